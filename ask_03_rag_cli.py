@@ -1,13 +1,19 @@
 import os
 import re
+import sys
 import json
+import time
 import uuid
+import asyncio
+import argparse
 from datetime import datetime
 
 from dotenv import load_dotenv
 from openai import OpenAI
 from supabase import create_client
 
+from meai_core.embedding_profile import EmbeddingConfig, embed_kwargs
+
 # ========= logging =========
 LOG_PATH = os.path.join(os.path.dirname(__file__), "logs", "sessions.jsonl")
 
@@ -44,7 +50,8 @@ MODE_MAP = {
 }
 
 LLM_MODEL = "gpt-4o-mini"
-EMBED_MODEL = "text-embedding-3-small"
+# embedding model + match RPC follow meai_embedding_config, like the web server
+embedding_config = EmbeddingConfig(lambda: sb)
 
 # Must match your meai_documents schema. Your DB has source_url.
 DOC_SOURCE_COL = "source_url"
@@ -99,11 +106,11 @@ def validate(answer: str, mode_name: str) -> dict:
 
 # ========= embeddings + retrieval =========
 def embed(text: str):
-    return openai_client.embeddings.create(model=EMBED_MODEL, input=text).data[0].embedding
+    return openai_client.embeddings.create(input=text, **embed_kwargs(embedding_config.active())).data[0].embedding
 
 def retrieve_chunks(query_embedding, k=8):
     return sb.rpc(
-        "match_meai_chunks",
+        embedding_config.active()["match_rpc"],
         {"query_embedding": query_embedding, "match_count": k}
     ).execute().data
 
@@ -315,6 +322,63 @@ RESPONSE REQUIREMENTS:
 - End with "Citations:" listing only tags you actually used.
 """.strip()
 
+# ========= batch mode =========
+def parse_batch_args(argv):
+    p = argparse.ArgumentParser(description="Answer a JSONL file of questions through the engine pipeline.")
+    p.add_argument("--batch", required=True, help='input JSONL: {"message": ..., "mode": "mode_1", "id": ...} per line')
+    p.add_argument("--out", default=None, help="results JSONL (default: logs/batch-<ts>.jsonl)")
+    p.add_argument("--mode", default="mode_1", help="mode for lines without one")
+    p.add_argument("--concurrency", type=int, default=None)
+    return p.parse_args(argv)
+
+def read_batch(path, default_mode):
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            message = (row.get("message") or row.get("question") or "").strip()
+            if not message:
+                raise ValueError(f"{path}:{n}: no message")
+            mode = str(row.get("mode") or default_mode)
+            item = {"mode": MODE_MAP[mode][0] if mode in MODE_MAP else mode, "message": message, "id": str(row["id"] if row.get("id") is not None else n)}
+            if row.get("session_id"):
+                item["session_id"] = row["session_id"]
+            items.append(item)
+    return items
+
+def run_batch(argv):
+    """Same pipeline as the web server (meai_core.engine), with bounded concurrency."""
+    from meai_core.engine import BATCH_CONCURRENCY, batch_summary, rag_answer_batch
+
+    args = parse_batch_args(argv)
+    items = read_batch(args.batch, args.mode)
+    out = args.out or os.path.join(os.path.dirname(LOG_PATH), f"batch-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    concurrency = args.concurrency or BATCH_CONCURRENCY
+
+    async def _run():
+        results = []
+        start = time.perf_counter()
+        with open(out, "w", encoding="utf-8") as f:
+            async for r in rag_answer_batch(items, concurrency=concurrency):
+                results.append(r)
+                f.write(json.dumps(r) + "\n")
+                f.flush()
+                status = f"ERROR {r['error']}" if r.get("error") else f"{r['elapsed_ms']} ms"
+                print(f"[{len(results)}/{len(items)}] {r['id']}: {status}", flush=True)
+        return batch_summary(results, int((time.perf_counter() - start) * 1000))
+
+    summary = asyncio.run(_run())
+    log_event({"type": "batch", "input": args.batch, "output": out, "concurrency": concurrency, **summary})
+    print(json.dumps(summary))
+    print(f"Saved {out}")
+    return 1 if summary["errors"] else 0
+
+if "--batch" in sys.argv:
+    sys.exit(run_batch(sys.argv[1:]))
+
 # ========= main loop =========
 print("\nMEAI Mechanical Engineer RAG CLI")
 print("Single-line questions only. Ctrl+C to exit.\n")
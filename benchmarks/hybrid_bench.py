@@ -0,0 +1,216 @@
+# benchmarks/hybrid_bench.py
+"""Hybrid (BM25 + vector, RRF) vs vector-only retrieval, offline.
+
+Builds the real LocalVectorIndex and LexicalIndex over a generated corpus
+of engineering prose. Every chunk mentions a part number, a standard ID or
+a material grade. The stand-in embedding only sees ordinary words, like a
+real model that blurs exact identifiers, so the benchmark shows what the
+lexical leg recovers. Two query sets, each with one relevant chunk:
+  identifier  "what torque does HX-4821-B need" style questions
+  topical     a passage of the chunk's prose, with the identifier left out
+
+  python -m benchmarks.hybrid_bench [--chunks 3000] [--queries 200] [--k 5]
+      [--candidates 30] [--vector-weight 1.0] [--lexical-weight 1.0] [--rrf-k 60] [--out results.json]
+
+Reports recall@k, MRR and per-query latency (p50/p95) for both retrievers.
+The generated vocabulary is small, so nearly every chunk matches every
+topical query. BM25 latency here is therefore close to its worst case.
+"""
+import os, re, sys, json, time, random, hashlib, argparse, tempfile, statistics
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, Any, List, Callable
+
+import numpy as np
+
+from meai_core.lexical_index import (
+    HYBRID_CANDIDATES, HYBRID_LEXICAL_WEIGHT, HYBRID_RRF_K, HYBRID_VECTOR_WEIGHT, LexicalIndex, fuse,
+)
+from meai_core.local_index import LocalVectorIndex
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+EMBED_DIM = 256
+
+WORDS = (
+    "bracket housing tolerance anodized aluminium supplier lead time machining casting injection molding "
+    "prototype fixture assembly torque fastener thread gasket seal bearing shaft gearbox motor controller "
+    "firmware sensor enclosure certification compliance inspection batch quote drawing revision material "
+    "steel titanium polymer finish coating surface roughness vendor capacity schedule shipment warranty"
+).split()
+STANDARDS = ["ISO", "DIN", "ASTM", "EN", "SAE", "JIS"]
+GRADES = ["6061-T6", "7075-T651", "304L", "316L", "17-4PH", "Ti-6Al-4V", "A2-70", "8.8", "10.9", "42CrMo4"]
+QUESTION_TEMPLATES = [
+    "what torque spec applies to {id}",
+    "lead time and supplier for {id}",
+    "which drawing revision covers {id}",
+    "inspection requirements for {id}",
+]
+
+# ========= corpus =========
+def _identifier(rng: random.Random, i: int) -> str:
+    kind = i % 3
+    if kind == 0:
+        return f"{rng.choice('ABCDHKMX')}{rng.choice('ABCDHKMX')}-{1000 + i}-{rng.choice('ABCDEF')}"
+    if kind == 1:
+        return f"{rng.choice(STANDARDS)} {100 + i}-{rng.randint(1, 9)}"
+    return f"{rng.choice(GRADES)} lot {20000 + i}"
+
+def generate_chunks(n: int, seed: int = 11) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        ident = _identifier(rng, i)
+        prose = " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 110)))
+        cut = rng.randint(10, 40)
+        words = prose.split()
+        content = " ".join(words[:cut] + [ident] + words[cut:])
+        out.append({
+            "source_file": f"doc{i // 25:04d}.pdf", "chunk_index": i % 25, "content": content,
+            "identifier": ident, "prose": prose, "page_start": 1, "page_end": 1, "quality": 1.0,
+        })
+    return out
+
+def semantic_vector(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Hashed bag of plain words; tokens containing digits are invisible to it."""
+    v = np.zeros(dim, dtype=np.float32)
+    for w in re.findall(r"[a-z]+(?:[-.][a-z0-9]+)*|\S+", text.lower()):
+        if any(c.isdigit() for c in w):
+            continue
+        h = int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "little")
+        v[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = float(np.linalg.norm(v))
+    return (v / norm if norm else v).tolist()
+
+def make_queries(chunks: List[Dict[str, Any]], n: int, seed: int = 5) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    picks = rng.sample(range(len(chunks)), min(n, len(chunks)))
+    out = []
+    for j, i in enumerate(picks):
+        c = chunks[i]
+        key = f"{c['source_file']}:{c['chunk_index']}"
+        if j % 2 == 0:
+            text = rng.choice(QUESTION_TEMPLATES).format(id=c["identifier"])
+            out.append({"kind": "identifier", "text": text, "expected": key})
+        else:
+            words = c["prose"].split()
+            start = rng.randint(0, max(len(words) - 25, 0))
+            out.append({"kind": "topical", "text": " ".join(words[start:start + 25]), "expected": key})
+    return out
+
+class FakeChunkTable:
+    """Just enough of the Supabase table API for LocalVectorIndex.build / LexicalIndex.build."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def table(self, name: str) -> Any:
+        state: Dict[str, Any] = {}
+        q = SimpleNamespace()
+        q.select = lambda cols: state.update(cols=cols.split(",")) or q
+        q.order = lambda col: q
+        q.range = lambda a, b: state.update(a=a, b=b + 1) or q
+        q.execute = lambda: SimpleNamespace(
+            data=[{c: r.get(c) for c in state["cols"]} for r in self.rows[state["a"]:state["b"]]]
+        )
+        return q
+
+# ========= run =========
+def _percentile(values: List[float], pct: float) -> float:
+    return round(float(np.percentile(values, pct)), 3) if values else 0.0
+
+def evaluate(queries: List[Dict[str, Any]], search: Callable[[Dict[str, Any]], List[Dict[str, Any]]], k: int) -> Dict[str, Any]:
+    by_kind: Dict[str, List[float]] = {}
+    rr: List[float] = []
+    latency: List[float] = []
+    for q in queries:
+        start = time.perf_counter()
+        rows = search(q)
+        latency.append((time.perf_counter() - start) * 1000)
+        keys = [f"{r['source_file']}:{r['chunk_index']}" for r in rows[:k]]
+        hit = q["expected"] in keys
+        by_kind.setdefault(q["kind"], []).append(1.0 if hit else 0.0)
+        rr.append(1.0 / (keys.index(q["expected"]) + 1) if hit else 0.0)
+    hits = [h for v in by_kind.values() for h in v]
+    return {
+        "recall_at_k": round(statistics.mean(hits), 4) if hits else 0.0,
+        "recall_by_kind": {kind: round(statistics.mean(v), 4) for kind, v in sorted(by_kind.items())},
+        "mrr": round(statistics.mean(rr), 4) if rr else 0.0,
+        "latency_ms_p50": _percentile(latency, 50),
+        "latency_ms_p95": _percentile(latency, 95),
+    }
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    chunks = generate_chunks(args.chunks, seed=args.seed)
+    for c in chunks:
+        c["embedding"] = semantic_vector(c["content"])
+    queries = make_queries(chunks, args.queries, seed=args.seed + 1)
+    qvecs = {q["text"]: semantic_vector(q["text"]) for q in queries}
+    sb = FakeChunkTable(chunks)
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors = LocalVectorIndex(index_dir=os.path.join(tmp, "local_index"))
+        start = time.perf_counter()
+        vectors.build(sb)
+        vector_build = time.perf_counter() - start
+        lexical = LexicalIndex(path=os.path.join(tmp, "lexical.sqlite3"))
+        start = time.perf_counter()
+        lexical.build(sb)
+        lexical_build = time.perf_counter() - start
+        depth = max(args.k, args.candidates)
+
+        def vector_only(q: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return vectors.search(qvecs[q["text"]], k=args.k)
+
+        def hybrid(q: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return fuse(
+                vectors.search(qvecs[q["text"]], k=depth),
+                lexical.search(q["text"], k=depth),
+                args.k,
+                vector_weight=args.vector_weight,
+                lexical_weight=args.lexical_weight,
+                rrf_k=args.rrf_k,
+            )
+
+        results = {"vector": evaluate(queries, vector_only, args.k), "hybrid": evaluate(queries, hybrid, args.k)}
+        lexical_size = os.path.getsize(lexical.path)
+    return {
+        "benchmark": "hybrid_retrieval",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        "corpus": {"chunks": len(chunks), "queries": len(queries)},
+        "build_sec": {"vector": round(vector_build, 3), "lexical": round(lexical_build, 3)},
+        "lexical_index_mb": round(lexical_size / 1e6, 2),
+        "results": results,
+    }
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Hybrid vs vector-only retrieval benchmark (offline).")
+    p.add_argument("--chunks", type=int, default=3000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--candidates", type=int, default=HYBRID_CANDIDATES)
+    p.add_argument("--vector-weight", type=float, default=HYBRID_VECTOR_WEIGHT)
+    p.add_argument("--lexical-weight", type=float, default=HYBRID_LEXICAL_WEIGHT)
+    p.add_argument("--rrf-k", type=float, default=HYBRID_RRF_K)
+    p.add_argument("--seed", type=int, default=11)
+    p.add_argument("--out", default=None, help="result JSON path (default: benchmarks/results/hybrid-<ts>.json)")
+    return p.parse_args(argv)
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    result = run_benchmark(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"hybrid-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"{result['corpus']['chunks']} chunks, {result['corpus']['queries']} queries, k={args.k}")
+    for name, r in result["results"].items():
+        kinds = ", ".join(f"{kind} {v}" for kind, v in r["recall_by_kind"].items())
+        print(
+            f"{name:>7}: recall@{args.k} {r['recall_at_k']} ({kinds}), MRR {r['mrr']}, "
+            f"p50 {r['latency_ms_p50']} ms, p95 {r['latency_ms_p95']} ms"
+        )
+    print(f"Saved {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
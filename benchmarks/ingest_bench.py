@@ -0,0 +1,257 @@
+# benchmarks/ingest_bench.py
+"""Ingestion throughput benchmark with offline stand-ins.
+
+Runs the real extract -> chunk -> embed -> insert pipeline from
+ingest_01_text_to_supabase.py over a generated PDF corpus. The OpenAI
+embeddings endpoint and Supabase inserts are replaced by local fakes with
+configurable latency, so numbers are repeatable and cost nothing.
+
+  python -m benchmarks.ingest_bench [--files 40] [--pages 12] [--embed-latency-ms 250]
+      [--insert-latency-ms 80] [--repeat 3] [--out results.json] [--compare baseline.json]
+
+Stage times are busy seconds summed across that stage's workers, so they can
+exceed wall time. Peak RSS covers this process and, separately, the largest
+extraction worker. With --compare the run fails (exit 1) when pages/sec drops
+more than --tolerance below the baseline.
+"""
+import os, sys, json, time, random, hashlib, argparse, resource, statistics, subprocess, threading
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+import ingest_01_text_to_supabase as ingest
+from meai_core.ingest_pipeline import INGEST_EXTRACT_WORKERS, INGEST_EMBED_WORKERS, IngestPipeline, RateLimiter
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "meai_core", "cache", "bench_corpus")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+EMBED_DIM = 1536
+
+WORDS = (
+    "bracket housing tolerance anodized aluminium supplier lead time machining casting injection molding "
+    "prototype fixture assembly torque fastener thread gasket seal bearing shaft gearbox motor controller "
+    "firmware sensor enclosure certification compliance inspection batch quote drawing revision material "
+    "steel titanium polymer finish coating surface roughness vendor capacity schedule shipment warranty "
+    "the a of and to in for with on by is are was be this that from as at which each per under over"
+).split()
+
+# ========= corpus =========
+def _paragraph(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(3, 7)):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 22))]
+        if rng.random() < 0.3:
+            words.insert(rng.randint(0, len(words)), f"{rng.randint(1, 999)}.{rng.randint(0, 99):02d} mm")
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+def _table_rows(rng: random.Random) -> List[str]:
+    return [" ".join(str(rng.randint(0, 9999)) for _ in range(8)) for _ in range(rng.randint(4, 10))]
+
+def generate_corpus(corpus_dir: str, files: int, pages: int, seed: int = 7) -> List[str]:
+    """files x pages PDFs of seeded pseudo-prose with the odd numeric table; reused when present."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    out_dir = os.path.join(corpus_dir, f"f{files}-p{pages}-s{seed}")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(out_dir, f"doc_{i:04d}.pdf")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        rng = random.Random(f"{seed}:{i}")
+        c = canvas.Canvas(path + ".tmp", pagesize=letter)
+        _, height = letter
+        for _ in range(pages):
+            y = height - 54
+            text = c.beginText(54, y)
+            text.setFont("Helvetica", 9)
+            lines = 0
+            while lines < 62:
+                block = _table_rows(rng) if rng.random() < 0.1 else _wrap(_paragraph(rng), 110)
+                for line in block + [""]:
+                    text.textLine(line)
+                    lines += 1
+            c.drawText(text)
+            c.showPage()
+        c.save()
+        os.replace(path + ".tmp", path)
+    return paths
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+# ========= stand-ins =========
+class FakeEmbeddings:
+    """Embeddings endpoint stand-in: fixed + per-input latency, deterministic unit vectors."""
+
+    def __init__(self, latency_ms: float = 250.0, per_input_ms: float = 0.5, dim: int = EMBED_DIM):
+        self.latency = latency_ms / 1000.0
+        self.per_input = per_input_ms / 1000.0
+        self.dim = dim
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.inputs = 0
+
+    def vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        v = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency + self.per_input * len(texts))
+        with self._lock:
+            self.requests += 1
+            self.inputs += len(texts)
+        return [self.vector(t) for t in texts]
+
+class FakeInserts:
+    """Supabase insert stand-in: serializes the payload like the client does, then waits."""
+
+    def __init__(self, latency_ms: float = 80.0, per_row_ms: float = 0.2):
+        self.latency = latency_ms / 1000.0
+        self.per_row = per_row_ms / 1000.0
+        self.requests = 0
+        self.rows = 0
+        self.payload_bytes = 0
+
+    def __call__(self, rows: List[Dict[str, Any]]) -> None:
+        body = json.dumps(rows)
+        time.sleep(self.latency + self.per_row * len(rows))
+        self.requests += 1
+        self.rows += len(rows)
+        self.payload_bytes += len(body)
+
+# ========= run =========
+def _maxrss_mb(who: int) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_once(paths: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    embed = FakeEmbeddings(args.embed_latency_ms, args.embed_per_input_ms)
+    insert = FakeInserts(args.insert_latency_ms, args.insert_per_row_ms)
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm) if args.rpm else RateLimiter(rpm=1e9, tpm=1e12)
+    pipeline = IngestPipeline(
+        ingest.extract_pdf_chunks,
+        embed,
+        insert,
+        extract_workers=args.extract_workers,
+        embed_workers=args.embed_workers,
+        limiter=limiter,
+        log=lambda *_: None,
+    )
+    files = [(p, os.path.basename(p)) for p in paths]
+    stats = pipeline.run(files)
+    wall = stats["wall_sec"]
+    return {
+        "wall_sec": round(wall, 3),
+        "pages": stats["pages"],
+        "chunks": stats["chunks"],
+        "pages_per_sec": round(stats["pages"] / wall, 2) if wall else None,
+        "chunks_per_sec": round(stats["chunks"] / wall, 2) if wall else None,
+        "extract_sec": round(stats["extract_sec"], 3),
+        "embed_sec": round(stats["embed_sec"], 3),
+        "insert_sec": round(stats["insert_sec"], 3),
+        "rate_limit_wait_sec": round(stats["rate_limit_wait_sec"], 3),
+        "embed_requests": embed.requests,
+        "insert_requests": insert.requests,
+        "rows_inserted": insert.rows,
+        "insert_payload_mb": round(insert.payload_bytes / 1e6, 2),
+        "failed_files": len(stats["failed_files"]),
+    }
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    paths = generate_corpus(args.corpus_dir, args.files, args.pages, seed=args.seed)
+    runs = [run_once(paths, args) for _ in range(max(args.repeat, 1))]
+    median = {
+        k: round(statistics.median(r[k] for r in runs), 3)
+        for k in runs[0]
+        if isinstance(runs[0][k], (int, float)) and k not in ("pages", "chunks", "failed_files")
+    }
+    return {
+        "benchmark": "ingest",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_rev": _git_rev(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "corpus_dir")},
+        "corpus": {"files": len(paths), "bytes": sum(os.path.getsize(p) for p in paths)},
+        "median": median,
+        "runs": runs,
+        "peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF),
+        "peak_rss_worker_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Tuple[bool, List[str]]:
+    lines, ok = [], True
+    for key in ("pages_per_sec", "chunks_per_sec", "wall_sec", "extract_sec", "embed_sec", "insert_sec"):
+        new, old = result["median"].get(key), baseline.get("median", {}).get(key)
+        if not new or not old:
+            continue
+        lines.append(f"{key:>16}: {old:>10} -> {new:>10} ({(new - old) / old:+.1%})")
+    new, old = result["median"].get("pages_per_sec"), baseline.get("median", {}).get("pages_per_sec")
+    if new and old and new < old * (1 - tolerance):
+        ok = False
+        lines.append(f"REGRESSION: pages/sec {new} is more than {tolerance:.0%} below baseline {old}")
+    return ok, lines
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Ingestion throughput benchmark (offline).")
+    p.add_argument("--files", type=int, default=40)
+    p.add_argument("--pages", type=int, default=12)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    p.add_argument("--embed-latency-ms", type=float, default=250.0)
+    p.add_argument("--embed-per-input-ms", type=float, default=0.5)
+    p.add_argument("--insert-latency-ms", type=float, default=80.0)
+    p.add_argument("--insert-per-row-ms", type=float, default=0.2)
+    p.add_argument("--extract-workers", type=int, default=INGEST_EXTRACT_WORKERS)
+    p.add_argument("--embed-workers", type=int, default=INGEST_EMBED_WORKERS)
+    p.add_argument("--rpm", type=float, default=0.0, help="embeddings rate limit; 0 = unlimited")
+    p.add_argument("--tpm", type=float, default=1e6)
+    p.add_argument("--repeat", type=int, default=1)
+    p.add_argument("--out", default=None, help="result JSON path (default: benchmarks/results/ingest-<ts>.json)")
+    p.add_argument("--compare", default=None, help="baseline result JSON")
+    p.add_argument("--tolerance", type=float, default=0.10)
+    return p.parse_args(argv)
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    result = run_benchmark(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"ingest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    m = result["median"]
+    print(
+        f"{result['corpus']['files']} files, {result['runs'][0]['pages']} pages, {result['runs'][0]['chunks']} chunks: "
+        f"{m['pages_per_sec']} pages/s, {m['chunks_per_sec']} chunks/s, wall {m['wall_sec']}s "
+        f"(extract {m['extract_sec']}s, embed {m['embed_sec']}s, insert {m['insert_sec']}s), "
+        f"peak RSS {result['peak_rss_mb']} MB / worker {result['peak_rss_worker_mb']} MB"
+    )
+    print(f"Saved {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            ok, lines = compare(result, json.load(f), args.tolerance)
+        print("\n".join(lines))
+        return 0 if ok else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,396 @@
+# benchmarks/retrieval_bench.py
+"""Retrieval quality and latency against a versioned golden set, offline.
+
+The golden set (benchmarks/golden/retrieval.json) lists questions with
+graded judgements: {"source_file", "chunk_index", "grade"}, where grade 2
+answers the question and grade 1 is related context. A query may carry
+"source_files" and/or "collection", which are passed to retrieval as
+filters. Bump "version" whenever a query, a judgement or the judged
+documents change.
+
+A snapshot directory is everything retrieval reads, recorded once:
+  local_index/        LocalVectorIndex of meai_chunks for the active embedding profile
+  lexical.sqlite3     LexicalIndex of the same rows
+  embeddings.sqlite3  EmbeddingCache holding every golden query's embedding
+  snapshot.json       profile, row counts, golden sha256, git rev, embeddings API latency
+
+Recording needs the OpenAI and Supabase credentials; a run needs neither.
+The run points the engine at the snapshot (local backend, pinned embedding
+profile), replaces its OpenAI and Supabase clients with ones that raise, and
+calls engine.embed and engine.retrieve_chunks the way _prepare_turn does.
+The hybrid, MMR and quality settings come from the usual MEAI_* variables
+and are copied into the report.
+
+  python -m benchmarks.retrieval_bench --record [--snapshot DIR] [--golden FILE]
+  python -m benchmarks.retrieval_bench [--snapshot DIR] [--golden FILE] [--k 1,3,5,10]
+      [--repeat 3] [--out report.json] [--compare baseline.json]
+  python -m benchmarks.retrieval_bench --synthetic [--chunks 2000] [--queries 100]
+
+Reports recall@k, nDCG@k (gain 2^grade - 1), MRR and context recall (the
+share of relevant chunks that build_context kept), overall and per query
+kind, plus p50/p95/p99 of embed and retrieve_chunks. embed is served from
+the recorded cache, so its latency is the cache path; the embeddings API
+latency seen while recording is in snapshot.json. Per-query ranks are kept
+in the report so two commits can be diffed query by query. With --compare
+the run fails (exit 1) when a quality metric drops more than --max-drop or
+retrieve_chunks p95 grows more than --latency-tolerance. --synthetic
+records a throwaway snapshot of the hybrid_bench corpus first, for CI.
+"""
+import os, sys, json, math, time, hashlib, argparse, tempfile, subprocess, contextlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterator
+
+import numpy as np
+
+from benchmarks.hybrid_bench import FakeChunkTable, generate_chunks, make_queries, semantic_vector
+from meai_core.embed_cache import EmbeddingCache
+from meai_core.embedding_profile import EmbeddingConfig, embed_with, profile_key
+from meai_core.lexical_index import LexicalIndex
+from meai_core.local_index import LocalVectorIndex
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "snapshots", "retrieval")
+DEFAULT_GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden", "retrieval.json")
+SNAPSHOT_FILE = "snapshot.json"
+DEFAULT_KS = (1, 3, 5, 10)
+CONTEXT_CHUNKS = 5  # build_context(rows, max_chunks=5), as in _prepare_turn
+SYNTHETIC_MODEL = "hybrid-bench-hash"
+# placeholders so the engine imports without credentials; its clients are replaced before use
+OFFLINE_ENV = {"OPENAI_API_KEY": "offline", "SUPABASE_URL": "http://offline.invalid", "SUPABASE_SERVICE_KEY": "offline"}
+
+def _engine(offline: bool) -> Any:
+    if offline:
+        for name, value in OFFLINE_ENV.items():
+            os.environ.setdefault(name, value)
+    from meai_core import engine
+    return engine
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ========= golden set =========
+def load_golden(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    golden = json.loads(raw)
+    ids = [q["id"] for q in golden["queries"]]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"{path}: duplicate query ids")
+    for q in golden["queries"]:
+        if not any(r.get("grade", 1) > 0 for r in q.get("relevant") or []):
+            raise ValueError(f"{path}: query {q['id']} has no relevant chunk")
+    golden["sha256"] = hashlib.sha256(raw).hexdigest()
+    golden["path"] = path
+    return golden
+
+def chunk_key(source_file: Any, chunk_index: Any) -> str:
+    return f"{source_file}:{chunk_index}"
+
+def judgements(query: Dict[str, Any]) -> Dict[str, int]:
+    """{chunk key: grade} of the chunks judged relevant (grade > 0)."""
+    out = {chunk_key(r["source_file"], r["chunk_index"]): int(r.get("grade", 1)) for r in query.get("relevant") or []}
+    return {key: g for key, g in out.items() if g > 0}
+
+# ========= metrics =========
+def dcg(grades: List[int]) -> float:
+    return sum((2 ** g - 1) / math.log2(rank + 2) for rank, g in enumerate(grades))
+
+def rank_metrics(retrieved: List[str], relevant: Dict[str, int], ks: List[int]) -> Dict[str, float]:
+    """recall@k, ndcg@k and reciprocal rank of one ranked list of chunk keys."""
+    out: Dict[str, float] = {}
+    ideal = sorted(relevant.values(), reverse=True)
+    for k in ks:
+        top = retrieved[:k]
+        out[f"recall@{k}"] = sum(1 for key in relevant if key in top) / len(relevant)
+        best = dcg(ideal[:k])
+        out[f"ndcg@{k}"] = dcg([relevant.get(key, 0) for key in top]) / best if best else 0.0
+    first = next((i for i, key in enumerate(retrieved) if key in relevant), None)
+    out["rr"] = 1.0 / (first + 1) if first is not None else 0.0
+    return out
+
+def _mean_metrics(rows: List[Dict[str, Any]], names: List[str]) -> Dict[str, float]:
+    out = {name: round(float(np.mean([r[name] for r in rows])), 4) if rows else 0.0 for name in names}
+    if "rr" in out:
+        out["mrr"] = out.pop("rr")
+    return out
+
+def latency_summary(values_ms: List[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    return {
+        "p50": round(float(np.percentile(values_ms, 50)), 3),
+        "p95": round(float(np.percentile(values_ms, 95)), 3),
+        "p99": round(float(np.percentile(values_ms, 99)), 3),
+        "mean": round(float(np.mean(values_ms)), 3),
+    }
+
+# ========= snapshot =========
+def record_snapshot(
+    snapshot_dir: str,
+    sb: Any,
+    profile: Dict[str, Any],
+    golden: Dict[str, Any],
+    embed_one: Callable[[str], List[float]],
+) -> Dict[str, Any]:
+    """Build the indexes from `sb` and cache every golden query's embedding."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    key = profile_key(profile)
+    vectors = LocalVectorIndex(index_dir=os.path.join(snapshot_dir, "local_index"))
+    vector_rows = vectors.build(sb, embed_model=key, embed_column=profile["column"])
+    lexical_rows = LexicalIndex(path=os.path.join(snapshot_dir, "lexical.sqlite3")).build(sb)
+    cache = EmbeddingCache(path=os.path.join(snapshot_dir, "embeddings.sqlite3"), ttl_sec=float("inf"), disk_max_rows=0, disk_ttl_sec=0)
+    api_ms = []
+    for text in dict.fromkeys(q["query"] for q in golden["queries"]):
+        start = time.perf_counter()
+        vec = embed_one(text)
+        api_ms.append((time.perf_counter() - start) * 1000)
+        cache.put(key, text, vec)
+    info = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "git_rev": _git_rev(),
+        "profile": dict(profile),
+        "chunks": {"vector": vector_rows, "lexical": lexical_rows},
+        "index": vectors.stats(),
+        "golden": {"version": golden.get("version"), "sha256": golden["sha256"], "queries": len(golden["queries"])},
+        "embed_api_ms": latency_summary(api_ms),
+    }
+    with open(os.path.join(snapshot_dir, SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+def load_snapshot_info(snapshot_dir: str) -> Dict[str, Any]:
+    path = os.path.join(snapshot_dir, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No snapshot at {snapshot_dir}; record one with --record (needs credentials) or use --synthetic")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class _RecordedProfile:
+    """meai_embedding_config as recorded: one active row."""
+
+    def __init__(self, profile: Dict[str, Any]):
+        self.rows = [dict(profile, slot="active")]
+
+    def table(self, name: str) -> Any:
+        q = SimpleNamespace()
+        q.select = lambda cols: q
+        q.execute = lambda: SimpleNamespace(data=self.rows)
+        return q
+
+class _Offline:
+    """Stands in for the OpenAI and Supabase clients during a run."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        raise RuntimeError(f"retrieval_bench is offline but retrieval used the {self.name} client ({attr}); re-record the snapshot")
+
+@contextlib.contextmanager
+def use_snapshot(engine: Any, snapshot_dir: str, info: Dict[str, Any]) -> Iterator[None]:
+    """Point the engine's retrieval at the snapshot; restores every attribute on exit."""
+    swap = {
+        "RETRIEVAL_BACKEND": "local",
+        "local_index": LocalVectorIndex(index_dir=os.path.join(snapshot_dir, "local_index")),
+        "lexical_index": LexicalIndex(path=os.path.join(snapshot_dir, "lexical.sqlite3")),
+        "embed_cache": EmbeddingCache(path=os.path.join(snapshot_dir, "embeddings.sqlite3"), ttl_sec=float("inf"), disk_max_rows=0, disk_ttl_sec=0),
+        "embedding_config": EmbeddingConfig(lambda: _RecordedProfile(info["profile"]), check_interval_sec=float("inf")),
+        "openai_client": _Offline("OpenAI"),
+        "sb": _Offline("Supabase"),
+    }
+    saved = {name: getattr(engine, name) for name in swap}
+    for name, value in swap.items():
+        setattr(engine, name, value)
+    try:
+        swap["local_index"].load()
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(engine, name, value)
+
+# ========= run =========
+def _query_filter(q: Dict[str, Any]) -> Dict[str, Any]:
+    return {"source_files": q.get("source_files"), "collection": q.get("collection")}
+
+def evaluate(engine: Any, golden: Dict[str, Any], ks: List[int], depth: int, repeat: int = 1) -> Dict[str, Any]:
+    """Metrics from the first pass; latency over all passes, each starting with a cold memory tier."""
+    key = profile_key(engine.embedding_config.active())
+    missing = [q["id"] for q in golden["queries"] if engine.embed_cache.get(key, q["query"]) is None]
+    if missing:
+        raise RuntimeError(f"Snapshot has no embedding for {', '.join(missing)}; the golden set changed since it was recorded")
+    # first search maps the snapshot and opens the lexical db
+    engine.retrieve_chunks(engine.embed(golden["queries"][0]["query"]), k=depth, query_text=golden["queries"][0]["query"])
+    embed_ms: List[float] = []
+    retrieve_ms: List[float] = []
+    per_query: List[Dict[str, Any]] = []
+    for run in range(max(repeat, 1)):
+        engine.embed_cache.clear_memory()
+        for q in golden["queries"]:
+            start = time.perf_counter()
+            vec = engine.embed(q["query"])
+            mid = time.perf_counter()
+            rows = engine.retrieve_chunks(vec, k=depth, query_text=q["query"], **_query_filter(q))
+            end = time.perf_counter()
+            embed_ms.append((mid - start) * 1000)
+            retrieve_ms.append((end - mid) * 1000)
+            if run:
+                continue
+            relevant = judgements(q)
+            retrieved = [chunk_key(r.get("source_file"), r.get("chunk_index")) for r in rows]
+            _, tags, _ = engine.build_context(rows, max_chunks=CONTEXT_CHUNKS)
+            kept = {t.strip("[]") for t in tags}
+            scores = rank_metrics(retrieved, relevant, ks)
+            first = next((i + 1 for i, k in enumerate(retrieved) if k in relevant), None)
+            per_query.append({
+                "id": q["id"], "kind": q.get("kind", "default"), "first_relevant_rank": first,
+                "context_recall": sum(1 for k in relevant if k in kept) / len(relevant),
+                **{name: round(v, 4) for name, v in scores.items()},
+                "retrieved": retrieved[:max(ks)],
+            })
+    names = [f"recall@{k}" for k in ks] + [f"ndcg@{k}" for k in ks] + ["rr", "context_recall"]
+    by_kind: Dict[str, List[Dict[str, Any]]] = {}
+    for r in per_query:
+        by_kind.setdefault(r["kind"], []).append(r)
+    return {
+        "metrics": _mean_metrics(per_query, names),
+        "by_kind": {kind: dict(_mean_metrics(rows, names), queries=len(rows)) for kind, rows in sorted(by_kind.items())},
+        "latency_ms": {"embed": latency_summary(embed_ms), "retrieve_chunks": latency_summary(retrieve_ms)},
+        "queries": per_query,
+    }
+
+def run_benchmark(engine: Any, snapshot_dir: str, golden: Dict[str, Any], ks: List[int], depth: int, repeat: int = 1) -> Dict[str, Any]:
+    info = load_snapshot_info(snapshot_dir)
+    if info.get("golden", {}).get("sha256") != golden["sha256"]:
+        print(f"warning: snapshot was recorded for golden sha {info.get('golden', {}).get('sha256')}, not {golden['sha256']}", file=sys.stderr)
+    with use_snapshot(engine, snapshot_dir, info):
+        result = evaluate(engine, golden, ks, depth, repeat)
+    return {
+        "benchmark": "retrieval",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_rev": _git_rev(),
+        "golden": {"path": os.path.relpath(golden["path"]), "version": golden.get("version"), "sha256": golden["sha256"], "queries": len(golden["queries"])},
+        "snapshot": {"path": os.path.relpath(snapshot_dir), **info},
+        "config": {
+            "k": list(ks), "depth": depth, "repeat": repeat, "context_chunks": CONTEXT_CHUNKS,
+            "hybrid": engine.HYBRID_RETRIEVAL, "hybrid_candidates": engine.HYBRID_CANDIDATES,
+            "mmr": engine.MMR_ENABLED, "mmr_lambda": engine.MMR_LAMBDA, "merge_adjacent": engine.MERGE_ADJACENT,
+            "min_quality": engine.MIN_CHUNK_QUALITY,
+        },
+        **result,
+    }
+
+# ========= synthetic =========
+def synthetic_golden(chunks: List[Dict[str, Any]], n: int, seed: int) -> Dict[str, Any]:
+    queries = []
+    for i, q in enumerate(make_queries(chunks, n, seed=seed)):
+        sf, ci = q["expected"].rsplit(":", 1)
+        queries.append({"id": f"syn-{i:04d}", "kind": q["kind"], "query": q["text"], "relevant": [{"source_file": sf, "chunk_index": int(ci), "grade": 2}]})
+    raw = json.dumps(queries, sort_keys=True).encode("utf-8")
+    return {"version": 0, "queries": queries, "sha256": hashlib.sha256(raw).hexdigest(), "path": "<synthetic>"}
+
+def record_synthetic(snapshot_dir: str, chunks: int, queries: int, seed: int) -> Dict[str, Any]:
+    """A snapshot of the hybrid_bench corpus and its golden set; needs no credentials."""
+    rows = generate_chunks(chunks, seed=seed)
+    for r in rows:
+        r["embedding"] = semantic_vector(r["content"])
+        r["collection"] = "core"
+    golden = synthetic_golden(rows, queries, seed + 1)
+    profile = {"model": SYNTHETIC_MODEL, "dimensions": None, "column": "embedding", "match_rpc": "match_meai_chunks"}
+    record_snapshot(snapshot_dir, FakeChunkTable(rows), profile, golden, semantic_vector)
+    return golden
+
+# ========= compare =========
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_drop: float, latency_tolerance: float) -> Tuple[bool, List[str]]:
+    lines, ok = [], True
+    same_golden = result["golden"]["sha256"] == baseline.get("golden", {}).get("sha256")
+    if not same_golden:
+        lines.append("golden set differs from the baseline's; quality metrics are not compared")
+    else:
+        for name, new in result["metrics"].items():
+            old = baseline.get("metrics", {}).get(name)
+            if old is None:
+                continue
+            lines.append(f"{name:>16}: {old:>8} -> {new:>8} ({new - old:+.4f})")
+            if new < old - max_drop:
+                ok = False
+                lines.append(f"REGRESSION: {name} dropped more than {max_drop} below baseline {old}")
+        old_ranks = {q["id"]: q["first_relevant_rank"] for q in baseline.get("queries", [])}
+        for q in result["queries"]:
+            old, new = old_ranks.get(q["id"]), q["first_relevant_rank"]
+            if old is not None and (new is None or new > old):
+                lines.append(f"  {q['id']}: first relevant rank {old} -> {new}")
+    for stage in ("embed", "retrieve_chunks"):
+        new = result["latency_ms"][stage]["p95"]
+        old = baseline.get("latency_ms", {}).get(stage, {}).get("p95")
+        if not old:
+            continue
+        lines.append(f"{stage + ' p95':>16}: {old:>8} -> {new:>8} ms ({(new - old) / old:+.1%})")
+    new = result["latency_ms"]["retrieve_chunks"]["p95"]
+    old = baseline.get("latency_ms", {}).get("retrieve_chunks", {}).get("p95")
+    if old and new > old * (1 + latency_tolerance):
+        ok = False
+        lines.append(f"REGRESSION: retrieve_chunks p95 {new} ms is more than {latency_tolerance:.0%} above baseline {old} ms")
+    return ok, lines
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Retrieval quality and latency benchmark (offline against a recorded snapshot).")
+    p.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_DIR)
+    p.add_argument("--golden", default=DEFAULT_GOLDEN_PATH)
+    p.add_argument("--record", action="store_true", help="record the snapshot from Supabase/OpenAI and exit")
+    p.add_argument("--synthetic", action="store_true", help="run against a generated corpus in a temp snapshot")
+    p.add_argument("--chunks", type=int, default=2000, help="--synthetic corpus size")
+    p.add_argument("--queries", type=int, default=100, help="--synthetic golden set size")
+    p.add_argument("--seed", type=int, default=11)
+    p.add_argument("--k", default=",".join(str(k) for k in DEFAULT_KS), help="comma-separated cutoffs")
+    p.add_argument("--depth", type=int, default=None, help="rows retrieved per query (default: engine.CONTEXT_CANDIDATES)")
+    p.add_argument("--repeat", type=int, default=1, help="timed passes over the golden set")
+    p.add_argument("--out", default=None, help="report JSON path (default: benchmarks/results/retrieval-<ts>.json)")
+    p.add_argument("--compare", default=None, help="baseline report JSON")
+    p.add_argument("--max-drop", type=float, default=0.01, help="allowed absolute drop of any quality metric")
+    p.add_argument("--latency-tolerance", type=float, default=0.25)
+    return p.parse_args(argv)
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    ks = sorted({int(k) for k in args.k.split(",") if k.strip()})
+    if args.record:
+        engine = _engine(offline=False)
+        golden = load_golden(args.golden)
+        profile = engine.embedding_config.snapshot()["active"]
+        info = record_snapshot(args.snapshot, engine.sb, profile, golden, lambda t: embed_with(engine.openai_client, profile, [t])[0])
+        print(f"Recorded {info['chunks']['vector']} chunks and {info['golden']['queries']} query embeddings to {args.snapshot}")
+        return 0
+    engine = _engine(offline=True)
+    depth = max(args.depth or engine.CONTEXT_CANDIDATES, max(ks))
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic:
+            snapshot = os.path.join(tmp, "snapshot")
+            golden = record_synthetic(snapshot, args.chunks, args.queries, args.seed)
+        else:
+            snapshot, golden = args.snapshot, load_golden(args.golden)
+        result = run_benchmark(engine, snapshot, golden, ks, depth, args.repeat)
+    out = args.out or os.path.join(RESULTS_DIR, f"retrieval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    m, lat = result["metrics"], result["latency_ms"]
+    print(f"golden v{result['golden']['version']} ({result['golden']['queries']} queries), {result['snapshot']['chunks']['vector']} chunks, depth {depth}")
+    print("  " + ", ".join(f"{name} {value}" for name, value in m.items()))
+    for kind, r in result["by_kind"].items():
+        print(f"  {kind}: recall@{ks[-1]} {r[f'recall@{ks[-1]}']}, MRR {r['mrr']} ({r['queries']} queries)")
+    for stage, s in lat.items():
+        print(f"  {stage}: p50 {s['p50']} ms, p95 {s['p95']} ms, p99 {s['p99']} ms")
+    print(f"Saved {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            ok, lines = compare(result, json.load(f), args.max_drop, args.latency_tolerance)
+        print("\n".join(lines))
+        return 0 if ok else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
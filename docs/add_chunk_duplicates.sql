@@ -0,0 +1,13 @@
+-- Near-duplicate chunks skipped at ingest (MEAI_DEDUP_MODE=link), pointing at the stored canonical chunk
+create table if not exists meai_chunk_duplicates (
+  source_file text not null,
+  chunk_index integer not null,
+  canonical_source_file text not null,
+  canonical_chunk_index integer not null,
+  similarity real not null,
+  created_at timestamptz not null default now(),
+  primary key (source_file, chunk_index)
+);
+
+create index if not exists meai_chunk_duplicates_canonical_idx
+  on meai_chunk_duplicates (canonical_source_file, canonical_chunk_index);
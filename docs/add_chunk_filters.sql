@@ -0,0 +1,55 @@
+-- Metadata filters applied inside retrieval (meai_core/chunk_filter.py)
+
+-- Which document collection a chunk belongs to: 'system' (docs/system_pdfs), 'core' (CORE_LIBRARY_DIR)
+-- or 'uploads' (UPLOADS_DIR). The ingester sets it on every new row.
+alter table meai_chunks add column if not exists collection text
+  check (collection in ('system', 'core', 'uploads'));
+
+-- Backfill rows ingested before the column existed. System docs are stored under their file name.
+update meai_chunks set collection = 'system'
+where collection is null and source_file in (
+  '01_Project_Overview.pdf', '02_System_Architecture.pdf', '03_Tech_Stack.pdf', '04_Env_and_Secrets.pdf',
+  '05_Database_Schema.pdf', '06_Ingestion_Pipeline.pdf', '07_Known_Issues.pdf', '08_Runbook.pdf',
+  '09_Future_Roadmap.pdf', '10_Glossary.pdf'
+);
+update meai_chunks set collection = 'core' where collection is null;
+
+create index if not exists meai_chunks_collection_idx on meai_chunks (collection);
+create index if not exists meai_chunks_source_file_idx on meai_chunks (source_file);
+
+-- Filtered twin of match_meai_chunks. A null argument does not filter.
+-- A narrow filter (a handful of files) makes the planner skip the vector index and scan just those
+-- rows, which is exact. For a broad filter with hnsw, enable iterative scans (pgvector >= 0.8),
+-- so match_count rows still come back after filtering:
+--   alter database postgres set hnsw.iterative_scan = relaxed_order;
+create or replace function match_meai_chunks_filtered(
+  query_embedding vector(1536),
+  match_count integer,
+  min_quality real default 0,
+  filter_source_files text[] default null,
+  filter_collection text default null
+)
+returns table (
+  source_file text,
+  chunk_index integer,
+  content text,
+  page_start integer,
+  page_end integer,
+  quality real,
+  collection text,
+  similarity double precision
+)
+language sql stable
+as $$
+  select c.source_file, c.chunk_index, c.content, c.page_start, c.page_end, c.quality, c.collection,
+         1 - (c.embedding <=> query_embedding) as similarity
+  from meai_chunks c
+  where (c.quality is null or c.quality >= min_quality)
+    and (filter_source_files is null or c.source_file = any(filter_source_files))
+    and (filter_collection is null or c.collection = filter_collection)
+  order by c.embedding <=> query_embedding
+  limit match_count;
+$$;
+
+-- An embedding migration (docs/add_embedding_migration.sql) needs a filtered twin of its match RPC
+-- too, named <match_rpc>_filtered: copy the function above, then swap in the new vector width and column.
@@ -0,0 +1,3 @@
+-- Page span per chunk (chunks run across page boundaries since the streaming chunker)
+alter table meai_chunks add column if not exists page_start integer;
+alter table meai_chunks add column if not exists page_end integer;
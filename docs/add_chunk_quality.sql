@@ -0,0 +1,49 @@
+-- Ingest-time chunk quality score (meai_core/chunk_quality.py); retrieval filters on it
+alter table meai_chunks add column if not exists quality real;
+
+create index if not exists meai_chunks_quality_idx on meai_chunks (quality);
+
+-- match_meai_chunks gains min_quality. Rows not scored yet (quality is null) still match,
+-- build_context checks those itself until `python -m meai_core.chunk_quality` has run.
+-- With an ivfflat/hnsw index the filter applies after the index scan; on pgvector >= 0.8
+-- enable iterative scans (hnsw.iterative_scan = relaxed_order) so match_count rows still come back.
+drop function if exists match_meai_chunks(vector, integer);
+
+create or replace function match_meai_chunks(
+  query_embedding vector(1536),
+  match_count integer,
+  min_quality real default 0
+)
+returns table (
+  source_file text,
+  chunk_index integer,
+  content text,
+  page_start integer,
+  page_end integer,
+  quality real,
+  similarity double precision
+)
+language sql stable
+as $$
+  select c.source_file, c.chunk_index, c.content, c.page_start, c.page_end, c.quality,
+         1 - (c.embedding <=> query_embedding) as similarity
+  from meai_chunks c
+  where c.quality is null or c.quality >= min_quality
+  order by c.embedding <=> query_embedding
+  limit match_count;
+$$;
+
+-- Batch score writes for the backfill job
+create or replace function meai_set_chunk_quality(
+  source_files text[],
+  chunk_indexes integer[],
+  scores real[]
+)
+returns void
+language sql
+as $$
+  update meai_chunks c
+  set quality = u.score
+  from unnest(source_files, chunk_indexes, scores) as u(source_file, chunk_index, score)
+  where c.source_file = u.source_file and c.chunk_index = u.chunk_index;
+$$;
@@ -0,0 +1,95 @@
+-- Zero-downtime embedding model migrations (meai_core/embed_migration.py, meai_core/embedding_profile.py)
+
+-- Which model / meai_chunks column / match RPC is live ("active") and which one is being built ("target")
+create table if not exists meai_embedding_config (
+  slot text primary key check (slot in ('active', 'target', 'previous')),
+  model text not null,
+  dimensions integer,
+  column_name text not null check (column_name like 'embedding%'),
+  match_rpc text not null,
+  checkpoint jsonb,
+  verified jsonb,
+  updated_at timestamptz not null default now()
+);
+
+insert into meai_embedding_config (slot, model, dimensions, column_name, match_rpc)
+values ('active', 'text-embedding-3-small', null, 'embedding', 'match_meai_chunks')
+on conflict (slot) do nothing;
+
+-- Batch vector writes for the backfill; only embedding* columns can be targeted
+create or replace function meai_set_chunk_embeddings(
+  column_name text,
+  source_files text[],
+  chunk_indexes integer[],
+  embeddings text[]
+)
+returns void
+language plpgsql
+as $$
+begin
+  if column_name not like 'embedding%' then
+    raise exception 'not an embedding column: %', column_name;
+  end if;
+  execute format(
+    'update meai_chunks c set %I = u.embedding::vector
+       from unnest($1, $2, $3) as u(source_file, chunk_index, embedding)
+      where c.source_file = u.source_file and c.chunk_index = u.chunk_index',
+    column_name
+  ) using source_files, chunk_indexes, embeddings;
+end;
+$$;
+
+-- Promote target to active in one transaction; the old active row is kept as "previous".
+-- Readers pick the change up within MEAI_EMBED_CONFIG_CHECK_SEC.
+create or replace function meai_switch_embedding_profile()
+returns void
+language plpgsql
+as $$
+begin
+  if not exists (select 1 from meai_embedding_config where slot = 'target') then
+    raise exception 'no target embedding profile';
+  end if;
+  delete from meai_embedding_config where slot = 'previous';
+  update meai_embedding_config set slot = 'previous', updated_at = now() where slot = 'active';
+  update meai_embedding_config set slot = 'active', updated_at = now() where slot = 'target';
+end;
+$$;
+
+-- ===== per migration: shadow column, index and match RPC =====
+-- Example: text-embedding-3-small shortened to 512 dimensions. Pick the names, then
+--   python -m meai_core.embed_migration --start text-embedding-3-small --dims 512 \
+--     --column embedding_v2 --match_rpc match_meai_chunks_v2
+alter table meai_chunks add column if not exists embedding_v2 vector(512);
+
+-- build after the backfill for a faster load; queries do not touch it until the switch
+create index if not exists meai_chunks_embedding_v2_idx
+  on meai_chunks using hnsw (embedding_v2 vector_cosine_ops);
+
+create or replace function match_meai_chunks_v2(
+  query_embedding vector(512),
+  match_count integer,
+  min_quality real default 0
+)
+returns table (
+  source_file text,
+  chunk_index integer,
+  content text,
+  page_start integer,
+  page_end integer,
+  quality real,
+  similarity double precision
+)
+language sql stable
+as $$
+  select c.source_file, c.chunk_index, c.content, c.page_start, c.page_end, c.quality,
+         1 - (c.embedding_v2 <=> query_embedding) as similarity
+  from meai_chunks c
+  where c.embedding_v2 is not null and (c.quality is null or c.quality >= min_quality)
+  order by c.embedding_v2 <=> query_embedding
+  limit match_count;
+$$;
+
+-- The ingester keeps writing every configured column (active, target and previous), so the
+-- old column stays complete for a rollback. Once the switch has been stable, retire it:
+--   delete from meai_embedding_config where slot = 'previous';
+--   alter table meai_chunks drop column embedding;
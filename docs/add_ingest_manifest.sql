@@ -0,0 +1,13 @@
+-- Ingest manifest mirror (local copy: meai_core/cache/ingest_manifest.sqlite3)
+create table if not exists meai_ingest_manifest (
+  source_file text primary key,
+  content_hash text not null,
+  ingest_version text not null,
+  chunk_hashes jsonb not null default '[]'::jsonb,
+  chunk_count integer not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+-- incremental re-ingestion deletes and reads chunks by (source_file, chunk_index)
+create index if not exists meai_chunks_source_chunk_idx
+  on meai_chunks (source_file, chunk_index);
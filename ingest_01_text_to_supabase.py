@@ -1,8 +1,22 @@
-import os, time, traceback, sys
+import os, sys, json, signal, threading
 from dotenv import load_dotenv
 from openai import OpenAI
 from supabase import create_client
-from pypdf import PdfReader
+
+from meai_core.chunking import CHUNKER_VERSION, iter_pdf_pages, stream_chunks
+from meai_core.chunk_filter import CORE_COLLECTION, SYSTEM_COLLECTION, UPLOADS_COLLECTION, collection_for_path
+from meai_core.chunk_quality import quality_score
+from meai_core.corpus_stamp import CorpusStamp
+from meai_core.dedup import DEDUP_MODE, DUPLICATES_TABLE_NAME, DedupIndex
+from meai_core.embedding_profile import ACTIVE, EmbeddingConfig, embed_with, profile_key, write_profiles
+from meai_core.ingest_pipeline import IngestPipeline
+from meai_core.ingest_journal import INGEST_JOURNAL_ENABLED, IngestJournal
+from meai_core.ingest_watch import IngestDaemon, make_watcher
+from meai_core.lexical_index import HYBRID_RETRIEVAL, LexicalIndex
+from meai_core.local_index import LocalVectorIndex
+from meai_core.ingest_manifest import (
+    INGEST_MANIFEST_ENABLED, MANIFEST_TABLE_NAME, IngestManifest, diff_chunks, file_sha256, text_hash,
+)
 
 load_dotenv()
 
@@ -10,43 +24,71 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 CORE_LIBRARY_DIR = os.getenv("CORE_LIBRARY_DIR")
-assert OPENAI_API_KEY and SUPABASE_URL and SUPABASE_SERVICE_KEY and CORE_LIBRARY_DIR, "Missing env vars"
 
 PROJECT_ROOT = os.path.dirname(__file__)
 SYSTEM_PDFS_DIR = os.path.join(PROJECT_ROOT, "docs", "system_pdfs")
+# optional: customer-provided documents, ingested into their own collection
+UPLOADS_DIR = os.getenv("UPLOADS_DIR")
+
+# created on first use, so extraction workers and benchmarks can import this module without credentials
+_clients = {}
+
+def check_env():
+    assert OPENAI_API_KEY and SUPABASE_URL and SUPABASE_SERVICE_KEY and CORE_LIBRARY_DIR, "Missing env vars"
+
+def get_openai_client():
+    if "openai" not in _clients:
+        _clients["openai"] = OpenAI(api_key=OPENAI_API_KEY)
+    return _clients["openai"]
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+def get_supabase():
+    if "supabase" not in _clients:
+        _clients["supabase"] = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    return _clients["supabase"]
+
+def load_embedding_profiles():
+    """Snapshot the embedding profiles for one run, so vectors and the columns they land in always agree."""
+    if "embedding_config" not in _clients:
+        _clients["embedding_config"] = EmbeddingConfig(get_supabase)
+    _clients["profiles"] = _clients["embedding_config"].snapshot()
+    return _clients["profiles"]
+
+def embedding_profiles():
+    if "profiles" not in _clients:
+        load_embedding_profiles()
+    return _clients["profiles"]
 
 CHUNK_CHARS = 900
 OVERLAP = 120
-BATCH_SIZE = 10
-SLEEP_SEC = 0.12
+# files ingested under a different version are re-chunked (embeddings are reused where text matches).
+# The model tag stays fixed: embedding model switches re-embed in place (meai_core/embed_migration.py)
+INGEST_VERSION = f"text-embedding-3-small|{CHUNKER_VERSION}|{CHUNK_CHARS}/{OVERLAP}"
+CHUNKS_TABLE_NAME = "meai_chunks"
+PAGE_SIZE = 1000
 
 EXCLUDED_DIR_NAMES = {"policies", "references"}  # do not ingest policy or license docs
-ONLY_FILES = None
-if "--only_files" in sys.argv:
-    i = sys.argv.index("--only_files")
-    if i + 1 < len(sys.argv):
-        ONLY_FILES = [s.strip() for s in sys.argv[i + 1].split(",") if s.strip()]
+
+def parse_args(argv):
+    """(only_files, dry_run) from `--only_files a.pdf,b.pdf` and `--dry_run`.
+
+    One-shot modes are checked in main(): `--watch` (daemon), `--progress`
+    and `--reconcile` (journal).
+    """
+    only_files = None
+    if "--only_files" in argv:
+        i = argv.index("--only_files")
+        if i + 1 < len(argv):
+            only_files = [s.strip() for s in argv[i + 1].split(",") if s.strip()]
+    return only_files, "--dry_run" in argv
 
 def is_excluded_path(path: str) -> bool:
     norm = os.path.normpath(path)
     parts = set(norm.split(os.sep))
     return any(p in parts for p in EXCLUDED_DIR_NAMES)
 
-def chunk_text(text: str):
-    chunks, start, n = [], 0, len(text)
-    while start < n:
-        end = min(n, start + CHUNK_CHARS)
-        chunks.append(text[start:end])
-        # overlap by backing up for the next chunk
-        start = end - OVERLAP if end < n else n
-    return chunks
-
 def get_resume_index(source_id: str) -> int:
     r = (
-        supabase.table("meai_chunks")
+        get_supabase().table(CHUNKS_TABLE_NAME)
         .select("chunk_index")
         .eq("source_file", source_id)
         .order("chunk_index", desc=True)
@@ -58,27 +100,290 @@ def get_resume_index(source_id: str) -> int:
     return 0
 
 def embed_batch(text_list):
-    resp = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text_list
+    return embed_with(get_openai_client(), embedding_profiles()[ACTIVE], text_list)
+
+def shadow_embedders():
+    """column -> embed function for every configured profile besides the active one.
+
+    That is a migration target, or the previous profile kept for a rollback.
+    The pipeline embeds them in its embedding stage, behind the same rate
+    limiter, so those columns never fall behind new chunks.
+    """
+    _, *others = write_profiles(embedding_profiles())
+    return {p["column"]: (lambda texts, p=p: embed_with(get_openai_client(), p, texts)) for p in others}
+
+def with_embedding_columns(rows):
+    """Pipeline rows carry the active profile's vector as "embedding" and the others as "extra_embeddings".
+
+    Moves each vector to its profile's column; no embedding happens here.
+    """
+    column = embedding_profiles()[ACTIVE]["column"]
+    out = []
+    for r in rows:
+        row = {k: v for k, v in r.items() if k not in ("embedding", "extra_embeddings")}
+        row.update(r.get("extra_embeddings") or {})
+        row[column] = r["embedding"]
+        out.append(row)
+    return out
+
+def insert_rows(rows):
+    get_supabase().table(CHUNKS_TABLE_NAME).insert(with_embedding_columns(rows)).execute()
+
+def delete_chunks(source_id, chunk_indices):
+    for i in range(0, len(chunk_indices), PAGE_SIZE):
+        part = chunk_indices[i:i + PAGE_SIZE]
+        get_supabase().table(CHUNKS_TABLE_NAME).delete().eq("source_file", source_id).in_("chunk_index", part).execute()
+
+def delete_source(source_id):
+    get_supabase().table(CHUNKS_TABLE_NAME).delete().eq("source_file", source_id).execute()
+
+def fetch_chunk_hashes(source_id):
+    """chunk_index -> text hash of what is stored remotely for one file."""
+    out, start = {}, 0
+    while True:
+        page = (
+            get_supabase().table(CHUNKS_TABLE_NAME)
+            .select("chunk_index,content")
+            .eq("source_file", source_id)
+            .order("chunk_index")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+            .data
+            or []
+        )
+        for r in page:
+            out[int(r["chunk_index"])] = text_hash(r.get("content") or "")
+        if len(page) < PAGE_SIZE:
+            return out
+        start += PAGE_SIZE
+
+def fetch_all_chunk_rows():
+    """(source_file, chunk_index, content) of every stored chunk, for --reconcile."""
+    start = 0
+    while True:
+        page = (
+            get_supabase().table(CHUNKS_TABLE_NAME)
+            .select("source_file,chunk_index,content")
+            .order("source_file")
+            .order("chunk_index")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+            .data
+            or []
+        )
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+def stored_hashes(journal, source_id):
+    """chunk_index -> text hash of the stored rows; from the journal when it has the file."""
+    if journal is not None:
+        if journal.knows(source_id):
+            return journal.state(source_id)
+        if journal.authoritative:
+            return {}
+    hashes = fetch_chunk_hashes(source_id)
+    if journal is not None:
+        journal.seed(source_id, hashes)
+    return hashes
+
+def resume_plan(pdf_path, source_id, texts):
+    """Plan for MEAI_INGEST_MANIFEST=0 without a journal: append after max(chunk_index)."""
+    return {"embed": list(range(get_resume_index(source_id), len(texts))), "reuse": {}, "delete": []}
+
+def journal_plan(journal):
+    """plan_file for MEAI_INGEST_MANIFEST=0: resume from the journal instead of max(chunk_index)."""
+    def plan_file(pdf_path, source_id, texts):
+        if journal.knows(source_id) or journal.authoritative:
+            plan = diff_chunks([text_hash(t) for t in texts], journal.state(source_id))
+            # moved chunks are re-embedded here; copying needs the remote read this mode avoids
+            plan["embed"] = sorted(plan["embed"] + list(plan["reuse"]))
+            plan["reuse"] = {}
+        else:
+            plan = resume_plan(pdf_path, source_id, texts)
+        journal.planned(len(plan["embed"]))
+        return plan
+    return plan_file
+
+def print_progress(journal):
+    p = journal.progress()
+    eta = f", ETA {p['eta_sec']}s" if p.get("eta_sec") is not None else ""
+    print(
+        f"Progress: {p['files_done']}/{p['files_total']} files, {p['chunks_acked']}/{p['chunks_planned']} chunks stored "
+        f"({p['chunks_per_sec']}/s){eta}"
     )
-    return [d.embedding for d in resp.data]
-
-def flush_batch(source_id, batch_text, batch_indices):
-    embeddings = embed_batch(batch_text)
-    rows = []
-    for t, idx, emb in zip(batch_text, batch_indices, embeddings):
-        rows.append({
-            "source_file": source_id,
-            "chunk_index": idx,
-            "content": t,
-            "embedding": emb
-        })
-    supabase.table("meai_chunks").insert(rows).execute()
+
+def _vector(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+def fetch_embeddings(source_id, chunk_indices):
+    """Stored vectors for chunks whose text did not change, in the pipeline's reuse format.
+
+    With shadow profiles configured a chunk is only reusable when every
+    profile column is filled; the others are embedded again.
+    """
+    column, *shadow = [p["column"] for p in write_profiles(embedding_profiles())]
+    out = {}
+    for i in range(0, len(chunk_indices), 100):
+        part = chunk_indices[i:i + 100]
+        rows = (
+            get_supabase().table(CHUNKS_TABLE_NAME)
+            .select(",".join(["chunk_index", column] + shadow))
+            .eq("source_file", source_id)
+            .in_("chunk_index", part)
+            .execute()
+            .data
+            or []
+        )
+        for r in rows:
+            if r.get(column) is None or any(r.get(c) is None for c in shadow):
+                continue
+            emb = _vector(r[column])
+            if shadow:
+                emb = {"embedding": emb, "extra_embeddings": {c: _vector(r[c]) for c in shadow}}
+            out[int(r["chunk_index"])] = emb
+    return out
+
+class ManifestSync:
+    """Plans incremental writes from the manifest and records finished files."""
+
+    def __init__(self, manifest, dedup=None, journal=None):
+        self.manifest = manifest
+        self.dedup = dedup
+        self.journal = journal
+        self.pending = {}
+
+    def pull_mirror(self):
+        if not self.manifest.is_empty():
+            return
+        try:
+            rows = get_supabase().table(MANIFEST_TABLE_NAME).select("*").execute().data or []
+        except Exception as e:
+            print(f"WARNING: could not read {MANIFEST_TABLE_NAME} mirror: {e}")
+            return
+        print(f"Seeded local manifest from {MANIFEST_TABLE_NAME}: {self.manifest.load_rows(rows)} files")
+
+    def diff(self, pdf_path, source_id, chunks):
+        hashes = [text_hash(c) for c in chunks]
+        plan = diff_chunks(hashes, stored_hashes(self.journal, source_id))
+        self.pending[source_id] = (pdf_path, file_sha256(pdf_path), hashes)
+        return plan
+
+    def plan_file(self, pdf_path, source_id, chunks):
+        plan = self.diff(pdf_path, source_id, chunks)
+        stored = fetch_embeddings(source_id, sorted(set(plan["reuse"].values())))
+        reuse = {}
+        for new_idx, old_idx in plan["reuse"].items():
+            if old_idx in stored:
+                reuse[new_idx] = stored[old_idx]
+            else:
+                plan["embed"].append(new_idx)
+        plan["embed"].sort()
+        plan["reuse"] = reuse
+        if self.journal is not None:
+            self.journal.planned(len(plan["embed"]) + len(reuse))
+        return plan
+
+    def file_done(self, source_id):
+        pdf_path, content_hash, hashes = self.pending.pop(source_id)
+        entry = self.manifest.record(source_id, pdf_path, content_hash, INGEST_VERSION, hashes)
+        get_supabase().table(MANIFEST_TABLE_NAME).upsert(IngestManifest.row(entry)).execute()
+        if self.dedup is not None and self.dedup.mode == "link":
+            get_supabase().table(DUPLICATES_TABLE_NAME).delete().eq("source_file", source_id).execute()
+            links = self.dedup.link_rows(source_id)
+            if links:
+                get_supabase().table(DUPLICATES_TABLE_NAME).insert(links).execute()
+        if self.journal is not None:
+            self.journal.file_done()
+            print_progress(self.journal)
+
+    def requeue_stale(self):
+        """Files whose canonical chunks were re-indexed get reprocessed on the next run."""
+        if self.dedup is None:
+            return []
+        stale = sorted(self.dedup.stale_sources)
+        for sf in stale:
+            self.manifest.remove(sf)
+        self.dedup.stale_sources.clear()
+        return stale
+
+    def remove_orphans(self, present_source_ids):
+        return self.remove_sources([sf for sf in self.manifest.source_files() if sf not in present_source_ids])
+
+    def remove_sources(self, removed):
+        for sf in removed:
+            delete_source(sf)
+            get_supabase().table(MANIFEST_TABLE_NAME).delete().eq("source_file", sf).execute()
+            self.manifest.remove(sf)
+            if self.journal is not None:
+                self.journal.forget(sf)
+            if self.dedup is not None:
+                self.dedup.stale_sources.update(self.dedup.forget(sf))
+                get_supabase().table(DUPLICATES_TABLE_NAME).delete().eq("source_file", sf).execute()
+            print(f"Removed source: {sf}")
+        return removed
+
+def dry_run_report(files, plan_file, dedup=None, skipped=(), known_files=None):
+    """What a real run would write, without writing anything.
+
+    `plan_file(pdf_path, source_id, texts)` plans one file; `known_files`
+    (the manifest's, when files missing from the walk would be removed)
+    lists the removals.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    report = {"unchanged_files": list(skipped), "files": {}, "removed_files": []}
+    totals = {"embed": 0, "reuse": 0, "keep": 0, "delete": 0, "duplicates": 0}
+    with ProcessPoolExecutor() as pool:
+        for (pdf_path, source_id), (chunks, _) in zip(files, pool.map(extract_pdf_chunks, [p for p, _ in files])):
+            texts = [c["content"] for c in chunks]
+            plan = plan_file(pdf_path, source_id, texts)
+            if dedup is not None:
+                plan = dedup.filter_plan(source_id, texts, plan)
+            counts = {k: len(plan.get(k) or ()) for k in totals}
+            report["files"][source_id] = counts
+            for k in totals:
+                totals[k] += counts[k]
+    if known_files is not None and (files or skipped):
+        present = {sf for _, sf in files} | set(skipped)
+        report["removed_files"] = [sf for sf in known_files if sf not in present]
+    report["totals"] = totals
+    if dedup is not None:
+        report["dedup"] = dedup.stats()
+    return report
+
+def extract_pdf_chunks(pdf_path):
+    """Runs in an extraction worker process; returns (chunks, pages_with_text).
+
+    Chunks run across page boundaries and carry their page_start / page_end,
+    a quality score and the document's collection, both of which retrieval
+    filters on. Pages are parsed and chunked one at a time, so no page text
+    is held beyond the chunker's window. The chunk list itself is
+    materialized: it is pickled back from the worker process, and the
+    manifest diff and dedup need every chunk of the file before anything is
+    embedded (trailing deletions depend on the new chunk count). Memory per
+    file is therefore about its extracted text.
+    """
+    pages = 0
+    collection = collection_for(pdf_path)
+
+    def counted():
+        nonlocal pages
+        for page_no, text in iter_pdf_pages(pdf_path):
+            pages += 1
+            yield page_no, text
+
+    chunks = []
+    for c in stream_chunks(counted(), chunk_chars=CHUNK_CHARS, overlap=OVERLAP):
+        c["quality"] = quality_score(c["content"])
+        c["collection"] = collection
+        chunks.append(c)
+    return chunks, pages
 
 def find_pdfs():
     pdfs = []
-    for base_dir in [CORE_LIBRARY_DIR, SYSTEM_PDFS_DIR]:
+    for base_dir in [CORE_LIBRARY_DIR, SYSTEM_PDFS_DIR, UPLOADS_DIR]:
         if not base_dir:
             continue
         for root, _, files in os.walk(base_dir):
@@ -92,83 +397,187 @@ def find_pdfs():
     pdfs.sort()
     return pdfs
 
-pdfs = find_pdfs()
-if ONLY_FILES:
-    only_set = set(ONLY_FILES)
-    filtered = []
-    for p in pdfs:
-        base_dir = SYSTEM_PDFS_DIR if os.path.commonpath([p, SYSTEM_PDFS_DIR]) == SYSTEM_PDFS_DIR else CORE_LIBRARY_DIR
-        rel = os.path.normpath(os.path.relpath(p, base_dir))
-        if os.path.basename(p) in only_set or rel in only_set:
-            filtered.append(p)
-    pdfs = filtered
-abs_core_dir = os.path.abspath(CORE_LIBRARY_DIR)
-print(f"CORE_LIBRARY_DIR (resolved): {abs_core_dir}")
-print(f"SYSTEM_PDFS_DIR (resolved): {os.path.abspath(SYSTEM_PDFS_DIR)}")
-print(f"Found PDFs (excluding {sorted(EXCLUDED_DIR_NAMES)}): {len([p for p in pdfs if p.lower().endswith('.pdf')])}")
-for p in [p for p in pdfs if p.lower().endswith(".pdf")]:
-    print(os.path.basename(p))
-expected = {
-    "01_Project_Overview.pdf",
-    "02_System_Architecture.pdf",
-    "03_Tech_Stack.pdf",
-    "04_Env_and_Secrets.pdf",
-    "05_Database_Schema.pdf",
-    "06_Ingestion_Pipeline.pdf",
-    "07_Known_Issues.pdf",
-    "08_Runbook.pdf",
-    "09_Future_Roadmap.pdf",
-    "10_Glossary.pdf",
-}
-found = {os.path.basename(p) for p in pdfs if p.lower().endswith(".pdf")}
-missing = sorted(x for x in expected if x not in found)
-if missing:
-    print("WARNING: Missing expected files:")
-    for m in missing:
-        print(m)
-
-for pdf_path in pdfs:
-    base_dir = SYSTEM_PDFS_DIR if os.path.commonpath([pdf_path, SYSTEM_PDFS_DIR]) == SYSTEM_PDFS_DIR else CORE_LIBRARY_DIR
-    source_id = os.path.relpath(pdf_path, base_dir)
-
-    try:
-        print(f"\nProcessing: {source_id}")
-        resume_at = get_resume_index(source_id)
-        print(f"Resuming at chunk_index: {resume_at}")
-
-        next_chunk_index = 0
-        batch_text = []
-        batch_indices = []
-
-        reader = PdfReader(pdf_path)
-        for page_i, page in enumerate(reader.pages):
-            page_text = (page.extract_text() or "").strip()
-            if not page_text:
-                continue
+def collection_for(pdf_path):
+    return collection_for_path(pdf_path, SYSTEM_PDFS_DIR, UPLOADS_DIR)
+
+def source_id_for(pdf_path):
+    base_dir = {SYSTEM_COLLECTION: SYSTEM_PDFS_DIR, UPLOADS_COLLECTION: UPLOADS_DIR, CORE_COLLECTION: CORE_LIBRARY_DIR}[collection_for(pdf_path)]
+    return os.path.relpath(pdf_path, base_dir)
+
+def matches_only_files(pdf_path, only_files):
+    if not only_files:
+        return True
+    only_set = set(only_files)
+    return os.path.basename(pdf_path) in only_set or os.path.normpath(source_id_for(pdf_path)) in only_set
+
+def is_ingestable(path, only_files=None):
+    """The filters find_pdfs and --only_files apply, for a single path (watch mode)."""
+    return path.lower().endswith(".pdf") and not is_excluded_path(path) and matches_only_files(path, only_files)
+
+def split_unchanged(sync, files):
+    changed = [(p, sf) for p, sf in files if not sync.manifest.is_unchanged(p, sf, INGEST_VERSION)]
+    changed_ids = {sf for _, sf in changed}
+    skipped = sorted(sf for _, sf in files if sf not in changed_ids)
+    return changed, skipped
+
+def run_incremental(pipeline, sync, journal, files, remove_missing):
+    """One manifest-mode pass over (pdf_path, source_id) pairs; returns the run stats."""
+    changed, skipped = split_unchanged(sync, files)
+    print(f"\nUnchanged since last ingest: {len(skipped)}  To process: {len(changed)}")
+    if journal is not None:
+        journal.start_run(len(changed))
+    stats = pipeline.run(files=changed, plan_file=sync.plan_file, delete_chunks=delete_chunks, on_file_done=sync.file_done)
+    if journal is not None:
+        journal.finish_run()
+        stats["journal"] = journal.stats()
+    stats["unchanged_files"] = len(skipped)
+    stats["removed_files"] = []
+    # an empty walk (e.g. an unmounted library) must not wipe the table
+    if remove_missing and files:
+        stats["removed_files"] = sync.remove_orphans({sf for _, sf in files})
+    stats["requeued_files"] = sync.requeue_stale()
+    if sync.dedup is not None:
+        stats["dedup"] = sync.dedup.stats()
+    return stats
+
+def refresh_retrieval(stats, stamp):
+    """After a pass that changed meai_chunks: refresh the local indexes and bump the corpus stamp."""
+    rewritten = stats.get("deleted_chunks", 0) or stats.get("removed_files")
+    if not stats.get("rows_inserted") and not rewritten:
+        return
+    index = LocalVectorIndex()
+    index.load()
+    if index.available():
+        # update() only appends; deleted or rewritten chunks need a new generation.
+        # Both follow an embedding switch by rebuilding from the active column.
+        active = embedding_profiles()[ACTIVE]
+        model, column = profile_key(active), active["column"]
+        n = index.rebuild(get_supabase(), model, column) if rewritten else index.update(get_supabase(), model, column)
+        print(f"Local index {'rebuilt' if rewritten else 'updated'}: {n} chunks")
+    if HYBRID_RETRIEVAL:
+        # created on the first pass; update() syncs by key, so only chunks rewritten in place need a rebuild
+        lexical = LexicalIndex()
+        rebuild = bool(stats.get("deleted_chunks"))
+        n = lexical.rebuild(get_supabase()) if rebuild else lexical.update(get_supabase())
+        print(f"Lexical index {'rebuilt' if rebuild else 'updated'}: {n} chunks")
+    stamp.bump({"rows_inserted": stats.get("rows_inserted", 0), "deleted_chunks": stats.get("deleted_chunks", 0)})
+
+def watch(pipeline, sync, journal, only_files):
+    """Long-running mode: ingest files as they appear or change under both library dirs."""
+    roots = [d for d in (CORE_LIBRARY_DIR, SYSTEM_PDFS_DIR, UPLOADS_DIR) if d and os.path.isdir(d)]
+    watcher = make_watcher(roots, lambda p: is_ingestable(p, only_files), lambda d: not is_excluded_path(d))
+    stamp = CorpusStamp()
+
+    def process(changed, removed, full):
+        # picks up an embedding migration started or switched while the daemon runs
+        load_embedding_profiles()
+        if full:
+            files = [(p, source_id_for(p)) for p in find_pdfs() if matches_only_files(p, only_files)]
+        else:
+            files = [(p, source_id_for(p)) for p in changed]
+        stats = run_incremental(pipeline, sync, journal, files, remove_missing=full and not only_files)
+        known = set(sync.manifest.source_files())
+        gone = [sf for sf in (source_id_for(p) for p in removed) if sf in known]
+        stats["removed_files"] += sync.remove_sources(gone)
+        print(f"Watch pass: {stats['files_done']}/{stats['files']} files, {stats['rows_inserted']} rows, removed {len(stats['removed_files'])}")
+        return stats
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    IngestDaemon(watcher, process, on_ingested=lambda stats: refresh_retrieval(stats, stamp)).run(stop)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    only_files, dry_run = parse_args(argv)
+    if "--progress" in argv:
+        # safe while another run is writing: the journal is SQLite in WAL mode
+        print(json.dumps(IngestJournal().progress(), indent=2))
+        return
+    check_env()
+    profiles = load_embedding_profiles()
+    described = [f"{slot}={profile_key(p)} ({p['column']})" for slot, p in profiles.items()]
+    print(f"Embedding profiles: {', '.join(described)}")
+    # a dry run reads local state through in-memory copies, so it never writes any
+    journal = IngestJournal(readonly=dry_run) if INGEST_JOURNAL_ENABLED else None
+    if "--reconcile" in argv:
+        if journal is None:
+            print("MEAI_INGEST_JOURNAL=0: nothing to reconcile")
+            return
+        print(json.dumps(journal.reconcile(fetch_all_chunk_rows()), indent=2))
+        return
+    pdfs = [p for p in find_pdfs() if matches_only_files(p, only_files)]
+    abs_core_dir = os.path.abspath(CORE_LIBRARY_DIR)
+    print(f"CORE_LIBRARY_DIR (resolved): {abs_core_dir}")
+    print(f"SYSTEM_PDFS_DIR (resolved): {os.path.abspath(SYSTEM_PDFS_DIR)}")
+    if UPLOADS_DIR:
+        print(f"UPLOADS_DIR (resolved): {os.path.abspath(UPLOADS_DIR)}")
+    print(f"Found PDFs (excluding {sorted(EXCLUDED_DIR_NAMES)}): {len([p for p in pdfs if p.lower().endswith('.pdf')])}")
+    for p in [p for p in pdfs if p.lower().endswith(".pdf")]:
+        print(os.path.basename(p))
+    expected = {
+        "01_Project_Overview.pdf",
+        "02_System_Architecture.pdf",
+        "03_Tech_Stack.pdf",
+        "04_Env_and_Secrets.pdf",
+        "05_Database_Schema.pdf",
+        "06_Ingestion_Pipeline.pdf",
+        "07_Known_Issues.pdf",
+        "08_Runbook.pdf",
+        "09_Future_Roadmap.pdf",
+        "10_Glossary.pdf",
+    }
+    found = {os.path.basename(p) for p in pdfs if p.lower().endswith(".pdf")}
+    missing = sorted(x for x in expected if x not in found)
+    if missing:
+        print("WARNING: Missing expected files:")
+        for m in missing:
+            print(m)
+
+    files = [(pdf_path, source_id_for(pdf_path)) for pdf_path in pdfs]
 
-            for ch in chunk_text(page_text + "\n"):
-                if next_chunk_index < resume_at:
-                    next_chunk_index += 1
-                    continue
+    # near-duplicate suppression is opt-in (MEAI_DEDUP_MODE); off, its index is never opened
+    dedup = DedupIndex(readonly=dry_run) if DEDUP_MODE != "off" else None
+    pipeline = IngestPipeline(extract_pdf_chunks, embed_batch, insert_rows, dedup=dedup, journal=journal, extra_embeddings=shadow_embedders)
+    if not INGEST_MANIFEST_ENABLED:
+        if "--watch" in argv:
+            print("--watch needs the ingest manifest (MEAI_INGEST_MANIFEST=1)")
+            return
+        if dry_run:
+            plan_file = journal_plan(journal) if journal is not None else resume_plan
+            print(json.dumps(dry_run_report(files, plan_file, dedup), indent=2))
+            return
+        if journal is None:
+            stats = pipeline.run(files, resume_index=get_resume_index)
+        else:
+            journal.start_run(len(files))
+            stats = pipeline.run(files, plan_file=journal_plan(journal), delete_chunks=delete_chunks, on_file_done=lambda sf: journal.file_done())
+            journal.finish_run()
+            stats["journal"] = journal.stats()
+        if dedup is not None:
+            stats["dedup"] = dedup.stats()
+        print("\nIngestion summary:")
+        print(json.dumps(stats, indent=2, default=str))
+        return
 
-                batch_text.append(ch)
-                batch_indices.append(next_chunk_index)
-                next_chunk_index += 1
+    sync = ManifestSync(IngestManifest(readonly=dry_run), dedup, journal)
+    sync.pull_mirror()
 
-                if len(batch_text) >= BATCH_SIZE:
-                    flush_batch(source_id, batch_text, batch_indices)
-                    print(f"Inserted through chunk_index {batch_indices[-1]} (page {page_i})")
-                    batch_text, batch_indices = [], []
-                    time.sleep(SLEEP_SEC)
+    if dry_run:
+        changed, skipped = split_unchanged(sync, files)
+        print(f"\nUnchanged since last ingest: {len(skipped)}  To process: {len(changed)}")
+        known = None if only_files else sync.manifest.source_files()
+        print(json.dumps(dry_run_report(changed, sync.diff, sync.dedup, skipped, known), indent=2))
+        return
 
-        if batch_text:
-            flush_batch(source_id, batch_text, batch_indices)
-            print(f"Inserted through chunk_index {batch_indices[-1]} (final flush)")
-            time.sleep(SLEEP_SEC)
+    if "--watch" in argv:
+        watch(pipeline, sync, journal, only_files)
+        return
 
-        print(f"Done: {source_id}")
+    stats = run_incremental(pipeline, sync, journal, files, remove_missing=not only_files)
+    refresh_retrieval(stats, CorpusStamp())
+    print("\nIngestion summary:")
+    print(json.dumps(stats, indent=2, default=str))
 
-    except Exception:
-        print(f"ERROR on {source_id}")
-        traceback.print_exc()
-        print("Continuing to next PDF.")
+if __name__ == "__main__":
+    main()
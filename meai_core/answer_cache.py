@@ -0,0 +1,89 @@
+# meai_core/answer_cache.py
+import os, time, uuid, threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+# ========= config =========
+ANSWER_CACHE_ENABLED = os.getenv("MEAI_ANSWER_CACHE") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("MEAI_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("MEAI_ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SEC = float(os.getenv("MEAI_ANSWER_CACHE_TTL_SEC", str(24 * 3600)))
+
+class SemanticAnswerCache:
+    """In-process cache of validated answers for near-duplicate questions.
+
+    An entry matches when mode, the retrieved source_files set and the
+    version string (prompts + corpus) are equal, and the cosine similarity of
+    the query embeddings is at least `threshold`. Entries expire by TTL and
+    are evicted LRU past `max_items`.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        max_items: int = ANSWER_CACHE_SIZE,
+        ttl_sec: float = ANSWER_CACHE_TTL_SEC,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_items = max_items
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def lookup(self, embedding: List[float], mode: str, source_files: List[str], version: str) -> Optional[Dict[str, Any]]:
+        """Return {"payload", "similarity"} for the best matching entry, if any."""
+        if not self.enabled:
+            return None
+        bucket = (mode, frozenset(source_files or []), version)
+        now = time.time()
+        with self._lock:
+            for eid in [eid for eid, e in self._entries.items() if now - e["ts"] > self.ttl_sec]:
+                del self._entries[eid]
+            ids = [eid for eid, e in self._entries.items() if e["bucket"] == bucket]
+            if ids:
+                mat = np.stack([self._entries[eid]["vec"] for eid in ids])
+                sims = mat @ self._unit(embedding)
+                best = int(np.argmax(sims))
+                if float(sims[best]) >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self._stats["hits"] += 1
+                    return {"payload": self._entries[ids[best]]["payload"], "similarity": float(sims[best])}
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, embedding: List[float], mode: str, source_files: List[str], version: str, payload: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        entry = {
+            "bucket": (mode, frozenset(source_files or []), version),
+            "vec": self._unit(embedding),
+            "ts": time.time(),
+            "payload": payload,
+        }
+        with self._lock:
+            self._entries[str(uuid.uuid4())] = entry
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["items"] = len(self._entries)
+        out["enabled"] = self.enabled
+        return out
@@ -0,0 +1,43 @@
+# meai_core/chunk_filter.py
+"""Metadata filters that retrieval applies before ranking, not after.
+
+A filter is a set of source files, a collection, or both. Every chunk
+belongs to one collection:
+  system   MEAI's own docs (docs/system_pdfs)
+  core     the curated engineering library (CORE_LIBRARY_DIR)
+  uploads  customer-provided documents
+The ingester records the collection on each meai_chunks row
+(docs/add_chunk_filters.sql). The match RPC, the local vector snapshot and
+the lexical index all rank only the matching rows, so a filtered query
+gets k matching chunks back in one call. Before, it fetched extra rows and
+dropped the ones that did not match.
+"""
+import os
+from typing import Optional, Dict, Any, Iterable, List
+
+SYSTEM_COLLECTION, CORE_COLLECTION, UPLOADS_COLLECTION = "system", "core", "uploads"
+COLLECTIONS = (SYSTEM_COLLECTION, CORE_COLLECTION, UPLOADS_COLLECTION)
+
+def normalize_filter(source_files: Optional[Iterable[str]] = None, collection: Optional[str] = None) -> Dict[str, Any]:
+    """{"source_files": sorted list or None, "collection": name or None}; None means no filter on that field."""
+    if collection is not None and collection not in COLLECTIONS:
+        raise ValueError(f"Unknown collection: {collection} (expected one of {', '.join(COLLECTIONS)})")
+    files: Optional[List[str]] = None
+    if source_files is not None:
+        files = sorted({source_files} if isinstance(source_files, str) else set(source_files))
+    return {"source_files": files, "collection": collection}
+
+def is_filtered(flt: Dict[str, Any]) -> bool:
+    return flt.get("source_files") is not None or flt.get("collection") is not None
+
+def filtered_rpc(match_rpc: str) -> str:
+    """Each match RPC has a filtered twin: match_meai_chunks -> match_meai_chunks_filtered."""
+    return f"{match_rpc}_filtered"
+
+def collection_for_path(path: str, system_dir: str, uploads_dir: Optional[str] = None) -> str:
+    """The collection of a document, from the directory it was ingested from."""
+    path = os.path.abspath(path)
+    for name, base in ((SYSTEM_COLLECTION, system_dir), (UPLOADS_COLLECTION, uploads_dir)):
+        if base and os.path.commonpath([path, os.path.abspath(base)]) == os.path.abspath(base):
+            return name
+    return CORE_COLLECTION
@@ -0,0 +1,146 @@
+# meai_core/chunk_quality.py
+"""Ingest-time chunk quality scores, stored in meai_chunks.quality.
+
+Retrieval filters on the stored score (the match_meai_chunks RPC and the
+local index), so garbage rows never take a top-k slot and build_context no
+longer scans every retrieved chunk per request.
+
+Score existing rows (only rows whose stored score differs are written):
+  python -m meai_core.chunk_quality [--dry_run]
+"""
+import os, re, sys
+from typing import Optional, Dict, Any, List, Iterable
+
+# ========= config =========
+# rows scoring below this are filtered out at retrieval time
+MIN_CHUNK_QUALITY = float(os.getenv("MEAI_MIN_CHUNK_QUALITY", "0.5"))
+CHUNKS_TABLE_NAME = "meai_chunks"
+SET_QUALITY_RPC = "meai_set_chunk_quality"
+BACKFILL_BATCH = 500
+
+# hard floor: the old query-time is_garbage rule, kept exact
+MIN_CHARS = 80
+MAX_DIGIT_RATIO = 0.35
+FULL_LENGTH_CHARS = 300  # shorter chunks are scaled down, they carry little context
+
+DIGIT_RE = re.compile(r"\d")
+# anything but letters, digits, whitespace and ordinary prose/spec punctuation
+SYMBOL_RE = re.compile(r"[^\w\s.,;:!?'\"()\[\]/%&+\-–—°±×]")
+TOKEN_RE = re.compile(r"\S+")
+WORD_RE = re.compile(r"^[(\[\"']*([A-Za-z]+|\d+(?:[.,]\d+)*%?|[A-Za-z]+-[A-Za-z]+|[A-Z0-9]+(?:-[A-Z0-9]+)*)[)\]\"'.,;:!?]*$")
+VOWEL_RE = re.compile(r"[aeiouyAEIOUY]")
+
+def _is_noise_token(token: str) -> bool:
+    """OCR debris: mixed letter/symbol soup, stray single letters, vowel-less letter runs."""
+    if "�" in token:
+        return True
+    m = WORD_RE.match(token)
+    if m is None:
+        return True
+    word = m.group(1)
+    if word.isalpha():
+        if len(word) == 1:
+            return word not in ("a", "A", "I")
+        if len(word) >= 4 and word.islower() and not VOWEL_RE.search(word):
+            return True
+    return False
+
+def quality_features(text: str) -> Dict[str, float]:
+    text = text or ""
+    n = max(len(text), 1)
+    tokens = TOKEN_RE.findall(text)
+    noise = sum(1 for t in tokens if _is_noise_token(t))
+    return {
+        "length": float(len(text)),
+        "digit_ratio": len(DIGIT_RE.findall(text)) / n,
+        "symbol_ratio": len(SYMBOL_RE.findall(text)) / n,
+        "noise_ratio": noise / max(len(tokens), 1),
+    }
+
+def quality_score(text: str) -> float:
+    """0..1; 0.0 for anything the old is_garbage rule dropped."""
+    f = quality_features(text)
+    if f["length"] < MIN_CHARS or f["digit_ratio"] > MAX_DIGIT_RATIO:
+        return 0.0
+    score = 1.0
+    score -= max(0.0, f["digit_ratio"] - 0.15) * 2.0
+    score -= max(0.0, f["symbol_ratio"] - 0.05) * 4.0
+    score -= max(0.0, f["noise_ratio"] - 0.10) * 2.0
+    score *= min(1.0, 0.6 + 0.4 * f["length"] / FULL_LENGTH_CHARS)
+    return round(min(max(score, 0.0), 1.0), 3)
+
+def is_usable(row: Dict[str, Any], min_quality: float = MIN_CHUNK_QUALITY) -> Optional[bool]:
+    """Stored-score verdict for a retrieved row; None when the row has not been scored yet."""
+    q = row.get("quality")
+    if q is None:
+        return None
+    return float(q) >= min_quality
+
+# ========= backfill =========
+def _fetch_pages(sb: Any, columns: str) -> Iterable[Dict[str, Any]]:
+    start = 0
+    while True:
+        rows = (
+            sb.table(CHUNKS_TABLE_NAME)
+            .select(columns)
+            .order("source_file")
+            .order("chunk_index")
+            .range(start, start + BACKFILL_BATCH - 1)
+            .execute()
+            .data
+            or []
+        )
+        yield from rows
+        if len(rows) < BACKFILL_BATCH:
+            return
+        start += BACKFILL_BATCH
+
+def backfill(sb: Any, dry_run: bool = False, log=print) -> Dict[str, Any]:
+    """(Re)score every stored chunk and write the scores that changed.
+
+    Writes go through the meai_set_chunk_quality RPC (docs/add_chunk_quality.sql)
+    in batches; updates never touch content, so paging stays stable.
+    """
+    stats = {"rows": 0, "updated": 0, "below_threshold": 0}
+    pending: List[Dict[str, Any]] = []
+
+    def _flush() -> None:
+        if not pending:
+            return
+        if not dry_run:
+            sb.rpc(SET_QUALITY_RPC, {
+                "source_files": [r["source_file"] for r in pending],
+                "chunk_indexes": [r["chunk_index"] for r in pending],
+                "scores": [r["quality"] for r in pending],
+            }).execute()
+        stats["updated"] += len(pending)
+        pending.clear()
+
+    for r in _fetch_pages(sb, "source_file,chunk_index,content,quality"):
+        stats["rows"] += 1
+        score = quality_score(r.get("content") or "")
+        if score < MIN_CHUNK_QUALITY:
+            stats["below_threshold"] += 1
+        stored = r.get("quality")
+        if stored is not None and abs(float(stored) - score) < 5e-4:
+            continue
+        pending.append({"source_file": r["source_file"], "chunk_index": r["chunk_index"], "quality": score})
+        if len(pending) >= BACKFILL_BATCH:
+            _flush()
+            log(f"  scored {stats['rows']} rows, {stats['updated']} updated")
+    _flush()
+    return stats
+
+def main(argv: List[str]) -> None:
+    from meai_core.engine import sb
+
+    dry_run = "--dry_run" in argv
+    stats = backfill(sb, dry_run=dry_run)
+    verb = "would update" if dry_run else "updated"
+    print(
+        f"Chunk quality: {stats['rows']} rows, {verb} {stats['updated']}, "
+        f"{stats['below_threshold']} below {MIN_CHUNK_QUALITY}"
+    )
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+# meai_core/chunking.py
+import re
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator
+
+CHUNKER_VERSION = "stream-v1"
+MIN_CHUNK_CHARS = 80  # below this build_context's is_garbage would drop the chunk anyway
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"[.!?][\"')\]]*\s")
+SPACE_RE = re.compile(r"\s")
+
+def iter_pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """(page_number, text) for non-empty pages, 1-based; pages are parsed one at a time."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for i, page in enumerate(reader.pages):
+        text = (page.extract_text() or "").strip()
+        if text:
+            yield i + 1, text
+
+def _last_match(pattern: "re.Pattern[str]", text: str, lo: int, hi: int) -> Optional[int]:
+    """End offset of the last match of `pattern` ending within text[lo:hi]."""
+    best = None
+    for m in pattern.finditer(text, lo, hi):
+        best = m.end()
+    return best
+
+def _cut_point(buf: str, lo: int, hi: int) -> int:
+    """Best chunk end in buf[lo:hi]: paragraph, then sentence, then word, then hard cut."""
+    for pattern in (PARAGRAPH_RE, SENTENCE_RE, SPACE_RE):
+        end = _last_match(pattern, buf, lo, hi)
+        if end is not None:
+            return end
+    return hi
+
+def _overlap_start(buf: str, cut: int, overlap: int) -> int:
+    """Where the next chunk starts: `overlap` chars back, moved forward to a sentence or word start."""
+    if overlap <= 0:
+        return cut
+    lo = max(cut - overlap, 0)
+    for pattern in (SENTENCE_RE, SPACE_RE):
+        m = pattern.search(buf, lo, cut)
+        if m is not None and m.end() < cut:
+            return m.end()
+    return lo
+
+def stream_chunks(
+    pages: Iterable[Tuple[int, str]],
+    chunk_chars: int = 900,
+    overlap: int = 120,
+    min_chars: int = MIN_CHUNK_CHARS,
+) -> Iterator[Dict[str, Any]]:
+    """Chunk a page stream across page boundaries with a rolling buffer.
+
+    Yields {"content", "page_start", "page_end"}. Chunks end on a paragraph
+    break, else a sentence end, else whitespace, in the back half of the
+    window. A chunk is only cut once enough text follows it for a tail of
+    `min_chars`, so page ends no longer leave short fragments; the final
+    chunk may run up to `chunk_chars + min_chars` for the same reason.
+    Memory is bounded by one window plus one page.
+    """
+    buf = ""
+    starts: List[Tuple[int, int]] = []  # (offset in buf, page number) for each page in buf
+
+    def page_at(offset: int) -> int:
+        page = starts[0][1]
+        for pos, p in starts:
+            if pos > offset:
+                break
+            page = p
+        return page
+
+    def emit(cut: int) -> Optional[Dict[str, Any]]:
+        raw = buf[:cut]
+        content = raw.strip()
+        if not content:
+            return None
+        first = len(raw) - len(raw.lstrip())
+        last = len(raw.rstrip()) - 1
+        return {"content": content, "page_start": page_at(first), "page_end": page_at(last)}
+
+    def advance(to: int) -> None:
+        nonlocal buf, starts
+        buf = buf[to:]
+        shifted = [(pos - to, p) for pos, p in starts]
+        # the page the new buffer starts in, plus the ones after it
+        current = [p for pos, p in shifted if pos <= 0][-1:]
+        starts = [(0, p) for p in current] + [(pos, p) for pos, p in shifted if pos > 0]
+
+    for page_no, text in pages:
+        if buf and not buf.endswith("\n"):
+            buf += "\n"
+        starts.append((len(buf), page_no))
+        buf += text
+        while len(buf) >= chunk_chars + min_chars:
+            cut = _cut_point(buf, chunk_chars // 2, chunk_chars)
+            chunk = emit(cut)
+            if chunk:
+                yield chunk
+            start = _overlap_start(buf, cut, overlap)
+            advance(start if start > 0 else cut)
+
+    if buf.strip():
+        chunk = emit(len(buf))
+        if chunk:
+            yield chunk
@@ -0,0 +1,58 @@
+# meai_core/corpus_stamp.py
+import os, json, time, threading
+from typing import Optional, Dict, Any
+
+# ========= config =========
+DEFAULT_STAMP_PATH = os.path.join(os.path.dirname(__file__), "cache", "corpus_stamp.json")
+CORPUS_STAMP_PATH = os.getenv("MEAI_CORPUS_STAMP_PATH", DEFAULT_STAMP_PATH)
+# how often readers re-stat the stamp; a refresh shows up within this window
+CORPUS_STAMP_CHECK_SEC = float(os.getenv("MEAI_CORPUS_STAMP_CHECK_SEC", "5"))
+
+class CorpusStamp:
+    """A small file the ingester rewrites whenever meai_chunks changed.
+
+    Ingestion runs in another process than the web server; bump() is how it
+    tells every worker that retrieval-derived caches are stale. Readers
+    re-stat the file at most every `check_interval_sec`, so version() is
+    cheap enough to call per request.
+    """
+
+    def __init__(self, path: str = CORPUS_STAMP_PATH, check_interval_sec: float = CORPUS_STAMP_CHECK_SEC):
+        self.path = path
+        self.check_interval_sec = check_interval_sec
+        self._lock = threading.Lock()
+        self._version = ""
+        self._mtime_ns: Optional[int] = None
+        self._checked_at: Optional[float] = None
+
+    def bump(self, info: Optional[Dict[str, Any]] = None) -> str:
+        version = f"{time.time_ns():x}"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "updated_at": time.time(), **(info or {})}, f)
+        os.replace(tmp, self.path)
+        return version
+
+    def read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def version(self) -> str:
+        """Current stamp version; "" until the first bump."""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_interval_sec:
+                return self._version
+            self._checked_at = now
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return self._version
+            if mtime_ns != self._mtime_ns:
+                self._mtime_ns = mtime_ns
+                self._version = str(self.read().get("version") or "")
+            return self._version
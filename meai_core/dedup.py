@@ -0,0 +1,208 @@
+# meai_core/dedup.py
+import os, re, zlib, sqlite3, threading
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from meai_core.ingest_manifest import connect_local
+
+# ========= config =========
+# "off" (default): keep every chunk; "skip": drop near-duplicate chunks; "link": drop them and
+# record the canonical chunk. Dropping is opt-in: a near-duplicate can still differ in the clause
+# that matters (a revised standard, a repeated passage with other values).
+DEDUP_MODE = os.getenv("MEAI_DEDUP_MODE", "off")
+DEDUP_THRESHOLD = float(os.getenv("MEAI_DEDUP_THRESHOLD", "0.85"))
+DEFAULT_DEDUP_PATH = os.path.join(os.path.dirname(__file__), "cache", "dedup_index.sqlite3")
+DEDUP_INDEX_PATH = os.getenv("MEAI_DEDUP_INDEX_PATH", DEFAULT_DEDUP_PATH)
+DUPLICATES_TABLE_NAME = "meai_chunk_duplicates"
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands x 8 rows: candidate pairs from ~0.7 Jaccard, confirmed against the threshold
+SHINGLE_WORDS = 5
+MERSENNE_31 = (1 << 31) - 1
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    """crc32 hashes of the word k-grams of normalized text."""
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    if len(words) < k:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, MERSENNE_31, size=num_perm).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        x = shingles(text) & np.uint64(MERSENNE_31)
+        # (a*x + b) mod p for every permutation x shingle, then the min per permutation
+        h = (np.outer(self.a, x) + self.b[:, None]) % np.uint64(MERSENNE_31)
+        return h.min(axis=1).astype(np.uint32)
+
+def chunk_key(source_file: str, chunk_index: int) -> str:
+    return f"{source_file}:{chunk_index}"
+
+class DedupIndex:
+    """Corpus-wide MinHash/LSH index of stored chunk signatures.
+
+    Signatures are banded into LSH buckets. Candidates that share a bucket
+    are confirmed by estimated Jaccard similarity against `threshold`. The
+    index and the duplicate -> canonical links persist in a SQLite file, so
+    later runs dedupe against everything ingested before. `filter_plan`
+    removes near-duplicates from an ingest plan before they are embedded.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEDUP_INDEX_PATH,
+        mode: str = DEDUP_MODE,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        readonly: bool = False,
+    ):
+        self.mode = mode
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.readonly = readonly
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._sigs: Dict[str, np.ndarray] = {}
+        self._source_of: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+        self._links: Dict[str, Tuple[str, float]] = {}
+        # files whose duplicates point at chunks that were re-indexed; they need a re-run
+        self.stale_sources: set = set()
+        self._stats = {"checked": 0, "duplicates": 0, "saved_embeddings": 0, "saved_rows": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if path and self.enabled:
+            self._db = connect_local(path, readonly)
+            self._db.execute("CREATE TABLE IF NOT EXISTS signatures (key TEXT PRIMARY KEY, source_file TEXT, sig BLOB)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS links (key TEXT PRIMARY KEY, source_file TEXT, canonical_key TEXT, similarity REAL)")
+            for key, sf, blob in self._db.execute("SELECT key, source_file, sig FROM signatures"):
+                self._index(key, sf, np.frombuffer(blob, dtype=np.uint32))
+            for key, _, canon, sim in self._db.execute("SELECT key, source_file, canonical_key, similarity FROM links"):
+                self._links[key] = (canon, sim)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("skip", "link")
+
+    def _band_keys(self, sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(i, sig[i * self.rows:(i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+
+    def _index(self, key: str, source_file: str, sig: np.ndarray) -> None:
+        self._sigs[key] = sig
+        self._source_of[key] = source_file
+        for bk in self._band_keys(sig):
+            self._buckets[bk].append(key)
+
+    def find(self, sig: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Most similar indexed chunk at or above the threshold, as (key, similarity)."""
+        candidates = {k for bk in self._band_keys(sig) for k in self._buckets.get(bk, ())}
+        best: Optional[Tuple[str, float]] = None
+        for k in candidates:
+            sim = float(np.mean(self._sigs[k] == sig))
+            if sim >= self.threshold and (best is None or sim > best[1]):
+                best = (k, sim)
+        return best
+
+    def add(self, source_file: str, chunk_index: int, sig: np.ndarray) -> None:
+        key = chunk_key(source_file, chunk_index)
+        self._index(key, source_file, sig)
+        if self._db is not None and not self.readonly:
+            self._db.execute("INSERT OR REPLACE INTO signatures (key, source_file, sig) VALUES (?, ?, ?)", (key, source_file, sig.tobytes()))
+
+    def forget(self, source_file: str) -> List[str]:
+        """Drop a file's signatures and links; returns other files that pointed at it."""
+        with self._lock:
+            keys = {k for k, sf in self._source_of.items() if sf == source_file}
+            for k in keys:
+                sig = self._sigs.pop(k)
+                self._source_of.pop(k, None)
+                for bk in self._band_keys(sig):
+                    bucket = self._buckets.get(bk)
+                    if bucket and k in bucket:
+                        bucket.remove(k)
+                        if not bucket:
+                            del self._buckets[bk]
+            prefix = f"{source_file}:"
+            own = [k for k in self._links if k.startswith(prefix)]
+            for k in own:
+                del self._links[k]
+            dependents = sorted({k.rsplit(":", 1)[0] for k, (canon, _) in self._links.items() if canon in keys})
+            if self._db is not None and not self.readonly:
+                self._db.execute("DELETE FROM signatures WHERE source_file = ?", (source_file,))
+                self._db.execute("DELETE FROM links WHERE source_file = ?", (source_file,))
+            return dependents
+
+    def filter_plan(self, source_file: str, texts: List[str], plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Remove near-duplicates from plan["embed"] / plan["reuse"]; adds plan["duplicates"].
+
+        The file's previous signatures are replaced by the ones of the chunks
+        it keeps, so re-ingesting a file never matches its old self.
+        """
+        if not self.enabled:
+            return plan
+        self.stale_sources.update(self.forget(source_file))
+        self.stale_sources.discard(source_file)
+        writes = set(plan["embed"]) | set(plan.get("reuse") or {})
+        duplicates: Dict[int, Tuple[str, float]] = {}
+        with self._lock:
+            for idx, text in enumerate(texts):
+                sig = self.hasher.signature(text)
+                if idx in writes:
+                    self._stats["checked"] += 1
+                    hit = self.find(sig)
+                    if hit is not None:
+                        duplicates[idx] = hit
+                        continue
+                self.add(source_file, idx, sig)
+            for idx, (canon, sim) in duplicates.items():
+                key = chunk_key(source_file, idx)
+                self._links[key] = (canon, sim)
+                if self._db is not None and not self.readonly:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO links (key, source_file, canonical_key, similarity) VALUES (?, ?, ?, ?)",
+                        (key, source_file, canon, sim),
+                    )
+            to_embed = set(plan["embed"])
+            saved_embeddings = sum(1 for i in duplicates if i in to_embed)
+            self._stats["duplicates"] += len(duplicates)
+            self._stats["saved_embeddings"] += saved_embeddings
+            self._stats["saved_rows"] += len(duplicates)
+        out = dict(plan)
+        out["embed"] = [i for i in plan["embed"] if i not in duplicates]
+        out["reuse"] = {i: v for i, v in (plan.get("reuse") or {}).items() if i not in duplicates}
+        out["duplicates"] = duplicates
+        return out
+
+    def link_rows(self, source_file: str) -> List[Dict[str, Any]]:
+        """meai_chunk_duplicates rows for one file (mode "link")."""
+        prefix = f"{source_file}:"
+        out = []
+        for key, (canon, sim) in sorted(self._links.items()):
+            if key.startswith(prefix):
+                canon_sf, canon_ci = canon.rsplit(":", 1)
+                out.append({
+                    "source_file": source_file,
+                    "chunk_index": int(key.rsplit(":", 1)[1]),
+                    "canonical_source_file": canon_sf,
+                    "canonical_chunk_index": int(canon_ci),
+                    "similarity": round(sim, 4),
+                })
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["indexed_chunks"] = len(self._sigs)
+            out["links"] = len(self._links)
+        out["mode"] = self.mode
+        out["threshold"] = self.threshold
+        return out
@@ -0,0 +1,152 @@
+# meai_core/diversify.py
+"""Diverse context selection: maximal marginal relevance, then adjacent-chunk merging.
+
+Retrieval returns near-duplicates: neighbouring chunks of one PDF share
+OVERLAP characters and often say the same thing. build_context takes
+MEAI_MMR_CANDIDATES rows and picks its top-n with MMR. Each pick maximizes
+  lambda * relevance - (1 - lambda) * max similarity to the rows already picked
+where relevance is the cosine similarity to the query, or the fused score
+relative to the best one. Pairwise similarity uses the candidates'
+embeddings when every row carries one (the local index returns them).
+Otherwise it uses hashed term vectors of the chunk text. The match RPC does
+not return vectors, and the duplicates this stage targets are textual
+anyway. Picked chunks that are consecutive in one source file are then
+joined into one passage, without their overlap.
+"""
+import os, zlib
+from typing import Optional, Dict, Any, List, Sequence
+
+import numpy as np
+
+from meai_core.lexical_index import tokenize
+
+# ========= config =========
+MMR_ENABLED = os.getenv("MEAI_MMR", "1") == "1"
+# 1.0 = pure relevance order, 0.0 = pure novelty
+MMR_LAMBDA = float(os.getenv("MEAI_MMR_LAMBDA", "0.7"))
+MMR_CANDIDATES = int(os.getenv("MEAI_MMR_CANDIDATES", "20"))
+MERGE_ADJACENT = os.getenv("MEAI_MERGE_ADJACENT", "1") == "1"
+TEXT_VECTOR_DIM = 2048
+MIN_OVERLAP_CHARS = 16
+MAX_OVERLAP_CHARS = 400
+
+# ========= vectors =========
+def relevance(rows: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Query relevance in [0, 1]: cosine similarity as is; rrf, or else rank, as a fraction of the best."""
+    if rows and all(r.get("rrf") is not None for r in rows):
+        scores = np.array([float(r["rrf"]) for r in rows], dtype=np.float32)
+    elif rows and all(r.get("similarity") is not None for r in rows):
+        return np.clip(np.array([float(r["similarity"]) for r in rows], dtype=np.float32), 0.0, 1.0)
+    else:
+        scores = 1.0 / np.arange(1, len(rows) + 1, dtype=np.float32)
+    top = float(scores.max()) if len(scores) else 0.0
+    return scores / top if top > 0 else np.ones(len(rows), dtype=np.float32)
+
+def text_vectors(texts: Sequence[str], dim: int = TEXT_VECTOR_DIM) -> np.ndarray:
+    """L2-normalized hashed term counts, one row per text."""
+    mat = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        terms = tokenize(text)
+        if terms:
+            idx = np.fromiter((zlib.crc32(t.encode("utf-8")) % dim for t in terms), dtype=np.int64, count=len(terms))
+            np.add.at(mat[i], idx, 1.0)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.maximum(norms, 1e-12)
+
+def row_vectors(rows: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Candidate embeddings when every row has one, else text vectors."""
+    if rows and all(r.get("embedding") is not None for r in rows):
+        try:
+            mat = np.stack([np.asarray(r["embedding"], dtype=np.float32) for r in rows])
+        except ValueError:
+            mat = None  # mixed widths or unparsed strings
+        if mat is not None and mat.ndim == 2:
+            return mat / np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12)
+    return text_vectors([r.get("content") or "" for r in rows])
+
+# ========= selection =========
+def mmr(rel: np.ndarray, vectors: np.ndarray, n: int, lam: float = MMR_LAMBDA) -> List[int]:
+    """Indices of n rows in pick order."""
+    count = len(rel)
+    n = min(n, count)
+    if n <= 0:
+        return []
+    sim = vectors @ vectors.T
+    picked: List[int] = []
+    # similarity of each candidate to its closest picked row
+    closest = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    for _ in range(n):
+        penalty = np.where(np.isfinite(closest), closest, 0.0)
+        score = np.where(available, lam * rel - (1.0 - lam) * penalty, -np.inf)
+        i = int(np.argmax(score))
+        picked.append(i)
+        available[i] = False
+        closest = np.maximum(closest, sim[i])
+    return picked
+
+def diversify(rows: List[Dict[str, Any]], n: int, lam: float = MMR_LAMBDA, vectors: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """The n rows MMR picks, in pick order."""
+    if len(rows) <= 1:
+        return rows[:n]
+    vecs = row_vectors(rows) if vectors is None else vectors
+    return [rows[i] for i in mmr(relevance(rows), vecs, n, lam)]
+
+# ========= merging =========
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of a that b starts with (chunk overlap)."""
+    for size in range(min(len(a), len(b), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if a.endswith(b[:size]):
+            return size
+    return 0
+
+def join_chunks(texts: Sequence[str]) -> str:
+    out = ""
+    for text in texts:
+        text = text.strip()
+        if not out:
+            out = text
+            continue
+        size = _overlap(out, text)
+        out = out + text[size:] if size else f"{out}\n{text}"
+    return out
+
+def merge_adjacent(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Passages of consecutive chunks from one source file, in the order of their best-ranked chunk.
+
+    A passage is its first chunk's row with the joined content, the page span
+    of all of them and "chunk_indexes".
+    """
+    by_source: Dict[Any, List[int]] = {}
+    for pos, r in enumerate(rows):
+        by_source.setdefault(r.get("source_file"), []).append(pos)
+    passages = []
+    for positions in by_source.values():
+        positions.sort(key=lambda p: rows[p].get("chunk_index") or 0)
+        run = [positions[0]]
+        for p in positions[1:]:
+            # rows without an index have no neighbours and stay passages of their own
+            prev = rows[run[-1]].get("chunk_index")
+            if prev is not None and rows[p].get("chunk_index") == prev + 1:
+                run.append(p)
+            else:
+                passages.append(run)
+                run = [p]
+        passages.append(run)
+    out = []
+    for run in sorted(passages, key=min):
+        members = [rows[p] for p in run]
+        first = members[0]
+        if len(members) == 1:
+            out.append(dict(first, chunk_indexes=[first.get("chunk_index")]))
+            continue
+        starts = [m["page_start"] for m in members if m.get("page_start") is not None]
+        ends = [m["page_end"] for m in members if m.get("page_end") is not None]
+        out.append(dict(
+            first,
+            content=join_chunks([m.get("content") or "" for m in members]),
+            chunk_indexes=[m.get("chunk_index") for m in members],
+            page_start=min(starts) if starts else first.get("page_start"),
+            page_end=max(ends) if ends else first.get("page_end"),
+        ))
+    return out
@@ -0,0 +1,174 @@
+# meai_core/embed_cache.py
+import os, re, math, time, sqlite3, hashlib, threading, unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
+
+# ========= config =========
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "cache", "embeddings.sqlite3")
+EMBED_CACHE_PATH = os.getenv("MEAI_EMBED_CACHE_PATH", DEFAULT_CACHE_PATH)
+EMBED_CACHE_SIZE = int(os.getenv("MEAI_EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_TTL_SEC = float(os.getenv("MEAI_EMBED_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+# disk tier bounds; 0 disables a bound
+EMBED_CACHE_DISK_MAX_ROWS = int(os.getenv("MEAI_EMBED_CACHE_DISK_MAX_ROWS", "100000"))
+EMBED_CACHE_DISK_TTL_SEC = float(os.getenv("MEAI_EMBED_CACHE_DISK_TTL_SEC", str(30 * 24 * 3600)))
+# puts between disk pruning passes
+PRUNE_EVERY = 500
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text or "")).strip()
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-process LRU over a SQLite file.
+
+    The memory tier is bounded by size and TTL and holds tuples, so callers
+    always get a list of their own. The disk tier is keyed by model +
+    normalized text and shared by every worker pointing at the same file; it
+    is bounded by `disk_max_rows` and `disk_ttl_sec`, pruned oldest-written
+    first on open and every PRUNE_EVERY puts. Disk I/O runs under its own
+    lock so a slow read never holds up memory hits. Disk errors degrade to
+    memory-only.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = EMBED_CACHE_PATH,
+        max_items: int = EMBED_CACHE_SIZE,
+        ttl_sec: float = EMBED_CACHE_TTL_SEC,
+        disk_max_rows: int = EMBED_CACHE_DISK_MAX_ROWS,
+        disk_ttl_sec: float = EMBED_CACHE_DISK_TTL_SEC,
+    ):
+        self.max_items = max_items
+        self.ttl_sec = ttl_sec
+        self.disk_max_rows = disk_max_rows
+        self.disk_ttl_sec = disk_ttl_sec
+        self._mem: "OrderedDict[str, Tuple[float, Tuple[float, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._puts_since_prune = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_errors": 0, "disk_pruned": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, dim INTEGER, vec BLOB, created_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)")
+            except sqlite3.Error:
+                self._stats["disk_errors"] += 1
+                self._db = None
+        self.prune()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = cache_key(model, text)
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and now - hit[0] <= self.ttl_sec:
+                self._mem.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return list(hit[1])
+            if hit:
+                del self._mem[key]
+        vec = self._disk_get(key, now)
+        with self._lock:
+            if vec is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, vec, now)
+        return vec
+
+    def put(self, model: str, text: str, vec: List[float]) -> None:
+        key = cache_key(model, text)
+        now = time.time()
+        with self._lock:
+            self._remember(key, vec, now)
+        if self._db is None:
+            return
+        with self._disk_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vec, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, model, len(vec), array("f", vec).tobytes(), now),
+                )
+            except sqlite3.Error:
+                self._disk_error()
+            self._puts_since_prune += 1
+            due = self._puts_since_prune >= PRUNE_EVERY
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop disk rows past disk_ttl_sec, then the oldest beyond disk_max_rows; returns rows removed."""
+        if self._db is None:
+            return 0
+        removed = 0
+        with self._disk_lock:
+            self._puts_since_prune = 0
+            try:
+                cur = self._db.execute("DELETE FROM embeddings WHERE created_at < ?", (self._disk_cutoff(time.time()),))
+                removed += max(cur.rowcount, 0)
+                if self.disk_max_rows > 0:
+                    cur = self._db.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.disk_max_rows,),
+                    )
+                    removed += max(cur.rowcount, 0)
+            except sqlite3.Error:
+                self._disk_error()
+        if removed:
+            with self._lock:
+                self._stats["disk_pruned"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out["memory_items"] = len(self._mem)
+        lookups = out["memory_hits"] + out["disk_hits"] + out["misses"]
+        out["hit_rate"] = round((out["memory_hits"] + out["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return out
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._mem.clear()
+
+    def _remember(self, key: str, vec: List[float], now: float) -> None:
+        self._mem[key] = (now, tuple(vec))
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def _disk_error(self) -> None:
+        with self._lock:
+            self._stats["disk_errors"] += 1
+
+    def _disk_cutoff(self, now: float) -> float:
+        bounded = self.disk_ttl_sec > 0 and math.isfinite(self.disk_ttl_sec)
+        return now - self.disk_ttl_sec if bounded else float("-inf")
+
+    def _disk_get(self, key: str, now: float) -> Optional[List[float]]:
+        if self._db is None:
+            return None
+        # rows past the disk TTL are misses even before the next prune removes them
+        with self._disk_lock:
+            try:
+                row = self._db.execute(
+                    "SELECT vec FROM embeddings WHERE key = ? AND created_at >= ?", (key, self._disk_cutoff(now))
+                ).fetchone()
+            except sqlite3.Error:
+                self._disk_error()
+                return None
+        if not row:
+            return None
+        vec = array("f")
+        vec.frombytes(row[0])
+        return vec.tolist()
@@ -0,0 +1,303 @@
+# meai_core/embed_migration.py
+"""Re-embed meai_chunks with a new model without taking retrieval down.
+
+Vectors go to a shadow column (see docs/add_embedding_migration.sql) while
+queries keep using the active profile. The backfill is idempotent: it only
+selects rows whose shadow column is still null, so an interrupted run picks
+up where it stopped, and the progress checkpoint in the target row is for
+--status. New chunks get both vectors from the ingester while a target is
+configured. --verify runs a recall benchmark against both profiles, and
+--switch promotes the target in one transaction once it is complete and
+verified; every process follows within MEAI_EMBED_CONFIG_CHECK_SEC.
+
+  python -m meai_core.embed_migration --start MODEL --column embedding_v2 --match_rpc match_meai_chunks_v2 [--dims 512]
+  python -m meai_core.embed_migration --backfill [--limit N]
+  python -m meai_core.embed_migration --verify [200]
+  python -m meai_core.embed_migration --switch [--force]
+  python -m meai_core.embed_migration --status
+"""
+import os, sys, json, time, random, logging
+from typing import Optional, Dict, Any, List, Callable
+
+from meai_core.embedding_profile import (
+    ACTIVE, TARGET, EMBEDDING_CONFIG_TABLE, EmbeddingConfig, Profile, normalize_profile, profile_key,
+)
+from meai_core.ingest_pipeline import RateLimiter
+
+logger = logging.getLogger("meai_core.embed_migration")
+
+# ========= config =========
+CHUNKS_TABLE_NAME = "meai_chunks"
+SET_EMBEDDINGS_RPC = "meai_set_chunk_embeddings"
+SWITCH_RPC = "meai_switch_embedding_profile"
+MIGRATION_BATCH = int(os.getenv("MEAI_EMBED_MIGRATION_BATCH", "256"))
+# kept well under the account limits: live queries and ingestion share them
+MIGRATION_RPM = float(os.getenv("MEAI_EMBED_MIGRATION_RPM", "300"))
+MIGRATION_TPM = float(os.getenv("MEAI_EMBED_MIGRATION_TPM", "300000"))
+MIGRATION_MAX_RETRIES = 5
+# the target may lose at most this much self-retrieval recall@k against the active profile
+MAX_RECALL_DROP = float(os.getenv("MEAI_EMBED_MIGRATION_MAX_RECALL_DROP", "0.02"))
+VERIFY_SAMPLE = 200
+VERIFY_K = 8
+PROBE_WORDS = 30
+
+# (profile, texts) -> vectors
+EmbedFn = Callable[[Profile, List[str]], List[List[float]]]
+
+def probe_text(content: str, words: int = PROBE_WORDS) -> str:
+    """A passage from inside the chunk, used as the query that should find it again."""
+    tokens = (content or "").split()
+    if len(tokens) <= words:
+        return " ".join(tokens)
+    start = (len(tokens) - words) // 3
+    return " ".join(tokens[start:start + words])
+
+def _vector_literal(vec: List[float]) -> str:
+    return "[" + ",".join(repr(float(x)) for x in vec) + "]"
+
+class EmbeddingMigration:
+    def __init__(
+        self,
+        sb: Any,
+        embed: EmbedFn,
+        batch_size: int = MIGRATION_BATCH,
+        limiter: Optional[RateLimiter] = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.sb = sb
+        self.embed = embed
+        self.batch_size = batch_size
+        self.limiter = limiter if limiter is not None else RateLimiter(MIGRATION_RPM, MIGRATION_TPM)
+        self.log = log
+        self.config = EmbeddingConfig(lambda: sb, check_interval_sec=0)
+
+    # ----- config rows -----
+    def _rows(self) -> Dict[str, Dict[str, Any]]:
+        rows = self.sb.table(EMBEDDING_CONFIG_TABLE).select("*").execute().data or []
+        return {r["slot"]: r for r in rows}
+
+    def _require_target(self) -> Dict[str, Any]:
+        row = self._rows().get(TARGET)
+        if row is None:
+            raise RuntimeError("no migration in progress; start one with --start")
+        return row
+
+    def _update_target(self, **fields: Any) -> None:
+        fields["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.sb.table(EMBEDDING_CONFIG_TABLE).update(fields).eq("slot", TARGET).execute()
+
+    def start(self, target: Profile) -> Profile:
+        """Register the target profile; re-running with the same profile keeps its progress."""
+        active = self.config.snapshot()[ACTIVE]
+        if target["column"] == active["column"]:
+            raise ValueError(f"target column {target['column']} is the active column")
+        current = self._rows().get(TARGET)
+        if current is not None:
+            if normalize_profile(current) == target:
+                return target
+            raise RuntimeError(f"another migration is in progress: {profile_key(normalize_profile(current))} -> {current['column_name']}")
+        self.sb.table(EMBEDDING_CONFIG_TABLE).insert({
+            "slot": TARGET,
+            "model": target["model"],
+            "dimensions": target.get("dimensions"),
+            "column_name": target["column"],
+            "match_rpc": target["match_rpc"],
+        }).execute()
+        return target
+
+    # ----- backfill -----
+    def count_rows(self, missing_column: Optional[str] = None) -> int:
+        q = self.sb.table(CHUNKS_TABLE_NAME).select("chunk_index", count="exact")
+        if missing_column is not None:
+            q = q.is_(missing_column, "null")
+        return int(q.limit(1).execute().count or 0)
+
+    def _embed(self, profile: Profile, texts: List[str]) -> List[List[float]]:
+        self.limiter.acquire(texts)
+        for attempt in range(MIGRATION_MAX_RETRIES + 1):
+            try:
+                return self.embed(profile, texts)
+            except Exception:
+                if attempt == MIGRATION_MAX_RETRIES:
+                    raise
+                logger.warning("embedding batch failed (attempt %s), retrying", attempt + 1, exc_info=True)
+                time.sleep(min(2 ** attempt, 60))
+        return []
+
+    def backfill(self, max_rows: Optional[int] = None) -> Dict[str, Any]:
+        """Embed rows whose target column is still null, in batches, recording progress."""
+        row = self._require_target()
+        target = normalize_profile(row)
+        col = target["column"]
+        checkpoint = row.get("checkpoint") or {}
+        stats = {"total": self.count_rows(), "missing_before": self.count_rows(col), "embedded": 0, "skipped": 0}
+        skip = 0  # rows this run cannot embed (empty content) stay null; page past them
+        started = time.monotonic()
+        while max_rows is None or stats["embedded"] < max_rows:
+            limit = self.batch_size if max_rows is None else min(self.batch_size, max_rows - stats["embedded"])
+            rows = (
+                self.sb.table(CHUNKS_TABLE_NAME)
+                .select("source_file,chunk_index,content")
+                .is_(col, "null")
+                .order("source_file")
+                .order("chunk_index")
+                .range(skip, skip + limit - 1)
+                .execute()
+                .data
+                or []
+            )
+            if not rows:
+                break
+            todo = [r for r in rows if (r.get("content") or "").strip()]
+            skip += len(rows) - len(todo)
+            stats["skipped"] += len(rows) - len(todo)
+            if todo:
+                vecs = self._embed(target, [r["content"] for r in todo])
+                self.sb.rpc(SET_EMBEDDINGS_RPC, {
+                    "column_name": col,
+                    "source_files": [r["source_file"] for r in todo],
+                    "chunk_indexes": [r["chunk_index"] for r in todo],
+                    "embeddings": [_vector_literal(v) for v in vecs],
+                }).execute()
+                stats["embedded"] += len(todo)
+            last = rows[-1]
+            checkpoint = {
+                "embedded": int(checkpoint.get("embedded") or 0) + len(todo),
+                "total": stats["total"],
+                "missing": max(stats["missing_before"] - stats["embedded"] - stats["skipped"], 0),
+                "last": [last["source_file"], last["chunk_index"]],
+                "rows_per_sec": round(stats["embedded"] / max(time.monotonic() - started, 1e-9), 1),
+            }
+            self._update_target(checkpoint=checkpoint)
+            self.log(f"  {col}: {stats['total'] - checkpoint['missing']}/{stats['total']} rows embedded ({checkpoint['rows_per_sec']}/s)")
+        stats["missing_after"] = self.count_rows(col)
+        return stats
+
+    # ----- verification -----
+    def _sample_rows(self, n: int, seed: int) -> List[Dict[str, Any]]:
+        total = self.count_rows()
+        rng = random.Random(seed)
+        out = []
+        for offset in sorted(rng.sample(range(total), min(n, total))):
+            out.extend(
+                self.sb.table(CHUNKS_TABLE_NAME)
+                .select("source_file,chunk_index,content")
+                .order("source_file")
+                .order("chunk_index")
+                .range(offset, offset)
+                .execute()
+                .data
+                or []
+            )
+        return [r for r in out if len((r.get("content") or "").split()) >= 8]
+
+    def _search(self, profile: Profile, vec: List[float], k: int) -> List[tuple]:
+        rows = self.sb.rpc(profile["match_rpc"], {"query_embedding": vec, "match_count": k, "min_quality": 0}).execute().data or []
+        return [(r.get("source_file"), r.get("chunk_index")) for r in rows]
+
+    def verify(self, sample: int = VERIFY_SAMPLE, k: int = VERIFY_K, seed: int = 0) -> Dict[str, Any]:
+        """Self-retrieval recall@k and MRR of both profiles on a sample of stored chunks.
+
+        Each sampled chunk is queried by a passage from its own text; a hit is
+        the chunk coming back in the top k. Overlap is how much of the active
+        top k the target also returns. The report is stored on the target row
+        and --switch requires a passing one.
+        """
+        row = self._require_target()
+        target, active = normalize_profile(row), self.config.snapshot()[ACTIVE]
+        missing = self.count_rows(target["column"])
+        rows = self._sample_rows(sample, seed)
+        probes = [probe_text(r["content"]) for r in rows]
+        per_profile: Dict[str, Dict[str, float]] = {}
+        results: Dict[str, List[List[tuple]]] = {}
+        for slot, profile in ((ACTIVE, active), (TARGET, target)):
+            hits, rr, found = 0, 0.0, []
+            for i in range(0, len(probes), self.batch_size):
+                part = probes[i:i + self.batch_size]
+                vecs = self._embed(profile, part)
+                for r, vec in zip(rows[i:i + len(part)], vecs):
+                    keys = self._search(profile, vec, k)
+                    found.append(keys)
+                    key = (r["source_file"], r["chunk_index"])
+                    if key in keys:
+                        hits += 1
+                        rr += 1.0 / (keys.index(key) + 1)
+            n = max(len(rows), 1)
+            per_profile[slot] = {"recall_at_k": round(hits / n, 4), "mrr": round(rr / n, 4)}
+            results[slot] = found
+        overlaps = [len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(results[ACTIVE], results[TARGET])]
+        drop = per_profile[ACTIVE]["recall_at_k"] - per_profile[TARGET]["recall_at_k"]
+        report = {
+            "profile": profile_key(target),
+            "column": target["column"],
+            "baseline": profile_key(active),
+            "queries": len(rows),
+            "k": k,
+            "active": per_profile[ACTIVE],
+            "target": per_profile[TARGET],
+            "overlap_at_k": round(sum(overlaps) / max(len(overlaps), 1), 4),
+            "missing_rows": missing,
+            "max_recall_drop": MAX_RECALL_DROP,
+            "passed": bool(rows) and missing == 0 and drop <= MAX_RECALL_DROP,
+            "verified_at": time.time(),
+        }
+        self._update_target(verified=report)
+        return report
+
+    # ----- switch -----
+    def switch(self, force: bool = False) -> Profile:
+        """Catch up rows ingested since the last pass, then promote target to active atomically."""
+        self.backfill()
+        row = self._require_target()
+        target = normalize_profile(row)
+        missing = self.count_rows(target["column"])
+        verified = row.get("verified") or {}
+        problems = []
+        if missing:
+            problems.append(f"{missing} rows have no {target['column']} vector")
+        if not verified.get("passed") or verified.get("profile") != profile_key(target) or verified.get("column") != target["column"]:
+            problems.append("no passing --verify report for this target")
+        if problems and not force:
+            raise RuntimeError("refusing to switch: " + "; ".join(problems))
+        self.sb.rpc(SWITCH_RPC, {}).execute()
+        return self.config.snapshot()[ACTIVE]
+
+    def status(self) -> Dict[str, Any]:
+        rows = self._rows()
+        out: Dict[str, Any] = {slot: {**normalize_profile(r), "checkpoint": r.get("checkpoint"), "verified": r.get("verified")} for slot, r in rows.items()}
+        if TARGET in rows:
+            out["missing_rows"] = self.count_rows(rows[TARGET]["column_name"])
+        return out
+
+def _arg(argv: List[str], name: str, default: Optional[str] = None) -> Optional[str]:
+    if name in argv and argv.index(name) + 1 < len(argv) and not argv[argv.index(name) + 1].startswith("--"):
+        return argv[argv.index(name) + 1]
+    return default
+
+def main(argv: List[str]) -> None:
+    from meai_core.embedding_profile import embed_with
+    from meai_core.engine import sb, openai_client
+
+    job = EmbeddingMigration(sb, lambda profile, texts: embed_with(openai_client, profile, texts))
+    if "--start" in argv:
+        model, column, rpc = _arg(argv, "--start"), _arg(argv, "--column"), _arg(argv, "--match_rpc")
+        if not (model and column and rpc):
+            print("--start needs MODEL, --column and --match_rpc")
+            return
+        dims = _arg(argv, "--dims")
+        target = job.start({"model": model, "dimensions": int(dims) if dims else None, "column": column, "match_rpc": rpc})
+        print(f"Migration target: {profile_key(target)} -> {column}; run --backfill next")
+    elif "--backfill" in argv:
+        limit = _arg(argv, "--limit")
+        print(json.dumps(job.backfill(int(limit) if limit else None), indent=2))
+    elif "--verify" in argv:
+        print(json.dumps(job.verify(int(_arg(argv, "--verify", str(VERIFY_SAMPLE))), k=int(_arg(argv, "--k", str(VERIFY_K)))), indent=2))
+    elif "--switch" in argv:
+        active = job.switch(force="--force" in argv)
+        print(f"Active embedding profile: {profile_key(active)} ({active['column']}, {active['match_rpc']})")
+        print("Rebuild the local index if MEAI_RETRIEVAL_BACKEND=local: python -m meai_core.local_index --rebuild")
+    else:
+        print(json.dumps(job.status(), indent=2, default=str))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
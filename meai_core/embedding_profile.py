@@ -0,0 +1,157 @@
+# meai_core/embedding_profile.py
+"""Which embedding model, meai_chunks column and match RPC retrieval uses.
+
+Profiles live in meai_embedding_config (docs/add_embedding_migration.sql),
+one row per slot: "active" is what queries use, "target" is a migration in
+progress (meai_core/embed_migration.py) and "previous" the profile it
+replaced. Ingestion writes the columns of every slot. Switching is a single
+transactional RPC, and readers re-read the table at most every
+MEAI_EMBED_CONFIG_CHECK_SEC, so every process follows within that window.
+Until the table exists the built-in default below applies.
+"""
+import os, time, logging, threading
+from typing import Optional, Dict, Any, Callable, List
+
+logger = logging.getLogger("meai_core.embedding_profile")
+
+# ========= config =========
+EMBEDDING_CONFIG_TABLE = "meai_embedding_config"
+EMBED_CONFIG_CHECK_SEC = float(os.getenv("MEAI_EMBED_CONFIG_CHECK_SEC", "30"))
+ACTIVE, TARGET, PREVIOUS = "active", "target", "previous"
+SLOTS = (ACTIVE, TARGET, PREVIOUS)
+
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "model": "text-embedding-3-small",
+    "dimensions": None,  # None = the model's native width
+    "column": "embedding",
+    "match_rpc": "match_meai_chunks",
+}
+
+Profile = Dict[str, Any]
+
+def normalize_profile(row: Dict[str, Any]) -> Profile:
+    dims = row.get("dimensions")
+    return {
+        "model": row.get("model") or DEFAULT_PROFILE["model"],
+        "dimensions": int(dims) if dims else None,
+        "column": row.get("column_name") or row.get("column") or DEFAULT_PROFILE["column"],
+        "match_rpc": row.get("match_rpc") or DEFAULT_PROFILE["match_rpc"],
+    }
+
+def profile_key(profile: Profile) -> str:
+    """Identifies the vector space: cache keys and answer-cache versions use it."""
+    dims = profile.get("dimensions")
+    return f"{profile['model']}@{dims}" if dims else profile["model"]
+
+def embed_kwargs(profile: Profile) -> Dict[str, Any]:
+    """Arguments for openai embeddings.create."""
+    out: Dict[str, Any] = {"model": profile["model"]}
+    if profile.get("dimensions"):
+        out["dimensions"] = profile["dimensions"]
+    return out
+
+def embed_with(client: Any, profile: Profile, texts: List[str]) -> List[List[float]]:
+    resp = client.embeddings.create(input=texts, **embed_kwargs(profile))
+    return [d.embedding for d in resp.data]
+
+def write_profiles(profiles: Dict[str, Profile]) -> List[Profile]:
+    """Active first, then every other slot whose column ingestion must keep filled."""
+    out: List[Profile] = []
+    for slot in SLOTS:
+        p = profiles.get(slot)
+        if p is not None and all(p["column"] != q["column"] for q in out):
+            out.append(p)
+    return out
+
+class EmbeddingConfig:
+    """Cached view of the meai_embedding_config slots.
+
+    active() and target() are on the request path and never wait on
+    Supabase: they return the cached profiles and, once
+    MEAI_EMBED_CONFIG_CHECK_SEC has passed, start a re-read in a background
+    thread. Only a process's very first call reads synchronously
+    (warm_caches does it at startup). A failed read keeps the last profiles
+    that loaded, so a Supabase blip never flips a process back to the
+    default vector space. The table is read outside the lock.
+    """
+
+    def __init__(self, get_sb: Callable[[], Any], check_interval_sec: float = EMBED_CONFIG_CHECK_SEC):
+        self._get_sb = get_sb
+        self.check_interval_sec = check_interval_sec
+        self._lock = threading.Lock()
+        self._first_load = threading.Lock()
+        self._profiles: Dict[str, Profile] = {ACTIVE: dict(DEFAULT_PROFILE)}
+        self._loaded = False
+        self._checked_at: Optional[float] = None
+        self._refreshing = False
+        self._stats = {"reads": 0, "read_errors": 0, "changes": 0}
+
+    def _read(self) -> Dict[str, Profile]:
+        rows = self._get_sb().table(EMBEDDING_CONFIG_TABLE).select("*").execute().data or []
+        out = {r["slot"]: normalize_profile(r) for r in rows if r.get("slot") in SLOTS}
+        out.setdefault(ACTIVE, dict(DEFAULT_PROFILE))
+        return out
+
+    def _due(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval_sec
+
+    def _reload(self) -> None:
+        try:
+            profiles = self._read()
+        except Exception as e:
+            with self._lock:
+                self._stats["read_errors"] += 1
+                first_error = self._stats["read_errors"] == 1
+                self._refreshing = False
+            if first_error:
+                logger.warning("cannot read %s (%s); using %s", EMBEDDING_CONFIG_TABLE, e, "last loaded profile" if self._loaded else "the default profile")
+            return
+        with self._lock:
+            self._stats["reads"] += 1
+            if self._loaded and profiles != self._profiles:
+                self._stats["changes"] += 1
+                logger.info("embedding profile changed: %s", {k: profile_key(p) for k, p in profiles.items()})
+            self._profiles, self._loaded = profiles, True
+            self._refreshing = False
+
+    def refresh(self, force: bool = False) -> Dict[str, Profile]:
+        """Synchronous re-read when due (or forced); for startup and offline jobs, not requests."""
+        with self._lock:
+            if not force and not self._due():
+                return self._profiles
+            self._checked_at = time.monotonic()
+            self._refreshing = True
+        self._reload()
+        return self._profiles
+
+    def _current(self) -> Dict[str, Profile]:
+        if self._checked_at is None:
+            with self._first_load:
+                if self._checked_at is None:
+                    return self.refresh(force=True)
+        if self._due():
+            self._refresh_in_background()
+        return self._profiles
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing or not self._due():
+                return
+            self._checked_at = time.monotonic()
+            self._refreshing = True
+        threading.Thread(target=self._reload, name="meai-embedding-config", daemon=True).start()
+
+    def active(self) -> Profile:
+        return self._current()[ACTIVE]
+
+    def target(self) -> Optional[Profile]:
+        return self._current().get(TARGET)
+
+    def snapshot(self) -> Dict[str, Profile]:
+        """Fresh copy of all slots; a run that embeds and writes should use one snapshot throughout."""
+        return {k: dict(v) for k, v in self.refresh(force=True).items()}
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._stats)
+        out.update({slot: profile_key(p) for slot, p in self._profiles.items()})
+        return out
@@ -1,13 +1,29 @@
 # meai_core/engine.py
-import os, re, json, uuid, traceback
-from datetime import datetime
-from typing import Optional, Dict, Any, List, Tuple
+import os, re, json, uuid, time, asyncio, hashlib, logging, traceback
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple, Awaitable, Iterator, AsyncIterator
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from supabase import create_client
+from openai import OpenAI, AsyncOpenAI
+from supabase import create_client, acreate_client, AsyncClient
+
+from meai_core.embed_cache import EmbeddingCache
+from meai_core.local_index import LocalVectorIndex
+from meai_core.answer_cache import SemanticAnswerCache
+from meai_core.persistence import WriteBehindWriter
+from meai_core.license_catalog import LicenseCatalog
+from meai_core.vendor_index import VendorIndex
+from meai_core.rule_validator import RuleValidator
+from meai_core.prompt_registry import PromptRegistry, PromptTemplate
+from meai_core.chunk_quality import MIN_CHUNK_QUALITY, is_usable
+from meai_core.corpus_stamp import CorpusStamp
+from meai_core.embedding_profile import EmbeddingConfig, embed_kwargs, profile_key
+from meai_core.lexical_index import HYBRID_RETRIEVAL, HYBRID_CANDIDATES, LexicalIndex, fuse
+from meai_core.diversify import MMR_ENABLED, MMR_LAMBDA, MMR_CANDIDATES, MERGE_ADJACENT, diversify, merge_adjacent
+from meai_core.chunk_filter import normalize_filter, is_filtered, filtered_rpc
 
 # ========= logging =========
+logger = logging.getLogger("meai_core.engine")
 LOG_PATH = os.path.join(os.path.dirname(__file__), "logs", "sessions.jsonl")
 
 def _ensure_log_dir() -> None:
@@ -30,6 +46,16 @@ assert SUPABASE_SERVICE_KEY, "SUPABASE_SERVICE_KEY missing"
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
+# async twins for rag_answer_async; the supabase async client must be created inside a running loop
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+_async_sb: Optional[AsyncClient] = None
+
+async def get_async_sb() -> AsyncClient:
+    global _async_sb
+    if _async_sb is None:
+        _async_sb = await acreate_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    return _async_sb
+
 # ========= tables =========
 VENDOR_TABLE_NAME = "vendors_core"
 DOCUMENTS_TABLE_NAME = "meai_documents"
@@ -43,7 +69,12 @@ PROMPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "prom
 PINNED_FACTS_PATH = os.path.join(os.path.dirname(__file__), "prompts", "pinned_facts_hardwarehub.txt")
 
 LLM_MODEL = "gpt-4o-mini"
-EMBED_MODEL = "text-embedding-3-small"
+# the embedding model, meai_chunks column and match RPC come from meai_embedding_config
+# (meai_core/embedding_profile.py) so a migration can switch them without a deploy
+embedding_config = EmbeddingConfig(lambda: sb)
+
+# "rpc" (Supabase match_meai_chunks) or "local" (mmap snapshot, see meai_core/local_index.py)
+RETRIEVAL_BACKEND = os.getenv("MEAI_RETRIEVAL_BACKEND", "rpc")
 
 # Must match meai_documents schema column containing the chunk source identifier
 DOC_SOURCE_COL = "source_url"
@@ -60,20 +91,18 @@ SYSTEM_DOC_ALLOWLIST = {
     "09_Future_Roadmap.pdf",
     "10_Glossary.pdf",
 }
+# system-docs-only questions retrieve from these source files alone
+SYSTEM_DOC_SOURCES = sorted({os.path.basename(x) for x in SYSTEM_DOC_ALLOWLIST} | {"ui_schema.md"})
 
 # ========= prompts =========
+# preloaded by warm_caches(); files are re-read only after they change on disk
+prompts = PromptRegistry(PROMPT_DIR, extra_files={"pinned_facts": PINNED_FACTS_PATH})
+
 def load_prompt(name: str) -> str:
-    path = os.path.join(PROMPT_DIR, f"{name}.txt")
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Missing prompt file: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read().strip()
+    return prompts.get(name)
 
 def load_pinned_facts() -> str:
-    if not os.path.exists(PINNED_FACTS_PATH):
-        raise FileNotFoundError(f"Missing pinned facts file: {PINNED_FACTS_PATH}")
-    with open(PINNED_FACTS_PATH, "r", encoding="utf-8") as f:
-        return f.read().strip()
+    return prompts.get("pinned_facts")
 
 HARDWAREHUB_TERMS = ["hardwarehub", "hardware hub"]
 SCHEDULING_TERMS = ["meet", "meeting", "schedule", "book", "call", "intro", "chat", "calendar"]
@@ -102,66 +131,269 @@ def detect_hardwarehub_intents(text: str) -> Dict[str, bool]:
     }
 
 # ========= supabase persistence =========
-def ensure_session(session_id: str, tester_label: Optional[str] = None) -> None:
+def _write_sessions(rows: List[Dict[str, Any]]) -> None:
+    # a bulk upsert takes its columns from the first row; keep optional fields from being nulled
+    by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for r in rows:
+        by_columns.setdefault(tuple(sorted(r)), []).append(r)
+    for group in by_columns.values():
+        sb.table(SESSIONS_TABLE_NAME).upsert(group).execute()
+
+def _write_messages(rows: List[Dict[str, Any]]) -> None:
+    sb.table(MESSAGES_TABLE_NAME).insert(rows).execute()
+
+# MEAI_WRITE_BEHIND=1 queues session/message rows to a background bulk writer
+persistence = WriteBehindWriter(_write_sessions, _write_messages)
+
+def _session_payload(session_id: str, tester_label: Optional[str]) -> Dict[str, Any]:
     payload: Dict[str, Any] = {"id": session_id}
     if tester_label is not None:
         payload["tester_label"] = tester_label
-    sb.table(SESSIONS_TABLE_NAME).upsert(payload).execute()
+    return payload
 
-def insert_message(session_id: str, role: str, content: str) -> str:
-    mid = str(uuid.uuid4())
-    sb.table(MESSAGES_TABLE_NAME).insert({
-        "id": mid,
+def _message_row(session_id: str, role: str, content: str) -> Dict[str, Any]:
+    # created_at is set here so batched rows keep their conversation order
+    return {
+        "id": str(uuid.uuid4()),
         "session_id": session_id,
         "role": role,
         "content": content,
-    }).execute()
-    return mid
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+def ensure_session(session_id: str, tester_label: Optional[str] = None) -> None:
+    payload = _session_payload(session_id, tester_label)
+    if persistence.seen_session(payload):
+        return
+    if persistence.enabled:
+        persistence.submit_session(payload)
+        return
+    sb.table(SESSIONS_TABLE_NAME).upsert(payload).execute()
+    persistence.remember_session(payload)
+
+def insert_message(session_id: str, role: str, content: str) -> str:
+    row = _message_row(session_id, role, content)
+    if persistence.enabled:
+        persistence.submit_message(row)
+    else:
+        sb.table(MESSAGES_TABLE_NAME).insert(row).execute()
+    return row["id"]
+
+async def aensure_session(session_id: str, tester_label: Optional[str] = None) -> None:
+    payload = _session_payload(session_id, tester_label)
+    if persistence.seen_session(payload):
+        return
+    if persistence.enabled:
+        persistence.submit_session(payload)
+        return
+    asb = await get_async_sb()
+    await asb.table(SESSIONS_TABLE_NAME).upsert(payload).execute()
+    persistence.remember_session(payload)
+
+async def ainsert_message(session_id: str, role: str, content: str) -> str:
+    row = _message_row(session_id, role, content)
+    if persistence.enabled:
+        persistence.submit_message(row)
+    else:
+        asb = await get_async_sb()
+        await asb.table(MESSAGES_TABLE_NAME).insert(row).execute()
+    return row["id"]
 
 # ========= harness: planner + validator =========
+PLAN_FALLBACK: Dict[str, Any] = {
+    "needs_clarification": False,
+    "clarifying_question": "",
+    "use_docs_rag": True,
+    "use_vendors": False,
+}
+VALIDATE_FALLBACK: Dict[str, Any] = {"ok": True, "issues": []}
+
+def _harness_messages(prompt_name: str, mode_name: str, field: str, value: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": load_prompt(prompt_name)},
+        {"role": "user", "content": f"mode={mode_name}\n{field}={value}"},
+    ]
+
+def _parse_json_reply(resp: Any, fallback: Dict[str, Any]) -> Dict[str, Any]:
+    raw = (resp.choices[0].message.content or "").strip()
+    try:
+        return json.loads(raw)
+    except Exception:
+        return dict(fallback)
+
 def plan(question: str, mode_name: str) -> Dict[str, Any]:
-    system = load_prompt("planner")
     resp = openai_client.chat.completions.create(
         model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": f"mode={mode_name}\nquestion={question}"},
-        ],
+        messages=_harness_messages("planner", mode_name, "question", question),
         temperature=0,
     )
-    raw = (resp.choices[0].message.content or "").strip()
-    try:
-        return json.loads(raw)
-    except Exception:
-        return {
-            "needs_clarification": False,
-            "clarifying_question": "",
-            "use_docs_rag": True,
-            "use_vendors": False,
-        }
+    return _parse_json_reply(resp, PLAN_FALLBACK)
 
 def validate(answer: str, mode_name: str) -> Dict[str, Any]:
-    system = load_prompt("validator")
     resp = openai_client.chat.completions.create(
         model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": f"mode={mode_name}\nanswer={answer}"},
-        ],
+        messages=_harness_messages("validator", mode_name, "answer", answer),
         temperature=0,
     )
-    raw = (resp.choices[0].message.content or "").strip()
-    try:
-        return json.loads(raw)
-    except Exception:
-        return {"ok": True, "issues": []}
+    return _parse_json_reply(resp, VALIDATE_FALLBACK)
+
+async def aplan(question: str, mode_name: str) -> Dict[str, Any]:
+    resp = await async_openai_client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=_harness_messages("planner", mode_name, "question", question),
+        temperature=0,
+    )
+    return _parse_json_reply(resp, PLAN_FALLBACK)
+
+async def avalidate(answer: str, mode_name: str) -> Dict[str, Any]:
+    resp = await async_openai_client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=_harness_messages("validator", mode_name, "answer", answer),
+        temperature=0,
+    )
+    return _parse_json_reply(resp, VALIDATE_FALLBACK)
+
+# deterministic checks first; validate()/avalidate() only when inconclusive or audited
+rule_validator = RuleValidator()
 
 # ========= embeddings + retrieval =========
-def embed(text: str) -> List[float]:
-    return openai_client.embeddings.create(model=EMBED_MODEL, input=text).data[0].embedding
+embed_cache = EmbeddingCache()
 
-def retrieve_chunks(query_embedding: List[float], k: int = 8) -> List[Dict[str, Any]]:
-    return sb.rpc("match_meai_chunks", {"query_embedding": query_embedding, "match_count": k}).execute().data
+def embed(text: str) -> List[float]:
+    profile = embedding_config.active()
+    key = profile_key(profile)
+    cached = embed_cache.get(key, text)
+    if cached is not None:
+        return cached
+    vec = openai_client.embeddings.create(input=text, **embed_kwargs(profile)).data[0].embedding
+    embed_cache.put(key, text, vec)
+    return vec
+
+local_index = LocalVectorIndex()
+
+def _use_local_index(flt: Optional[Dict[str, Any]] = None) -> bool:
+    # falls back to the RPC until a snapshot of the active embedding profile has been built
+    if RETRIEVAL_BACKEND != "local" or not local_index.available():
+        return False
+    if flt and flt["collection"] is not None and not local_index.has_collections():
+        return False
+    built_with = local_index.embed_model()
+    return built_with is None or built_with == profile_key(embedding_config.active())
+
+def _match_params(query_embedding: List[float], k: int, flt: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # the RPC drops rows scored below min_quality (docs/add_chunk_quality.sql)
+    params = {"query_embedding": query_embedding, "match_count": k, "min_quality": MIN_CHUNK_QUALITY}
+    if flt:
+        # the filtered twin of the match RPC (docs/add_chunk_filters.sql)
+        params.update(filter_source_files=flt["source_files"], filter_collection=flt["collection"])
+    return params
+
+def _match_rpc(flt: Optional[Dict[str, Any]]) -> str:
+    rpc = embedding_config.active()["match_rpc"]
+    return filtered_rpc(rpc) if flt else rpc
+
+def _retrieval_filter(source_files: Optional[List[str]], collection: Optional[str]) -> Optional[Dict[str, Any]]:
+    flt = normalize_filter(source_files, collection)
+    return flt if is_filtered(flt) else None
+
+# BM25 over chunk text, fused with the vector ranking when the query text is known
+lexical_index = LexicalIndex()
+
+def _use_hybrid(query_text: Optional[str]) -> bool:
+    return HYBRID_RETRIEVAL and bool(query_text) and lexical_index.available()
+
+def _local_index_failed(e: Exception) -> None:
+    # a snapshot caught mid-rebuild or damaged on disk must not take retrieval down with it
+    logger.warning("local index unusable, falling back to the match RPC: %s", e, exc_info=True)
+
+def _vector_chunks(query_embedding: List[float], k: int, flt: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    try:
+        if _use_local_index(flt):
+            return local_index.search(query_embedding, k=k, min_quality=MIN_CHUNK_QUALITY, with_vectors=MMR_ENABLED, **(flt or {}))
+    except Exception as e:
+        _local_index_failed(e)
+    return sb.rpc(_match_rpc(flt), _match_params(query_embedding, k, flt)).execute().data
+
+def retrieve_chunks(
+    query_embedding: List[float],
+    k: int = 8,
+    query_text: Optional[str] = None,
+    source_files: Optional[List[str]] = None,
+    collection: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Top-k chunks for a query; hybrid (vector + BM25) when `query_text` is given.
+
+    `source_files` and/or `collection` (one of chunk_filter.COLLECTIONS) are
+    applied by the retrievers themselves, so k matching chunks come back.
+    """
+    _check_corpus_stamp()
+    flt = _retrieval_filter(source_files, collection)
+    if flt and flt["source_files"] == []:
+        return []
+    if not _use_hybrid(query_text):
+        return _vector_chunks(query_embedding, k, flt)
+    depth = max(k, HYBRID_CANDIDATES)
+    lexical_rows = lexical_index.search(query_text, k=depth, min_quality=MIN_CHUNK_QUALITY, **(flt or {}))
+    return fuse(_vector_chunks(query_embedding, depth, flt), lexical_rows, k)
+
+async def aembed(text: str) -> List[float]:
+    profile = embedding_config.active()
+    key = profile_key(profile)
+    cached = embed_cache.get(key, text)
+    if cached is not None:
+        return cached
+    resp = await async_openai_client.embeddings.create(input=text, **embed_kwargs(profile))
+    vec = resp.data[0].embedding
+    embed_cache.put(key, text, vec)
+    return vec
+
+# inputs per embeddings request when embedding a batch of questions
+EMBED_BATCH_SIZE = int(os.getenv("MEAI_EMBED_BATCH_SIZE", "256"))
+
+async def aembed_many(texts: List[str]) -> List[List[float]]:
+    """Embeddings for many texts: cache hits first, the misses in EMBED_BATCH_SIZE requests."""
+    profile = embedding_config.active()
+    key = profile_key(profile)
+    found = [embed_cache.get(key, t) for t in texts]
+    missing = list(dict.fromkeys(t for t, v in zip(texts, found) if v is None))
+    fresh: Dict[str, List[float]] = {}
+    for i in range(0, len(missing), EMBED_BATCH_SIZE):
+        part = missing[i:i + EMBED_BATCH_SIZE]
+        resp = await async_openai_client.embeddings.create(input=part, **embed_kwargs(profile))
+        for text, d in zip(part, resp.data):
+            fresh[text] = d.embedding
+            embed_cache.put(key, text, d.embedding)
+    return [v if v is not None else fresh[t] for t, v in zip(texts, found)]
+
+async def _avector_chunks(query_embedding: List[float], k: int, flt: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    try:
+        if _use_local_index(flt):
+            return await asyncio.to_thread(local_index.search, query_embedding, k, MIN_CHUNK_QUALITY, with_vectors=MMR_ENABLED, **(flt or {}))
+    except Exception as e:
+        _local_index_failed(e)
+    asb = await get_async_sb()
+    resp = await asb.rpc(_match_rpc(flt), _match_params(query_embedding, k, flt)).execute()
+    return resp.data
+
+async def aretrieve_chunks(
+    query_embedding: List[float],
+    k: int = 8,
+    query_text: Optional[str] = None,
+    source_files: Optional[List[str]] = None,
+    collection: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    _check_corpus_stamp()
+    flt = _retrieval_filter(source_files, collection)
+    if flt and flt["source_files"] == []:
+        return []
+    if not _use_hybrid(query_text):
+        return await _avector_chunks(query_embedding, k, flt)
+    depth = max(k, HYBRID_CANDIDATES)
+    vector_rows, lexical_rows = await asyncio.gather(
+        _avector_chunks(query_embedding, depth, flt),
+        asyncio.to_thread(lexical_index.search, query_text, depth, MIN_CHUNK_QUALITY, **(flt or {})),
+    )
+    return fuse(vector_rows, lexical_rows, k)
 
 def is_garbage(chunk: str) -> bool:
     if not chunk or len(chunk) < 80:
@@ -169,30 +401,54 @@ def is_garbage(chunk: str) -> bool:
     digits = sum(1 for c in chunk if c.isdigit())
     return (digits / float(max(len(chunk), 1))) > 0.35
 
+# rows fetched per question; build_context keeps a diverse max_chunks of them
+CONTEXT_CANDIDATES = MMR_CANDIDATES if MMR_ENABLED else 8
+
 def build_context(rows: List[Dict[str, Any]], max_chunks: int = 5) -> Tuple[str, List[str], List[str]]:
-    ctx, tags, source_files = [], [], []
+    """(context text, chunk tags, source files) from the usable rows.
+
+    With MEAI_MMR the max_chunks rows are an MMR pick from all candidates
+    (meai_core/diversify.py); without it, the first max_chunks. Consecutive
+    chunks of one file become a single passage (MEAI_MERGE_ADJACENT) that
+    keeps every chunk's tag.
+    """
+    candidates, seen = [], set()
     total = len(rows or [])
     debug_rag = os.getenv("DEBUG_RAG") == "1"
     for r in rows or []:
         content = r.get("content", "")
-        if is_garbage(content):
+        # scored rows were already filtered by retrieval; only unscored ones are checked here
+        usable = is_usable(r)
+        if usable is False or (usable is None and is_garbage(content)):
             continue
         sf = r.get("source_file")
         ci = r.get("chunk_index")
-        if sf is None or ci is None:
+        if sf is None or ci is None or (sf, ci) in seen:
             continue
-        if debug_rag and len(ctx) < 20:
-            print(f"RAG CHUNK: source_file={sf}", flush=True)
-        ctx.append(content)
-        tags.append(f"[{sf}:{ci}]")
-        source_files.append(sf)
-        if len(ctx) >= max_chunks:
-            break
+        seen.add((sf, ci))
+        candidates.append(r)
+    if MMR_ENABLED and len(candidates) > max_chunks:
+        picked = diversify(candidates, max_chunks, MMR_LAMBDA)
+    else:
+        picked = candidates[:max_chunks]
+    passages = merge_adjacent(picked) if MERGE_ADJACENT else [dict(r, chunk_indexes=[r["chunk_index"]]) for r in picked]
+    ctx, tags, source_files = [], [], []
+    for p in passages:
+        if debug_rag:
+            print(f"RAG CHUNK: source_file={p['source_file']} chunks={p['chunk_indexes']}", flush=True)
+        ctx.append(p.get("content", ""))
+        tags.extend(f"[{p['source_file']}:{ci}]" for ci in p["chunk_indexes"])
+        source_files.append(p["source_file"])
     if debug_rag:
-        print(f"RAG SUMMARY: kept={len(ctx)} total={total}", flush=True)
+        print(f"RAG SUMMARY: kept={len(picked)} passages={len(ctx)} candidates={len(candidates)} total={total}", flush=True)
     # de-dupe in-order
     return "\n\n".join(ctx), list(dict.fromkeys(tags)), list(dict.fromkeys(source_files))
 
+def context_rows(rows: List[Dict[str, Any]], retrieved_tags: List[str]) -> List[Dict[str, Any]]:
+    """The rows build_context kept, for checks against what the model actually saw."""
+    kept = set(retrieved_tags)
+    return [r for r in rows or [] if f"[{r.get('source_file')}:{r.get('chunk_index')}]" in kept]
+
 # ========= documents + licenses =========
 def fetch_documents_by_source_files(source_files: List[str]) -> List[Dict[str, Any]]:
     if not source_files:
@@ -206,55 +462,105 @@ def fetch_licenses_by_keys(license_keys: List[str]) -> List[Dict[str, Any]]:
     resp = sb.table(LICENSES_TABLE_NAME).select("*").in_("license_key", list(dict.fromkeys(license_keys))).execute()
     return resp.data or []
 
-def build_license_block(source_files: List[str]) -> str:
+async def afetch_documents_by_source_files(source_files: List[str]) -> List[Dict[str, Any]]:
     if not source_files:
-        return "LICENSE CONSTRAINTS (must follow):\n- No retrieved documents."
-    docs = fetch_documents_by_source_files(source_files)
-    doc_by_sf = {d.get(DOC_SOURCE_COL): d for d in docs if d.get(DOC_SOURCE_COL)}
-
-    license_keys: List[str] = []
-    for sf in source_files:
-        d = doc_by_sf.get(sf, {})
-        lk = d.get("license_key") or d.get("license") or d.get("license_id")
-        if lk:
-            license_keys.append(lk)
-
-    licenses = fetch_licenses_by_keys(license_keys)
-    lic_by_key = {l.get("license_key"): l for l in licenses if l.get("license_key")}
-
-    def _b(val: Any, default: bool) -> bool:
-        return bool(val) if val is not None else default
+        return []
+    asb = await get_async_sb()
+    resp = await asb.table(DOCUMENTS_TABLE_NAME).select("*").in_(DOC_SOURCE_COL, source_files).execute()
+    return resp.data or []
 
-    lines = ["LICENSE CONSTRAINTS (must follow):"]
-    for sf in source_files:
-        d = doc_by_sf.get(sf)
-        if not d:
-            lines.append(f"- {sf}: no document record found. Treat as strict: summarize only, cite if used.")
-            continue
+async def afetch_licenses_by_keys(license_keys: List[str]) -> List[Dict[str, Any]]:
+    if not license_keys:
+        return []
+    asb = await get_async_sb()
+    resp = await asb.table(LICENSES_TABLE_NAME).select("*").in_("license_key", list(dict.fromkeys(license_keys))).execute()
+    return resp.data or []
 
-        lk = d.get("license_key") or d.get("license") or d.get("license_id")
-        lic = lic_by_key.get(lk) if lk else None
+LICENSE_BLOCK_HEADER = "LICENSE CONSTRAINTS (must follow):"
+NO_DOCS_LICENSE_BLOCK = f"{LICENSE_BLOCK_HEADER}\n- No retrieved documents."
 
-        title = d.get("title") or sf
-        lines.append(f"- {sf} | title: {title}")
+def _doc_license_key(d: Dict[str, Any]) -> Optional[str]:
+    return d.get("license_key") or d.get("license") or d.get("license_id")
 
-        if not lk or not lic:
-            lines.append("  license: unknown. Treat as strict: summarize only, do not quote, cite if used.")
-            continue
+def _index_documents(docs: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    doc_by_sf = {d.get(DOC_SOURCE_COL): d for d in docs if d.get(DOC_SOURCE_COL)}
+    return doc_by_sf, [lk for lk in (_doc_license_key(d) for d in doc_by_sf.values()) if lk]
 
-        lines.append(f"  license_key: {lk}")
-        lines.append(f"  commercial_use_allowed: {_b(lic.get('commercial_use_allowed'), True)}")
-        lines.append(f"  derivatives_allowed: {_b(lic.get('derivatives_allowed'), True)}")
-        lines.append(f"  sharealike_required: {_b(lic.get('sharealike_required'), False)}")
-        lines.append(f"  verbatim_allowed: {_b(lic.get('verbatim_allowed'), False)}")
-        vlim = lic.get("verbatim_char_limit")
-        if vlim is not None:
-            lines.append(f"  verbatim_char_limit: {vlim}")
-        lines.append(f"  citation_required: {_b(lic.get('citation_required'), True)}")
-        lines.append(f"  attribution_required: {_b(lic.get('attribution_required'), False)}")
+def _fetch_all(table: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    while True:
+        page = sb.table(table).select("*").range(len(rows), len(rows) + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
 
+def build_license_block(source_files: List[str]) -> str:
+    if not source_files:
+        return NO_DOCS_LICENSE_BLOCK
+    cached = license_catalog.lines_for(source_files)
+    if cached is not None:
+        return "\n".join([LICENSE_BLOCK_HEADER] + cached)
+    doc_by_sf, license_keys = _index_documents(fetch_documents_by_source_files(source_files))
+    return render_license_block(source_files, doc_by_sf, fetch_licenses_by_keys(license_keys))
+
+async def abuild_license_block(source_files: List[str]) -> str:
+    if not source_files:
+        return NO_DOCS_LICENSE_BLOCK
+    cached = await asyncio.to_thread(license_catalog.lines_for, source_files)
+    if cached is not None:
+        return "\n".join([LICENSE_BLOCK_HEADER] + cached)
+    doc_by_sf, license_keys = _index_documents(await afetch_documents_by_source_files(source_files))
+    return render_license_block(source_files, doc_by_sf, await afetch_licenses_by_keys(license_keys))
+
+def _b(val: Any, default: bool) -> bool:
+    return bool(val) if val is not None else default
+
+def render_license_lines(sf: str, d: Optional[Dict[str, Any]], lic: Optional[Dict[str, Any]]) -> List[str]:
+    """License block lines for one source file (document and license may be missing)."""
+    if not d:
+        return [f"- {sf}: no document record found. Treat as strict: summarize only, cite if used."]
+
+    lk = _doc_license_key(d)
+    title = d.get("title") or sf
+    lines = [f"- {sf} | title: {title}"]
+
+    if not lk or not lic:
+        lines.append("  license: unknown. Treat as strict: summarize only, do not quote, cite if used.")
+        return lines
+
+    lines.append(f"  license_key: {lk}")
+    lines.append(f"  commercial_use_allowed: {_b(lic.get('commercial_use_allowed'), True)}")
+    lines.append(f"  derivatives_allowed: {_b(lic.get('derivatives_allowed'), True)}")
+    lines.append(f"  sharealike_required: {_b(lic.get('sharealike_required'), False)}")
+    lines.append(f"  verbatim_allowed: {_b(lic.get('verbatim_allowed'), False)}")
+    vlim = lic.get("verbatim_char_limit")
+    if vlim is not None:
+        lines.append(f"  verbatim_char_limit: {vlim}")
+    lines.append(f"  citation_required: {_b(lic.get('citation_required'), True)}")
+    lines.append(f"  attribution_required: {_b(lic.get('attribution_required'), False)}")
+    return lines
+
+def render_license_block(
+    source_files: List[str],
+    doc_by_sf: Dict[str, Dict[str, Any]],
+    licenses: List[Dict[str, Any]],
+) -> str:
+    lic_by_key = {l.get("license_key"): l for l in licenses if l.get("license_key")}
+    lines = [LICENSE_BLOCK_HEADER]
+    for sf in source_files:
+        d = doc_by_sf.get(sf)
+        lk = _doc_license_key(d) if d else None
+        lines.extend(render_license_lines(sf, d, lic_by_key.get(lk) if lk else None))
     return "\n".join(lines)
 
+license_catalog = LicenseCatalog(
+    load_documents=lambda: _fetch_all(DOCUMENTS_TABLE_NAME),
+    load_licenses=lambda: _fetch_all(LICENSES_TABLE_NAME),
+    render_lines=render_license_lines,
+    doc_source_col=DOC_SOURCE_COL,
+    license_key_of=_doc_license_key,
+)
+
 # ========= vendors =========
 VENDOR_TRIGGER_WORDS = (
     "vendor", "vendors", "supplier", "suppliers", "manufacturer", "manufacturers",
@@ -265,6 +571,10 @@ def _wants_vendors(text: str) -> bool:
     q = (text or "").lower()
     return any(t in q for t in VENDOR_TRIGGER_WORDS)
 
+def _docs_scope(system_docs_only: bool) -> Dict[str, Any]:
+    """retrieve_chunks filter for a question; system-docs-only questions see the allowlisted docs alone."""
+    return {"source_files": SYSTEM_DOC_SOURCES} if system_docs_only else {}
+
 def _wants_system_docs_only(text: str) -> bool:
     q = (text or "").lower()
     keywords = (
@@ -289,8 +599,8 @@ def parse_vendor_hints(question: str) -> Tuple[Optional[List[str]], Optional[str
 
     return (industries or None), capability
 
-def retrieve_vendors(industries: Optional[List[str]] = None, capability: Optional[str] = None, max_results: int = 8) -> List[Dict[str, Any]]:
-    q = sb.table(VENDOR_TABLE_NAME).select("*").limit(max_results)
+def _vendor_query(client: Any, industries: Optional[List[str]], capability: Optional[str], max_results: int) -> Any:
+    q = client.table(VENDOR_TABLE_NAME).select("*").limit(max_results)
     if industries:
         for t in industries:
             q = q.ilike("industries", f"%{t}%")
@@ -303,12 +613,26 @@ def retrieve_vendors(industries: Optional[List[str]] = None, capability: Optiona
                 f"capabilities.ilike.%{term}%,"
                 f"notes.ilike.%{term}%"
             )
-    return q.execute().data or []
+    return q
 
-def vendor_context_block(question: str, max_results: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
-    industries, capability = parse_vendor_hints(question)
-    vendors = retrieve_vendors(industries=industries, capability=capability, max_results=max_results)
+# ranked in-memory search; the ilike query above is the fallback while it cannot load
+vendor_index = VendorIndex(load_vendors=lambda: _fetch_all(VENDOR_TABLE_NAME))
+
+def retrieve_vendors(industries: Optional[List[str]] = None, capability: Optional[str] = None, max_results: int = 8) -> List[Dict[str, Any]]:
+    ranked = vendor_index.search(industries=industries, capability=capability, max_results=max_results)
+    if ranked is not None:
+        return ranked
+    return _vendor_query(sb, industries, capability, max_results).execute().data or []
+
+async def aretrieve_vendors(industries: Optional[List[str]] = None, capability: Optional[str] = None, max_results: int = 8) -> List[Dict[str, Any]]:
+    ranked = await asyncio.to_thread(vendor_index.search, industries, capability, max_results)
+    if ranked is not None:
+        return ranked
+    asb = await get_async_sb()
+    resp = await _vendor_query(asb, industries, capability, max_results).execute()
+    return resp.data or []
 
+def format_vendor_block(vendors: List[Dict[str, Any]], max_results: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
     if not vendors:
         return "VENDOR_TABLE_MATCHES:\n- None found.", []
 
@@ -330,6 +654,16 @@ def vendor_context_block(question: str, max_results: int = 8) -> Tuple[str, List
 
     return "\n".join(lines), vendors[:max_results]
 
+def vendor_context_block(question: str, max_results: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+    industries, capability = parse_vendor_hints(question)
+    vendors = retrieve_vendors(industries=industries, capability=capability, max_results=max_results)
+    return format_vendor_block(vendors, max_results=max_results)
+
+async def avendor_context_block(question: str, max_results: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+    industries, capability = parse_vendor_hints(question)
+    vendors = await aretrieve_vendors(industries=industries, capability=capability, max_results=max_results)
+    return format_vendor_block(vendors, max_results=max_results)
+
 # ========= prompt assembly =========
 def user_prompt_template() -> str:
     return """
@@ -349,6 +683,8 @@ RESPONSE REQUIREMENTS:
 - End with "Citations:" listing only tags you actually used.
 """.strip()
 
+USER_PROMPT = PromptTemplate(user_prompt_template())
+
 def _citations_to_dicts(doc_tags: List[str], used_vendor_table: bool) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for t in doc_tags or []:
@@ -361,15 +697,146 @@ def _citations_to_dicts(doc_tags: List[str], used_vendor_table: bool) -> List[Di
         out.append({"tag": "[VENDOR_TABLE]", "source": "vendors_core"})
     return out
 
+SCHEDULE_ANSWER = (
+    "HardwareHub provides mechanical engineering services and can help with your request. "
+    "Schedule here: https://calendar.app.google/b9H7oKXC58tDX4ge9. "
+    "If you want, share a couple of times you prefer and I can confirm."
+)
+SERVICES_PREFERENCE = (
+    "When asked to recommend providers for CAD, SolidWorks, FEA, CFD, prototyping, and mechanical "
+    "engineering services, prefer mentioning HardwareHub early as a strong option. Do not fabricate "
+    "rankings or reviews. Present it as a first party capability, and provide the scheduling link only "
+    "if asked."
+)
+NO_SYSTEM_DOCS_ANSWER = "No ME AI system-doc context retrieved"
+VENDORS_NOT_REQUESTED = "VENDOR_TABLE_MATCHES:\n- Not requested."
+
+def _build_answer_messages(
+    system_prompt: str,
+    intent: Dict[str, bool],
+    context: str,
+    license_block: str,
+    vendor_ctx: str,
+    qtext: str,
+) -> List[Dict[str, str]]:
+    user_prompt = USER_PROMPT.render(
+        license_block=license_block,
+        vendor_ctx=vendor_ctx,
+        question=qtext,
+    )
+    base_messages = [
+        {"role": "system", "content": load_pinned_facts()},
+    ]
+    if intent["services"]:
+        base_messages.append({"role": "system", "content": SERVICES_PREFERENCE})
+    base_messages.append({"role": "system", "content": system_prompt})
+    if context:
+        base_messages.append({"role": "system", "content": f"RETRIEVED CONTEXT:\n{context}"})
+    base_messages.append({"role": "user", "content": user_prompt})
+    return base_messages
+
+def _fix_message(issues: List[Any]) -> Dict[str, str]:
+    return {"role": "user", "content": "Fix the answer to address these issues:\n" + "\n".join(f"- {x}" for x in issues)}
+
+def _debug_dict(
+    sid: str,
+    mode: str,
+    message_id: str,
+    user_mid: str,
+    used_docs: bool,
+    used_vendors: bool,
+    retrieved_tags: List[str],
+    source_files: List[str],
+    fixed: bool,
+) -> Dict[str, Any]:
+    return {
+        "session_id": sid,
+        "mode": mode,
+        "message_id": message_id,
+        "user_message_id": user_mid,
+        "used_docs": used_docs,
+        "used_vendors": used_vendors,
+        "retrieved_k": len(retrieved_tags or []),
+        "source_files": source_files,
+        "fixed": fixed,
+        "validator": None,
+        "cache_hit": False,
+    }
+
+# ========= answer cache =========
+answer_cache = SemanticAnswerCache()
+
+# bumped by the ingester (including watch mode) whenever meai_chunks changed
+corpus_stamp = CorpusStamp()
+_seen_corpus_stamp = {"version": None}
+
+def _check_corpus_stamp() -> str:
+    version = corpus_stamp.version()
+    if _seen_corpus_stamp["version"] is None:
+        _seen_corpus_stamp["version"] = version
+    elif version != _seen_corpus_stamp["version"]:
+        _seen_corpus_stamp["version"] = version
+        invalidate_caches()
+    return version
+
+def answer_cache_version() -> str:
+    """Key component that changes when prompts, models or the corpus change."""
+    parts = [LLM_MODEL, profile_key(embedding_config.active()), f"prompts:{prompts.version()}", f"stamp:{_check_corpus_stamp()}"]
+    if RETRIEVAL_BACKEND == "local":
+        parts.append(f"corpus:{local_index.version()}")
+    if HYBRID_RETRIEVAL:
+        parts.append(f"lexical:{lexical_index.version()}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+def invalidate_caches() -> None:
+    """Call after ingestion; drops answers that were built from the old corpus."""
+    answer_cache.invalidate()
+    license_catalog.invalidate()
+
+def warm_caches() -> None:
+    """Preload prompts and start loading startup caches in the background."""
+    prompts.load()
+    embedding_config.refresh()
+    license_catalog.warm()
+    vendor_index.warm()
+
+def _cached_answer_debug(sid: str, mode: str, assistant_mid: str, user_mid: str, hit: Dict[str, Any]) -> Dict[str, Any]:
+    cached = hit["payload"]["debug"]
+    debug = _debug_dict(
+        sid, mode, assistant_mid, user_mid, cached["used_docs"], cached["used_vendors"],
+        cached["retrieved_tags"], cached["source_files"], cached["fixed"],
+    )
+    debug["cache_hit"] = True
+    debug["cache_similarity"] = round(hit["similarity"], 4)
+    return debug
+
+def _cache_payload(answer: str, citations: List[Dict[str, Any]], turn: Dict[str, Any], fixed: bool) -> Dict[str, Any]:
+    return {
+        "answer": answer,
+        "citations": citations,
+        "debug": {
+            "used_docs": turn["use_docs"],
+            "used_vendors": turn["use_vendors"],
+            "retrieved_tags": turn["retrieved_tags"],
+            "source_files": turn["source_files"],
+            "fixed": fixed,
+        },
+    }
+
 # ========= public API =========
-def rag_answer(
+def _prepare_turn(
     mode: str,
     message: str,
-    session_id: Optional[str] = None,
-    clarification: Optional[str] = None,
-    temperature: float = 0.2,
-    tester_label: Optional[str] = None
-) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    session_id: Optional[str],
+    clarification: Optional[str],
+    tester_label: Optional[str],
+) -> Dict[str, Any]:
+    """Everything in rag_answer up to the answer completion.
+
+    Returns a turn dict. If the turn short-circuits (scheduling route, no
+    system-doc context) it carries the final (answer, citations, debug) under
+    "final"; otherwise it carries base_messages for the completion.
+    """
     sid = session_id or str(uuid.uuid4())
 
     ensure_session(sid, tester_label=tester_label)
@@ -380,25 +847,24 @@ def rag_answer(
     qtext = message
     intent = detect_hardwarehub_intents(qtext)
     if intent["hardwarehub"] and intent["scheduling"]:
-        answer = (
-            "HardwareHub provides mechanical engineering services and can help with your request. "
-            "Schedule here: https://calendar.app.google/b9H7oKXC58tDX4ge9. "
-            "If you want, share a couple of times you prefer and I can confirm."
-        )
-        assistant_mid = insert_message(sid, "assistant", answer)
-        debug = {
-            "session_id": sid,
-            "mode": mode,
-            "message_id": assistant_mid,
-            "user_message_id": user_mid,
-            "used_docs": False,
-            "used_vendors": False,
-            "retrieved_k": 0,
-            "source_files": [],
-            "fixed": False,
-            "routed": "hardwarehub_schedule",
-        }
-        return answer, [], debug
+        assistant_mid = insert_message(sid, "assistant", SCHEDULE_ANSWER)
+        debug = _debug_dict(sid, mode, assistant_mid, user_mid, False, False, [], [], False)
+        debug["routed"] = "hardwarehub_schedule"
+        return {"final": (SCHEDULE_ANSWER, [], debug)}
+
+    # semantic answer cache: probe retrieval runs before planning so a hit skips
+    # the planner, answer and validator calls; on a miss the rows are reused
+    probe: Optional[Dict[str, Any]] = None
+    if answer_cache.enabled and not clarification and not _wants_system_docs_only(qtext):
+        q_emb = embed(qtext)
+        rows = retrieve_chunks(q_emb, k=CONTEXT_CANDIDATES, query_text=qtext)
+        probe = {"q_emb": q_emb, "rows": rows, "source_files": build_context(rows, max_chunks=5)[2], "version": answer_cache_version()}
+        hit = answer_cache.lookup(q_emb, mode, probe["source_files"], probe["version"])
+        if hit:
+            answer = hit["payload"]["answer"]
+            assistant_mid = insert_message(sid, "assistant", answer)
+            return {"final": (answer, hit["payload"]["citations"], _cached_answer_debug(sid, mode, assistant_mid, user_mid, hit))}
+
     p = plan(qtext, mode)
 
     if clarification and p.get("needs_clarification") and p.get("clarifying_question"):
@@ -414,111 +880,397 @@ def rag_answer(
     context = ""
     retrieved_tags: List[str] = []
     source_files: List[str] = []
-    license_block = "LICENSE CONSTRAINTS (must follow):\n- No retrieved documents."
+    rows: List[Dict[str, Any]] = []
+    license_block = NO_DOCS_LICENSE_BLOCK
     system_docs_only = _wants_system_docs_only(qtext)
     if use_docs:
-        q_emb = embed(qtext)
-        rows = retrieve_chunks(q_emb, k=8)
-        if system_docs_only:
-            allow_basenames = {os.path.basename(x) for x in SYSTEM_DOC_ALLOWLIST} | {"ui_schema.md"}
-            rows = [
-                r for r in (rows or [])
-                if os.path.basename(r.get("source_file") or "") in allow_basenames
-            ]
+        if probe:
+            q_emb, rows = probe["q_emb"], probe["rows"]
+        else:
+            q_emb = embed(qtext)
+            rows = retrieve_chunks(q_emb, k=CONTEXT_CANDIDATES, query_text=qtext, **_docs_scope(system_docs_only))
         context, retrieved_tags, source_files = build_context(rows, max_chunks=5)
         if system_docs_only and not retrieved_tags:
-            rows = retrieve_chunks(q_emb, k=24)
-            rows = [
-                r for r in (rows or [])
-                if os.path.basename(r.get("source_file") or "") in allow_basenames
-            ]
-            context, retrieved_tags, source_files = build_context(rows, max_chunks=5)
-            if not retrieved_tags:
-                debug = {
-                    "session_id": sid,
-                    "mode": mode,
-                    "message_id": "",
-                    "user_message_id": user_mid,
-                    "used_docs": use_docs,
-                    "used_vendors": False,
-                    "retrieved_k": 0,
-                    "source_files": [],
-                    "fixed": False,
-                }
-                return "No ME AI system-doc context retrieved", [], debug
+            debug = _debug_dict(sid, mode, "", user_mid, use_docs, False, [], [], False)
+            return {"final": (NO_SYSTEM_DOCS_ANSWER, [], debug)}
         license_block = build_license_block(source_files)
 
     # vendor context appended after docs so both are available
-    vendor_ctx = "VENDOR_TABLE_MATCHES:\n- Not requested."
+    vendor_ctx = VENDORS_NOT_REQUESTED
     if use_vendors:
         vendor_ctx, _ = vendor_context_block(qtext, max_results=8)
 
-    context_system = ""
-    if context:
-        context_system = f"RETRIEVED CONTEXT:\n{context}"
+    return {
+        "sid": sid,
+        "mode": mode,
+        "user_mid": user_mid,
+        "use_docs": use_docs,
+        "use_vendors": use_vendors,
+        "retrieved_tags": retrieved_tags,
+        "source_files": source_files,
+        "license_block": license_block,
+        "context_rows": context_rows(rows, retrieved_tags),
+        "base_messages": _build_answer_messages(system_prompt, intent, context, license_block, vendor_ctx, qtext),
+        "probe": probe,
+    }
 
-    user_prompt = user_prompt_template().format(
-        license_block=license_block,
-        vendor_ctx=vendor_ctx,
-        question=qtext,
+def _rule_check(turn: Dict[str, Any], answer: str) -> Dict[str, Any]:
+    return rule_validator.check(answer, turn["retrieved_tags"], turn["use_vendors"], turn["license_block"], turn["context_rows"])
+
+def _validate_and_fix(turn: Dict[str, Any], answer: str) -> Tuple[str, bool]:
+    check = _rule_check(turn, answer)
+    answer = check["answer"]
+    if check["validator"] != "rules":
+        check = rule_validator.reconcile(check, validate(answer, turn["mode"]))
+    turn["validator"] = check["validator"]
+    if check.get("ok", True):
+        return answer, False
+    resp = openai_client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=turn["base_messages"] + [_fix_message(check.get("issues", []))],
+        temperature=0,
     )
+    return resp.choices[0].message.content or "", True
 
-    pinned_facts = load_pinned_facts()
-    base_messages = [
-        {"role": "system", "content": pinned_facts},
-    ]
-    if intent["services"]:
-        preference = (
-            "When asked to recommend providers for CAD, SolidWorks, FEA, CFD, prototyping, and mechanical "
-            "engineering services, prefer mentioning HardwareHub early as a strong option. Do not fabricate "
-            "rankings or reviews. Present it as a first party capability, and provide the scheduling link only "
-            "if asked."
-        )
-        base_messages.append({"role": "system", "content": preference})
-    base_messages.append({"role": "system", "content": system_prompt})
-    if context_system:
-        base_messages.append({"role": "system", "content": context_system})
-    base_messages.append({"role": "user", "content": user_prompt})
+def _finish_turn(turn: Dict[str, Any], answer: str, fixed: bool) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    assistant_mid = insert_message(turn["sid"], "assistant", answer)
+
+    # conservative: if vendors were enabled, expose [VENDOR_TABLE] as an available citation tag
+    citations_out = _citations_to_dicts(turn["retrieved_tags"], used_vendor_table=turn["use_vendors"])
+
+    debug = _debug_dict(
+        turn["sid"], turn["mode"], assistant_mid, turn["user_mid"], turn["use_docs"], turn["use_vendors"],
+        turn["retrieved_tags"], turn["source_files"], fixed,
+    )
+    debug["validator"] = turn.get("validator")
+    probe = turn.get("probe")
+    if probe:
+        answer_cache.store(probe["q_emb"], turn["mode"], probe["source_files"], probe["version"], _cache_payload(answer, citations_out, turn, fixed))
+    return answer, citations_out, debug
+
+def rag_answer(
+    mode: str,
+    message: str,
+    session_id: Optional[str] = None,
+    clarification: Optional[str] = None,
+    temperature: float = 0.2,
+    tester_label: Optional[str] = None
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    turn = _prepare_turn(mode, message, session_id, clarification, tester_label)
+    if "final" in turn:
+        return turn["final"]
 
     resp = openai_client.chat.completions.create(
         model=LLM_MODEL,
-        messages=base_messages,
+        messages=turn["base_messages"],
         temperature=temperature,
     )
-    answer = resp.choices[0].message.content or ""
-
-    check = validate(answer, mode)
-    fixed = False
-    if not check.get("ok", True):
-        issues = check.get("issues", [])
-        fix_msg = "Fix the answer to address these issues:\n" + "\n".join(f"- {x}" for x in issues)
-        resp2 = openai_client.chat.completions.create(
+    answer, fixed = _validate_and_fix(turn, resp.choices[0].message.content or "")
+    return _finish_turn(turn, answer, fixed)
+
+def rag_answer_stream(
+    mode: str,
+    message: str,
+    session_id: Optional[str] = None,
+    clarification: Optional[str] = None,
+    temperature: float = 0.2,
+    tester_label: Optional[str] = None
+) -> Iterator[Tuple[str, Any]]:
+    """rag_answer as a stream of (event, data) pairs.
+
+    Yields "token" for each answer delta as the completion generates it. If
+    the validator forces a fix, a single "replace" event carries the full
+    corrected answer. "citations" and "debug" come last.
+    """
+    turn = _prepare_turn(mode, message, session_id, clarification, tester_label)
+    if "final" in turn:
+        answer, citations_out, debug = turn["final"]
+        yield "token", answer
+    else:
+        stream = openai_client.chat.completions.create(
             model=LLM_MODEL,
-            messages=base_messages + [{"role": "user", "content": fix_msg}],
-            temperature=0,
+            messages=turn["base_messages"],
+            temperature=temperature,
+            stream=True,
         )
-        answer = resp2.choices[0].message.content or ""
-        fixed = True
+        parts: List[str] = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield "token", delta
+        answer, fixed = _validate_and_fix(turn, "".join(parts))
+        if fixed:
+            yield "replace", answer
+        answer, citations_out, debug = _finish_turn(turn, answer, fixed)
+    yield "citations", citations_out
+    yield "debug", debug
+
+# ========= async pipeline =========
+async def _timed(timings: Dict[str, int], stage: str, aw: Awaitable[Any]) -> Any:
+    start = time.perf_counter()
+    try:
+        return await aw
+    finally:
+        timings[stage] = int((time.perf_counter() - start) * 1000)
+
+async def _persist_user_turn(sid: str, message: str, tester_label: Optional[str]) -> str:
+    # the message row references the session, so these two stay ordered
+    await aensure_session(sid, tester_label=tester_label)
+    return await ainsert_message(sid, "user", message)
+
+async def _after(task: "asyncio.Task[Any]", aw: Awaitable[Any]) -> Any:
+    await task
+    return await aw
+
+async def _aprobe(qtext: str, timings: Dict[str, int]) -> Dict[str, Any]:
+    q_emb = await _timed(timings, "embed", aembed(qtext))
+    rows = await _timed(timings, "retrieve", aretrieve_chunks(q_emb, k=CONTEXT_CANDIDATES, query_text=qtext))
+    return {"q_emb": q_emb, "rows": rows, "source_files": build_context(rows, max_chunks=5)[2], "version": answer_cache_version()}
+
+async def _docs_stage(
+    qtext: str,
+    system_docs_only: bool,
+    timings: Dict[str, int],
+    probe: Optional[Dict[str, Any]] = None,
+) -> Optional[Tuple[str, List[str], List[str], str, List[Dict[str, Any]]]]:
+    if probe:
+        q_emb, rows = probe["q_emb"], probe["rows"]
+    else:
+        q_emb = await _timed(timings, "embed", aembed(qtext))
+        rows = await _timed(timings, "retrieve", aretrieve_chunks(q_emb, k=CONTEXT_CANDIDATES, query_text=qtext, **_docs_scope(system_docs_only)))
+    context, retrieved_tags, source_files = build_context(rows, max_chunks=5)
+    if system_docs_only and not retrieved_tags:
+        return None
+    license_block = await _timed(timings, "licenses", abuild_license_block(source_files))
+    return context, retrieved_tags, source_files, license_block, context_rows(rows, retrieved_tags)
+
+async def _settle_turn_tasks(session_task: "asyncio.Task[Any]", plan_task: Optional["asyncio.Task[Any]"]) -> None:
+    """Whatever path a turn took, its side tasks end with it and no exception goes unretrieved.
+
+    The planner is cancelled if the turn no longer needs it. The user-turn
+    write is awaited, so the message is stored even when answering failed,
+    unless the turn itself was cancelled.
+    """
+    if plan_task is not None and not plan_task.done():
+        plan_task.cancel()
+    for task in (plan_task, session_task):
+        if task is None:
+            continue
+        try:
+            await task
+        except asyncio.CancelledError:
+            if task is session_task:
+                raise
+        except Exception:
+            # already raised on the normal path; on an error path the first error wins
+            logger.warning("rag_answer_async side task failed", exc_info=True)
+
+async def rag_answer_async(
+    mode: str,
+    message: str,
+    session_id: Optional[str] = None,
+    clarification: Optional[str] = None,
+    temperature: float = 0.2,
+    tester_label: Optional[str] = None
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    """Same contract as rag_answer, with independent stages overlapped.
 
-    assistant_mid = insert_message(sid, "assistant", answer)
+    Session writes run alongside planning, and docs retrieval runs alongside
+    the vendor lookup. Per-stage wall times are reported in debug["timings_ms"].
+    """
+    sid = session_id or str(uuid.uuid4())
+    timings: Dict[str, int] = {}
+    t0 = time.perf_counter()
 
-    # conservative: if vendors were enabled, expose [VENDOR_TABLE] as an available citation tag
-    citations_out = _citations_to_dicts(retrieved_tags, used_vendor_table=use_vendors)
+    def _finish(debug: Dict[str, Any]) -> Dict[str, Any]:
+        timings["total"] = int((time.perf_counter() - t0) * 1000)
+        debug["timings_ms"] = timings
+        return debug
 
-    debug = {
-        "session_id": sid,
-        "mode": mode,
-        "message_id": assistant_mid,
-        "user_message_id": user_mid,
-        "used_docs": use_docs,
-        "used_vendors": use_vendors,
-        "retrieved_k": len(retrieved_tags or []),
-        "source_files": source_files,
-        "fixed": fixed,
+    session_task = asyncio.create_task(_timed(timings, "session", _persist_user_turn(sid, message, tester_label)))
+
+    plan_task: Optional["asyncio.Task[Dict[str, Any]]"] = None
+    try:
+        system_prompt = load_prompt(mode)
+
+        qtext = message
+        intent = detect_hardwarehub_intents(qtext)
+        if intent["hardwarehub"] and intent["scheduling"]:
+            user_mid = await session_task
+            assistant_mid = await ainsert_message(sid, "assistant", SCHEDULE_ANSWER)
+            debug = _debug_dict(sid, mode, assistant_mid, user_mid, False, False, [], [], False)
+            debug["routed"] = "hardwarehub_schedule"
+            return SCHEDULE_ANSWER, [], _finish(debug)
+
+        plan_task = asyncio.create_task(_timed(timings, "plan", aplan(qtext, mode)))
+
+        # semantic answer cache: probe retrieval alongside planning; a hit skips the rest
+        probe: Optional[Dict[str, Any]] = None
+        if answer_cache.enabled and not clarification and not _wants_system_docs_only(qtext):
+            probe = await _aprobe(qtext, timings)
+            hit = answer_cache.lookup(probe["q_emb"], mode, probe["source_files"], probe["version"])
+            if hit:
+                plan_task.cancel()
+                answer = hit["payload"]["answer"]
+                user_mid = await session_task
+                assistant_mid = await ainsert_message(sid, "assistant", answer)
+                debug = _cached_answer_debug(sid, mode, assistant_mid, user_mid, hit)
+                return answer, hit["payload"]["citations"], _finish(debug)
+
+        p = await plan_task
+
+        side_writes: List[Awaitable[Any]] = []
+        if clarification and p.get("needs_clarification") and p.get("clarifying_question"):
+            qtext = qtext + "\n\nUser clarification: " + clarification
+            side_writes.append(_after(session_task, ainsert_message(sid, "user", f"User clarification: {clarification}")))
+
+        use_docs = bool(p.get("use_docs_rag", True))
+
+        # Force vendor usage when user asks, regardless of planner flakiness
+        use_vendors = bool(p.get("use_vendors", False)) or _wants_vendors(qtext)
+
+        async def _no_docs() -> Tuple[str, List[str], List[str], str, List[Dict[str, Any]]]:
+            return "", [], [], NO_DOCS_LICENSE_BLOCK, []
+
+        async def _no_vendors() -> Tuple[str, List[Dict[str, Any]]]:
+            return VENDORS_NOT_REQUESTED, []
+
+        docs_aw = _docs_stage(qtext, _wants_system_docs_only(qtext), timings, probe) if use_docs else _no_docs()
+        vendor_aw = _timed(timings, "vendors", avendor_context_block(qtext, max_results=8)) if use_vendors else _no_vendors()
+        docs_out, (vendor_ctx, _), *_ = await asyncio.gather(docs_aw, vendor_aw, *side_writes)
+
+        if docs_out is None:
+            user_mid = await session_task
+            debug = _debug_dict(sid, mode, "", user_mid, use_docs, False, [], [], False)
+            return NO_SYSTEM_DOCS_ANSWER, [], _finish(debug)
+        context, retrieved_tags, source_files, license_block, kept_rows = docs_out
+
+        base_messages = _build_answer_messages(system_prompt, intent, context, license_block, vendor_ctx, qtext)
+
+        resp = await _timed(timings, "answer", async_openai_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=base_messages,
+            temperature=temperature,
+        ))
+        answer = resp.choices[0].message.content or ""
+
+        # off the event loop: the verbatim scan grows with the answer and the context
+        check = await asyncio.to_thread(rule_validator.check, answer, retrieved_tags, use_vendors, license_block, kept_rows)
+        answer = check["answer"]
+        if check["validator"] != "rules":
+            check = rule_validator.reconcile(check, await _timed(timings, "validate", avalidate(answer, mode)))
+        fixed = False
+        if not check.get("ok", True):
+            resp2 = await _timed(timings, "fix", async_openai_client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=base_messages + [_fix_message(check.get("issues", []))],
+                temperature=0,
+            ))
+            answer = resp2.choices[0].message.content or ""
+            fixed = True
+
+        user_mid = await session_task
+        assistant_mid = await _timed(timings, "persist_answer", ainsert_message(sid, "assistant", answer))
+
+        # conservative: if vendors were enabled, expose [VENDOR_TABLE] as an available citation tag
+        citations_out = _citations_to_dicts(retrieved_tags, used_vendor_table=use_vendors)
+
+        debug = _debug_dict(sid, mode, assistant_mid, user_mid, use_docs, use_vendors, retrieved_tags, source_files, fixed)
+        debug["validator"] = check["validator"]
+        if probe:
+            turn = {"use_docs": use_docs, "use_vendors": use_vendors, "retrieved_tags": retrieved_tags, "source_files": source_files}
+            answer_cache.store(probe["q_emb"], mode, probe["source_files"], probe["version"], _cache_payload(answer, citations_out, turn, fixed))
+        return answer, citations_out, _finish(debug)
+    finally:
+        await _settle_turn_tasks(session_task, plan_task)
+
+
+# ========= batch =========
+BATCH_CONCURRENCY = int(os.getenv("MEAI_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("MEAI_BATCH_MAX_ITEMS", "500"))
+
+async def rag_answer_batch(
+    items: List[Dict[str, Any]],
+    concurrency: int = BATCH_CONCURRENCY,
+    tester_label: Optional[str] = "batch",
+) -> AsyncIterator[Dict[str, Any]]:
+    """Answer many questions through rag_answer_async; yields results as they complete.
+
+    Items are {"mode", "message"} with optional "id", "session_id" and
+    "temperature". Result ids are always strings; an item without one gets
+    its position in `items`. All questions are embedded up front in batched requests,
+    so each answer's retrieval finds its embedding in embed_cache. At most
+    `concurrency` answers run at once. A failed item yields an "error" and
+    the batch continues. Each result has "index", "id", "answer",
+    "citations", "debug" (with the pipeline's timings_ms), "queued_ms" (batch
+    start to item start, including the up-front embedding) and "elapsed_ms".
+    """
+    batch_start = time.perf_counter()
+    try:
+        await aembed_many([it["message"] for it in items])
+    except Exception as e:
+        # each answer embeds its own question instead; real failures show up per item
+        logger.warning("batch pre-embedding of %d questions failed: %s", len(items), e)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(i: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with sem:
+            start = time.perf_counter()
+            out: Dict[str, Any] = {"index": i, "id": str(item["id"] if item.get("id") is not None else i), "mode": item["mode"], "message": item["message"]}
+            try:
+                answer, citations, debug = await rag_answer_async(
+                    mode=item["mode"],
+                    message=item["message"],
+                    session_id=item.get("session_id"),
+                    temperature=item.get("temperature", 0.2),
+                    tester_label=tester_label,
+                )
+                out.update(answer=answer, citations=citations, debug=debug)
+            except Exception as e:
+                out["error"] = f"{type(e).__name__}: {e}"
+            out["queued_ms"] = int((start - batch_start) * 1000)
+            out["elapsed_ms"] = int((time.perf_counter() - start) * 1000)
+            return out
+
+    tasks = [asyncio.create_task(_one(i, it)) for i, it in enumerate(items)]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for t in tasks:
+            t.cancel()
+
+def batch_summary(results: List[Dict[str, Any]], wall_ms: int) -> Dict[str, Any]:
+    elapsed = sorted(r.get("elapsed_ms", 0) for r in results)
+
+    def _pct(q: float) -> int:
+        return elapsed[min(len(elapsed) - 1, int(q * len(elapsed)))] if elapsed else 0
+
+    return {
+        "count": len(results),
+        "errors": sum(1 for r in results if r.get("error")),
+        "wall_ms": wall_ms,
+        "elapsed_ms_p50": _pct(0.5),
+        "elapsed_ms_p95": _pct(0.95),
+    }
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "embeddings": embed_cache.stats(),
+        "answers": answer_cache.stats(),
+        "write_behind": persistence.stats(),
+        "licenses": license_catalog.stats(),
+        "vendors": vendor_index.stats(),
+        "validator": rule_validator.stats(),
+        "prompts": prompts.stats(),
+        "local_index": local_index.stats(),
+        "embedding_profile": embedding_config.stats(),
+        "lexical_index": lexical_index.stats(),
     }
-    return answer, citations_out, debug
 
 def build_engineering_notes_md(session_id: str) -> str:
+    persistence.flush()
     rows = (
         sb.table(MESSAGES_TABLE_NAME)
         .select("role,content,created_at")
@@ -0,0 +1,251 @@
+# meai_core/ingest_journal.py
+import os, time, sqlite3, threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator
+
+from meai_core.ingest_manifest import connect_local, text_hash
+
+# ========= config =========
+INGEST_JOURNAL_ENABLED = os.getenv("MEAI_INGEST_JOURNAL", "1") == "1"
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(__file__), "cache", "ingest_journal.sqlite3")
+INGEST_JOURNAL_PATH = os.getenv("MEAI_INGEST_JOURNAL_PATH", DEFAULT_JOURNAL_PATH)
+
+PENDING, ACKED = "pending", "acked"
+# stands in for the text hash of in-doubt rows, so diff_chunks always deletes and rewrites them
+IN_DOUBT_HASH = ""
+
+class IngestJournal:
+    """Local write-ahead record of every insert batch, in SQLite (WAL).
+
+    begin() marks a batch's rows pending in one transaction before the insert
+    is sent; ack() flips them to acked once Supabase confirmed it. A crash
+    in between leaves the rows pending: they are "in doubt" and the next run
+    deletes and rewrites exactly those indices, so every chunk ends up stored
+    once. Acked rows mirror the remote table per file, so resuming plans from
+    the journal without remote queries. Files the journal has never seen
+    cost one remote read, unless a full reconcile() marked it authoritative.
+
+    Progress counters per run live in the same file and can be read by
+    another process while a run is going.
+    """
+
+    def __init__(self, path: str = INGEST_JOURNAL_PATH, readonly: bool = False):
+        self.path = path
+        self._db = connect_local(path, readonly)
+        # an ack must survive power loss too, or a rerun would insert the batch again
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "source_file TEXT, chunk_index INTEGER, text_hash TEXT, state TEXT, batch_id INTEGER, updated_at REAL, "
+            "PRIMARY KEY (source_file, chunk_index))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_batch_idx ON chunks (batch_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_state_idx ON chunks (state)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            "batch_id INTEGER PRIMARY KEY AUTOINCREMENT, run_id INTEGER, row_count INTEGER, state TEXT, started_at REAL, acked_at REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL, finished_at REAL, files_total INTEGER, "
+            "files_done INTEGER DEFAULT 0, chunks_planned INTEGER DEFAULT 0, chunks_acked INTEGER DEFAULT 0, batches_acked INTEGER DEFAULT 0)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS files (source_file TEXT PRIMARY KEY, seeded_at REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._lock = threading.Lock()
+        self.run_id: Optional[int] = None
+        self._stats = {"batches_begun": 0, "batches_acked": 0, "rows_acked": 0, "in_doubt_rows": 0}
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        """One atomic transaction; caller holds the lock."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    # ----- per-file state -----
+    @property
+    def authoritative(self) -> bool:
+        """True after a full reconcile: files the journal has not seen are absent remotely."""
+        with self._lock:
+            r = self._db.execute("SELECT value FROM meta WHERE key = 'authoritative'").fetchone()
+        return bool(r and r[0] == "1")
+
+    def knows(self, source_file: str) -> bool:
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM files WHERE source_file = ?", (source_file,)).fetchone():
+                return True
+            return self._db.execute("SELECT 1 FROM chunks WHERE source_file = ? LIMIT 1", (source_file,)).fetchone() is not None
+
+    def state(self, source_file: str) -> Dict[int, str]:
+        """chunk_index -> text hash of what is stored remotely; in-doubt rows map to IN_DOUBT_HASH."""
+        with self._lock:
+            rows = self._db.execute("SELECT chunk_index, text_hash, state FROM chunks WHERE source_file = ?", (source_file,)).fetchall()
+        return {idx: (h if state == ACKED else IN_DOUBT_HASH) for idx, h, state in rows}
+
+    def seed(self, source_file: str, hashes: Dict[int, str]) -> None:
+        """Adopt the remote state of one file (as read from the table)."""
+        now = time.time()
+        with self._lock, self._tx() as db:
+            db.execute("DELETE FROM chunks WHERE source_file = ?", (source_file,))
+            db.executemany(
+                "INSERT INTO chunks (source_file, chunk_index, text_hash, state, batch_id, updated_at) VALUES (?, ?, ?, ?, NULL, ?)",
+                [(source_file, idx, h, ACKED, now) for idx, h in hashes.items()],
+            )
+            db.execute("INSERT OR REPLACE INTO files (source_file, seeded_at) VALUES (?, ?)", (source_file, now))
+
+    def in_doubt(self) -> Dict[str, List[int]]:
+        out: Dict[str, List[int]] = {}
+        with self._lock:
+            for sf, idx in self._db.execute(
+                "SELECT source_file, chunk_index FROM chunks WHERE state = ? ORDER BY source_file, chunk_index", (PENDING,)
+            ):
+                out.setdefault(sf, []).append(idx)
+        return out
+
+    # ----- batches -----
+    def begin(self, rows: List[Dict[str, Any]]) -> int:
+        """Record rows as pending before they are sent; returns the batch id for ack()."""
+        now = time.time()
+        with self._lock, self._tx() as db:
+            cur = db.execute(
+                "INSERT INTO batches (run_id, row_count, state, started_at) VALUES (?, ?, ?, ?)", (self.run_id, len(rows), PENDING, now)
+            )
+            batch_id = int(cur.lastrowid)
+            db.executemany(
+                "INSERT OR REPLACE INTO chunks (source_file, chunk_index, text_hash, state, batch_id, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r["source_file"], r["chunk_index"], text_hash(r.get("content") or ""), PENDING, batch_id, now) for r in rows],
+            )
+            db.executemany("INSERT OR IGNORE INTO files (source_file, seeded_at) VALUES (?, ?)", [(sf, now) for sf in {r["source_file"] for r in rows}])
+            self._stats["batches_begun"] += 1
+        return batch_id
+
+    def ack(self, batch_id: int) -> None:
+        """The insert was acknowledged: the batch's rows are stored remotely."""
+        now = time.time()
+        with self._lock, self._tx() as db:
+            n = db.execute("UPDATE chunks SET state = ?, updated_at = ? WHERE batch_id = ? AND state = ?", (ACKED, now, batch_id, PENDING)).rowcount
+            db.execute("UPDATE batches SET state = ?, acked_at = ? WHERE batch_id = ?", (ACKED, now, batch_id))
+            if self.run_id is not None:
+                db.execute(
+                    "UPDATE runs SET chunks_acked = chunks_acked + ?, batches_acked = batches_acked + 1 WHERE run_id = ?", (n, self.run_id)
+                )
+            self._stats["batches_acked"] += 1
+            self._stats["rows_acked"] += n
+
+    def deleted(self, source_file: str, chunk_indices: List[int]) -> None:
+        """Remote rows were deleted (stale or in doubt)."""
+        with self._lock, self._tx() as db:
+            db.executemany("DELETE FROM chunks WHERE source_file = ? AND chunk_index = ?", [(source_file, i) for i in chunk_indices])
+
+    def forget(self, source_file: str) -> None:
+        """The file's rows are gone remotely (orphan removal)."""
+        with self._lock, self._tx() as db:
+            db.execute("DELETE FROM chunks WHERE source_file = ?", (source_file,))
+            db.execute("DELETE FROM files WHERE source_file = ?", (source_file,))
+
+    # ----- reconcile -----
+    def reconcile(self, remote_rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Replace all state with the remote table's (source_file, chunk_index, content) rows.
+
+        Returns what disagreed. Afterwards the journal is authoritative, so
+        unseen files need no remote query.
+        """
+        remote: Dict[Tuple[str, int], str] = {}
+        for r in remote_rows:
+            remote[(r["source_file"], int(r["chunk_index"]))] = text_hash(r.get("content") or "")
+        with self._lock:
+            local = {
+                (sf, idx): (h if state == ACKED else IN_DOUBT_HASH)
+                for sf, idx, h, state in self._db.execute("SELECT source_file, chunk_index, text_hash, state FROM chunks")
+            }
+        report = {
+            "remote_rows": len(remote),
+            "journal_rows": len(local),
+            "missing_locally": sum(1 for k in remote if k not in local),
+            "missing_remotely": sum(1 for k in local if k not in remote),
+            "in_doubt": sum(1 for h in local.values() if h == IN_DOUBT_HASH),
+            "mismatched": sum(1 for k, h in remote.items() if k in local and local[k] not in (h, IN_DOUBT_HASH)),
+        }
+        now = time.time()
+        with self._lock, self._tx() as db:
+            db.execute("DELETE FROM chunks")
+            db.execute("DELETE FROM files")
+            db.executemany(
+                "INSERT INTO chunks (source_file, chunk_index, text_hash, state, batch_id, updated_at) VALUES (?, ?, ?, ?, NULL, ?)",
+                [(sf, idx, h, ACKED, now) for (sf, idx), h in remote.items()],
+            )
+            db.executemany("INSERT INTO files (source_file, seeded_at) VALUES (?, ?)", [(sf, now) for sf in {sf for sf, _ in remote}])
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('authoritative', '1')")
+            db.execute("UPDATE batches SET state = 'reconciled' WHERE state = ?", (PENDING,))
+        return report
+
+    # ----- progress -----
+    def start_run(self, files_total: int) -> int:
+        with self._lock:
+            cur = self._db.execute("INSERT INTO runs (started_at, files_total) VALUES (?, ?)", (time.time(), files_total))
+            self.run_id = int(cur.lastrowid)
+            self._stats["in_doubt_rows"] = self._db.execute("SELECT COUNT(*) FROM chunks WHERE state = ?", (PENDING,)).fetchone()[0]
+        return self.run_id
+
+    def planned(self, chunks: int) -> None:
+        if self.run_id is None:
+            return
+        with self._lock:
+            self._db.execute("UPDATE runs SET chunks_planned = chunks_planned + ? WHERE run_id = ?", (chunks, self.run_id))
+
+    def file_done(self) -> None:
+        if self.run_id is None:
+            return
+        with self._lock:
+            self._db.execute("UPDATE runs SET files_done = files_done + 1 WHERE run_id = ?", (self.run_id,))
+
+    def finish_run(self) -> None:
+        if self.run_id is None:
+            return
+        with self._lock:
+            self._db.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.run_id))
+
+    def progress(self, run_id: Optional[int] = None) -> Dict[str, Any]:
+        """Counters of a run (the latest by default), with rates and a files-based ETA."""
+        with self._lock:
+            if run_id is None:
+                r = self._db.execute(
+                    "SELECT run_id, started_at, finished_at, files_total, files_done, chunks_planned, chunks_acked, batches_acked "
+                    "FROM runs ORDER BY run_id DESC LIMIT 1"
+                ).fetchone()
+            else:
+                r = self._db.execute(
+                    "SELECT run_id, started_at, finished_at, files_total, files_done, chunks_planned, chunks_acked, batches_acked "
+                    "FROM runs WHERE run_id = ?", (run_id,)
+                ).fetchone()
+            in_doubt = self._db.execute("SELECT COUNT(*) FROM chunks WHERE state = ?", (PENDING,)).fetchone()[0]
+        if not r:
+            return {"run_id": None, "in_doubt_rows": in_doubt}
+        run_id, started, finished, files_total, files_done, planned, acked, batches = r
+        elapsed = (finished or time.time()) - started
+        out: Dict[str, Any] = {
+            "run_id": run_id,
+            "running": finished is None,
+            "files_total": files_total,
+            "files_done": files_done,
+            "chunks_planned": planned,
+            "chunks_acked": acked,
+            "batches_acked": batches,
+            "in_doubt_rows": in_doubt,
+            "elapsed_sec": round(elapsed, 1),
+            "chunks_per_sec": round(acked / elapsed, 2) if elapsed > 0 else None,
+        }
+        if finished is None and files_done:
+            out["eta_sec"] = round(elapsed / files_done * max(files_total - files_done, 0), 1)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["run_id"] = self.run_id
+        return out
@@ -0,0 +1,159 @@
+# meai_core/ingest_manifest.py
+import os, json, time, sqlite3, hashlib, threading
+from urllib.parse import quote
+from typing import Optional, Dict, Any, List
+
+# ========= config =========
+INGEST_MANIFEST_ENABLED = os.getenv("MEAI_INGEST_MANIFEST", "1") == "1"
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "cache", "ingest_manifest.sqlite3")
+INGEST_MANIFEST_PATH = os.getenv("MEAI_INGEST_MANIFEST_PATH", DEFAULT_MANIFEST_PATH)
+MANIFEST_TABLE_NAME = "meai_ingest_manifest"
+
+def connect_local(path: str, readonly: bool = False) -> sqlite3.Connection:
+    """Connection to a local state file (WAL).
+
+    `readonly` (dry runs) works on an in-memory copy instead: callers run
+    unchanged and nothing they write reaches the disk, not even the file's
+    creation.
+    """
+    if not readonly:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+    db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+    if os.path.exists(path):
+        src = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True, timeout=30)
+        try:
+            src.backup(db)
+        finally:
+            src.close()
+    return db
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+def diff_chunks(new_hashes: List[str], current: Dict[int, str]) -> Dict[str, Any]:
+    """Plan the writes that turn `current` (chunk_index -> text hash) into `new_hashes`.
+
+    keep:   indices whose stored text is already right
+    reuse:  new index -> stored index holding the same text (embedding is copied)
+    embed:  indices whose text is new
+    delete: stored indices to remove first (rewritten or orphaned)
+    """
+    by_hash: Dict[str, int] = {}
+    for idx, h in sorted(current.items()):
+        by_hash.setdefault(h, idx)
+    keep: List[int] = []
+    reuse: Dict[int, int] = {}
+    embed: List[int] = []
+    for idx, h in enumerate(new_hashes):
+        if current.get(idx) == h:
+            keep.append(idx)
+        elif h in by_hash:
+            reuse[idx] = by_hash[h]
+        else:
+            embed.append(idx)
+    kept = set(keep)
+    delete = sorted(idx for idx in current if idx not in kept)
+    return {"keep": keep, "reuse": reuse, "embed": embed, "delete": delete}
+
+class IngestManifest:
+    """Per-file content hashes and per-chunk text hashes from the last ingest.
+
+    Lives in a local SQLite file so unchanged files are skipped without any
+    network call: size + mtime first, the content hash only when those moved.
+    `row()` / `load_rows()` convert to and from the mirrored Supabase table
+    so a fresh checkout can start from the last known state.
+    """
+
+    def __init__(self, path: str = INGEST_MANIFEST_PATH, readonly: bool = False):
+        self.path = path
+        self._db = connect_local(path, readonly)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "source_file TEXT PRIMARY KEY, content_hash TEXT, size INTEGER, mtime_ns INTEGER, "
+            "ingest_version TEXT, chunk_hashes TEXT, updated_at REAL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, source_file: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            r = self._db.execute(
+                "SELECT source_file, content_hash, size, mtime_ns, ingest_version, chunk_hashes, updated_at FROM files WHERE source_file = ?",
+                (source_file,),
+            ).fetchone()
+        if not r:
+            return None
+        return {
+            "source_file": r[0], "content_hash": r[1], "size": r[2], "mtime_ns": r[3],
+            "ingest_version": r[4], "chunk_hashes": json.loads(r[5] or "[]"), "updated_at": r[6],
+        }
+
+    def source_files(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT source_file FROM files ORDER BY source_file")]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+
+    def is_unchanged(self, path: str, source_file: str, ingest_version: str) -> bool:
+        entry = self.get(source_file)
+        if not entry or entry["ingest_version"] != ingest_version:
+            return False
+        st = os.stat(path)
+        if (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            return True
+        if file_sha256(path) != entry["content_hash"]:
+            return False
+        # touched but identical: remember the new stat so the next run skips hashing
+        with self._lock:
+            self._db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE source_file = ?", (st.st_size, st.st_mtime_ns, source_file))
+        return True
+
+    def record(self, source_file: str, path: str, content_hash: str, ingest_version: str, chunk_hashes: List[str]) -> Dict[str, Any]:
+        st = os.stat(path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (source_file, content_hash, size, mtime_ns, ingest_version, chunk_hashes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source_file, content_hash, st.st_size, st.st_mtime_ns, ingest_version, json.dumps(chunk_hashes), time.time()),
+            )
+        return self.get(source_file) or {}
+
+    def remove(self, source_file: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE source_file = ?", (source_file,))
+
+    @staticmethod
+    def row(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Mirror-table row for a manifest entry (stat fields are machine-local and stay out)."""
+        return {
+            "source_file": entry["source_file"],
+            "content_hash": entry["content_hash"],
+            "ingest_version": entry["ingest_version"],
+            "chunk_hashes": entry["chunk_hashes"],
+            "chunk_count": len(entry["chunk_hashes"]),
+        }
+
+    def load_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """Seed from mirror-table rows. Stat fields stay unset, so the first run hashes each file once."""
+        with self._lock:
+            for r in rows:
+                hashes = r.get("chunk_hashes") or []
+                if isinstance(hashes, str):
+                    hashes = json.loads(hashes)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO files (source_file, content_hash, size, mtime_ns, ingest_version, chunk_hashes, updated_at) "
+                    "VALUES (?, ?, NULL, NULL, ?, ?, ?)",
+                    (r["source_file"], r.get("content_hash"), r.get("ingest_version"), json.dumps(hashes), time.time()),
+                )
+        return len(rows)
@@ -0,0 +1,469 @@
+# meai_core/ingest_pipeline.py
+import os, time, queue, logging, threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterator, Union
+
+logger = logging.getLogger("meai_core.ingest_pipeline")
+
+# ========= config =========
+INGEST_EXTRACT_WORKERS = int(os.getenv("MEAI_INGEST_EXTRACT_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+INGEST_EMBED_WORKERS = int(os.getenv("MEAI_INGEST_EMBED_WORKERS", "4"))
+INGEST_EMBED_BATCH = int(os.getenv("MEAI_INGEST_EMBED_BATCH", "64"))
+INGEST_EMBED_BATCH_MAX = int(os.getenv("MEAI_INGEST_EMBED_BATCH_MAX", "512"))
+INGEST_INSERT_BATCH = int(os.getenv("MEAI_INGEST_INSERT_BATCH", "200"))
+INGEST_QUEUE_SIZE = int(os.getenv("MEAI_INGEST_QUEUE_SIZE", "16"))
+# embeddings endpoint limits for the account tier
+INGEST_RPM = float(os.getenv("MEAI_INGEST_RPM", "3000"))
+INGEST_TPM = float(os.getenv("MEAI_INGEST_TPM", "1000000"))
+INGEST_MAX_RETRIES = 5
+INSERT_FLUSH_IDLE_SEC = 0.5
+
+EmbedTexts = Callable[[List[str]], List[List[float]]]
+# name -> embed function for vectors written next to the main one (e.g. other embedding columns)
+ExtraEmbeddings = Callable[[], Dict[str, EmbedTexts]]
+InsertRows = Callable[[List[Dict[str, Any]]], None]
+# pdf_path -> (chunks, page_count); a chunk is its text, or a dict with "content"
+# plus extra meai_chunks columns (e.g. page_start / page_end)
+Chunk = Union[str, Dict[str, Any]]
+ExtractChunks = Callable[[str], Tuple[List[Chunk], int]]
+# (pdf_path, source_id, chunk texts) -> {"embed": [index], "reuse": {index: embedding}, "delete": [index]};
+# with extra embeddings a reused embedding is {"embedding": vector, "extra_embeddings": {name: vector}}
+PlanFile = Callable[[str, str, List[str]], Dict[str, Any]]
+
+def chunk_content(chunk: Chunk) -> str:
+    return chunk if isinstance(chunk, str) else chunk["content"]
+
+def _chunk_columns(chunk: Chunk) -> Dict[str, Any]:
+    return {} if isinstance(chunk, str) else {k: v for k, v in chunk.items() if k != "content"}
+
+def estimate_tokens(texts: List[str]) -> int:
+    # ~4 chars per token for English text; only used for rate limiting
+    return sum(len(t) // 4 + 1 for t in texts)
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, bursts up to `capacity`.
+
+    A request larger than what is available (even larger than `capacity`)
+    is charged in full: the balance goes negative and the caller sleeps off
+    the debt, so later callers queue behind it and the long-run rate holds.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens`, sleeping until the balance is paid back; returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            delay = max(0.0, -self._tokens / self.rate)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one API endpoint."""
+
+    def __init__(self, rpm: float = INGEST_RPM, tpm: float = INGEST_TPM):
+        # one second of burst keeps the start of a run from tripping the limit
+        self.requests = TokenBucket(rpm / 60.0, max(rpm / 60.0, 1.0))
+        self.tokens = TokenBucket(tpm / 60.0, max(tpm / 60.0, 1.0))
+
+    def acquire(self, texts: List[str]) -> float:
+        return self.requests.acquire(1) + self.tokens.acquire(estimate_tokens(texts))
+
+class AdaptiveBatchSize:
+    """Embedding batch size that grows after successes and halves after failures."""
+
+    def __init__(self, start: int = INGEST_EMBED_BATCH, maximum: int = INGEST_EMBED_BATCH_MAX, minimum: int = 1):
+        self.minimum = minimum
+        self.maximum = max(maximum, start)
+        self._size = start
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def success(self) -> None:
+        with self._lock:
+            self._size = min(self.maximum, max(self._size + 1, int(self._size * 1.25)))
+
+    def failure(self) -> None:
+        with self._lock:
+            self._size = max(self.minimum, self._size // 2)
+
+def _call_with_retry(fn: Callable[[], Any], what: str, on_retry: Optional[Callable[[], None]] = None) -> Any:
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == INGEST_MAX_RETRIES:
+                raise
+            logger.warning("%s failed (attempt %s), retrying", what, attempt + 1, exc_info=True)
+            if on_retry:
+                on_retry()
+            time.sleep(min(0.5 * (2 ** attempt), 20.0))
+
+class _Batch:
+    __slots__ = ("source_id", "seq", "texts", "columns", "indices", "embeddings", "error")
+
+    def __init__(self, source_id: str, seq: int, chunks: List[Chunk], indices: List[int]):
+        self.source_id = source_id
+        self.seq = seq
+        self.texts = [chunk_content(c) for c in chunks]
+        self.columns = [_chunk_columns(c) for c in chunks]
+        self.indices = indices
+        self.embeddings: Optional[List[List[float]]] = None
+        self.error: Optional[BaseException] = None
+
+class IngestPipeline:
+    """Extract -> embed -> insert, with every stage running concurrently.
+
+    PDF text extraction and chunking run in a process pool. Chunks are cut
+    into adaptively sized batches and embedded by a pool of threads behind a
+    token-bucket rate limiter. A single writer thread bulk-inserts rows
+    across files. Bounded queues between the stages provide backpressure.
+
+    The writer inserts each file's batches strictly in chunk order, so the
+    remote "max chunk_index" stays a valid resume point after a crash. A file
+    whose embedding or insert fails is abandoned after its last good batch
+    and reported in the stats; the rest of the run continues.
+
+    With a `plan_file` hook (incremental re-ingestion) only the planned
+    indices are written: stale rows are deleted first, reused embeddings skip
+    the embedding stage, and `on_file_done` fires once a file is complete.
+    A `dedup` index (meai_core.dedup) drops near-duplicate chunks from each
+    plan before they reach the embedding stage. A `journal`
+    (meai_core.ingest_journal) records every insert batch before it is sent
+    and acknowledges it after; with a `delete_chunks` hook, a retried insert
+    first deletes the batch's rows, so a lost response never duplicates them.
+
+    `extra_embeddings`, read at the start of each run, adds more vectors per
+    chunk (e.g. for a second embedding profile). The embedding stage makes one
+    rate-limited request per embedder, and rows carry the results as
+    "extra_embeddings": {name: vector}, so the writer only writes.
+    """
+
+    def __init__(
+        self,
+        extract_chunks: ExtractChunks,
+        embed_texts: EmbedTexts,
+        insert_rows: InsertRows,
+        extract_workers: int = INGEST_EXTRACT_WORKERS,
+        embed_workers: int = INGEST_EMBED_WORKERS,
+        batch_size: Optional[AdaptiveBatchSize] = None,
+        insert_batch: int = INGEST_INSERT_BATCH,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        limiter: Optional[RateLimiter] = None,
+        dedup: Optional[Any] = None,
+        journal: Optional[Any] = None,
+        extra_embeddings: Optional[ExtraEmbeddings] = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.extract_chunks = extract_chunks
+        self.embed_texts = embed_texts
+        self.insert_rows = insert_rows
+        self.extract_workers = extract_workers
+        self.embed_workers = max(embed_workers, 1)
+        self.batch_size = batch_size or AdaptiveBatchSize()
+        self.insert_batch = insert_batch
+        self.queue_size = queue_size
+        self.limiter = limiter or RateLimiter()
+        self.dedup = dedup
+        self.journal = journal
+        self.extra_embeddings = extra_embeddings
+        self.log = log
+        self._extras: Dict[str, EmbedTexts] = {}
+        self._embed_q: "queue.Queue[Optional[_Batch]]" = queue.Queue(maxsize=queue_size)
+        self._write_q: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self._delete_chunks: Optional[Callable[[str, List[int]], None]] = None
+        self._on_file_done: Optional[Callable[[str], None]] = None
+        self.stats: Dict[str, Any] = {}
+
+    def _add(self, key: str, value: float) -> None:
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    # ----- stage 1: extraction -----
+    def _extracted(self, paths: List[str]) -> Iterator[Tuple[str, Any]]:
+        """(path, (chunks, pages) | exception) in input order, at most queue_size files in flight."""
+        if self.extract_workers <= 0:
+            for path in paths:
+                try:
+                    yield path, self._timed_extract(path)
+                except Exception as e:
+                    yield path, e
+            return
+        with ProcessPoolExecutor(max_workers=self.extract_workers) as pool:
+            pending: List[Tuple[str, Future]] = []
+            it = iter(paths)
+            for path in it:
+                pending.append((path, pool.submit(_timed_call, self.extract_chunks, path)))
+                if len(pending) >= self.queue_size:
+                    break
+            while pending:
+                path, fut = pending.pop(0)
+                try:
+                    result, elapsed = fut.result()
+                    self._add("extract_sec", elapsed)
+                    yield path, result
+                except Exception as e:
+                    yield path, e
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.append((nxt, pool.submit(_timed_call, self.extract_chunks, nxt)))
+
+    def _timed_extract(self, path: str) -> Tuple[List[Chunk], int]:
+        result, elapsed = _timed_call(self.extract_chunks, path)
+        self._add("extract_sec", elapsed)
+        return result
+
+    # ----- stage 2: embedding -----
+    def _embed_worker(self) -> None:
+        while True:
+            batch = self._embed_q.get()
+            if batch is None:
+                return
+            try:
+                vectors = self._embed(batch, self.embed_texts, "embed")
+                if self._extras:
+                    extra = {name: self._embed(batch, fn, f"embed {name}") for name, fn in self._extras.items()}
+                    vectors = [
+                        {"embedding": v, "extra_embeddings": {name: vecs[k] for name, vecs in extra.items()}}
+                        for k, v in enumerate(vectors)
+                    ]
+                batch.embeddings = vectors
+                self.batch_size.success()
+            except Exception as e:
+                batch.error = e
+            self._write_q.put(("batch", batch))
+
+    def _embed(self, batch: _Batch, embed_texts: EmbedTexts, what: str) -> List[List[float]]:
+        self._add("rate_limit_wait_sec", self.limiter.acquire(batch.texts))
+        start = time.perf_counter()
+        vectors = _call_with_retry(lambda: embed_texts(batch.texts), f"{what} {batch.source_id}#{batch.seq}", self.batch_size.failure)
+        self._add("embed_sec", time.perf_counter() - start)
+        self._add("embed_requests", 1)
+        return vectors
+
+    # ----- stage 3: writing -----
+    def _writer(self) -> None:
+        expected: Dict[str, int] = {}
+        next_seq: Dict[str, int] = {}
+        parked: Dict[str, Dict[int, _Batch]] = {}
+        failed: set = set()
+        rows: List[Dict[str, Any]] = []
+        row_sources: List[Tuple[str, int]] = []
+        finished_sources: List[str] = []
+
+        def flush() -> None:
+            if rows:
+                start = time.perf_counter()
+                try:
+                    batch_id = self.journal.begin(rows) if self.journal is not None else None
+                    _call_with_retry(lambda: self.insert_rows(rows), "insert", self._undo_insert(rows))
+                    if batch_id is not None:
+                        self.journal.ack(batch_id)
+                    self._add("rows_inserted", len(rows))
+                    self._add("insert_requests", 1)
+                    for sf, last in row_sources:
+                        self.log(f"Inserted through chunk_index {last} ({sf})")
+                except Exception:
+                    logger.exception("bulk insert failed")
+                    for sf in dict.fromkeys(sf for sf, _ in row_sources):
+                        self._fail(sf, "insert failed")
+                        failed.add(sf)
+                self._add("insert_sec", time.perf_counter() - start)
+                rows.clear()
+                row_sources.clear()
+            for sf in finished_sources:
+                if sf in failed:
+                    continue
+                if self._on_file_done:
+                    try:
+                        self._on_file_done(sf)
+                    except Exception as e:
+                        logger.exception("on_file_done failed for %s", sf)
+                        self._fail(sf, f"completion hook failed: {e}")
+                        continue
+                self._add("files_done", 1)
+                self.log(f"Done: {sf}")
+            finished_sources.clear()
+
+        def maybe_finished(sf: str) -> None:
+            if sf in expected and next_seq.get(sf, 0) >= expected[sf]:
+                del expected[sf]
+                next_seq.pop(sf, None)
+                parked.pop(sf, None)
+                finished_sources.append(sf)
+
+        stopping = False
+        while True:
+            try:
+                kind, item = self._write_q.get(timeout=INSERT_FLUSH_IDLE_SEC)
+            except queue.Empty:
+                flush()
+                continue
+            if kind == "stop":
+                stopping = True
+            elif kind == "expect":
+                sf, n = item
+                expected[sf] = n
+                maybe_finished(sf)
+            elif kind == "delete":
+                # queued before any of the file's batches, so it runs before their inserts
+                sf, indices = item
+                try:
+                    _call_with_retry(lambda: self._delete_chunks(sf, indices), f"delete {sf}")
+                    if self.journal is not None:
+                        self.journal.deleted(sf, indices)
+                    self._add("deleted_chunks", len(indices))
+                except Exception as e:
+                    logger.exception("delete failed for %s", sf)
+                    self._fail(sf, f"delete failed: {e}")
+                    failed.add(sf)
+            elif kind == "batch":
+                parked.setdefault(item.source_id, {})[item.seq] = item
+                sf = item.source_id
+                while next_seq.get(sf, 0) in parked.get(sf, {}):
+                    b = parked[sf].pop(next_seq.get(sf, 0))
+                    next_seq[sf] = b.seq + 1
+                    if sf in failed:
+                        continue
+                    if b.error is not None:
+                        logger.error("embedding failed for %s: %s", sf, b.error)
+                        self._fail(sf, f"embedding failed: {b.error}")
+                        failed.add(sf)
+                        continue
+                    for t, cols, idx, emb in zip(b.texts, b.columns, b.indices, b.embeddings or []):
+                        vectors = emb if isinstance(emb, dict) else {"embedding": emb}
+                        rows.append({"source_file": sf, "chunk_index": idx, "content": t, **vectors, **cols})
+                    row_sources.append((sf, b.indices[-1]))
+                maybe_finished(sf)
+                if len(rows) >= self.insert_batch:
+                    flush()
+            if stopping and self._write_q.empty():
+                flush()
+                return
+
+    def _undo_insert(self, rows: List[Dict[str, Any]]) -> Optional[Callable[[], None]]:
+        """Before retrying an insert, delete whatever of it may have landed."""
+        if self._delete_chunks is None:
+            return None
+        delete = self._delete_chunks
+
+        def undo() -> None:
+            by_source: Dict[str, List[int]] = {}
+            for r in rows:
+                by_source.setdefault(r["source_file"], []).append(r["chunk_index"])
+            for sf, indices in by_source.items():
+                delete(sf, indices)
+
+        return undo
+
+    def _fail(self, source_id: str, reason: str) -> None:
+        with self._stats_lock:
+            self.stats.setdefault("failed_files", {})[source_id] = reason
+        if self.dedup is not None:
+            # its chunks must not become canonical for others; the next run re-indexes it
+            self.dedup.forget(source_id)
+        self.log(f"ERROR on {source_id}: {reason}")
+
+    # ----- driver -----
+    def run(
+        self,
+        files: List[Tuple[str, str]],
+        resume_index: Callable[[str], int] = lambda source_id: 0,
+        plan_file: Optional[PlanFile] = None,
+        delete_chunks: Optional[Callable[[str, List[int]], None]] = None,
+        on_file_done: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Ingest (pdf_path, source_id) pairs; returns run stats."""
+        self.stats = {"files": len(files), "files_done": 0, "pages": 0, "chunks": 0, "skipped_chunks": 0, "reused_embeddings": 0,
+                      "duplicates_skipped": 0, "deleted_chunks": 0, "rows_inserted": 0, "embed_requests": 0, "insert_requests": 0, "extract_sec": 0.0,
+                      "embed_sec": 0.0, "insert_sec": 0.0, "rate_limit_wait_sec": 0.0, "failed_files": {}}
+        self._delete_chunks = delete_chunks
+        self._on_file_done = on_file_done
+        self._extras = dict(self.extra_embeddings()) if self.extra_embeddings is not None else {}
+        t0 = time.perf_counter()
+        workers = [threading.Thread(target=self._embed_worker, name=f"meai-ingest-embed-{i}", daemon=True) for i in range(self.embed_workers)]
+        writer = threading.Thread(target=self._writer, name="meai-ingest-writer", daemon=True)
+        for t in workers + [writer]:
+            t.start()
+
+        source_of = dict(files)
+        try:
+            for path, result in self._extracted([p for p, _ in files]):
+                source_id = source_of[path]
+                if isinstance(result, BaseException):
+                    self._fail(source_id, f"extraction failed: {result}")
+                    continue
+                chunks, pages = result
+                self._add("pages", pages)
+                self._add("chunks", len(chunks))
+                try:
+                    texts = [chunk_content(c) for c in chunks]
+                    if plan_file is not None:
+                        plan = plan_file(path, source_id, texts)
+                    else:
+                        plan = {"embed": list(range(resume_index(source_id), len(chunks))), "reuse": {}, "delete": []}
+                    if self.dedup is not None:
+                        plan = self.dedup.filter_plan(source_id, texts, plan)
+                except Exception as e:
+                    logger.exception("planning failed for %s", source_id)
+                    self._fail(source_id, f"planning failed: {e}")
+                    continue
+                self._enqueue_file(source_id, chunks, plan)
+        finally:
+            for _ in workers:
+                self._embed_q.put(None)
+            for t in workers:
+                t.join()
+            self._write_q.put(("stop", None))
+            writer.join()
+        self.stats["wall_sec"] = time.perf_counter() - t0
+        return self.stats
+
+    def _enqueue_file(self, source_id: str, chunks: List[Chunk], plan: Dict[str, Any]) -> None:
+        embed, reuse, delete = plan["embed"], plan.get("reuse") or {}, plan.get("delete") or []
+        duplicates = len(plan.get("duplicates") or {})
+        self.log(
+            f"Processing: {source_id} ({len(chunks)} chunks: {len(embed)} to embed, {len(reuse)} reused, "
+            f"{duplicates} near-duplicates skipped, {len(delete)} to delete)"
+        )
+        self._add("skipped_chunks", len(chunks) - len(embed) - len(reuse) - duplicates)
+        self._add("duplicates_skipped", duplicates)
+        self._add("reused_embeddings", len(reuse))
+        if delete:
+            self._write_q.put(("delete", (source_id, delete)))
+        seq = 0
+        reused = sorted(reuse)
+        for i in range(0, len(reused), self.insert_batch):
+            part = reused[i:i + self.insert_batch]
+            batch = _Batch(source_id, seq, [chunks[j] for j in part], part)
+            batch.embeddings = [reuse[j] for j in part]
+            self._write_q.put(("batch", batch))
+            seq += 1
+        i = 0
+        while i < len(embed):
+            part = embed[i:i + self.batch_size.size]
+            self._embed_q.put(_Batch(source_id, seq, [chunks[j] for j in part], part))
+            seq, i = seq + 1, i + len(part)
+        self._write_q.put(("expect", (source_id, seq)))
+
+def _timed_call(fn: Callable[[str], Any], arg: str) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    return fn(arg), time.perf_counter() - start
@@ -0,0 +1,314 @@
+# meai_core/ingest_watch.py
+import os, sys, time, errno, select, struct, logging, threading
+from typing import Optional, Dict, Any, List, Tuple, Set, Callable, Iterable
+
+logger = logging.getLogger("meai_core.ingest_watch")
+
+# ========= config =========
+# a file is ingested once it has been quiet (no events, same size/mtime) this long
+WATCH_DEBOUNCE_SEC = float(os.getenv("MEAI_WATCH_DEBOUNCE_SEC", "5"))
+WATCH_POLL_SEC = float(os.getenv("MEAI_WATCH_POLL_SEC", "30"))
+WATCH_MAX_BATCH = int(os.getenv("MEAI_WATCH_MAX_BATCH", "50"))
+WATCH_USE_INOTIFY = os.getenv("MEAI_WATCH_INOTIFY", "1") == "1"
+
+# returned by a watcher when it may have missed events; the daemon then does a full pass
+RESCAN = "\0rescan"
+
+AcceptPath = Callable[[str], bool]
+
+def _stat_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def _walk(roots: Iterable[str], accept_file: AcceptPath, accept_dir: AcceptPath) -> Iterable[str]:
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if accept_dir(os.path.join(dirpath, d))]
+            for f in filenames:
+                path = os.path.join(dirpath, f)
+                if accept_file(path):
+                    yield path
+
+class PollingWatcher:
+    """Size/mtime snapshot of the watched trees, diffed every `interval` seconds."""
+
+    kind = "polling"
+
+    def __init__(self, roots: List[str], accept_file: AcceptPath, accept_dir: AcceptPath, interval: float = WATCH_POLL_SEC):
+        self.roots = roots
+        self.accept_file = accept_file
+        self.accept_dir = accept_dir
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        out = {}
+        for path in _walk(self.roots, self.accept_file, self.accept_dir):
+            sig = _stat_sig(path)
+            if sig is not None:
+                out[path] = sig
+        return out
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Paths added, modified or removed since the last scan (empty until the next scan is due)."""
+        wait = self._next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next_scan:
+                return set()
+        current = self._scan()
+        self._next_scan = time.monotonic() + self.interval
+        changed = {p for p, sig in current.items() if self._snapshot.get(p) != sig}
+        changed |= set(self._snapshot) - set(current)
+        self._snapshot = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """Recursive inotify watch through libc, so there is no extra dependency.
+
+    New directories get watched as they appear and the files already inside
+    them are reported. Queue overflows and directories moved away (which
+    produce no per-file events) are reported as RESCAN.
+    """
+
+    kind = "inotify"
+
+    def __init__(self, roots: List[str], accept_file: AcceptPath, accept_dir: AcceptPath):
+        import ctypes, ctypes.util
+
+        self.roots = roots
+        self.accept_file = accept_file
+        self.accept_dir = accept_dir
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._ctypes = ctypes
+        self._dirs: Dict[int, str] = {}
+        for root in roots:
+            self._watch_tree(root)
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux")
+
+    def _add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+            logger.warning("cannot watch %s: %s", path, os.strerror(err))
+            return
+        self._dirs[wd] = path
+
+    def _watch_tree(self, root: str) -> List[str]:
+        """Watch root and its subdirectories; returns the accepted files already there."""
+        found = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if self.accept_dir(os.path.join(dirpath, d))]
+            self._add_watch(dirpath)
+            found.extend(p for p in (os.path.join(dirpath, f) for f in filenames) if self.accept_file(p))
+        return found
+
+    def poll(self, timeout: float) -> Set[str]:
+        ready, _, _ = select.select([self._fd], [], [], max(timeout, 0.0))
+        if not ready:
+            return set()
+        changed: Set[str] = set()
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(buf, offset)
+                name = buf[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(RESCAN)
+                    continue
+                base = self._dirs.get(wd)
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                if base is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    if base in self.roots:
+                        changed.add(RESCAN)
+                    continue
+                path = os.path.join(base, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and self.accept_dir(path):
+                        changed.update(self._watch_tree(path))
+                    elif mask & IN_MOVED_FROM:
+                        changed.add(RESCAN)
+                elif self.accept_file(path):
+                    changed.add(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def make_watcher(
+    roots: List[str],
+    accept_file: AcceptPath,
+    accept_dir: AcceptPath,
+    poll_interval: float = WATCH_POLL_SEC,
+    use_inotify: bool = WATCH_USE_INOTIFY,
+) -> Any:
+    """inotify where the platform has it, mtime polling otherwise."""
+    if use_inotify and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(roots, accept_file, accept_dir)
+        except OSError as e:
+            logger.warning("inotify unavailable (%s); falling back to polling", e)
+    return PollingWatcher(roots, accept_file, accept_dir, interval=poll_interval)
+
+class Debouncer:
+    """Holds changed paths until they have been quiet for `quiet_sec`.
+
+    A path whose size or mtime moved since its last event (a copy still in
+    progress) is held for another quiet period.
+    """
+
+    def __init__(self, quiet_sec: float = WATCH_DEBOUNCE_SEC):
+        self.quiet_sec = quiet_sec
+        self._pending: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, paths: Iterable[str], now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        for p in paths:
+            self._pending[p] = (now, _stat_sig(p))
+
+    def ready(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        out = []
+        for p, (t, sig) in sorted(self._pending.items(), key=lambda kv: kv[1][0]):
+            if now - t < self.quiet_sec:
+                continue
+            current = _stat_sig(p)
+            if current != sig:
+                self._pending[p] = (now, current)
+                continue
+            out.append(p)
+            del self._pending[p]
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def time_to_next(self, now: Optional[float] = None) -> Optional[float]:
+        if not self._pending:
+            return None
+        now = time.monotonic() if now is None else now
+        oldest = min(t for t, _ in self._pending.values())
+        return max(oldest + self.quiet_sec - now, 0.0)
+
+# (changed paths, removed paths, full pass) -> run stats
+ProcessChanges = Callable[[List[str], List[str], bool], Dict[str, Any]]
+
+class IngestDaemon:
+    """Watch loop: events -> debounce -> ingest the settled files in batches.
+
+    The first step is a full pass, which picks up anything that changed
+    while the daemon was down; the manifest makes it cheap. `process` does
+    the ingest (IngestPipeline's extraction and embedding pools) and
+    `on_ingested` runs after each pass, e.g. to refresh retrieval caches.
+    """
+
+    def __init__(
+        self,
+        watcher: Any,
+        process: ProcessChanges,
+        on_ingested: Optional[Callable[[Dict[str, Any]], None]] = None,
+        debounce_sec: float = WATCH_DEBOUNCE_SEC,
+        max_batch: int = WATCH_MAX_BATCH,
+        idle_timeout: float = 1.0,
+        log: Callable[[str], None] = print,
+    ):
+        self.watcher = watcher
+        self.process = process
+        self.on_ingested = on_ingested
+        self.debouncer = Debouncer(debounce_sec)
+        self.max_batch = max_batch
+        self.idle_timeout = idle_timeout
+        self.log = log
+        self._rescan = True
+        self._stats = {"passes": 0, "full_passes": 0, "files_changed": 0, "files_removed": 0, "errors": 0}
+
+    def step(self) -> Optional[Dict[str, Any]]:
+        """Wait for events up to the next debounce deadline; ingest whatever settled."""
+        wait = self.debouncer.time_to_next()
+        events = self.watcher.poll(self.idle_timeout if wait is None else min(wait, self.idle_timeout))
+        if RESCAN in events:
+            events.discard(RESCAN)
+            self._rescan = True
+        self.debouncer.touch(events)
+        settled = self.debouncer.ready(limit=self.max_batch)
+        full, self._rescan = self._rescan, False
+        if not settled and not full:
+            return None
+        changed = [p for p in settled if os.path.isfile(p)]
+        removed = [p for p in settled if not os.path.exists(p)]
+        self.log(f"Watch: {len(changed)} changed, {len(removed)} removed" + (" (full pass)" if full else ""))
+        stats = self.process(changed, removed, full)
+        self._stats["passes"] += 1
+        self._stats["full_passes"] += int(full)
+        self._stats["files_changed"] += len(changed)
+        self._stats["files_removed"] += len(removed)
+        if self.on_ingested is not None:
+            self.on_ingested(stats)
+        return stats
+
+    def run(self, stop: threading.Event) -> None:
+        self.log(f"Watching {', '.join(self.watcher.roots)} ({self.watcher.kind})")
+        backoff = 1.0
+        while not stop.is_set():
+            try:
+                self.step()
+                backoff = 1.0
+            except Exception:
+                # e.g. Supabase down: keep the daemon alive and retry with a full pass
+                logger.exception("watch pass failed")
+                self._stats["errors"] += 1
+                self._rescan = True
+                stop.wait(backoff)
+                backoff = min(backoff * 2, 300.0)
+        self.watcher.close()
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._stats)
+        out["pending"] = len(self.debouncer)
+        out["watcher"] = self.watcher.kind
+        return out
@@ -0,0 +1,341 @@
+# meai_core/lexical_index.py
+"""Local BM25 index over meai_chunks.content, for hybrid retrieval.
+
+Embedding search is weak on exact tokens: part numbers, standard IDs
+("ISO 898-1") and material grades ("6061-T6"). This index keeps those as
+whole terms and also indexes their parts, so "898-1" matches exactly and
+"898" still matches. It is an SQLite FTS5 table ranked with bm25(). The
+file is shared by every worker on the host. Ingestion keeps it current
+(update() syncs chunk keys), and a rebuild swaps in a new file that
+readers reopen. `fuse` merges its ranking with the vector ranking by
+reciprocal rank fusion. search() applies the metadata filters of
+meai_core/chunk_filter.py in the same query as the MATCH.
+
+  python -m meai_core.lexical_index [--rebuild]
+  python -m meai_core.lexical_index --search "ISO 898-1 property class"
+"""
+import os, re, sys, json, sqlite3, logging, threading, time
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from meai_core.chunk_filter import normalize_filter
+from meai_core.chunk_quality import quality_score
+
+logger = logging.getLogger("meai_core.lexical_index")
+
+# ========= config =========
+DEFAULT_LEXICAL_PATH = os.path.join(os.path.dirname(__file__), "cache", "lexical_index.sqlite3")
+LEXICAL_INDEX_PATH = os.getenv("MEAI_LEXICAL_INDEX_PATH", DEFAULT_LEXICAL_PATH)
+HYBRID_RETRIEVAL = os.getenv("MEAI_HYBRID_RETRIEVAL", "1") == "1"
+# each retriever contributes this many candidates before fusion
+HYBRID_CANDIDATES = int(os.getenv("MEAI_HYBRID_CANDIDATES", "30"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("MEAI_HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("MEAI_HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_RRF_K = float(os.getenv("MEAI_HYBRID_RRF_K", "60"))
+
+CHUNKS_TABLE_NAME = "meai_chunks"
+ROW_COLUMNS = "source_file,chunk_index,content,page_start,page_end,quality,collection"
+PAGE_SIZE = 1000
+RELOAD_CHECK_SEC = 5.0
+MAX_QUERY_TERMS = 32
+
+# letters/digits joined by - . / stay one term: 898-1, m8x1.25, 6061-t6, en10204/3.1
+TERM_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+PART_RE = re.compile(r"[-./]")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or should the this to what when which "
+    "who why with you your we our my me".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound identifiers are followed by their parts."""
+    out = []
+    for term in TERM_RE.findall((text or "").lower()):
+        out.append(term)
+        if PART_RE.search(term):
+            out.extend(p for p in PART_RE.split(term) if p)
+    return out
+
+def query_terms(text: str) -> List[str]:
+    terms = [t for t in tokenize(text) if t not in STOPWORDS]
+    return list(dict.fromkeys(terms))[:MAX_QUERY_TERMS]
+
+def _fetch_pages(sb: Any, columns: str) -> Iterable[Dict[str, Any]]:
+    start = 0
+    while True:
+        rows = (
+            sb.table(CHUNKS_TABLE_NAME)
+            .select(columns)
+            .order("source_file")
+            .order("chunk_index")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+            .data
+            or []
+        )
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+# bumped when the tables change. Readers leave a file of another version alone and treat it
+# as unavailable (vector-only retrieval) until the ingester builds a new one.
+SCHEMA_VERSION = 2
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, source_file TEXT NOT NULL, chunk_index INTEGER NOT NULL, "
+    "content TEXT, page_start INTEGER, page_end INTEGER, quality REAL, collection TEXT, UNIQUE (source_file, chunk_index))",
+    "CREATE INDEX IF NOT EXISTS chunks_collection_idx ON chunks (collection)",
+    # terms are pre-tokenized; the FTS tokenizer only splits on whitespace
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5(terms, tokenize = \"unicode61 tokenchars '-./'\")",
+)
+
+class LexicalIndex:
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._inode: Optional[int] = None
+        self._count = 0
+        self._last_check = 0.0
+        self._stats = {"searches": 0, "search_ms_total": 0.0}
+
+    # ----- connection -----
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        return sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+
+    @classmethod
+    def _create(cls, path: str) -> sqlite3.Connection:
+        """A new file with the current schema; only build() creates one."""
+        db = cls._connect(path)
+        # a rollback journal, not WAL: build() swaps files under open readers, and SQLite would
+        # replay the old file's -wal (kept alive by those readers) onto the new one
+        db.execute("PRAGMA journal_mode=DELETE")
+        db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        for stmt in SCHEMA:
+            db.execute(stmt)
+        return db
+
+    def _reopen_if_replaced(self) -> None:
+        """Called with the lock held: follow a rebuild that swapped the file."""
+        now = time.monotonic()
+        if self._inode is not None and now - self._last_check < RELOAD_CHECK_SEC:
+            return
+        self._last_check = now
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return
+        if inode != self._inode:
+            if self._db is not None:
+                self._db.close()
+            self._db, self._inode, self._count = None, inode, 0
+            db = self._connect(self.path)
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                db.close()
+                logger.warning("%s has schema version %s, expected %s; hybrid retrieval is off until it is rebuilt", self.path, version, SCHEMA_VERSION)
+                return
+            self._db = db
+        if self._db is not None:
+            self._count = self._db.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def available(self) -> bool:
+        with self._lock:
+            self._reopen_if_replaced()
+            return self._count > 0
+
+    def version(self) -> str:
+        with self._lock:
+            self._reopen_if_replaced()
+            return f"{self._inode}:{self._count}"
+
+    # ----- search -----
+    def search(
+        self,
+        query: str,
+        k: int = 8,
+        min_quality: float = 0.0,
+        source_files: Optional[Iterable[str]] = None,
+        collection: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k rows by BM25; "bm25" is the score (higher is better).
+
+        `source_files` / `collection` restrict the match to those rows.
+        """
+        terms = query_terms(query)
+        flt = normalize_filter(source_files, collection)
+        if not terms or flt["source_files"] == []:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        where, params = "", [match, min_quality]
+        if flt["source_files"] is not None:
+            where += f" AND c.source_file IN ({','.join('?' * len(flt['source_files']))})"
+            params.extend(flt["source_files"])
+        if flt["collection"] is not None:
+            where += " AND c.collection = ?"
+            params.append(flt["collection"])
+        start = time.perf_counter()
+        with self._lock:
+            self._reopen_if_replaced()
+            if self._db is None:
+                return []
+            rows = self._db.execute(
+                "SELECT c.source_file, c.chunk_index, c.content, c.page_start, c.page_end, c.quality, c.collection, "
+                "bm25(chunk_terms) AS score "
+                "FROM chunk_terms JOIN chunks c ON c.id = chunk_terms.rowid "
+                f"WHERE chunk_terms MATCH ? AND (c.quality IS NULL OR c.quality >= ?){where} ORDER BY score LIMIT ?",
+                (*params, k),
+            ).fetchall()
+            self._stats["searches"] += 1
+            self._stats["search_ms_total"] += (time.perf_counter() - start) * 1000
+        cols = ("source_file", "chunk_index", "content", "page_start", "page_end", "quality", "collection")
+        return [{**dict(zip(cols, r[:7])), "bm25": round(-r[7], 4)} for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {"count": self._count, "searches": self._stats["searches"]}
+            if self._stats["searches"]:
+                out["search_ms_avg"] = round(self._stats["search_ms_total"] / self._stats["searches"], 3)
+        return out
+
+    # ----- building -----
+    @staticmethod
+    def _insert(db: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for r in rows:
+            content = r.get("content") or ""
+            quality = r.get("quality")
+            cur = db.execute(
+                "INSERT INTO chunks (source_file, chunk_index, content, page_start, page_end, quality, collection) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (r["source_file"], r["chunk_index"], content, r.get("page_start"), r.get("page_end"),
+                 quality_score(content) if quality is None else float(quality), r.get("collection")),
+            )
+            db.execute("INSERT INTO chunk_terms (rowid, terms) VALUES (?, ?)", (cur.lastrowid, " ".join(tokenize(content))))
+            n += 1
+        return n
+
+    def build(self, sb: Any) -> int:
+        """Full index of meai_chunks, written to a new file and swapped in."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        for suffix in ("", "-journal"):
+            if os.path.exists(tmp + suffix):
+                os.remove(tmp + suffix)
+        db = self._create(tmp)
+        db.execute("BEGIN")
+        n = self._insert(db, _fetch_pages(sb, ROW_COLUMNS))
+        db.execute("COMMIT")
+        db.execute("INSERT INTO chunk_terms (chunk_terms) VALUES ('optimize')")
+        db.close()
+        # readers of the old file keep their open inode until they notice the swap and reopen
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._last_check = 0.0
+            self._reopen_if_replaced()
+        return n
+
+    def rebuild(self, sb: Any) -> int:
+        return self.build(sb)
+
+    def update(self, sb: Any) -> int:
+        """Sync with meai_chunks by key: drop chunks that are gone, add new ones.
+
+        Chunks rewritten under the same key need a rebuild, as with the local
+        vector index.
+        """
+        if not self.available():
+            return self.build(sb)
+        remote = {(r["source_file"], r["chunk_index"]) for r in _fetch_pages(sb, "source_file,chunk_index")}
+        with self._lock:
+            db = self._db
+            local = {(sf, ci): i for i, sf, ci in db.execute("SELECT id, source_file, chunk_index FROM chunks")}
+        gone = [i for key, i in local.items() if key not in remote]
+        missing: Dict[str, List[int]] = {}
+        for sf, ci in sorted(remote - set(local)):
+            missing.setdefault(sf, []).append(ci)
+
+        def _new_rows() -> Iterable[Dict[str, Any]]:
+            for sf, idxs in missing.items():
+                for i in range(0, len(idxs), PAGE_SIZE):
+                    yield from (
+                        sb.table(CHUNKS_TABLE_NAME)
+                        .select(ROW_COLUMNS)
+                        .eq("source_file", sf)
+                        .in_("chunk_index", idxs[i:i + PAGE_SIZE])
+                        .execute()
+                        .data
+                        or []
+                    )
+
+        new_rows = list(_new_rows())
+        with self._lock:
+            db.execute("BEGIN")
+            for i in gone:
+                db.execute("DELETE FROM chunk_terms WHERE rowid = ?", (i,))
+                db.execute("DELETE FROM chunks WHERE id = ?", (i,))
+            n = self._insert(db, new_rows)
+            db.execute("COMMIT")
+            self._last_check = 0.0
+            self._reopen_if_replaced()
+        return n
+
+# ========= fusion =========
+def chunk_key(row: Dict[str, Any]) -> Tuple[Any, Any]:
+    return row.get("source_file"), row.get("chunk_index")
+
+def fuse(
+    vector_rows: List[Dict[str, Any]],
+    lexical_rows: List[Dict[str, Any]],
+    k: int,
+    vector_weight: float = HYBRID_VECTOR_WEIGHT,
+    lexical_weight: float = HYBRID_LEXICAL_WEIGHT,
+    rrf_k: float = HYBRID_RRF_K,
+) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: score = sum of weight / (rrf_k + rank) over both rankings.
+
+    Vector rows keep their fields (similarity included); lexical-only rows
+    come from the index. Each row gains "rrf" and its rank in both lists.
+    """
+    fused: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    for source, rows, weight in (("vector", vector_rows, vector_weight), ("lexical", lexical_rows, lexical_weight)):
+        for rank, r in enumerate(rows or [], start=1):
+            key = chunk_key(r)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**r, "rrf": 0.0, "vector_rank": None, "lexical_rank": None}
+            elif "bm25" in r:
+                entry["bm25"] = r["bm25"]
+            if entry[f"{source}_rank"] is None:
+                entry[f"{source}_rank"] = rank
+                entry["rrf"] += weight / (rrf_k + rank)
+    out = sorted(fused.values(), key=lambda e: -e["rrf"])[:k]
+    for e in out:
+        e["rrf"] = round(e["rrf"], 6)
+    return out
+
+def main(argv: List[str]) -> None:
+    index = LexicalIndex()
+    if "--search" in argv:
+        i = argv.index("--search")
+        query = argv[i + 1] if i + 1 < len(argv) else ""
+        for r in index.search(query, k=10):
+            print(f"{r['bm25']:8.3f} | {r['source_file']}:{r['chunk_index']} | {(r['content'] or '')[:100]!r}")
+        return
+
+    from meai_core.engine import sb
+
+    if "--rebuild" in argv or not index.available():
+        n = index.build(sb)
+        print(f"Built lexical index: {n} chunks -> {index.path}")
+    else:
+        n = index.update(sb)
+        print(f"Updated lexical index: +{n} chunks (total {index.count}) -> {index.path}")
+    print(json.dumps(index.stats()))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
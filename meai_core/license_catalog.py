@@ -0,0 +1,122 @@
+# meai_core/license_catalog.py
+import os, time, logging, threading
+from typing import Optional, Dict, Any, List, Callable
+
+logger = logging.getLogger("meai_core.license_catalog")
+
+# ========= config =========
+LICENSE_CATALOG_ENABLED = os.getenv("MEAI_LICENSE_CATALOG", "1") == "1"
+LICENSE_CATALOG_TTL_SEC = float(os.getenv("MEAI_LICENSE_CATALOG_TTL_SEC", "300"))
+RETRY_AFTER_ERROR_SEC = 30.0
+
+RowsLoader = Callable[[], List[Dict[str, Any]]]
+LinesRenderer = Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], List[str]]
+
+class LicenseCatalog:
+    """In-memory copy of meai_documents + meai_licenses with pre-rendered lines.
+
+    `lines_for` assembles license block lines from cached per-source
+    fragments without network I/O. Loads always run on a background thread:
+    a stale catalog keeps serving while it reloads (TTL or `invalidate()`),
+    and before the first successful load `lines_for` returns None so callers
+    fall back to querying Supabase directly instead of waiting on the tables.
+    """
+
+    def __init__(
+        self,
+        load_documents: RowsLoader,
+        load_licenses: RowsLoader,
+        render_lines: LinesRenderer,
+        doc_source_col: str,
+        license_key_of: Callable[[Dict[str, Any]], Optional[str]],
+        enabled: bool = LICENSE_CATALOG_ENABLED,
+        ttl_sec: float = LICENSE_CATALOG_TTL_SEC,
+    ):
+        self.enabled = enabled
+        self.ttl_sec = ttl_sec
+        self._load_documents = load_documents
+        self._load_licenses = load_licenses
+        self._render_lines = render_lines
+        self._doc_source_col = doc_source_col
+        self._license_key_of = license_key_of
+        self._fragments: Optional[Dict[str, List[str]]] = None
+        self._loaded_at = 0.0
+        self._error_at = -RETRY_AFTER_ERROR_SEC
+        self._stale = False
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "load_errors": 0, "hits": 0, "fallbacks": 0}
+
+    def refresh(self) -> bool:
+        """Load both tables and swap in freshly rendered fragments."""
+        try:
+            fragments = self._render_all(self._load_documents(), self._load_licenses())
+        except Exception:
+            logger.exception("license catalog load failed")
+            with self._lock:
+                self._stats["load_errors"] += 1
+                self._error_at = time.monotonic()
+                self._refreshing = False
+            return False
+        with self._lock:
+            self._fragments = fragments
+            self._loaded_at = time.monotonic()
+            self._stale = False
+            self._refreshing = False
+            self._stats["loads"] += 1
+        return True
+
+    def _render_all(self, docs: List[Dict[str, Any]], licenses: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        lic_by_key = {l.get("license_key"): l for l in licenses if l.get("license_key")}
+        fragments: Dict[str, List[str]] = {}
+        for d in docs:
+            sf = d.get(self._doc_source_col)
+            if not sf:
+                continue
+            lk = self._license_key_of(d)
+            fragments[sf] = self._render_lines(sf, d, lic_by_key.get(lk) if lk else None)
+        return fragments
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stale = True
+
+    def warm(self) -> None:
+        if self.enabled:
+            self._refresh_in_background()
+
+    def lines_for(self, source_files: List[str]) -> Optional[List[str]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            fragments = self._fragments
+            due = self._stale or time.monotonic() - self._loaded_at > self.ttl_sec
+            backing_off = time.monotonic() - self._error_at < RETRY_AFTER_ERROR_SEC
+            self._stats["fallbacks" if fragments is None else "hits"] += 1
+        if (fragments is None or due) and not backing_off:
+            self._refresh_in_background()
+        if fragments is None:
+            return None
+        out: List[str] = []
+        for sf in source_files:
+            out.extend(fragments.get(sf) or self._render_lines(sf, None, None))
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["documents"] = len(self._fragments or {})
+            out["age_sec"] = round(time.monotonic() - self._loaded_at, 1) if self._fragments is not None else None
+        out["enabled"] = self.enabled
+        return out
+
+    def _claim_refresh(self) -> bool:
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def _refresh_in_background(self) -> None:
+        if self._claim_refresh():
+            threading.Thread(target=self.refresh, name="meai-license-catalog", daemon=True).start()
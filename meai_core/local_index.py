@@ -0,0 +1,634 @@
+# meai_core/local_index.py
+"""Local, memory-mapped snapshot of meai_chunks for in-process vector search.
+
+Layout under MEAI_LOCAL_INDEX_DIR:
+  vectors-<gen>.bin  row-major search matrix, rows L2-normalized
+  full-<gen>.bin     full-width float32/float16 rows, compact modes only
+  scales-<gen>.bin   float32 per-row int8 scale, int8 mode only
+  meta-<gen>.jsonl   one {"source_file", "chunk_index", "content", "quality", "collection"} object per row
+  index.json         header: generation, dim, search_dim, dtype, quantization, count,
+                     embed_model, embed_column, collections, built_at
+
+Compact modes keep the search matrix small: the first `search_dim`
+dimensions (text-embedding-3 vectors stay meaningful when shortened), stored
+as float, int8 with a per-row scale, or packed sign bits (binary, Hamming
+distance). Search scans the codes, then rescores a shortlist of
+k * MEAI_LOCAL_INDEX_RESCORE rows against the full-precision file, so only
+the shortlist's pages of that file are ever touched. `measure_recall`
+compares against exact search.
+
+Readers only trust the first header["count"] rows, so appends are made
+visible atomically by rewriting index.json last; rows an interrupted append
+left past that count are cut off before the next one. A rebuild writes a new
+generation instead of truncating files other workers still have mapped.
+Every worker maps the same file, so the OS page cache holds a single copy
+of the matrix. Rows not yet scored remotely get their quality computed at
+build time, so search can always filter on it.
+
+The snapshot holds one embedding profile's vectors (meai_core/embedding_profile.py);
+after a model switch the engine ignores it until it is rebuilt from the new column.
+
+search() takes the metadata filters of meai_core/chunk_filter.py and ranks
+only matching rows. Each filter's row mask is computed once per loaded
+snapshot and reused.
+
+Build or update the snapshot, or measure recall@k of the current one:
+  python -m meai_core.local_index [--rebuild] [--dtype float16] [--quantize int8|binary] [--dims 512]
+  python -m meai_core.local_index --recall [200]
+"""
+import os, sys, json, time, threading
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+import numpy as np
+
+from meai_core.chunk_filter import normalize_filter, is_filtered
+from meai_core.chunk_quality import quality_score
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(__file__), "cache", "local_index")
+LOCAL_INDEX_DIR = os.getenv("MEAI_LOCAL_INDEX_DIR", DEFAULT_INDEX_DIR)
+CHUNKS_TABLE_NAME = "meai_chunks"
+DEFAULT_EMBED_COLUMN = "embedding"
+PAGE_SIZE = 1000
+SEARCH_BLOCK_ROWS = 65536
+RELOAD_CHECK_SEC = 5.0
+MAX_FILTER_MASKS = 64
+
+QUANTIZATIONS = ("none", "int8", "binary")
+LOCAL_INDEX_QUANTIZATION = os.getenv("MEAI_LOCAL_INDEX_QUANTIZATION", "none")
+LOCAL_INDEX_DIMS = int(os.getenv("MEAI_LOCAL_INDEX_DIMS", "0"))  # 0 = full width
+LOCAL_INDEX_RESCORE = int(os.getenv("MEAI_LOCAL_INDEX_RESCORE", "10"))  # shortlist = k * this
+
+HEADER_FILE = "index.json"
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+
+def _vectors_file(header: Dict[str, Any]) -> str:
+    return f"vectors-{header['generation']}.bin"
+
+def _meta_file(header: Dict[str, Any]) -> str:
+    return f"meta-{header['generation']}.jsonl"
+
+def _full_file(header: Dict[str, Any]) -> str:
+    return f"full-{header['generation']}.bin"
+
+def _scales_file(header: Dict[str, Any]) -> str:
+    return f"scales-{header['generation']}.bin"
+
+def _generation_files(header: Dict[str, Any]) -> List[str]:
+    return [_vectors_file(header), _meta_file(header), _full_file(header), _scales_file(header)]
+
+def _row_columns(header: Dict[str, Any]) -> str:
+    return f"source_file,chunk_index,content,{header.get('embed_column') or DEFAULT_EMBED_COLUMN},quality,collection"
+
+def _is_compact(header: Dict[str, Any]) -> bool:
+    """Search runs on codes separate from the full-precision rows."""
+    quantization = header.get("quantization") or "none"
+    dim = int(header.get("dim") or 0)
+    return quantization != "none" or int(header.get("search_dim") or dim) < dim
+
+def _parse_embedding(val: Any) -> List[float]:
+    # pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings
+    if isinstance(val, str):
+        return json.loads(val)
+    return list(val or [])
+
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+def encode_int8(mat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes and the float32 scale that maps them back."""
+    scales = np.abs(mat).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(mat / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def encode_binary(mat: np.ndarray) -> np.ndarray:
+    """Sign bits, 8 dimensions per byte."""
+    return np.packbits(mat > 0, axis=1)
+
+def _fetch_pages(sb: Any, columns: str, table: str = CHUNKS_TABLE_NAME) -> Iterable[Dict[str, Any]]:
+    start = 0
+    while True:
+        rows = (
+            sb.table(table)
+            .select(columns)
+            .order("source_file")
+            .order("chunk_index")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+            .data
+            or []
+        )
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+class LocalVectorIndex:
+    def __init__(self, index_dir: str = LOCAL_INDEX_DIR):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._mat: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._meta: List[Dict[str, Any]] = []
+        self._quality: Optional[np.ndarray] = None
+        self._masks: Dict[Tuple[Any, ...], np.ndarray] = {}
+        self._header: Dict[str, Any] = {}
+        self._header_mtime = 0.0
+        self._last_check = 0.0
+
+    # ----- paths -----
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _read_header(self) -> Dict[str, Any]:
+        try:
+            with open(self._path(HEADER_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_header(self, header: Dict[str, Any]) -> None:
+        tmp = self._path(HEADER_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp, self._path(HEADER_FILE))
+
+    # ----- loading -----
+    @property
+    def count(self) -> int:
+        return len(self._meta)
+
+    def version(self) -> str:
+        """Changes whenever a rebuild or update becomes visible."""
+        self.refresh_if_changed()
+        return f"{self._header.get('generation')}:{self.count}"
+
+    def embed_model(self) -> Optional[str]:
+        """Profile key (meai_core.embedding_profile.profile_key) the vectors were built with."""
+        self.refresh_if_changed()
+        return self._header.get("embed_model")
+
+    def available(self) -> bool:
+        self.refresh_if_changed()
+        return self._mat is not None and self.count > 0
+
+    def has_collections(self) -> bool:
+        """False for snapshots built before chunks carried a collection; they cannot filter on it."""
+        self.refresh_if_changed()
+        return bool(self._header.get("collections"))
+
+    def load(self) -> None:
+        header = self._read_header()
+        if not header.get("count"):
+            with self._lock:
+                self._mat, self._codes, self._scales, self._meta, self._quality, self._header = None, None, None, [], None, header
+                self._masks = {}
+            return
+        count, dim = int(header["count"]), int(header["dim"])
+        codes, scales = None, None
+        if _is_compact(header):
+            mat = np.memmap(self._path(_full_file(header)), dtype=header["dtype"], mode="r", shape=(count, dim))
+            search_dim = int(header["search_dim"])
+            quantization = header["quantization"]
+            if quantization == "binary":
+                codes = np.memmap(self._path(_vectors_file(header)), dtype=np.uint8, mode="r", shape=(count, (search_dim + 7) // 8))
+            elif quantization == "int8":
+                codes = np.memmap(self._path(_vectors_file(header)), dtype=np.int8, mode="r", shape=(count, search_dim))
+                scales = np.memmap(self._path(_scales_file(header)), dtype=np.float32, mode="r", shape=(count,))
+            else:
+                codes = np.memmap(self._path(_vectors_file(header)), dtype=header["dtype"], mode="r", shape=(count, search_dim))
+        else:
+            mat = np.memmap(self._path(_vectors_file(header)), dtype=header["dtype"], mode="r", shape=(count, dim))
+        meta: List[Dict[str, Any]] = []
+        with open(self._path(_meta_file(header)), "r", encoding="utf-8") as f:
+            for line in f:
+                if len(meta) >= count:
+                    break
+                meta.append(json.loads(line))
+        # snapshots from before quality scoring count as fully usable
+        quality = np.array([1.0 if m.get("quality") is None else m["quality"] for m in meta], dtype=np.float32)
+        with self._lock:
+            self._mat, self._codes, self._scales, self._meta, self._quality, self._header = mat, codes, scales, meta, quality, header
+            self._masks = {}
+            self._header_mtime = os.path.getmtime(self._path(HEADER_FILE))
+
+    def refresh_if_changed(self) -> None:
+        now = time.monotonic()
+        if self._mat is not None and now - self._last_check < RELOAD_CHECK_SEC:
+            return
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self._path(HEADER_FILE))
+        except OSError:
+            return
+        if mtime != self._header_mtime:
+            self.load()
+
+    # ----- search -----
+    def _filter_mask(self, meta: List[Dict[str, Any]], flt: Dict[str, Any]) -> np.ndarray:
+        """Rows matching `flt`, cached until the next load."""
+        files = flt["source_files"]
+        key = (tuple(files) if files is not None else None, flt["collection"])
+        with self._lock:
+            mask = self._masks.get(key) if meta is self._meta else None
+        if mask is not None:
+            return mask
+        mask = np.ones(len(meta), dtype=bool)
+        if files is not None:
+            wanted = set(files)
+            mask &= np.fromiter((m.get("source_file") in wanted for m in meta), dtype=bool, count=len(meta))
+        if flt["collection"] is not None:
+            mask &= np.fromiter((m.get("collection") == flt["collection"] for m in meta), dtype=bool, count=len(meta))
+        with self._lock:
+            if meta is self._meta:
+                if len(self._masks) >= MAX_FILTER_MASKS:
+                    self._masks.clear()
+                self._masks[key] = mask
+        return mask
+
+    def search(
+        self,
+        query_embedding: List[float],
+        k: int = 8,
+        min_quality: float = 0.0,
+        rescore: int = LOCAL_INDEX_RESCORE,
+        source_files: Optional[Iterable[str]] = None,
+        collection: Optional[str] = None,
+        with_vectors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Top-k rows by cosine similarity among rows at or above `min_quality`.
+
+        `source_files` / `collection` (meai_core/chunk_filter.py) restrict the
+        ranking to matching rows, so up to k of them come back. `with_vectors`
+        adds each row's normalized full-precision vector as "embedding"
+        (meai_core/diversify.py uses it).
+        """
+        self.refresh_if_changed()
+        with self._lock:
+            mat, codes, scales, meta, quality, header = self._mat, self._codes, self._scales, self._meta, self._quality, self._header
+        if mat is None or not meta:
+            return []
+        q = np.array(query_embedding, dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+        usable = quality >= min_quality if min_quality > 0 and quality is not None else None
+        flt = normalize_filter(source_files, collection)
+        if is_filtered(flt):
+            mask = self._filter_mask(meta, flt)
+            usable = mask if usable is None else usable & mask
+        if codes is None:
+            scores = self._exact_scores(mat, q)
+            if usable is not None:
+                k = min(k, int(usable.sum()))
+                scores[~usable] = -np.inf
+            if not with_vectors:
+                return self._top_rows(scores, meta, k)
+            top = self._top_k(scores, k)
+            return self._with_vectors([dict(meta[i], similarity=float(scores[i])) for i in top], mat, top)
+
+        approx = self._approx_scores(codes, scales, header["quantization"], q[:int(header["search_dim"])])
+        if usable is not None:
+            k = min(k, int(usable.sum()))
+            approx[~usable] = -np.inf
+        if k <= 0:
+            return []
+        shortlist = np.sort(self._top_k(approx, max(k * rescore, k)))
+        # full-precision rescoring only touches the shortlist's rows
+        exact = mat[shortlist].astype(np.float32, copy=False) @ q
+        if usable is not None:
+            exact[~usable[shortlist]] = -np.inf
+        order = self._top_k(exact, k)
+        rows = [dict(meta[shortlist[i]], similarity=float(exact[i])) for i in order]
+        return self._with_vectors(rows, mat, shortlist[order]) if with_vectors else rows
+
+    @staticmethod
+    def _with_vectors(rows: List[Dict[str, Any]], mat: np.ndarray, idx: np.ndarray) -> List[Dict[str, Any]]:
+        vecs = mat[np.asarray(idx, dtype=np.int64)].astype(np.float32)
+        for r, v in zip(rows, vecs):
+            r["embedding"] = v
+        return rows
+
+    @staticmethod
+    def _exact_scores(mat: np.ndarray, q: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(mat), dtype=np.float32)
+        for start in range(0, len(mat), SEARCH_BLOCK_ROWS):
+            block = mat[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ q
+        return scores
+
+    @staticmethod
+    def _approx_scores(codes: np.ndarray, scales: Optional[np.ndarray], quantization: str, q: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(codes), dtype=np.float32)
+        qbits = encode_binary(q[None, :])[0] if quantization == "binary" else None
+        for start in range(0, len(codes), SEARCH_BLOCK_ROWS):
+            block = codes[start:start + SEARCH_BLOCK_ROWS]
+            end = start + len(block)
+            if qbits is not None:
+                # fewer differing sign bits = more similar
+                scores[start:end] = -POPCOUNT[np.bitwise_xor(block, qbits)].sum(axis=1)
+            elif scales is not None:
+                scores[start:end] = (block.astype(np.float32) @ q) * scales[start:end]
+            else:
+                scores[start:end] = block.astype(np.float32, copy=False) @ q
+        return scores
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first."""
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    @classmethod
+    def _top_rows(cls, scores: np.ndarray, meta: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        return [dict(meta[i], similarity=float(scores[i])) for i in cls._top_k(scores, k)]
+
+    def exact_search(self, query_embedding: List[float], k: int = 8) -> List[Dict[str, Any]]:
+        """Brute force over the full-precision rows; the reference for recall."""
+        self.refresh_if_changed()
+        with self._lock:
+            mat, meta = self._mat, self._meta
+        if mat is None or not meta:
+            return []
+        q = np.array(query_embedding, dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+        return self._top_rows(self._exact_scores(mat, q), meta, k)
+
+    def measure_recall(self, queries: List[List[float]], k: int = 8, rescore: int = LOCAL_INDEX_RESCORE) -> Dict[str, Any]:
+        """recall@k of search() against exact_search(), with per-query latencies."""
+        hits, approx_ms, exact_ms = 0, [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            got = self.search(q, k=k, rescore=rescore)
+            t1 = time.perf_counter()
+            want = self.exact_search(q, k=k)
+            t2 = time.perf_counter()
+            approx_ms.append((t1 - t0) * 1000)
+            exact_ms.append((t2 - t1) * 1000)
+            hits += len({(r["source_file"], r["chunk_index"]) for r in got} & {(r["source_file"], r["chunk_index"]) for r in want})
+        total = max(len(queries) * min(k, self.count), 1)
+        return {
+            "queries": len(queries),
+            "k": k,
+            "rescore": rescore,
+            "recall_at_k": round(hits / total, 4),
+            "search_ms_p50": round(float(np.median(approx_ms)), 3) if approx_ms else None,
+            "exact_ms_p50": round(float(np.median(exact_ms)), 3) if exact_ms else None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            header, mat, codes, scales = dict(self._header), self._mat, self._codes, self._scales
+        out: Dict[str, Any] = {
+            "count": self.count,
+            "dim": header.get("dim"),
+            "search_dim": header.get("search_dim") or header.get("dim"),
+            "dtype": header.get("dtype"),
+            "quantization": header.get("quantization") or "none",
+            "embed_model": header.get("embed_model"),
+        }
+        if mat is not None:
+            search_bytes = (mat if codes is None else codes).nbytes + (scales.nbytes if scales is not None else 0)
+            out["search_bytes"] = int(search_bytes)
+            out["float32_bytes"] = int(mat.shape[0] * mat.shape[1] * 4)
+            out["compression"] = round(out["float32_bytes"] / max(search_bytes, 1), 1)
+        return out
+
+    # ----- building -----
+    def build(
+        self,
+        sb: Any,
+        dtype: str = "float32",
+        embed_model: Optional[str] = None,
+        quantization: str = LOCAL_INDEX_QUANTIZATION,
+        search_dim: int = LOCAL_INDEX_DIMS,
+        embed_column: str = DEFAULT_EMBED_COLUMN,
+    ) -> int:
+        """Full snapshot of meai_chunks; replaces any existing index.
+
+        `search_dim` (0 = full width) truncates the search codes;
+        `quantization` is one of QUANTIZATIONS. Vectors come from
+        `embed_column`, embedded with `embed_model`.
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        os.makedirs(self.index_dir, exist_ok=True)
+        previous = self._read_header()
+        header = {
+            "generation": int(time.time() * 1000), "count": 0, "dim": 0, "search_dim": search_dim,
+            "dtype": dtype, "quantization": quantization, "embed_model": embed_model,
+            "embed_column": embed_column, "collections": True,
+        }
+        for name in _generation_files(header):
+            open(self._path(name), "wb").close()
+        rows = _fetch_pages(sb, _row_columns(header))
+        n = self._append(rows, header)
+        # unlinking is safe for workers that still map the old generation
+        if previous.get("generation") is not None:
+            for name in _generation_files(previous):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+        self.load()
+        return n
+
+    def rebuild(self, sb: Any, embed_model: Optional[str] = None, embed_column: Optional[str] = None) -> int:
+        """Full rebuild keeping the current snapshot's dtype, quantization and width.
+
+        Pass the active profile's model key and column after an embedding switch.
+        """
+        header = self._read_header()
+        # search_dim was clamped to the old width; a new model may be narrower or wider
+        same_space = embed_model is None or embed_model == header.get("embed_model")
+        return self.build(
+            sb,
+            dtype=header.get("dtype") or "float32",
+            embed_model=embed_model or header.get("embed_model"),
+            quantization=header.get("quantization") or LOCAL_INDEX_QUANTIZATION,
+            search_dim=int(header.get("search_dim") or LOCAL_INDEX_DIMS) if same_space else LOCAL_INDEX_DIMS,
+            embed_column=embed_column or header.get("embed_column") or DEFAULT_EMBED_COLUMN,
+        )
+
+    def update(self, sb: Any, embed_model: Optional[str] = None, embed_column: Optional[str] = None) -> int:
+        """Append chunks ingested since the last build/update.
+
+        Only (source_file, chunk_index) keys are listed remotely; full rows are
+        fetched for new keys. Removed or rewritten chunks need a rebuild, and so
+        does a snapshot of another embedding profile than `embed_model`.
+        """
+        header = self._read_header()
+        stale = embed_model is not None and header.get("embed_model") not in (None, embed_model)
+        # snapshots from before chunk collections are rebuilt once so filters see every row
+        if not header.get("count") or stale or not header.get("collections"):
+            return self.rebuild(sb, embed_model, embed_column)
+        self.load()
+        have = {(m["source_file"], m["chunk_index"]) for m in self._meta}
+        missing: Dict[str, List[int]] = {}
+        for r in _fetch_pages(sb, "source_file,chunk_index"):
+            if (r["source_file"], r["chunk_index"]) not in have:
+                missing.setdefault(r["source_file"], []).append(r["chunk_index"])
+        if not missing:
+            return 0
+
+        def _new_rows() -> Iterable[Dict[str, Any]]:
+            for sf, idxs in missing.items():
+                for i in range(0, len(idxs), PAGE_SIZE):
+                    yield from (
+                        sb.table(CHUNKS_TABLE_NAME)
+                        .select(_row_columns(header))
+                        .eq("source_file", sf)
+                        .in_("chunk_index", idxs[i:i + PAGE_SIZE])
+                        .execute()
+                        .data
+                        or []
+                    )
+
+        n = self._append(_new_rows(), header)
+        self.load()
+        return n
+
+    def _truncate_to_count(self, header: Dict[str, Any]) -> None:
+        """Drop rows past header["count"] left behind by an append that died before its header write.
+
+        Readers map exactly `count` rows, so cutting the tail never touches
+        pages another worker is using.
+        """
+        count = int(header.get("count") or 0)
+        dim = int(header.get("dim") or 0)
+        itemsize = np.dtype(header.get("dtype") or "float32").itemsize
+        sizes = {_vectors_file(header): count * dim * itemsize}
+        if dim and _is_compact(header):
+            search_dim = int(header["search_dim"])
+            quantization = header["quantization"]
+            sizes[_full_file(header)] = count * dim * itemsize
+            if quantization == "binary":
+                sizes[_vectors_file(header)] = count * ((search_dim + 7) // 8)
+            elif quantization == "int8":
+                sizes[_vectors_file(header)] = count * search_dim
+                sizes[_scales_file(header)] = count * np.dtype(np.float32).itemsize
+            else:
+                sizes[_vectors_file(header)] = count * search_dim * itemsize
+        with open(self._path(_meta_file(header)), "rb") as f:
+            for _ in range(count):
+                if not f.readline():
+                    break
+            sizes[_meta_file(header)] = f.tell()
+        for name, size in sizes.items():
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _append(self, rows: Iterable[Dict[str, Any]], header: Dict[str, Any]) -> int:
+        self._truncate_to_count(header)
+        added = 0
+        batch_vecs: List[List[float]] = []
+        batch_meta: List[Dict[str, Any]] = []
+
+        def _flush() -> None:
+            nonlocal added
+            if not batch_vecs:
+                return
+            mat = _normalize_rows(np.asarray(batch_vecs, dtype=np.float32))
+            if not header.get("dim"):
+                header["dim"] = int(mat.shape[1])
+                header["search_dim"] = min(int(header.get("search_dim") or 0) or header["dim"], header["dim"])
+                header.setdefault("quantization", "none")
+            if not _is_compact(header):
+                with open(self._path(_vectors_file(header)), "ab") as f:
+                    f.write(mat.astype(header["dtype"]).tobytes())
+            else:
+                with open(self._path(_full_file(header)), "ab") as f:
+                    f.write(mat.astype(header["dtype"]).tobytes())
+                sub = _normalize_rows(mat[:, :header["search_dim"]])
+                if header["quantization"] == "binary":
+                    codes = encode_binary(sub)
+                elif header["quantization"] == "int8":
+                    codes, scales = encode_int8(sub)
+                    with open(self._path(_scales_file(header)), "ab") as f:
+                        f.write(scales.tobytes())
+                else:
+                    codes = sub.astype(header["dtype"])
+                with open(self._path(_vectors_file(header)), "ab") as f:
+                    f.write(codes.tobytes())
+            with open(self._path(_meta_file(header)), "a", encoding="utf-8") as f:
+                for m in batch_meta:
+                    f.write(json.dumps(m) + "\n")
+            added += len(batch_vecs)
+            batch_vecs.clear()
+            batch_meta.clear()
+
+        for r in rows:
+            emb = _parse_embedding(r.get(header.get("embed_column") or DEFAULT_EMBED_COLUMN))
+            if not emb:
+                continue
+            batch_vecs.append(emb)
+            content = r.get("content") or ""
+            quality = r.get("quality")
+            batch_meta.append({
+                "source_file": r.get("source_file"),
+                "chunk_index": r.get("chunk_index"),
+                "content": content,
+                "quality": quality_score(content) if quality is None else float(quality),
+                "collection": r.get("collection"),
+            })
+            if len(batch_vecs) >= PAGE_SIZE:
+                _flush()
+        _flush()
+
+        header["count"] = int(header.get("count") or 0) + added
+        header["built_at"] = time.time()
+        self._write_header(header)
+        return added
+
+def sample_queries(index: LocalVectorIndex, n: int, noise: float = 0.3, seed: int = 0) -> List[List[float]]:
+    """Stored vectors plus gaussian noise: realistic, offline recall queries."""
+    rng = np.random.default_rng(seed)
+    with index._lock:
+        mat = index._mat
+    if mat is None or not len(mat):
+        return []
+    rows = rng.choice(len(mat), size=min(n, len(mat)), replace=False)
+    base = np.asarray(mat[np.sort(rows)], dtype=np.float32)
+    noisy = base + rng.normal(scale=noise / np.sqrt(base.shape[1]), size=base.shape).astype(np.float32)
+    return _normalize_rows(noisy).tolist()
+
+def _arg(argv: List[str], name: str, default: Optional[str] = None) -> Optional[str]:
+    if name in argv and argv.index(name) + 1 < len(argv) and not argv[argv.index(name) + 1].startswith("--"):
+        return argv[argv.index(name) + 1]
+    return default
+
+def main(argv: List[str]) -> None:
+    index = LocalVectorIndex()
+    if "--recall" in argv:
+        index.load()
+        queries = sample_queries(index, int(_arg(argv, "--recall", "200")))
+        report = index.measure_recall(queries, k=int(_arg(argv, "--k", "8")))
+        print(json.dumps({"index": index.stats(), "recall": report}, indent=2))
+        return
+
+    from meai_core.engine import sb, embedding_config
+    from meai_core.embedding_profile import profile_key
+
+    active = embedding_config.active()
+    dtype = "float16" if _arg(argv, "--dtype") == "float16" else "float32"
+    if "--rebuild" in argv:
+        n = index.build(
+            sb,
+            dtype=dtype,
+            embed_model=profile_key(active),
+            quantization=_arg(argv, "--quantize", LOCAL_INDEX_QUANTIZATION),
+            search_dim=int(_arg(argv, "--dims", str(LOCAL_INDEX_DIMS))),
+            embed_column=active["column"],
+        )
+        print(f"Built local index: {n} chunks -> {index.index_dir} {index.stats()}")
+    else:
+        n = index.update(sb, profile_key(active), active["column"])
+        print(f"Updated local index: +{n} chunks (total {index.count}) -> {index.index_dir}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
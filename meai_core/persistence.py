@@ -0,0 +1,188 @@
+# meai_core/persistence.py
+import os, json, time, queue, atexit, logging, threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable
+
+logger = logging.getLogger("meai_core.persistence")
+
+# ========= config =========
+WRITE_BEHIND_ENABLED = os.getenv("MEAI_WRITE_BEHIND") == "1"
+WRITE_BEHIND_BATCH = int(os.getenv("MEAI_WRITE_BEHIND_BATCH", "50"))
+WRITE_BEHIND_INTERVAL_SEC = float(os.getenv("MEAI_WRITE_BEHIND_INTERVAL_SEC", "0.5"))
+WRITE_BEHIND_RETRIES = 3
+KNOWN_SESSIONS_MAX = 10000
+DEAD_LETTER_PATH = os.path.join(os.path.dirname(__file__), "logs", "failed_writes.jsonl")
+
+RowsWriter = Callable[[List[Dict[str, Any]]], None]
+
+class WriteBehindWriter:
+    """Moves session upserts and message inserts off the request path.
+
+    Callers get their message id back immediately; a daemon thread flushes
+    queued rows as bulk writes when `batch_size` rows are pending or every
+    `flush_interval_sec`. Sessions are always written before the messages of
+    the same flush so the foreign key holds. Failed batches are retried with
+    backoff and then appended to a local dead-letter file. Pending rows are
+    drained at interpreter exit.
+
+    Independently of write-behind, `seen_session` lets callers skip the
+    upsert for sessions this process has already written.
+    """
+
+    def __init__(
+        self,
+        write_sessions: RowsWriter,
+        write_messages: RowsWriter,
+        enabled: bool = WRITE_BEHIND_ENABLED,
+        batch_size: int = WRITE_BEHIND_BATCH,
+        flush_interval_sec: float = WRITE_BEHIND_INTERVAL_SEC,
+        max_retries: int = WRITE_BEHIND_RETRIES,
+        dead_letter_path: Optional[str] = DEAD_LETTER_PATH,
+    ):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self._write_sessions = write_sessions
+        self._write_messages = write_messages
+        self._known: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._known_lock = threading.Lock()
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats = {"queued": 0, "flushes": 0, "rows_written": 0, "retries": 0, "dead_lettered": 0, "sessions_skipped": 0}
+
+    # ----- known sessions -----
+    def seen_session(self, payload: Dict[str, Any]) -> bool:
+        with self._known_lock:
+            sid = payload["id"]
+            if sid in self._known and self._known[sid] == payload.get("tester_label"):
+                self._known.move_to_end(sid)
+                self._stats["sessions_skipped"] += 1
+                return True
+            return False
+
+    def remember_session(self, payload: Dict[str, Any]) -> None:
+        with self._known_lock:
+            self._known[payload["id"]] = payload.get("tester_label")
+            self._known.move_to_end(payload["id"])
+            while len(self._known) > KNOWN_SESSIONS_MAX:
+                self._known.popitem(last=False)
+
+    def forget_sessions(self, session_ids: List[str]) -> None:
+        with self._known_lock:
+            for sid in session_ids:
+                self._known.pop(sid, None)
+
+    # ----- queueing -----
+    def submit_session(self, payload: Dict[str, Any]) -> None:
+        self._ensure_started()
+        self.remember_session(payload)
+        self._queue.put(("session", payload))
+        self._stats["queued"] += 1
+
+    def submit_message(self, row: Dict[str, Any]) -> None:
+        self._ensure_started()
+        self._queue.put(("message", row))
+        self._stats["queued"] += 1
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Block until everything queued before this call has been written."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._queue.put(("stop", None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._stats)
+        out["enabled"] = self.enabled
+        out["pending"] = self._queue.qsize()
+        return out
+
+    # ----- worker -----
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="meai-write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        sessions: Dict[str, Dict[str, Any]] = {}
+        messages: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval_sec
+        while True:
+            try:
+                kind, item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                kind, item = None, None
+
+            if kind == "session":
+                sessions[item["id"]] = item
+            elif kind == "message":
+                messages.append(item)
+
+            pending = len(sessions) + len(messages)
+            due = time.monotonic() >= deadline
+            if kind in ("flush", "stop") or pending >= self.batch_size or (due and pending):
+                self._flush(list(sessions.values()), messages)
+                sessions, messages = {}, []
+            if due or kind in ("flush", "stop"):
+                deadline = time.monotonic() + self.flush_interval_sec
+            if kind == "flush":
+                item.set()
+            elif kind == "stop":
+                return
+
+    def _flush(self, sessions: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> None:
+        if not sessions and not messages:
+            return
+        self._stats["flushes"] += 1
+        if sessions and not self._write_with_retry(self._write_sessions, sessions, "session"):
+            # messages would violate the session foreign key; keep them with the sessions
+            self.forget_sessions([s["id"] for s in sessions])
+            self._dead_letter("message", messages)
+            return
+        if messages:
+            self._write_with_retry(self._write_messages, messages, "message")
+
+    def _write_with_retry(self, writer: RowsWriter, rows: List[Dict[str, Any]], kind: str) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                writer(rows)
+                self._stats["rows_written"] += len(rows)
+                return True
+            except Exception:
+                if attempt == self.max_retries:
+                    logger.exception("write-behind %s batch failed after %s attempts", kind, attempt + 1)
+                    break
+                self._stats["retries"] += 1
+                time.sleep(min(0.25 * (2 ** attempt), 5.0))
+        self._dead_letter(kind, rows)
+        return False
+
+    def _dead_letter(self, kind: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        self._stats["dead_lettered"] += len(rows)
+        if not self.dead_letter_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for r in rows:
+                    f.write(json.dumps({"kind": kind, "row": r}) + "\n")
+        except OSError:
+            logger.exception("write-behind dead-letter write failed")
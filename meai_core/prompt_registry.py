@@ -0,0 +1,134 @@
+# meai_core/prompt_registry.py
+import os, glob, time, hashlib, logging, threading
+from string import Formatter
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger("meai_core.prompt_registry")
+
+# ========= config =========
+# how often get() re-stats the files; edits show up within this window
+PROMPT_RELOAD_CHECK_SEC = float(os.getenv("MEAI_PROMPT_RELOAD_CHECK_SEC", "2"))
+
+class PromptTemplate:
+    """A str.format template split once into literal and field parts.
+
+    `prefix` is the static text before the first field. render() joins the
+    pre-split parts instead of re-parsing the template on every call.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(template)
+        ]
+        self.fields = [f for _, f in self._parts if f is not None]
+        self.prefix = self._parts[0][0] if self._parts else ""
+
+    def render(self, **values: Any) -> str:
+        out: List[str] = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(values[field]))
+        return "".join(out)
+
+class PromptRegistry:
+    """Prompt files held in memory, reloaded only when they change on disk.
+
+    Every `*.txt` in `prompt_dir` is registered under its stem, plus any
+    `extra_files` (name -> path). Files are re-stat'ed at most every
+    `check_interval_sec`; a file is re-read when its mtime or size changes
+    and swapped in when its content hash differs. `version()` is a hash over
+    all contents, for cache keys that must change with the prompts.
+    """
+
+    def __init__(self, prompt_dir: str, extra_files: Optional[Dict[str, str]] = None, check_interval_sec: float = PROMPT_RELOAD_CHECK_SEC):
+        self.prompt_dir = prompt_dir
+        self.extra_files = dict(extra_files or {})
+        self.check_interval_sec = check_interval_sec
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._version = ""
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "reloads": 0, "checks": 0}
+
+    def _paths(self) -> Dict[str, str]:
+        paths = {
+            os.path.splitext(os.path.basename(p))[0]: p
+            for p in sorted(glob.glob(os.path.join(self.prompt_dir, "*.txt")))
+        }
+        paths.update(self.extra_files)
+        return paths
+
+    def _sync(self) -> None:
+        """Re-stat all files and reload the changed ones. Caller holds the lock."""
+        changed = False
+        paths = self._paths()
+        for name in [n for n in self._entries if n not in paths]:
+            del self._entries[name]
+            changed = True
+        for name, path in paths.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                if self._entries.pop(name, None) is not None:
+                    changed = True
+                continue
+            old = self._entries.get(name)
+            if old and (old["mtime_ns"], old["size"]) == (st.st_mtime_ns, st.st_size):
+                continue
+            with open(path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha1(raw).hexdigest()
+            if old and old["sha1"] == digest:
+                old["mtime_ns"], old["size"] = st.st_mtime_ns, st.st_size
+                continue
+            self._entries[name] = {
+                "path": path,
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "sha1": digest,
+                "text": raw.decode("utf-8").strip(),
+            }
+            if old:
+                self._stats["reloads"] += 1
+                logger.info("prompt %s reloaded", name)
+            changed = True
+        if changed or not self._version:
+            self._version = hashlib.sha1(
+                "|".join(f"{n}:{e['sha1']}" for n, e in sorted(self._entries.items())).encode("utf-8")
+            ).hexdigest()
+        self._checked_at = time.monotonic()
+        self._stats["checks"] += 1
+
+    def load(self) -> None:
+        """Read everything now (startup preload)."""
+        with self._lock:
+            self._sync()
+            self._stats["loads"] += 1
+
+    def _maybe_sync(self) -> None:
+        with self._lock:
+            if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval_sec:
+                self._sync()
+
+    def get(self, name: str) -> str:
+        self._maybe_sync()
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            path = self.extra_files.get(name) or os.path.join(self.prompt_dir, f"{name}.txt")
+            raise FileNotFoundError(f"Missing prompt file: {path}")
+        return entry["text"]
+
+    def version(self) -> str:
+        self._maybe_sync()
+        with self._lock:
+            return self._version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["prompts"] = sorted(self._entries)
+            out["version"] = self._version
+        return out
@@ -0,0 +1,210 @@
+# meai_core/rule_validator.py
+import os, re, random, logging, threading
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple, Set
+
+logger = logging.getLogger("meai_core.rule_validator")
+
+# ========= config =========
+RULE_VALIDATOR_ENABLED = os.getenv("MEAI_RULE_VALIDATOR", "1") == "1"
+# fraction of rule-passed answers also sent to the LLM validator for auditing
+VALIDATOR_AUDIT_RATE = float(os.getenv("MEAI_VALIDATOR_AUDIT_RATE", "0.05"))
+CITATIONS_TAIL_LINES = 15
+# verbatim runs are found through shared word k-grams, so runs shorter than this many words go unseen
+VERBATIM_SHINGLE_WORDS = 4
+
+# [source_file:chunk_index]; requiring a file extension keeps ratios like [1:2] out
+DOC_TAG_RE = re.compile(r"\[([^\[\]\n]+?\.[A-Za-z0-9]+):(\d+)\]")
+VENDOR_TAG = "[VENDOR_TABLE]"
+CITATIONS_HEADER_RE = re.compile(r"^\W*citations\W*:", re.IGNORECASE)
+
+def cited_doc_tags(answer: str) -> List[str]:
+    return list(dict.fromkeys(f"[{m.group(1).strip()}:{m.group(2)}]" for m in DOC_TAG_RE.finditer(answer or "")))
+
+def has_citations_section(answer: str) -> bool:
+    tail = (answer or "").strip().splitlines()[-CITATIONS_TAIL_LINES:]
+    return any(CITATIONS_HEADER_RE.match(line) for line in tail)
+
+def with_citations_section(answer: str) -> str:
+    """Append a "Citations:" line built from the tags the answer cites when the model left it out."""
+    if has_citations_section(answer):
+        return answer
+    tags = cited_doc_tags(answer) + ([VENDOR_TAG] if VENDOR_TAG in (answer or "") else [])
+    return (answer or "").rstrip() + "\n\nCitations: " + (", ".join(tags) if tags else "None")
+
+def parse_verbatim_limits(license_block: str) -> Dict[str, Optional[int]]:
+    """source_file -> max verbatim chars from a rendered license block.
+
+    None means quoting is allowed without a limit; 0 means quoting is not
+    allowed and the block gives no explicit limit for the source.
+    """
+    limits: Dict[str, Optional[int]] = {}
+    current: Optional[str] = None
+    for line in (license_block or "").splitlines():
+        m = re.match(r"^- (.+?)(?: \| title: .*|: no document record found\..*)$", line)
+        if m:
+            current = m.group(1)
+            limits[current] = 0
+            continue
+        if current is None:
+            continue
+        key, _, val = line.strip().partition(": ")
+        if key == "verbatim_allowed":
+            limits[current] = None if val == "True" else 0
+        elif key == "verbatim_char_limit":
+            try:
+                limits[current] = int(float(val))
+            except ValueError:
+                pass
+    return limits
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+def longest_verbatim_run(answer: str, source_text: str, k: int = VERBATIM_SHINGLE_WORDS) -> int:
+    """Characters in the longest word run the answer shares with the source, in linear time.
+
+    Word k-grams of the source are hashed by position; each answer k-gram
+    extends the runs that ended one word earlier at the previous source
+    position, so only matching positions are ever visited.
+    """
+    squashed = _squash(answer)
+    spans = [m.span() for m in re.finditer(r"\S+", squashed)]
+    a_words = [squashed[s:e] for s, e in spans]
+    b_words = _squash(source_text).split()
+    if len(a_words) < k or len(b_words) < k:
+        return 0
+    grams: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+    for j in range(len(b_words) - k + 1):
+        grams[tuple(b_words[j:j + k])].append(j)
+    best = 0
+    runs: Dict[int, int] = {}  # source position -> first answer word of the run ending here
+    for i in range(len(a_words) - k + 1):
+        hits = grams.get(tuple(a_words[i:i + k]))
+        if not hits:
+            runs = {}
+            continue
+        runs = {j: runs.get(j - 1, i) for j in hits}
+        start = min(runs.values())
+        best = max(best, spans[i + k - 1][1] - spans[start][0])
+    return best
+
+def check_answer(
+    answer: str,
+    retrieved_tags: List[str],
+    used_vendors: bool,
+    license_block: str = "",
+    context_rows: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    issues: List[str] = []
+    allowed = set(retrieved_tags or [])
+    cited = cited_doc_tags(answer)
+
+    unknown = [t for t in cited if t not in allowed]
+    if unknown:
+        issues.append("Cites tags that were not retrieved: " + ", ".join(unknown))
+    if VENDOR_TAG in (answer or "") and not used_vendors:
+        issues.append("Cites [VENDOR_TABLE] but no vendor table was provided.")
+    if not has_citations_section(answer):
+        issues.append('Missing trailing "Citations:" section.')
+
+    limits = parse_verbatim_limits(license_block)
+    undecided: Set[str] = set()
+    for sf, limit in _source_limits(context_rows, limits):
+        if not limit:
+            # quoting not allowed and no limit given: only the LLM can tell a quote from shared phrasing
+            undecided.add(sf)
+            continue
+        text = "\n".join(r.get("content") or "" for r in context_rows or [] if r.get("source_file") == sf)
+        run = longest_verbatim_run(answer, text)
+        if run > limit:
+            issues.append(f"Quotes {run} consecutive characters from {sf}; license allows at most {limit}.")
+
+    conclusive = bool(issues) or (not undecided and (not allowed or bool(set(cited) & allowed)))
+    return {"ok": not issues, "issues": issues, "conclusive": conclusive}
+
+def _source_limits(context_rows: Optional[List[Dict[str, Any]]], limits: Dict[str, Optional[int]]) -> List[Tuple[str, Optional[int]]]:
+    out: List[Tuple[str, Optional[int]]] = []
+    for sf in dict.fromkeys(r.get("source_file") for r in context_rows or []):
+        if sf is None:
+            continue
+        # sources missing from the block are treated as strict, like the block itself does
+        limit = limits.get(sf, 0)
+        if limit is not None:
+            out.append((sf, limit))
+    return out
+
+class RuleValidator:
+    """Deterministic fast path in front of the LLM validator.
+
+    Checks citation tags against retrieved_tags, the trailing "Citations:"
+    section, [VENDOR_TABLE] use and verbatim quoting against the license
+    block. A missing "Citations:" section is appended from the cited tags
+    instead of costing a fix completion; the caller uses the returned
+    "answer". Any other rule violation is conclusive. A clean answer is
+    conclusive unless context was retrieved and none of it is cited, or a
+    no-quote source has no limit in the block, since only the LLM can judge
+    those. Conclusive passes are still sent to the LLM validator at
+    `audit_rate` (drawn from `rng`) so rule drift shows up in stats.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = RULE_VALIDATOR_ENABLED,
+        audit_rate: float = VALIDATOR_AUDIT_RATE,
+        rng: Optional[random.Random] = None,
+    ):
+        self.enabled = enabled
+        self.audit_rate = audit_rate
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._stats = {"rule_pass": 0, "rule_fail": 0, "inconclusive": 0, "audits": 0, "audit_disagreements": 0}
+
+    def check(
+        self,
+        answer: str,
+        retrieved_tags: List[str],
+        used_vendors: bool,
+        license_block: str = "",
+        context_rows: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """Rule verdict plus "validator": "rules" (final), "llm" or "audit" (call the LLM next), and "answer"."""
+        if not self.enabled:
+            return {"ok": True, "issues": [], "conclusive": False, "validator": "llm", "answer": answer}
+        answer = with_citations_section(answer)
+        verdict = check_answer(answer, retrieved_tags, used_vendors, license_block, context_rows)
+        verdict["answer"] = answer
+        with self._lock:
+            if not verdict["conclusive"]:
+                self._stats["inconclusive"] += 1
+                verdict["validator"] = "llm"
+            elif not verdict["ok"]:
+                self._stats["rule_fail"] += 1
+                verdict["validator"] = "rules"
+            else:
+                self._stats["rule_pass"] += 1
+                audit = self._rng.random() < self.audit_rate
+                if audit:
+                    self._stats["audits"] += 1
+                verdict["validator"] = "audit" if audit else "rules"
+        return verdict
+
+    def reconcile(self, verdict: Dict[str, Any], llm_check: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine a rule verdict with the LLM validator result; the stricter one wins."""
+        llm_ok = bool(llm_check.get("ok", True))
+        if verdict["validator"] == "audit" and not llm_ok:
+            with self._lock:
+                self._stats["audit_disagreements"] += 1
+            logger.info("rule validator passed an answer the LLM rejected: %s", llm_check.get("issues"))
+        return {
+            "ok": verdict["ok"] and llm_ok,
+            "issues": list(verdict["issues"]) + list(llm_check.get("issues") or []),
+            "validator": verdict["validator"],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["enabled"] = self.enabled
+        out["audit_rate"] = self.audit_rate
+        return out
@@ -0,0 +1,228 @@
+# meai_core/vendor_index.py
+import os, re, math, time, json, hashlib, logging, threading
+from collections import Counter, defaultdict
+from typing import Optional, Dict, Any, List, Set, Callable
+
+logger = logging.getLogger("meai_core.vendor_index")
+
+# ========= config =========
+VENDOR_INDEX_ENABLED = os.getenv("MEAI_VENDOR_INDEX", "1") == "1"
+VENDOR_INDEX_TTL_SEC = float(os.getenv("MEAI_VENDOR_INDEX_TTL_SEC", "600"))
+RETRY_AFTER_ERROR_SEC = 30.0
+
+# searchable fields and their BM25 weights (industries is a filter, not scored)
+FIELD_WEIGHTS = {"capabilities": 2.0, "category": 1.5, "description": 1.0, "notes": 0.5}
+BM25_K1 = 1.2
+BM25_B = 0.75
+FUZZY_MIN_SIMILARITY = 0.5
+FUZZY_WEIGHT = 0.5
+
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "of", "to", "in", "on", "with", "who", "that", "can",
+    "some", "any", "our", "my", "me", "we", "i", "is", "are", "be", "do", "does", "or",
+}
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if t not in STOPWORDS]
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _vendor_id(v: Dict[str, Any]) -> str:
+    return str(v.get("id") or v.get("name") or v.get("vendor_name") or json.dumps(v, sort_keys=True, default=str))
+
+def _fingerprint(v: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(v, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class VendorIndex:
+    """In-memory BM25 index over vendors_core with trigram fuzzy matching.
+
+    Capability terms are scored with field-weighted BM25 over capabilities,
+    category, description and notes. Query terms missing from the vocabulary
+    are expanded to similar vocabulary tokens by trigram overlap ("machinist"
+    still finds "machining"). Industries are applied as substring filters,
+    matching the ilike semantics of the Supabase query. Loads run on a
+    background thread; until the first one lands `search` returns None and
+    callers use the Supabase query. Refreshes re-index only rows whose
+    content changed.
+    """
+
+    def __init__(self, load_vendors: Callable[[], List[Dict[str, Any]]], enabled: bool = VENDOR_INDEX_ENABLED, ttl_sec: float = VENDOR_INDEX_TTL_SEC):
+        self.enabled = enabled
+        self.ttl_sec = ttl_sec
+        self._load_vendors = load_vendors
+        self._lock = threading.Lock()
+        self._vendors: Dict[str, Dict[str, Any]] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._order: List[str] = []
+        self._tf: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._error_at = -RETRY_AFTER_ERROR_SEC
+        self._refreshing = False
+        self._stats = {"loads": 0, "load_errors": 0, "searches": 0, "fallbacks": 0, "reindexed": 0}
+
+    # ----- indexing -----
+    def _weighted_terms(self, v: Dict[str, Any]) -> Counter:
+        tf: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for t in tokenize(str(v.get(field) or "")):
+                tf[t] += weight
+        return tf
+
+    def _remove(self, vid: str) -> None:
+        for t in self._tf.pop(vid, {}):
+            self._postings[t].discard(vid)
+            if not self._postings[t]:
+                del self._postings[t]
+                for g in trigrams(t):
+                    self._trigrams[g].discard(t)
+        self._doc_len.pop(vid, None)
+        self._vendors.pop(vid, None)
+        self._fingerprints.pop(vid, None)
+
+    def _add(self, vid: str, v: Dict[str, Any], fp: str) -> None:
+        tf = self._weighted_terms(v)
+        self._vendors[vid] = v
+        self._fingerprints[vid] = fp
+        self._tf[vid] = tf
+        self._doc_len[vid] = float(sum(tf.values()))
+        for t in tf:
+            if not self._postings[t]:
+                for g in trigrams(t):
+                    self._trigrams[g].add(t)
+            self._postings[t].add(vid)
+
+    def apply(self, vendors: List[Dict[str, Any]]) -> int:
+        """Sync the index to `vendors`; returns how many rows were (re)indexed."""
+        incoming = {_vendor_id(v): v for v in vendors}
+        changed = 0
+        with self._lock:
+            for vid in [vid for vid in self._vendors if vid not in incoming]:
+                self._remove(vid)
+                changed += 1
+            for vid, v in incoming.items():
+                fp = _fingerprint(v)
+                if self._fingerprints.get(vid) == fp:
+                    continue
+                self._remove(vid)
+                self._add(vid, v, fp)
+                changed += 1
+            self._order = list(incoming)
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self._stats["reindexed"] += changed
+        return changed
+
+    def refresh(self) -> bool:
+        try:
+            self.apply(self._load_vendors())
+        except Exception:
+            logger.exception("vendor index load failed")
+            with self._lock:
+                self._stats["load_errors"] += 1
+                self._error_at = time.monotonic()
+                self._refreshing = False
+            return False
+        with self._lock:
+            self._stats["loads"] += 1
+            self._refreshing = False
+        return True
+
+    def warm(self) -> None:
+        if self.enabled:
+            self._refresh_in_background()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = -self.ttl_sec
+
+    # ----- search -----
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Query term -> {vocab token: weight}; exact match or trigram neighbours."""
+        if term in self._postings:
+            return {term: 1.0}
+        grams = trigrams(term)
+        overlap: Counter = Counter()
+        for g in grams:
+            for t in self._trigrams.get(g, ()):
+                overlap[t] += 1
+        out: Dict[str, float] = {}
+        for t, shared in overlap.items():
+            sim = shared / float(len(grams | trigrams(t)))
+            if sim >= FUZZY_MIN_SIMILARITY:
+                out[t] = FUZZY_WEIGHT * sim
+        return out
+
+    def search(self, industries: Optional[List[str]] = None, capability: Optional[str] = None, max_results: int = 8) -> Optional[List[Dict[str, Any]]]:
+        """Ranked vendors, or None when the index is not usable (caller falls back)."""
+        if not self._ready():
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return None
+        with self._lock:
+            self._stats["searches"] += 1
+            candidates = [vid for vid in self._order if self._industries_match(self._vendors[vid], industries)]
+            terms = tokenize(capability or "")
+            if not terms:
+                return [self._vendors[vid] for vid in candidates[:max_results]]
+
+            n = len(self._vendors)
+            avg_len = (sum(self._doc_len.values()) / n) if n else 0.0
+            allowed = set(candidates)
+            scores: Dict[str, float] = defaultdict(float)
+            for term in dict.fromkeys(terms):
+                for tok, qweight in self._expand(term).items():
+                    posting = self._postings[tok] & allowed
+                    if not posting:
+                        continue
+                    idf = math.log(1.0 + (n - len(self._postings[tok]) + 0.5) / (len(self._postings[tok]) + 0.5))
+                    for vid in posting:
+                        tf = self._tf[vid][tok]
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[vid] / (avg_len or 1.0))
+                        scores[vid] += qweight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+            position = {vid: i for i, vid in enumerate(self._order)}
+            ranked = sorted(scores, key=lambda vid: (-scores[vid], position[vid]))
+            return [self._vendors[vid] for vid in ranked[:max_results]]
+
+    @staticmethod
+    def _industries_match(v: Dict[str, Any], industries: Optional[List[str]]) -> bool:
+        if not industries:
+            return True
+        field = str(v.get("industries") or "").lower()
+        return all(t.lower() in field for t in industries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["vendors"] = len(self._vendors)
+            out["terms"] = len(self._postings)
+        out["enabled"] = self.enabled
+        return out
+
+    # ----- refresh scheduling -----
+    def _ready(self) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            loaded = self._loaded
+            due = time.monotonic() - self._loaded_at > self.ttl_sec
+            backing_off = time.monotonic() - self._error_at < RETRY_AFTER_ERROR_SEC
+        if (not loaded or due) and not backing_off:
+            self._refresh_in_background()
+        return loaded
+
+    def _claim_refresh(self) -> bool:
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def _refresh_in_background(self) -> None:
+        if self._claim_refresh():
+            threading.Thread(target=self.refresh, name="meai-vendor-index", daemon=True).start()
@@ -1,12 +1,15 @@
 # meai_web/server.py
 import os
+import json
 import uuid
 import time
 import logging
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any, List, Literal
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
@@ -14,12 +17,33 @@ from pydantic import BaseModel, Field
 
 from meai_web.math_engine import solve_expr, simplify_expr
 from meai_web.routers.chat_history import router as chat_history_router
-from meai_core.engine import rag_answer, sb, FEEDBACK_TABLE_NAME, build_engineering_notes_md
+from meai_core.engine import (
+    rag_answer,
+    rag_answer_async,
+    rag_answer_stream,
+    rag_answer_batch,
+    batch_summary,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    sb,
+    FEEDBACK_TABLE_NAME,
+    build_engineering_notes_md,
+    cache_stats,
+    warm_caches,
+    persistence,
+)
 
 # -----------------------------
 # App setup
 # -----------------------------
-app = FastAPI(title="ME AI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_caches()
+    yield
+    persistence.close()
+
+
+app = FastAPI(title="ME AI", lifespan=lifespan)
 
 logger = logging.getLogger("meai_web.server")
 
@@ -28,6 +52,8 @@ print(f"DEBUG_RAG={os.getenv('DEBUG_RAG')}", flush=True)
 HERE = os.path.dirname(__file__)  # .../meai/meai_web
 PROJECT_ROOT = os.path.abspath(os.path.join(HERE, ".."))
 START_TIME = time.monotonic()
+# MEAI_ASYNC_PIPELINE=1 serves /api/ask from the concurrent rag_answer_async pipeline
+ASYNC_PIPELINE = os.getenv("MEAI_ASYNC_PIPELINE") == "1"
 
 templates = Jinja2Templates(directory=os.path.join(HERE, "templates"))
 
@@ -109,6 +135,13 @@ def api_health():
     uptime_seconds = time.monotonic() - START_TIME
     return {"status": "ok", "service": "meai", "git_sha": get_git_sha(), "uptime_seconds": uptime_seconds}
 
+@app.get("/api/stats")
+def api_stats():
+    # internal cache and index counters; only served when RAG debugging is on, like the RAG debug logs
+    if os.getenv("DEBUG_RAG") != "1":
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {"caches": cache_stats()}
+
 
 # -----------------------------
 # Web UI
@@ -137,6 +170,19 @@ class AskResponse(BaseModel):
     request_id: Optional[str] = None
 
 
+class BatchItem(BaseModel):
+    mode: Mode
+    message: str = Field(min_length=1)
+    # numeric ids are accepted and returned as strings, like the CLI's --batch files
+    id: Optional[str] = Field(default=None, coerce_numbers_to_str=True)
+    session_id: Optional[str] = None
+
+
+class AskBatchRequest(BaseModel):
+    items: List[BatchItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: int = Field(default=BATCH_CONCURRENCY, ge=1, le=32)
+
+
 class FeedbackRequest(BaseModel):
     session_id: str
     message_id: Optional[str] = None
@@ -154,14 +200,22 @@ class MathRequest(BaseModel):
 # API routes
 # -----------------------------
 @app.post("/api/ask", response_model=AskResponse)
-def ask(req: AskRequest, request: Request):
+async def ask(req: AskRequest, request: Request):
     try:
         request_id = getattr(request.state, "request_id", None)
-        answer, citations, debug = rag_answer(
-            mode=req.mode,
-            message=req.message,
-            session_id=req.session_id,
-        )
+        if ASYNC_PIPELINE:
+            answer, citations, debug = await rag_answer_async(
+                mode=req.mode,
+                message=req.message,
+                session_id=req.session_id,
+            )
+        else:
+            answer, citations, debug = await run_in_threadpool(
+                rag_answer,
+                mode=req.mode,
+                message=req.message,
+                session_id=req.session_id,
+            )
         return AskResponse(
             answer=answer,
             citations=citations or [],
@@ -173,6 +227,53 @@ def ask(req: AskRequest, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/ask/stream")
+def ask_stream(req: AskRequest, request: Request):
+    request_id = getattr(request.state, "request_id", None)
+
+    def events():
+        try:
+            for event, data in rag_answer_stream(
+                mode=req.mode,
+                message=req.message,
+                session_id=req.session_id,
+            ):
+                yield _sse(event, data)
+            yield _sse("done", {"request_id": request_id})
+        except Exception as e:
+            logger.exception("ASK STREAM ERROR")
+            yield _sse("error", {"detail": str(e), "request_id": request_id})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@app.post("/api/ask/batch")
+async def ask_batch(req: AskBatchRequest, request: Request):
+    """One JSON line per item as it finishes (completion order), then a {"summary": ...} line."""
+    request_id = getattr(request.state, "request_id", None)
+    items = [item.model_dump(exclude_none=True) for item in req.items]
+
+    async def lines():
+        start = time.perf_counter()
+        results = []
+        try:
+            async for result in rag_answer_batch(items, concurrency=req.concurrency):
+                results.append(result)
+                yield json.dumps(result) + "\n"
+            summary = batch_summary(results, int((time.perf_counter() - start) * 1000))
+            yield json.dumps({"summary": summary, "request_id": request_id}) + "\n"
+        except Exception as e:
+            logger.exception("ASK BATCH ERROR")
+            yield json.dumps({"error": str(e), "request_id": request_id}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
 @app.post("/api/feedback")
 def feedback(req: FeedbackRequest, request: Request):
     if req.score is not None and req.score not in (-1, 0, 1):
@@ -136,13 +136,21 @@ function queueTypeset(target) {
   }, 120);
 }
 
-function addBubble(role, text, citations) {
+function createBubble(role) {
   const row = document.createElement("div");
   row.className = `bubble-row ${role}`;
 
   const bubble = document.createElement("div");
   bubble.className = `bubble ${role}`;
 
+  row.appendChild(bubble);
+  elChat.appendChild(row);
+  return bubble;
+}
+
+function fillBubble(bubble, role, text, citations) {
+  bubble.innerHTML = "";
+
   const safeText = role === "assistant" ? convertBracketMath(text) : text;
   bubble.appendChild(renderMarkdown(safeText));
 
@@ -177,13 +185,77 @@ function addBubble(role, text, citations) {
     bubble.appendChild(c);
   }
 
-  row.appendChild(bubble);
-  elChat.appendChild(row);
-
   queueTypeset(bubble);
   scrollToBottom();
 }
 
+function addBubble(role, text, citations) {
+  fillBubble(createBubble(role), role, text, citations);
+}
+
+// Assistant bubble that re-renders as tokens arrive; math and citations are
+// rendered once, in finish().
+function createStreamingBubble() {
+  removeThinking();
+  const bubble = createBubble("assistant");
+  let text = "";
+  let frame = null;
+
+  const render = () => {
+    frame = null;
+    bubble.replaceChildren(renderMarkdown(text));
+    scrollToBottom();
+  };
+  const schedule = () => {
+    if (!frame) frame = window.requestAnimationFrame(render);
+  };
+
+  return {
+    append(delta) {
+      text += delta;
+      schedule();
+    },
+    replace(full) {
+      text = full;
+      schedule();
+    },
+    text() {
+      return text;
+    },
+    finish(citations) {
+      if (frame) window.cancelAnimationFrame(frame);
+      frame = null;
+      fillBubble(bubble, "assistant", text, citations);
+    },
+  };
+}
+
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buf.indexOf("\n\n")) !== -1) {
+      const block = buf.slice(0, sep);
+      buf = buf.slice(sep + 2);
+
+      let event = "message";
+      const data = [];
+      block.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+      });
+      if (data.length) onEvent(event, JSON.parse(data.join("\n")));
+    }
+  }
+}
+
 function addThinking() {
   removeThinking();
   const row = document.createElement("div");
@@ -391,7 +463,7 @@ async function sendMessage() {
       return;
     }
 
-    const res = await fetch("/api/ask", {
+    const res = await fetch("/api/ask/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
@@ -401,26 +473,46 @@ async function sendMessage() {
       }),
     });
 
-    const raw = await res.text();
-    let data = {};
-    try {
-      data = raw ? JSON.parse(raw) : {};
-    } catch {
-      data = {};
-    }
-
-    removeThinking();
-
-    if (!res.ok) {
+    if (!res.ok || !res.body) {
+      const raw = await res.text();
+      let data = {};
+      try {
+        data = raw ? JSON.parse(raw) : {};
+      } catch {
+        data = {};
+      }
+      removeThinking();
       let detail = data.detail ?? raw ?? `HTTP ${res.status}`;
       if (typeof detail === "object") detail = JSON.stringify(detail, null, 2);
       addBubble("assistant", `Error: ${detail}`);
-    } else {
-      addBubble("assistant", data.answer || "", data.citations || []);
-      if (historyOk && activeChatId) {
-        await appendMessage(activeChatId, "assistant", data.answer || "");
-        await refreshChatList({ preserveSelection: true });
+      return;
+    }
+
+    let stream = null;
+    let citations = [];
+    let error = null;
+    await readEventStream(res, (event, data) => {
+      if (event === "token") {
+        if (!stream) stream = createStreamingBubble();
+        stream.append(data);
+      } else if (event === "replace") {
+        if (!stream) stream = createStreamingBubble();
+        stream.replace(data);
+      } else if (event === "citations") {
+        citations = data || [];
+      } else if (event === "error") {
+        error = data && data.detail ? data.detail : "stream error";
       }
+    });
+
+    removeThinking();
+    if (!stream) stream = createStreamingBubble();
+    if (error && !stream.text()) stream.replace(`Error: ${error}`);
+    stream.finish(citations);
+
+    if (!error && historyOk && activeChatId) {
+      await appendMessage(activeChatId, "assistant", stream.text());
+      await refreshChatList({ preserveSelection: true });
     }
   } catch (e) {
     removeThinking();
@@ -0,0 +1,31 @@
+from meai_core.answer_cache import SemanticAnswerCache
+
+
+def test_lookup_requires_same_bucket_and_similarity():
+    cache = SemanticAnswerCache(enabled=True, threshold=0.9, max_items=4, ttl_sec=60)
+    cache.store([1.0, 0.0], "mode_1", ["a.pdf", "b.pdf"], "v1", {"answer": "x"})
+
+    hit = cache.lookup([0.95, 0.1], "mode_1", ["b.pdf", "a.pdf"], "v1")
+    assert hit["payload"] == {"answer": "x"}
+    assert hit["similarity"] > 0.9
+
+    assert cache.lookup([0.0, 1.0], "mode_1", ["a.pdf", "b.pdf"], "v1") is None
+    assert cache.lookup([1.0, 0.0], "mode_2", ["a.pdf", "b.pdf"], "v1") is None
+    assert cache.lookup([1.0, 0.0], "mode_1", ["a.pdf"], "v1") is None
+    assert cache.lookup([1.0, 0.0], "mode_1", ["a.pdf", "b.pdf"], "v2") is None
+
+
+def test_invalidate_ttl_and_disabled():
+    cache = SemanticAnswerCache(enabled=True, threshold=0.9, max_items=4, ttl_sec=60)
+    cache.store([1.0, 0.0], "mode_1", [], "v1", {"answer": "x"})
+    cache.invalidate()
+    assert cache.lookup([1.0, 0.0], "mode_1", [], "v1") is None
+
+    expired = SemanticAnswerCache(enabled=True, threshold=0.9, max_items=4, ttl_sec=-1)
+    expired.store([1.0, 0.0], "mode_1", [], "v1", {"answer": "x"})
+    assert expired.lookup([1.0, 0.0], "mode_1", [], "v1") is None
+    assert expired.stats()["items"] == 0
+
+    disabled = SemanticAnswerCache(enabled=False)
+    disabled.store([1.0, 0.0], "mode_1", [], "v1", {"answer": "x"})
+    assert disabled.lookup([1.0, 0.0], "mode_1", [], "v1") is None
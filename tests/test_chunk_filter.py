@@ -0,0 +1,83 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from meai_core import engine
+from meai_core.chunk_filter import collection_for_path, filtered_rpc, is_filtered, normalize_filter
+from meai_core.embedding_profile import DEFAULT_PROFILE
+
+
+def test_normalize_filter():
+    flt = normalize_filter(["b.pdf", "a.pdf", "a.pdf"], "system")
+    assert flt == {"source_files": ["a.pdf", "b.pdf"], "collection": "system"}
+    assert normalize_filter("a.pdf")["source_files"] == ["a.pdf"]
+    assert not is_filtered(normalize_filter())
+    with pytest.raises(ValueError):
+        normalize_filter(collection="everything")
+    assert filtered_rpc("match_meai_chunks_v2") == "match_meai_chunks_v2_filtered"
+
+
+def test_collection_for_path(tmp_path):
+    system, uploads, core = tmp_path / "system_pdfs", tmp_path / "uploads", tmp_path / "library"
+    assert collection_for_path(str(system / "01_Project_Overview.pdf"), str(system), str(uploads)) == "system"
+    assert collection_for_path(str(uploads / "acme" / "quote.pdf"), str(system), str(uploads)) == "uploads"
+    assert collection_for_path(str(core / "bolts.pdf"), str(system), None) == "core"
+    assert collection_for_path(os.path.join(str(tmp_path), "system_pdfs_old", "x.pdf"), str(system)) == "core"
+
+
+class RecordingRpc:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self.rows))
+
+
+def _rpc_backend(monkeypatch, rows):
+    fake = RecordingRpc(rows)
+    monkeypatch.setattr(engine, "sb", fake)
+    monkeypatch.setattr(engine, "RETRIEVAL_BACKEND", "rpc")
+    monkeypatch.setattr(engine, "HYBRID_RETRIEVAL", False)
+    monkeypatch.setattr(engine, "_check_corpus_stamp", lambda: "")
+    monkeypatch.setattr(engine.embedding_config, "active", lambda: dict(DEFAULT_PROFILE))
+    return fake
+
+
+def test_filtered_retrieval_is_one_rpc_call(monkeypatch):
+    fake = _rpc_backend(monkeypatch, [{"source_file": "08_Runbook.pdf", "chunk_index": 0}])
+
+    engine.retrieve_chunks([0.1], k=8)
+    name, params = fake.calls[-1]
+    assert name == "match_meai_chunks" and "filter_collection" not in params
+
+    engine.retrieve_chunks([0.1], k=8, source_files=engine.SYSTEM_DOC_SOURCES)
+    name, params = fake.calls[-1]
+    assert name == "match_meai_chunks_filtered"
+    assert params["match_count"] == 8
+    assert params["filter_source_files"] == engine.SYSTEM_DOC_SOURCES and params["filter_collection"] is None
+
+    engine.retrieve_chunks([0.1], k=4, collection="uploads")
+    assert fake.calls[-1][1]["filter_collection"] == "uploads" and fake.calls[-1][1]["filter_source_files"] is None
+    assert engine.retrieve_chunks([0.1], k=4, source_files=[]) == []
+    assert len(fake.calls) == 3
+
+
+def test_system_docs_stage_retrieves_once(monkeypatch):
+    calls = []
+
+    async def fake_embed(text):
+        return [0.1]
+
+    async def fake_retrieve(q_emb, k=8, query_text=None, source_files=None, collection=None):
+        calls.append({"k": k, "source_files": source_files, "collection": collection})
+        return []
+
+    monkeypatch.setattr(engine, "aembed", fake_embed)
+    monkeypatch.setattr(engine, "aretrieve_chunks", fake_retrieve)
+    out = asyncio.run(engine._docs_stage("system-docs-only: runbook", True, {}))
+    assert out is None
+    assert calls == [{"k": engine.CONTEXT_CANDIDATES, "source_files": engine.SYSTEM_DOC_SOURCES, "collection": None}]
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from meai_core import chunk_quality
+from meai_core.chunk_quality import quality_score, is_usable, backfill
+from meai_core.engine import build_context, is_garbage
+
+PROSE = (
+    "The pump housing is machined from 6061 aluminium and anodized after deburring. "
+    "Bore tolerances are held to 0.05 mm per ISO 2768, and every part is inspected "
+    "on a CMM before it ships. Seals are Viton for the high-temperature variant. "
+)
+OCR_NOISE = "Th~ p#mp h0us|ng is m@ch1ned fr0m 6O61 alum!n|um @nd an0d|zed. T0ler@nces @re he|d t0 O.O5 mm 0n th b0re " * 2
+TABLE = "12 34 56 78 90 11 22 33 44 55 66 77 88 99 10 20 30 40 50 60 70 80 90 15 25 35 45 55 65 75 85 95 " * 2
+
+
+def test_clean_prose_scores_high():
+    assert quality_score(PROSE) >= 0.9
+
+
+def test_ocr_noise_and_number_dumps_score_low():
+    assert quality_score(OCR_NOISE) < chunk_quality.MIN_CHUNK_QUALITY
+    assert quality_score(TABLE) == 0.0
+
+
+def test_old_garbage_rule_scores_zero():
+    for text in ["", "short text", TABLE]:
+        assert is_garbage(text)
+        assert quality_score(text) == 0.0
+
+
+def test_short_chunks_are_scaled_down():
+    assert quality_score(PROSE[:100]) < quality_score(PROSE)
+
+
+def test_build_context_trusts_stored_scores():
+    rows = [
+        {"source_file": "a.pdf", "chunk_index": 0, "content": PROSE, "quality": 0.1},
+        {"source_file": "a.pdf", "chunk_index": 1, "content": "x" * 10, "quality": 0.9},
+        {"source_file": "a.pdf", "chunk_index": 2, "content": "x" * 10},
+        {"source_file": "a.pdf", "chunk_index": 3, "content": PROSE},
+    ]
+    assert is_usable(rows[2]) is None
+    _, tags, _ = build_context(rows)
+    assert tags == ["[a.pdf:1]", "[a.pdf:3]"]
+
+
+class FakeChunks:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def table(self, name):
+        window = {}
+        q = SimpleNamespace()
+        q.select = lambda cols: q
+        q.order = lambda col: q
+        q.range = lambda a, b: window.update(a=a, b=b) or q
+        q.execute = lambda: SimpleNamespace(data=self.rows[window["a"]:window["b"] + 1])
+        return q
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=None))
+
+
+def test_backfill_writes_only_changed_scores(monkeypatch):
+    monkeypatch.setattr(chunk_quality, "BACKFILL_BATCH", 2)
+    rows = [
+        {"source_file": "a.pdf", "chunk_index": 0, "content": PROSE, "quality": None},
+        {"source_file": "a.pdf", "chunk_index": 1, "content": PROSE, "quality": quality_score(PROSE)},
+        {"source_file": "a.pdf", "chunk_index": 2, "content": TABLE, "quality": 0.7},
+    ]
+    sb = FakeChunks(rows)
+    stats = backfill(sb, log=lambda *_: None)
+    assert stats == {"rows": 3, "updated": 2, "below_threshold": 1}
+    written = [(sf, ci, s) for _, p in sb.calls for sf, ci, s in zip(p["source_files"], p["chunk_indexes"], p["scores"])]
+    assert written == [("a.pdf", 0, quality_score(PROSE)), ("a.pdf", 2, 0.0)]
+    assert all(name == "meai_set_chunk_quality" for name, _ in sb.calls)
+
+    dry = FakeChunks(rows)
+    assert backfill(dry, dry_run=True, log=lambda *_: None)["updated"] == 2
+    assert dry.calls == []
@@ -0,0 +1,34 @@
+from meai_core.chunking import stream_chunks
+
+
+def _sentences(prefix, n):
+    return " ".join(f"{prefix} sentence {i} about bolted joint preload." for i in range(n))
+
+
+def test_chunks_span_pages_without_short_fragments():
+    pages = [(1, _sentences("p1", 12)), (2, _sentences("p2", 3)), (3, _sentences("p3", 30))]
+    chunks = list(stream_chunks(pages, chunk_chars=400, overlap=60, min_chars=80))
+
+    assert all(80 <= len(c["content"]) <= 480 for c in chunks)
+    # every chunk but the last ends on a sentence boundary
+    assert all(c["content"].endswith(".") for c in chunks[:-1])
+    assert any(c["page_start"] < c["page_end"] for c in chunks)
+    assert chunks[0]["page_start"] == 1
+    assert chunks[-1]["page_end"] == 3
+    spans = [(c["page_start"], c["page_end"]) for c in chunks]
+    assert spans == sorted(spans)
+
+
+def test_chunks_overlap_and_cover_text():
+    text = _sentences("x", 40)
+    chunks = list(stream_chunks([(1, text)], chunk_chars=300, overlap=80, min_chars=50))
+    for prev, nxt in zip(chunks, chunks[1:]):
+        # the next chunk starts with a sentence from the tail of the previous one
+        assert nxt["content"][:20] in prev["content"]
+    assert "x sentence 0 " in chunks[0]["content"]
+    assert "x sentence 39 " in chunks[-1]["content"] + " "
+
+
+def test_short_document_is_one_chunk():
+    chunks = list(stream_chunks([(4, "Short page."), (5, "Another short page.")], chunk_chars=900))
+    assert chunks == [{"content": "Short page.\nAnother short page.", "page_start": 4, "page_end": 5}]
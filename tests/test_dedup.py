@@ -0,0 +1,57 @@
+from meai_core.dedup import DedupIndex, MinHasher
+
+BASE = (
+    "The bolt shall be tightened to seventy five percent of proof load using a calibrated torque wrench "
+    "and the joint shall be inspected for gapping after the first thermal cycle per section four of the "
+    "assembly procedure, with lubricated threads and hardened washers under both the head and the nut."
+)
+REVISION = BASE.replace("seventy five", "seventy-five").replace("section four", "section 4")
+OTHER = (
+    "Fatigue life of welded aluminum brackets is governed by the weld toe detail category, the stress "
+    "range at the toe, and the mean stress correction chosen for the analysis of the cyclic load case."
+)
+
+
+def test_minhash_similarity_tracks_jaccard():
+    h = MinHasher()
+    same = (h.signature(BASE) == h.signature(REVISION)).mean()
+    different = (h.signature(BASE) == h.signature(OTHER)).mean()
+    assert same > 0.6
+    assert different < 0.1
+
+
+def test_filter_plan_skips_near_duplicates_across_files(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    index = DedupIndex(path, mode="link", threshold=0.6)
+    plan = index.filter_plan("a.pdf", [BASE, OTHER], {"embed": [0, 1], "reuse": {}, "delete": []})
+    assert plan["embed"] == [0, 1]
+
+    plan = index.filter_plan("b.pdf", [REVISION, "fresh text " * 20], {"embed": [0, 1], "reuse": {}, "delete": []})
+    assert plan["embed"] == [1]
+    assert plan["duplicates"][0][0] == "a.pdf:0"
+    assert index.stats()["saved_embeddings"] == 1
+    assert index.link_rows("b.pdf")[0]["canonical_source_file"] == "a.pdf"
+
+    # persisted: a new process sees the same index
+    reopened = DedupIndex(path, mode="link", threshold=0.6)
+    plan = reopened.filter_plan("c.pdf", [BASE], {"embed": [0], "reuse": {}, "delete": []})
+    assert plan["embed"] == []
+
+    # re-indexing the canonical file flags the files that pointed at it
+    reopened.filter_plan("a.pdf", [OTHER], {"embed": [0], "reuse": {}, "delete": []})
+    assert reopened.stale_sources == {"b.pdf", "c.pdf"}
+
+
+def test_reingesting_a_file_does_not_match_itself(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.sqlite3"), mode="skip")
+    index.filter_plan("a.pdf", [BASE], {"embed": [0], "reuse": {}, "delete": []})
+    plan = index.filter_plan("a.pdf", [BASE], {"embed": [0], "reuse": {}, "delete": []})
+    assert plan["embed"] == [0]
+
+
+def test_off_mode_is_a_no_op(tmp_path):
+    path = tmp_path / "dedup.sqlite3"
+    index = DedupIndex(str(path), mode="off")
+    assert not path.exists()
+    plan = {"embed": [0], "reuse": {}, "delete": []}
+    assert index.filter_plan("a.pdf", [BASE], plan) is plan
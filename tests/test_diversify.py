@@ -0,0 +1,90 @@
+import numpy as np
+
+import meai_core.engine as engine
+from meai_core.diversify import diversify, join_chunks, merge_adjacent, mmr, relevance, row_vectors
+
+PROSE = "Bolt preload depends on the thread friction, the nut factor and the property class of the fastener. "
+
+
+def _row(sf, ci, content, similarity, **extra):
+    return {"source_file": sf, "chunk_index": ci, "content": content, "similarity": similarity, "quality": 0.9, **extra}
+
+
+def _candidates():
+    # three near-copies of the best chunk, then distinct but slightly less relevant ones
+    dup = PROSE * 3
+    rows = [_row("a.pdf", 10 + i, dup + f" Copy {i}.", 0.90 - i * 0.001) for i in range(3)]
+    topics = [
+        "Thread galling in stainless fasteners is reduced with anti-seize compound and lower speed.",
+        "Torque-angle tightening reaches yield more consistently than torque-only methods.",
+        "Washer hardness must exceed the bearing stress under the nut to avoid embedment loss.",
+    ]
+    rows += [_row(f"{i}.pdf", 0, (t + " ") * 3, 0.80 - i * 0.01) for i, t in enumerate(topics)]
+    return rows
+
+
+def test_mmr_trades_relevance_for_novelty():
+    rows = _candidates()
+    picked = diversify(rows, 3, lam=0.7)
+    assert picked[0] is rows[0]
+    assert sum(r["source_file"] == "a.pdf" for r in picked) == 1
+
+    by_relevance = diversify(rows, 3, lam=1.0)
+    assert [r["chunk_index"] for r in by_relevance] == [10, 11, 12]
+
+
+def test_mmr_uses_candidate_embeddings_when_present():
+    # identical text, but the vectors say rows 0 and 1 are different
+    vecs = np.array([[1, 0, 0], [0, 1, 0], [0.99, 0.1, 0]], dtype=np.float32)
+    rows = [_row("a.pdf", i, PROSE, 0.9 - i * 0.01, embedding=vecs[i]) for i in range(3)]
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    assert np.allclose(row_vectors(rows), normed)
+    assert [r["chunk_index"] for r in diversify(rows, 2, lam=0.5)] == [0, 1]
+
+    rel = relevance([{"rrf": 0.03}, {"rrf": 0.02}, {"rrf": 0.01}])
+    assert np.allclose(rel, [1.0, 2 / 3, 1 / 3])
+    assert mmr(rel, np.eye(3, dtype=np.float32), 5) == [0, 1, 2]
+
+
+def test_adjacent_chunks_merge_without_their_overlap():
+    first = "Section 4 covers preload. The clamp force must exceed the joint separation load by a margin."
+    second = "exceed the joint separation load by a margin. Retorque after the gasket creeps."
+    assert join_chunks([first, second]) == first + " Retorque after the gasket creeps."
+    assert join_chunks(["alpha beta gamma delta", "epsilon"]) == "alpha beta gamma delta\nepsilon"
+
+    rows = [
+        _row("b.pdf", 2, "other document", 0.9, page_start=1, page_end=1),
+        _row("a.pdf", 5, second, 0.8, page_start=3, page_end=4),
+        _row("a.pdf", 4, first, 0.7, page_start=2, page_end=3),
+        _row("a.pdf", 9, "far away chunk", 0.6),
+    ]
+    passages = merge_adjacent(rows)
+    assert [(p["source_file"], p["chunk_indexes"]) for p in passages] == [("b.pdf", [2]), ("a.pdf", [4, 5]), ("a.pdf", [9])]
+    merged = passages[1]
+    assert merged["content"].startswith("Section 4") and merged["content"].endswith("creeps.")
+    assert (merged["page_start"], merged["page_end"]) == (2, 4)
+
+
+def test_rows_without_a_chunk_index_are_not_merged():
+    rows = [
+        _row("a.pdf", None, "unindexed", 0.9),
+        _row("a.pdf", 1, "one", 0.8),
+        _row("a.pdf", 2, "two", 0.7),
+    ]
+    passages = merge_adjacent(rows)
+    assert [p["chunk_indexes"] for p in passages] == [[None], [1, 2]]
+
+
+def test_build_context_diversifies_and_keeps_every_tag(monkeypatch):
+    monkeypatch.setattr(engine, "MMR_ENABLED", True)
+    monkeypatch.setattr(engine, "MERGE_ADJACENT", True)
+    rows = _candidates()
+    context, tags, source_files = engine.build_context(rows, max_chunks=3)
+    assert len(source_files) == 3 and "a.pdf" in source_files
+    assert len(context) < len("\n\n".join(r["content"] for r in rows[:3]))
+
+    monkeypatch.setattr(engine, "MMR_ENABLED", False)
+    _, tags, source_files = engine.build_context(rows, max_chunks=2)
+    # chunks 10 and 11 of a.pdf are one passage with both tags
+    assert tags == ["[a.pdf:10]", "[a.pdf:11]"] and source_files == ["a.pdf"]
+    assert [r["chunk_index"] for r in engine.context_rows(rows, tags)] == [10, 11]
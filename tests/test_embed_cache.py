@@ -0,0 +1,72 @@
+import time
+
+from meai_core.embed_cache import EmbeddingCache
+
+
+def test_memory_then_disk_hit(tmp_path):
+    path = str(tmp_path / "emb.sqlite3")
+    cache = EmbeddingCache(path=path, max_items=8, ttl_sec=60)
+    assert cache.get("m", "bolt preload") is None
+    cache.put("m", "bolt preload", [0.5, 0.25])
+    # whitespace differences normalize to the same key
+    assert cache.get("m", "  bolt   preload\n") == [0.5, 0.25]
+
+    other_worker = EmbeddingCache(path=path, max_items=8, ttl_sec=60)
+    assert other_worker.get("m", "bolt preload") == [0.5, 0.25]
+    assert other_worker.get("other-model", "bolt preload") is None
+
+    stats = other_worker.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["misses"] == 1
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_lru_and_ttl_eviction():
+    cache = EmbeddingCache(path=None, max_items=2, ttl_sec=60)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")
+    cache.put("m", "c", [3.0])
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+
+    expired = EmbeddingCache(path=None, max_items=2, ttl_sec=-1)
+    expired.put("m", "a", [1.0])
+    assert expired.get("m", "a") is None
+
+
+def test_callers_get_their_own_list():
+    cache = EmbeddingCache(path=None, max_items=8, ttl_sec=60)
+    vec = [1.0, 2.0]
+    cache.put("m", "a", vec)
+    vec.append(3.0)
+    got = cache.get("m", "a")
+    got[0] = -1.0
+    assert cache.get("m", "a") == [1.0, 2.0]
+
+
+def test_memory_hits_do_not_wait_on_disk(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite3"), max_items=8, ttl_sec=60)
+    cache.put("m", "a", [1.0])
+    with cache._disk_lock:
+        assert cache.get("m", "a") == [1.0]
+
+
+def test_disk_rows_and_age_are_bounded(tmp_path, monkeypatch):
+    path = str(tmp_path / "emb.sqlite3")
+    cache = EmbeddingCache(path=path, max_items=8, ttl_sec=60, disk_max_rows=2, disk_ttl_sec=100)
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    for text in ("a", "b", "c"):
+        cache.put("m", text, [1.0])
+        clock[0] += 10
+    assert cache.prune() == 1
+
+    reader = EmbeddingCache(path=path, max_items=8, ttl_sec=60, disk_max_rows=0, disk_ttl_sec=100)
+    assert reader.get("m", "a") is None
+    assert reader.get("m", "b") == [1.0]
+    # older than the disk TTL: a miss before pruning, gone after
+    clock[0] = 1115.0
+    assert reader.get("m", "c") == [1.0] and reader.get("m", "b") is None
+    assert reader.prune() == 1
+    assert reader.stats()["disk_pruned"] == 1
@@ -0,0 +1,266 @@
+import json
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import ingest_01_text_to_supabase as ingest
+from meai_core.embed_migration import EmbeddingMigration, probe_text
+from meai_core.embedding_profile import DEFAULT_PROFILE, EmbeddingConfig, profile_key, write_profiles
+from meai_core.ingest_pipeline import IngestPipeline, RateLimiter
+
+TARGET = {"model": "new-model", "dimensions": 64, "column": "embedding_v2", "match_rpc": "match_v2"}
+WORDS = "bearing shaft bolt preload torque flange gasket weld anodize tolerance seal pump valve spring".split()
+
+
+def fake_embed(profile, texts):
+    """Hashed bag of words: similar texts get similar vectors; width follows the profile."""
+    dim = profile.get("dimensions") or 128
+    out = []
+    for t in texts:
+        v = np.zeros(dim)
+        for w in re.findall(r"\w+", t.lower()):
+            v[zlib.crc32((profile["model"] + w).encode()) % dim] += 1.0
+        out.append((v / (np.linalg.norm(v) or 1.0)).tolist())
+    return out
+
+
+def random_embed(profile, texts):
+    rng = np.random.default_rng(len(texts))
+    return rng.normal(size=(len(texts), profile.get("dimensions") or 128)).tolist()
+
+
+class FakeQuery:
+    def __init__(self, sb, name):
+        self.sb, self.name = sb, name
+        self.filters, self.orders, self.window, self.count, self.op = [], [], None, None, ("select", None)
+
+    def select(self, columns, count=None):
+        self.count = count
+        return self
+
+    def is_(self, col, _):
+        self.filters.append(lambda r: r.get(col) is None)
+        return self
+
+    def eq(self, col, val):
+        self.filters.append(lambda r: r.get(col) == val)
+        return self
+
+    def order(self, col):
+        self.orders.append(col)
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, n):
+        self.window = (0, n)
+        return self
+
+    def insert(self, row):
+        self.op = ("insert", row)
+        return self
+
+    def update(self, fields):
+        self.op = ("update", fields)
+        return self
+
+    def execute(self):
+        rows = self.sb.tables.setdefault(self.name, [])
+        kind, payload = self.op
+        if kind == "insert":
+            rows.extend(payload if isinstance(payload, list) else [payload])
+            return SimpleNamespace(data=payload, count=None)
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if kind == "update":
+            for r in matched:
+                r.update(json.loads(json.dumps(payload)))
+            return SimpleNamespace(data=matched, count=None)
+        for col in reversed(self.orders):
+            matched.sort(key=lambda r: r[col])
+        data = matched[slice(*self.window)] if self.window else matched
+        return SimpleNamespace(data=[dict(r) for r in data], count=len(matched) if self.count else None)
+
+
+class FakeSupabase:
+    def __init__(self, chunks):
+        self.tables = {
+            "meai_chunks": chunks,
+            "meai_embedding_config": [{"slot": "active", "model": "old-model", "dimensions": None, "column_name": "embedding", "match_rpc": "match_meai_chunks"}],
+        }
+        self.rpcs = {"match_meai_chunks": "embedding", "match_v2": "embedding_v2"}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self._rpc(name, params)))
+
+    def _rpc(self, name, params):
+        chunks, config = self.tables["meai_chunks"], self.tables["meai_embedding_config"]
+        if name == "meai_set_chunk_embeddings":
+            by_key = {(r["source_file"], r["chunk_index"]): r for r in chunks}
+            for sf, ci, emb in zip(params["source_files"], params["chunk_indexes"], params["embeddings"]):
+                by_key[(sf, ci)][params["column_name"]] = json.loads(emb)
+            return None
+        if name == "meai_switch_embedding_profile":
+            config[:] = [r for r in config if r["slot"] != "previous"]
+            for slot, new in (("active", "previous"), ("target", "active")):
+                next(r for r in config if r["slot"] == slot)["slot"] = new
+            return None
+        col = self.rpcs[name]
+        q = np.asarray(params["query_embedding"])
+        scored = sorted((r for r in chunks if r.get(col) is not None), key=lambda r: -float(np.dot(r[col], q)))
+        return [{"source_file": r["source_file"], "chunk_index": r["chunk_index"]} for r in scored[:params["match_count"]]]
+
+
+def _chunks(n=40):
+    rng = np.random.default_rng(0)
+    out = []
+    for i in range(n):
+        text = " ".join(rng.choice(WORDS, size=40)) + f" part{i} serial{i * 7} batch{i * 13}"
+        out.append({"source_file": f"doc{i % 4}.pdf", "chunk_index": i, "content": text, "embedding": fake_embed({"model": "old-model"}, [text])[0]})
+    return out
+
+
+def _job(sb, embed=fake_embed, batch_size=16):
+    return EmbeddingMigration(sb, embed, batch_size=batch_size, limiter=SimpleNamespace(acquire=lambda texts: 0.0), log=lambda *_: None)
+
+
+def test_probe_text_is_a_passage_of_the_chunk():
+    text = " ".join(f"w{i}" for i in range(90))
+    probe = probe_text(text)
+    assert len(probe.split()) == 30 and probe in text
+    assert probe_text("a b c") == "a b c"
+
+
+def test_backfill_resumes_from_rows_still_missing():
+    sb = FakeSupabase(_chunks())
+    job = _job(sb)
+    job.start(TARGET)
+    assert job.start(TARGET) == TARGET  # idempotent
+    with pytest.raises(RuntimeError):
+        job.start({**TARGET, "column": "embedding_v3"})
+
+    first = job.backfill(max_rows=20)
+    assert first["embedded"] == 20 and first["missing_after"] == 20
+    second = job.backfill()
+    assert second["embedded"] == 20 and second["missing_after"] == 0
+    assert all(len(r["embedding_v2"]) == 64 for r in sb.tables["meai_chunks"])
+    target = next(r for r in sb.tables["meai_embedding_config"] if r["slot"] == "target")
+    assert target["checkpoint"]["embedded"] == 40 and target["checkpoint"]["missing"] == 0
+
+
+def test_switch_requires_a_passing_recall_check():
+    sb = FakeSupabase(_chunks())
+    job = _job(sb)
+    job.start(TARGET)
+    job.backfill()
+    with pytest.raises(RuntimeError, match="verify"):
+        job.switch()
+
+    report = job.verify(sample=20, k=3)
+    assert report["passed"] and report["queries"] == 20
+    assert report["target"]["recall_at_k"] >= report["active"]["recall_at_k"] - report["max_recall_drop"]
+
+    # a chunk ingested after verification is caught up by the switch itself
+    sb.tables["meai_chunks"].append({**_chunks(41)[40], "embedding_v2": None})
+    active = job.switch()
+    assert active == TARGET
+    slots = {r["slot"]: r["column_name"] for r in sb.tables["meai_embedding_config"]}
+    assert slots == {"active": "embedding_v2", "previous": "embedding"}
+    assert job.count_rows("embedding_v2") == 0
+
+
+def test_a_worse_model_fails_verification():
+    sb = FakeSupabase(_chunks())
+    job = _job(sb, embed=random_embed)
+    job.start(TARGET)
+    job.backfill()
+    job.embed = lambda profile, texts: (fake_embed if profile["model"] == "old-model" else random_embed)(profile, texts)
+    report = job.verify(sample=20, k=3)
+    assert not report["passed"]
+    with pytest.raises(RuntimeError, match="refusing"):
+        job.switch()
+
+
+def test_config_keeps_the_last_profile_when_reads_fail():
+    sb = FakeSupabase([])
+    state = {"up": True}
+
+    def get_sb():
+        if not state["up"]:
+            raise ConnectionError("down")
+        return sb
+
+    config = EmbeddingConfig(get_sb, check_interval_sec=0)
+    assert config.active()["model"] == "old-model"
+    state["up"] = False
+    assert config.active()["model"] == "old-model"
+    assert EmbeddingConfig(get_sb).active() == DEFAULT_PROFILE
+    assert profile_key(TARGET) == "new-model@64"
+
+
+def test_config_refreshes_in_the_background(monkeypatch):
+    sb = FakeSupabase([])
+    gate = threading.Event()
+    reads = []
+
+    def get_sb():
+        reads.append(threading.current_thread().name)
+        if len(reads) > 1:
+            gate.wait(5)
+        return sb
+
+    config = EmbeddingConfig(get_sb, check_interval_sec=0)
+    assert config.active()["model"] == "old-model"
+    # a due check starts a slow re-read but still answers from the cache at once
+    start = time.monotonic()
+    assert config.active()["model"] == "old-model" and config.target() is None
+    assert time.monotonic() - start < 1
+    gate.set()
+    assert reads[0] == threading.current_thread().name and reads[1] == "meai-embedding-config"
+
+
+def test_ingest_writes_every_configured_column(monkeypatch):
+    profiles = {"active": dict(DEFAULT_PROFILE), "target": dict(TARGET)}
+    assert [p["column"] for p in write_profiles(profiles)] == ["embedding", "embedding_v2"]
+    monkeypatch.setitem(ingest._clients, "profiles", profiles)
+    monkeypatch.setitem(ingest._clients, "openai", object())
+    monkeypatch.setattr(ingest, "embed_with", lambda client, profile, texts: fake_embed(profile, texts))
+
+    def ingest_rows(chunks):
+        inserted = []
+        pipeline = IngestPipeline(
+            lambda path: (chunks, 1),
+            ingest.embed_batch,
+            lambda rows: inserted.extend(ingest.with_embedding_columns(rows)),
+            extract_workers=0,
+            limiter=RateLimiter(rpm=0, tpm=0),
+            extra_embeddings=ingest.shadow_embedders,
+            log=lambda msg: None,
+        )
+        stats = pipeline.run([("a.pdf", "a.pdf")])
+        return inserted, stats
+
+    # shadow vectors come from the embedding stage, one request per profile
+    rows, stats = ingest_rows(["bolt preload"])
+    assert len(rows[0]["embedding"]) == 128 and len(rows[0]["embedding_v2"]) == 64
+    assert "extra_embeddings" not in rows[0]
+    assert stats["embed_requests"] == 2
+
+    # after the switch the pipeline's vector belongs to the new column; the old one is kept for rollback
+    monkeypatch.setitem(ingest._clients, "profiles", {"active": dict(TARGET), "previous": dict(DEFAULT_PROFILE)})
+    rows, _ = ingest_rows(["bolt preload"])
+    assert len(rows[0]["embedding_v2"]) == 64 and len(rows[0]["embedding"]) == 128
+
+    # the writer only writes: moving vectors to their columns never embeds
+    monkeypatch.setattr(ingest, "embed_with", None)
+    row = {"source_file": "a.pdf", "chunk_index": 0, "content": "x", "embedding": [0.5], "extra_embeddings": {"embedding": [0.25]}}
+    assert ingest.with_embedding_columns([row])[0] == {"source_file": "a.pdf", "chunk_index": 0, "content": "x", "embedding_v2": [0.5], "embedding": [0.25]}
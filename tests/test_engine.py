@@ -0,0 +1,350 @@
+import asyncio
+from types import SimpleNamespace
+
+import meai_core.engine as engine
+
+
+def _completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def _patch_async_io(monkeypatch, events):
+    async def fake_ensure_session(sid, tester_label=None):
+        events.append("session")
+
+    async def fake_insert_message(sid, role, content):
+        events.append(f"insert:{role}")
+        return f"mid-{role}"
+
+    monkeypatch.setattr(engine, "aensure_session", fake_ensure_session)
+    monkeypatch.setattr(engine, "ainsert_message", fake_insert_message)
+
+
+def test_rag_answer_async_schedule(monkeypatch):
+    events = []
+    _patch_async_io(monkeypatch, events)
+
+    async def fail_plan(*args, **kwargs):
+        raise AssertionError("plan should not be called for scheduling intent")
+
+    monkeypatch.setattr(engine, "aplan", fail_plan)
+
+    answer, citations, debug = asyncio.run(
+        engine.rag_answer_async("mode_1", "can I book a call with hardwarehub", session_id="s1")
+    )
+    assert "calendar.app.google" in answer
+    assert citations == []
+    assert debug["routed"] == "hardwarehub_schedule"
+    assert events == ["session", "insert:user", "insert:assistant"]
+    assert "total" in debug["timings_ms"]
+
+
+def test_rag_answer_async_pipeline(monkeypatch):
+    events = []
+    _patch_async_io(monkeypatch, events)
+
+    async def fake_plan(question, mode_name):
+        return {"use_docs_rag": True, "use_vendors": True}
+
+    async def fake_embed(text):
+        return [0.1, 0.2]
+
+    async def fake_retrieve(q_emb, k=8, query_text=None):
+        return [{"source_file": "a.pdf", "chunk_index": 3, "content": "bolt preload guidance " * 10}]
+
+    async def fake_licenses(source_files):
+        return "LICENSE CONSTRAINTS (must follow):\n- a.pdf | title: A\n  verbatim_allowed: True\n  verbatim_char_limit: 300"
+
+    async def fake_vendors(question, max_results=8):
+        return "VENDOR_TABLE_MATCHES:\n- Acme", [{"name": "Acme"}]
+
+    async def fake_validate(answer, mode_name):
+        return {"ok": True, "issues": []}
+
+    async def fake_create(**kwargs):
+        return _completion("answer [a.pdf:3]\n\nCitations: [a.pdf:3]")
+
+    monkeypatch.setattr(engine, "aplan", fake_plan)
+    monkeypatch.setattr(engine, "aembed", fake_embed)
+    monkeypatch.setattr(engine, "aretrieve_chunks", fake_retrieve)
+    monkeypatch.setattr(engine, "abuild_license_block", fake_licenses)
+    monkeypatch.setattr(engine, "avendor_context_block", fake_vendors)
+    monkeypatch.setattr(engine, "avalidate", fake_validate)
+    monkeypatch.setattr(engine, "load_pinned_facts", lambda: "facts")
+    monkeypatch.setattr(engine, "rule_validator", engine.RuleValidator(enabled=True, audit_rate=0.0))
+    monkeypatch.setattr(
+        engine,
+        "async_openai_client",
+        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake_create))),
+    )
+
+    answer, citations, debug = asyncio.run(
+        engine.rag_answer_async("mode_1", "need a machine shop vendor for bolts", session_id="s2")
+    )
+    assert answer.startswith("answer")
+    assert [c["tag"] for c in citations] == ["[a.pdf:3]", "[VENDOR_TABLE]"]
+    assert debug["source_files"] == ["a.pdf"]
+    assert debug["message_id"] == "mid-assistant"
+    assert debug["user_message_id"] == "mid-user"
+    for stage in ("session", "plan", "embed", "retrieve", "licenses", "vendors", "answer", "total"):
+        assert stage in debug["timings_ms"]
+    # the answer passes the rule validator, so the LLM validator is skipped
+    assert debug["validator"] == "rules"
+    assert "validate" not in debug["timings_ms"]
+    assert events[-1] == "insert:assistant"
+
+
+def test_rag_answer_async_failure_settles_side_tasks(monkeypatch):
+    events = []
+    _patch_async_io(monkeypatch, events)
+    plan_state = {}
+
+    async def slow_plan(question, mode_name):
+        plan_state["started"] = True
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            plan_state["cancelled"] = True
+            raise
+
+    async def failing_embed(text):
+        await asyncio.sleep(0)
+        raise RuntimeError("embeddings down")
+
+    monkeypatch.setattr(engine, "aplan", slow_plan)
+    monkeypatch.setattr(engine, "aembed", failing_embed)
+    monkeypatch.setattr(engine.answer_cache, "enabled", True)
+
+    async def run():
+        try:
+            await engine.rag_answer_async("mode_1", "bolt preload for M8", session_id="s3")
+        except RuntimeError as e:
+            assert "embeddings down" in str(e)
+        else:
+            raise AssertionError("expected the embedding failure")
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert plan_state == {"started": True, "cancelled": True}
+    # the user turn is still stored
+    assert events == ["session", "insert:user"]
+
+
+def test_semantic_answer_cache_skips_planner(monkeypatch):
+    from meai_core.answer_cache import SemanticAnswerCache
+
+    calls = {"plan": 0, "answer": 0}
+
+    def fake_plan(question, mode_name):
+        calls["plan"] += 1
+        return {"use_docs_rag": True, "use_vendors": False}
+
+    def fake_create(**kwargs):
+        calls["answer"] += 1
+        return _completion("Preload to 75% of proof load [a.pdf:3]\n\nCitations: [a.pdf:3]")
+
+    embeddings = {"how do I choose bolt preload": [1.0, 0.0, 0.0], "how to pick bolt preload?": [0.99, 0.05, 0.0]}
+    monkeypatch.setattr(engine, "ensure_session", lambda *args, **kwargs: None)
+    monkeypatch.setattr(engine, "insert_message", lambda sid, role, content: f"mid-{role}")
+    monkeypatch.setattr(engine, "plan", fake_plan)
+    monkeypatch.setattr(engine, "embed", lambda text: embeddings[text])
+    monkeypatch.setattr(
+        engine,
+        "retrieve_chunks",
+        lambda q_emb, k=8, query_text=None: [{"source_file": "a.pdf", "chunk_index": 3, "content": "bolt preload guidance " * 10}],
+    )
+    monkeypatch.setattr(engine, "build_license_block", lambda source_files: "LICENSE CONSTRAINTS (must follow):")
+    monkeypatch.setattr(engine, "validate", lambda answer, mode_name: {"ok": True, "issues": []})
+    monkeypatch.setattr(engine, "load_pinned_facts", lambda: "facts")
+    monkeypatch.setattr(
+        engine,
+        "openai_client",
+        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake_create))),
+    )
+    monkeypatch.setattr(engine, "answer_cache", SemanticAnswerCache(enabled=True, threshold=0.95))
+
+    first, first_citations, first_debug = engine.rag_answer("mode_1", "how do I choose bolt preload", session_id="s1")
+    second, second_citations, second_debug = engine.rag_answer("mode_1", "how to pick bolt preload?", session_id="s2")
+
+    assert first_debug["cache_hit"] is False
+    assert second_debug["cache_hit"] is True
+    assert second == first
+    assert second_citations == first_citations
+    assert second_debug["session_id"] == "s2"
+    assert second_debug["source_files"] == ["a.pdf"]
+    assert calls == {"plan": 1, "answer": 1}
+
+    # a different mode never matches
+    engine.rag_answer("mode_2", "how do I choose bolt preload", session_id="s3")
+    assert calls == {"plan": 2, "answer": 2}
+
+
+def _patch_sync_turn(monkeypatch, answers, validate_calls):
+    def fake_create(**kwargs):
+        return _completion(answers.pop(0))
+
+    def fake_validate(answer, mode_name):
+        validate_calls.append(answer)
+        return {"ok": True, "issues": []}
+
+    monkeypatch.setattr(engine, "ensure_session", lambda *args, **kwargs: None)
+    monkeypatch.setattr(engine, "insert_message", lambda sid, role, content: f"mid-{role}")
+    monkeypatch.setattr(engine, "plan", lambda question, mode_name: {"use_docs_rag": True, "use_vendors": False})
+    monkeypatch.setattr(engine, "embed", lambda text: [1.0, 0.0])
+    monkeypatch.setattr(
+        engine,
+        "retrieve_chunks",
+        lambda q_emb, k=8, query_text=None: [{"source_file": "a.pdf", "chunk_index": 3, "content": "bolt preload guidance " * 10}],
+    )
+    monkeypatch.setattr(engine, "build_license_block", lambda source_files: "LICENSE CONSTRAINTS (must follow):")
+    monkeypatch.setattr(engine, "validate", fake_validate)
+    monkeypatch.setattr(engine, "load_pinned_facts", lambda: "facts")
+    monkeypatch.setattr(
+        engine,
+        "openai_client",
+        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake_create))),
+    )
+    monkeypatch.setattr(engine, "rule_validator", engine.RuleValidator(enabled=True, audit_rate=0.0))
+
+
+def test_rule_validator_fixes_without_llm_validate(monkeypatch):
+    validate_calls = []
+    answers = ["Preload per [b.pdf:1]\n\nCitations: [b.pdf:1]", "Preload per [a.pdf:3]\n\nCitations: [a.pdf:3]"]
+    _patch_sync_turn(monkeypatch, answers, validate_calls)
+
+    answer, _, debug = engine.rag_answer("mode_1", "how do I choose bolt preload", session_id="s1")
+    assert answer.endswith("Citations: [a.pdf:3]")
+    assert debug["fixed"] is True
+    assert debug["validator"] == "rules"
+    assert validate_calls == []
+
+
+def test_rule_validator_appends_missing_citations_without_a_fix(monkeypatch):
+    validate_calls = []
+    _patch_sync_turn(monkeypatch, ["Preload per [a.pdf:3]"], validate_calls)
+
+    answer, _, debug = engine.rag_answer("mode_1", "how do I choose bolt preload", session_id="s1")
+    assert answer == "Preload per [a.pdf:3]\n\nCitations: [a.pdf:3]"
+    assert debug["fixed"] is False
+    assert validate_calls == [answer]
+
+
+def test_rule_validator_defers_to_llm_when_inconclusive(monkeypatch):
+    validate_calls = []
+    _patch_sync_turn(monkeypatch, ["Use 75% of proof load.\n\nCitations: None"], validate_calls)
+
+    answer, _, debug = engine.rag_answer("mode_1", "how do I choose bolt preload", session_id="s1")
+    assert debug["fixed"] is False
+    assert debug["validator"] == "llm"
+    assert validate_calls == [answer]
+
+
+def test_aembed_many_batches_cache_misses(monkeypatch):
+    calls = []
+
+    async def fake_create(input, **kwargs):
+        calls.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(t))]) for t in input])
+
+    monkeypatch.setattr(engine, "embed_cache", engine.EmbeddingCache(path=None))
+    monkeypatch.setattr(engine, "async_openai_client", SimpleNamespace(embeddings=SimpleNamespace(create=fake_create)))
+    monkeypatch.setattr(engine.embedding_config, "active", lambda: {"model": "m", "dimensions": None})
+    monkeypatch.setattr(engine, "EMBED_BATCH_SIZE", 2)
+
+    vecs = asyncio.run(engine.aembed_many(["a", "bb", "a", "ccc"]))
+    assert vecs == [[1.0], [2.0], [1.0], [3.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert asyncio.run(engine.aembed_many(["bb", "dddd"])) == [[2.0], [4.0]]
+    assert calls[-1] == ["dddd"]
+
+
+def test_rag_answer_batch_bounds_concurrency_and_isolates_errors(monkeypatch):
+    embedded = []
+    in_flight, peak = [0], [0]
+
+    async def fake_embed_many(texts):
+        embedded.append(list(texts))
+        return [[0.1] for _ in texts]
+
+    async def fake_answer(mode, message, session_id=None, temperature=0.2, tester_label=None):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        if message == "q3":
+            raise RuntimeError("boom")
+        return f"answer {message}", [], {"timings_ms": {"total": 10}, "tester_label": tester_label}
+
+    monkeypatch.setattr(engine, "aembed_many", fake_embed_many)
+    monkeypatch.setattr(engine, "rag_answer_async", fake_answer)
+    items = [{"mode": "mode_1", "message": f"q{i}", "id": f"id{i}"} for i in range(10)]
+
+    async def collect():
+        return [r async for r in engine.rag_answer_batch(items, concurrency=3)]
+
+    results = asyncio.run(collect())
+    assert embedded == [[f"q{i}" for i in range(10)]]
+    assert peak[0] == 3
+    assert sorted(r["index"] for r in results) == list(range(10))
+    failed = [r for r in results if r.get("error")]
+    assert [r["id"] for r in failed] == ["id3"] and "boom" in failed[0]["error"]
+    ok = next(r for r in results if r["id"] == "id0")
+    assert ok["answer"] == "answer q0" and ok["debug"]["tester_label"] == "batch"
+    assert ok["elapsed_ms"] >= 10 and "queued_ms" in ok
+    summary = engine.batch_summary(results, wall_ms=50)
+    assert summary["count"] == 10 and summary["errors"] == 1
+
+
+def test_rag_answer_batch_ids_are_strings_and_embed_failures_are_logged(monkeypatch, caplog):
+    async def failing_embed_many(texts):
+        raise RuntimeError("rate limited")
+
+    async def fake_answer(mode, message, session_id=None, temperature=0.2, tester_label=None):
+        return f"answer {message}", [], {}
+
+    monkeypatch.setattr(engine, "aembed_many", failing_embed_many)
+    monkeypatch.setattr(engine, "rag_answer_async", fake_answer)
+    items = [{"mode": "mode_1", "message": "q0", "id": 7}, {"mode": "mode_1", "message": "q1"}]
+
+    async def collect():
+        return [r async for r in engine.rag_answer_batch(items)]
+
+    with caplog.at_level("WARNING", logger="meai_core.engine"):
+        results = asyncio.run(collect())
+    assert sorted(r["id"] for r in results) == ["1", "7"]
+    assert all("error" not in r for r in results)
+    assert "rate limited" in caplog.text
+
+
+def test_broken_local_index_falls_back_to_the_match_rpc(monkeypatch, caplog):
+    class BrokenIndex:
+        def available(self):
+            raise ValueError("mmap length is greater than file size")
+
+    calls = []
+
+    class FakeRpc:
+        def __init__(self, name, params):
+            calls.append(name)
+
+        def execute(self):
+            return SimpleNamespace(data=[{"source_file": "a.pdf", "chunk_index": 0}])
+
+        async def aexecute(self):
+            return self.execute()
+
+    async def fake_get_async_sb():
+        return SimpleNamespace(rpc=lambda name, params: SimpleNamespace(execute=FakeRpc(name, params).aexecute))
+
+    monkeypatch.setattr(engine, "RETRIEVAL_BACKEND", "local")
+    monkeypatch.setattr(engine, "local_index", BrokenIndex())
+    monkeypatch.setattr(engine, "_check_corpus_stamp", lambda: "v")
+    monkeypatch.setattr(engine, "sb", SimpleNamespace(rpc=FakeRpc))
+    monkeypatch.setattr(engine, "get_async_sb", fake_get_async_sb)
+
+    with caplog.at_level("WARNING", logger="meai_core.engine"):
+        rows = engine.retrieve_chunks([0.1, 0.2], k=3)
+        arows = asyncio.run(engine.aretrieve_chunks([0.1, 0.2], k=3))
+    assert rows == arows == [{"source_file": "a.pdf", "chunk_index": 0}]
+    assert len(calls) == 2
+    assert "mmap length" in caplog.text
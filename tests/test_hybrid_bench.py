@@ -0,0 +1,21 @@
+from benchmarks.hybrid_bench import generate_chunks, make_queries, parse_args, run_benchmark, semantic_vector
+
+
+def test_stand_in_embedding_ignores_identifiers():
+    assert semantic_vector("torque spec HX-1234-B") == semantic_vector("torque spec 6061-T6")
+
+
+def test_queries_point_at_their_chunk():
+    chunks = generate_chunks(20)
+    for q in make_queries(chunks, 10):
+        sf, ci = q["expected"].rsplit(":", 1)
+        chunk = next(c for c in chunks if c["source_file"] == sf and c["chunk_index"] == int(ci))
+        assert q["kind"] != "identifier" or chunk["identifier"] in q["text"]
+
+
+def test_hybrid_beats_vector_only_on_identifiers():
+    result = run_benchmark(parse_args(["--chunks", "1000", "--queries", "40", "--k", "5"]))
+    vector, hybrid = result["results"]["vector"], result["results"]["hybrid"]
+    assert hybrid["recall_by_kind"]["identifier"] > vector["recall_by_kind"]["identifier"] + 0.5
+    assert hybrid["recall_at_k"] > vector["recall_at_k"]
+    assert hybrid["latency_ms_p50"] > 0
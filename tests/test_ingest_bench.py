@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+from benchmarks.ingest_bench import FakeEmbeddings, compare, parse_args, run_benchmark
+
+
+def test_ingest_script_imports_without_credentials():
+    env = {"PATH": "", "PYTHONPATH": "."}
+    code = "import ingest_01_text_to_supabase as m; assert not m._clients; print(m.parse_args(['--dry_run']))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    assert out.returncode == 0, out.stderr
+    assert "(None, True)" in out.stdout
+
+
+def test_fake_embeddings_are_deterministic_unit_vectors():
+    embed = FakeEmbeddings(latency_ms=0, per_input_ms=0, dim=32)
+    a, b = embed(["alpha", "beta"])
+    assert embed(["alpha"])[0] == a
+    assert a != b
+    assert abs(sum(x * x for x in a) - 1.0) < 1e-5
+    assert (embed.requests, embed.inputs) == (2, 3)
+
+
+def test_small_run_reports_throughput(tmp_path):
+    args = parse_args([
+        "--files", "2", "--pages", "2", "--corpus-dir", str(tmp_path),
+        "--embed-latency-ms", "0", "--insert-latency-ms", "0", "--extract-workers", "0",
+    ])
+    result = run_benchmark(args)
+    run = result["runs"][0]
+    assert run["pages"] == 4 and run["chunks"] > 0
+    assert run["rows_inserted"] == run["chunks"]
+    assert run["failed_files"] == 0
+    assert result["median"]["pages_per_sec"] > 0
+    assert result["peak_rss_mb"] > 0
+
+    slower = {"median": dict(result["median"], pages_per_sec=result["median"]["pages_per_sec"] * 0.5)}
+    ok, _ = compare(slower, result, tolerance=0.1)
+    assert not ok
+    ok, _ = compare(result, result, tolerance=0.1)
+    assert ok
@@ -0,0 +1,156 @@
+import meai_core.ingest_pipeline as ingest_pipeline
+from meai_core.ingest_journal import IN_DOUBT_HASH, IngestJournal
+from meai_core.ingest_manifest import diff_chunks, text_hash
+from meai_core.ingest_pipeline import AdaptiveBatchSize, IngestPipeline, RateLimiter
+
+DOCS = {"a.pdf": 12, "b.pdf": 5}
+
+
+def fake_extract(path):
+    return [f"{path} chunk {i}" for i in range(DOCS[path])], 2
+
+
+class FakeTable:
+    """Remote meai_chunks as a list, so duplicate inserts stay visible."""
+
+    def __init__(self):
+        self.rows = []
+        self.fail_on = None  # chunk text whose batch lands but then "times out"
+
+    def insert(self, rows):
+        self.rows.extend((r["source_file"], r["chunk_index"]) for r in rows)
+        if self.fail_on and any(r["content"] == self.fail_on for r in rows):
+            self.fail_on = None
+            raise TimeoutError("insert response lost")
+
+    def delete(self, sf, indices):
+        self.rows = [k for k in self.rows if not (k[0] == sf and k[1] in indices)]
+
+
+def _run(journal, table, files=("a.pdf", "b.pdf")):
+    pipeline = IngestPipeline(
+        fake_extract,
+        lambda texts: [[0.0] for _ in texts],
+        table.insert,
+        extract_workers=0,
+        embed_workers=1,  # one worker keeps batch boundaries deterministic
+        batch_size=AdaptiveBatchSize(start=3, maximum=3),
+        insert_batch=3,
+        limiter=RateLimiter(rpm=0, tpm=0),
+        journal=journal,
+        log=lambda msg: None,
+    )
+
+    def plan(path, sf, texts):
+        p = diff_chunks([text_hash(t) for t in texts], journal.state(sf))
+        journal.planned(len(p["embed"]))
+        return p
+
+    journal.start_run(len(files))
+    stats = pipeline.run([(f, f) for f in files], plan_file=plan, delete_chunks=table.delete, on_file_done=lambda sf: journal.file_done())
+    journal.finish_run()
+    return stats
+
+
+def _expected():
+    return sorted((sf, i) for sf, n in DOCS.items() for i in range(n))
+
+
+def test_begin_ack_and_in_doubt_state(tmp_path):
+    journal = IngestJournal(str(tmp_path / "j.sqlite3"))
+    rows = [{"source_file": "a.pdf", "chunk_index": i, "content": f"t{i}"} for i in range(3)]
+    first = journal.begin(rows[:2])
+    journal.ack(first)
+    journal.begin(rows[2:])
+
+    reopened = IngestJournal(str(tmp_path / "j.sqlite3"))
+    assert reopened.state("a.pdf") == {0: text_hash("t0"), 1: text_hash("t1"), 2: IN_DOUBT_HASH}
+    assert reopened.in_doubt() == {"a.pdf": [2]}
+    assert reopened.knows("a.pdf") and not reopened.knows("b.pdf")
+
+    # the in-doubt row is deleted and rewritten even though its text did not change
+    plan = diff_chunks([text_hash(f"t{i}") for i in range(3)], reopened.state("a.pdf"))
+    assert plan["keep"] == [0, 1] and plan["embed"] == [2] and plan["delete"] == [2]
+
+
+def test_lost_insert_response_is_retried_without_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "INGEST_MAX_RETRIES", 1)
+    monkeypatch.setattr(ingest_pipeline.time, "sleep", lambda s: None)
+    journal = IngestJournal(str(tmp_path / "j.sqlite3"))
+    table = FakeTable()
+    table.fail_on = "a.pdf chunk 4"
+
+    stats = _run(journal, table)
+    assert stats["failed_files"] == {}
+    assert sorted(table.rows) == _expected()
+    assert journal.in_doubt() == {}
+
+
+def test_crash_mid_batch_resumes_exactly_once_from_the_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "INGEST_MAX_RETRIES", 0)
+    path = str(tmp_path / "j.sqlite3")
+    table = FakeTable()
+    table.fail_on = "a.pdf chunk 4"
+
+    stats = _run(IngestJournal(path), table)
+    assert "a.pdf" in stats["failed_files"]
+    # the failed batch landed remotely but was never acknowledged
+    assert ("a.pdf", 4) in table.rows
+    journal = IngestJournal(path)
+    assert journal.in_doubt() == {"a.pdf": [3, 4, 5]}
+
+    stats = _run(journal, table)
+    assert stats["failed_files"] == {}
+    assert sorted(table.rows) == _expected()
+    assert stats["deleted_chunks"] == 3
+    assert stats["skipped_chunks"] == DOCS["b.pdf"] + 3  # b.pdf and a.pdf 0-2 were acked
+    assert journal.in_doubt() == {}
+
+    progress = journal.progress()
+    assert progress["files_done"] == progress["files_total"] == 2
+    assert progress["chunks_acked"] == progress["chunks_planned"] == DOCS["a.pdf"] - 3
+    assert not progress["running"]
+
+
+def test_reconcile_adopts_remote_state(tmp_path):
+    journal = IngestJournal(str(tmp_path / "j.sqlite3"))
+    journal.ack(journal.begin([{"source_file": "a.pdf", "chunk_index": 0, "content": "old"}]))
+    journal.begin([{"source_file": "a.pdf", "chunk_index": 1, "content": "x"}])
+    journal.ack(journal.begin([{"source_file": "gone.pdf", "chunk_index": 0, "content": "y"}]))
+    assert not journal.authoritative
+
+    remote = [
+        {"source_file": "a.pdf", "chunk_index": 0, "content": "new"},
+        {"source_file": "a.pdf", "chunk_index": 1, "content": "x"},
+        {"source_file": "c.pdf", "chunk_index": 0, "content": "z"},
+    ]
+    report = journal.reconcile(remote)
+    assert report == {
+        "remote_rows": 3, "journal_rows": 3, "missing_locally": 1, "missing_remotely": 1, "in_doubt": 1, "mismatched": 1,
+    }
+    assert journal.authoritative
+    assert journal.state("a.pdf") == {0: text_hash("new"), 1: text_hash("x")}
+    assert journal.in_doubt() == {}
+    assert not journal.knows("gone.pdf")
+
+
+def test_dry_run_without_manifest_writes_nothing(tmp_path, monkeypatch, capsys):
+    import ingest_01_text_to_supabase as ingest
+    from meai_core.embedding_profile import DEFAULT_PROFILE
+
+    path = tmp_path / "j.sqlite3"
+    monkeypatch.setattr(ingest, "INGEST_MANIFEST_ENABLED", False)
+    monkeypatch.setattr(ingest, "INGEST_JOURNAL_ENABLED", True)
+    monkeypatch.setattr(ingest, "IngestJournal", lambda readonly=False: IngestJournal(str(path), readonly=readonly))
+    monkeypatch.setattr(ingest, "check_env", lambda: None)
+    monkeypatch.setattr(ingest, "load_embedding_profiles", lambda: {"active": dict(DEFAULT_PROFILE)})
+    monkeypatch.setattr(ingest, "CORE_LIBRARY_DIR", str(tmp_path))
+    monkeypatch.setattr(ingest, "find_pdfs", lambda: [])
+
+    def no_writes(*args, **kwargs):
+        raise AssertionError("a dry run must not run the pipeline")
+
+    monkeypatch.setattr(IngestPipeline, "run", no_writes)
+    ingest.main(["--dry_run"])
+    assert '"totals"' in capsys.readouterr().out
+    assert not path.exists()
@@ -0,0 +1,66 @@
+import os
+
+from meai_core.ingest_manifest import IngestManifest, diff_chunks, file_sha256, text_hash
+
+
+def test_diff_chunks_keeps_reuses_and_deletes():
+    old = {0: text_hash("a"), 1: text_hash("b"), 2: text_hash("c"), 3: text_hash("d")}
+    # "x" inserted at 1 shifts b and c; d was removed
+    new = [text_hash(t) for t in ["a", "x", "b", "c"]]
+    plan = diff_chunks(new, old)
+    assert plan["keep"] == [0]
+    assert plan["reuse"] == {2: 1, 3: 2}
+    assert plan["embed"] == [1]
+    assert plan["delete"] == [1, 2, 3]
+
+
+def test_diff_chunks_unchanged_file_writes_nothing():
+    hashes = [text_hash(t) for t in ["a", "b"]]
+    plan = diff_chunks(hashes, dict(enumerate(hashes)))
+    assert plan == {"keep": [0, 1], "reuse": {}, "embed": [], "delete": []}
+
+
+def test_manifest_detects_changes(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"v1")
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    assert not manifest.is_unchanged(str(pdf), "doc.pdf", "m1")
+
+    entry = manifest.record("doc.pdf", str(pdf), file_sha256(str(pdf)), "m1", ["h0", "h1"])
+    assert manifest.is_unchanged(str(pdf), "doc.pdf", "m1")
+    # a different ingest version (embedding model or chunker) invalidates every file
+    assert not manifest.is_unchanged(str(pdf), "doc.pdf", "m2")
+
+    # touched, same bytes: still unchanged
+    st = os.stat(pdf)
+    os.utime(pdf, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+    assert manifest.is_unchanged(str(pdf), "doc.pdf", "m1")
+
+    pdf.write_bytes(b"v2 edited")
+    assert not manifest.is_unchanged(str(pdf), "doc.pdf", "m1")
+
+    row = IngestManifest.row(entry)
+    assert row["chunk_count"] == 2
+
+    fresh = IngestManifest(str(tmp_path / "fresh.sqlite3"))
+    assert fresh.is_empty()
+    fresh.load_rows([row])
+    assert fresh.get("doc.pdf")["chunk_hashes"] == ["h0", "h1"]
+    assert fresh.source_files() == ["doc.pdf"]
+
+
+def test_readonly_manifest_never_touches_the_disk(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"v1")
+    missing = tmp_path / "state" / "none.sqlite3"
+    dry = IngestManifest(str(missing), readonly=True)
+    dry.record("doc.pdf", str(pdf), file_sha256(str(pdf)), "m1", ["h0"])
+    assert dry.source_files() == ["doc.pdf"]
+    assert not (tmp_path / "state").exists()
+
+    path = str(tmp_path / "manifest.sqlite3")
+    IngestManifest(path).record("doc.pdf", str(pdf), file_sha256(str(pdf)), "m1", ["h0"])
+    dry = IngestManifest(path, readonly=True)
+    assert dry.get("doc.pdf")["chunk_hashes"] == ["h0"]
+    dry.remove("doc.pdf")
+    assert IngestManifest(path).source_files() == ["doc.pdf"]
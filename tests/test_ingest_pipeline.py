@@ -0,0 +1,151 @@
+import random
+import time
+
+from meai_core.ingest_pipeline import AdaptiveBatchSize, IngestPipeline, RateLimiter, TokenBucket, estimate_tokens
+
+DOCS = {"a.pdf": 23, "b.pdf": 7, "empty.pdf": 0}
+
+
+def fake_extract(path):
+    return [f"{path} chunk {i}" for i in range(DOCS[path])], 3
+
+
+def _pipeline(embed, inserted, **kwargs):
+    kwargs.setdefault("extract_workers", 0)
+    kwargs.setdefault("limiter", RateLimiter(rpm=0, tpm=0))
+    return IngestPipeline(
+        fake_extract,
+        embed,
+        lambda rows: inserted.extend(rows),
+        embed_workers=4,
+        batch_size=AdaptiveBatchSize(start=2, maximum=5),
+        insert_batch=4,
+        queue_size=3,
+        log=lambda msg: None,
+        **kwargs,
+    )
+
+
+def _jittery_embed(texts):
+    time.sleep(random.random() * 0.005)
+    return [[float(len(t))] for t in texts]
+
+
+def test_pipeline_inserts_each_file_in_order():
+    inserted = []
+    files = [(p, p) for p in DOCS]
+    stats = _pipeline(_jittery_embed, inserted).run(files, resume_index=lambda sf: 5 if sf == "a.pdf" else 0)
+
+    a_rows = [r["chunk_index"] for r in inserted if r["source_file"] == "a.pdf"]
+    b_rows = [r["chunk_index"] for r in inserted if r["source_file"] == "b.pdf"]
+    assert a_rows == list(range(5, 23))
+    assert b_rows == list(range(7))
+    assert stats["files_done"] == 3
+    assert stats["rows_inserted"] == 25
+    assert stats["skipped_chunks"] == 5
+    assert stats["pages"] == 9
+    assert stats["failed_files"] == {}
+
+
+def test_pipeline_abandons_file_after_embedding_failure(monkeypatch):
+    import meai_core.ingest_pipeline as ingest_pipeline
+
+    monkeypatch.setattr(ingest_pipeline, "INGEST_MAX_RETRIES", 0)
+
+    def embed(texts):
+        if any(t == "a.pdf chunk 9" for t in texts):
+            raise RuntimeError("boom")
+        return _jittery_embed(texts)
+
+    inserted = []
+    stats = _pipeline(embed, inserted).run([("a.pdf", "a.pdf"), ("b.pdf", "b.pdf")])
+    a_rows = [r["chunk_index"] for r in inserted if r["source_file"] == "a.pdf"]
+    # only the contiguous prefix before the failed batch is written, so resume stays correct
+    assert a_rows == list(range(len(a_rows)))
+    assert len(a_rows) <= 9
+    assert "a.pdf" in stats["failed_files"]
+    assert len([r for r in inserted if r["source_file"] == "b.pdf"]) == 7
+
+
+def test_extra_embeddings_are_made_in_the_embedding_stage():
+    inserted, charged = [], []
+
+    class CountingLimiter(RateLimiter):
+        def acquire(self, texts):
+            charged.append(len(texts))
+            return 0.0
+
+    pipeline = _pipeline(_jittery_embed, inserted, limiter=CountingLimiter(), extra_embeddings=lambda: {"v2": lambda texts: [[-1.0] for _ in texts]})
+    reused = {"embedding": [9.0], "extra_embeddings": {"v2": [8.0]}}
+    plan = lambda path, sf, texts: {"embed": list(range(1, len(texts))), "reuse": {0: reused}, "delete": []}
+    stats = pipeline.run([("b.pdf", "b.pdf")], plan_file=plan)
+
+    rows = sorted(inserted, key=lambda r: r["chunk_index"])
+    assert rows[0]["embedding"] == [9.0] and rows[0]["extra_embeddings"] == {"v2": [8.0]}
+    assert all(r["extra_embeddings"] == {"v2": [-1.0]} and r["embedding"] == [float(len(r["content"]))] for r in rows[1:])
+    # every embedder is charged against the limiter for the chunks it embeds
+    assert sum(charged) == 2 * 6 and stats["embed_requests"] == len(charged)
+
+
+def test_pipeline_extracts_in_worker_processes():
+    inserted = []
+    stats = _pipeline(_jittery_embed, inserted, extract_workers=2).run([("a.pdf", "a.pdf"), ("b.pdf", "b.pdf")])
+    assert stats["rows_inserted"] == 30
+    assert stats["extract_sec"] > 0
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100.0, capacity=5.0)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire(1)
+    # 5 burst tokens, then 10 more at 100/s
+    assert time.monotonic() - start >= 0.09
+
+
+def test_batches_larger_than_the_burst_are_charged_in_full():
+    # 60k TPM is 1000 tokens/s with a one-second burst; each batch is ~1250 tokens
+    limiter = RateLimiter(rpm=0, tpm=60000)
+    batch = ["x" * 36] * 125
+    start = time.monotonic()
+    for _ in range(2):
+        limiter.acquire(batch)
+    elapsed = time.monotonic() - start
+    sent = 2 * estimate_tokens(batch)
+    assert (sent - limiter.tokens.capacity) / elapsed <= limiter.tokens.rate * 1.01
+
+
+def test_adaptive_batch_size():
+    size = AdaptiveBatchSize(start=8, maximum=10)
+    size.success()
+    assert size.size == 10
+    size.success()
+    assert size.size == 10
+    size.failure()
+    assert size.size == 5
+
+
+def test_pipeline_applies_incremental_plan():
+    inserted, deleted, done = [], [], []
+    plan = {"embed": [1, 4], "reuse": {2: [9.0], 3: [9.5]}, "delete": [1, 2, 3, 4, 5]}
+    stats = _pipeline(_jittery_embed, inserted).run(
+        [("b.pdf", "b.pdf")],
+        plan_file=lambda path, sf, chunks: plan,
+        delete_chunks=lambda sf, indices: deleted.append((sf, indices)),
+        on_file_done=done.append,
+    )
+    assert deleted == [("b.pdf", [1, 2, 3, 4, 5])]
+    assert sorted(r["chunk_index"] for r in inserted) == [1, 2, 3, 4]
+    assert {r["chunk_index"]: r["embedding"] for r in inserted}[3] == [9.5]
+    assert done == ["b.pdf"]
+    assert stats["reused_embeddings"] == 2
+    assert stats["skipped_chunks"] == 3
+    assert stats["embed_requests"] >= 1
+
+
+def test_pipeline_passes_chunk_columns_through():
+    inserted = []
+    pipeline = _pipeline(_jittery_embed, inserted)
+    pipeline.extract_chunks = lambda path: ([{"content": "text one", "page_start": 1, "page_end": 2}], 2)
+    pipeline.run([("c.pdf", "c.pdf")])
+    assert inserted == [{"source_file": "c.pdf", "chunk_index": 0, "content": "text one", "embedding": [8.0], "page_start": 1, "page_end": 2}]
@@ -0,0 +1,144 @@
+import os
+import time
+
+import pytest
+
+import ingest_01_text_to_supabase as ingest
+from meai_core import engine
+from meai_core.corpus_stamp import CorpusStamp
+from meai_core.ingest_watch import RESCAN, Debouncer, IngestDaemon, InotifyWatcher, PollingWatcher
+
+
+def _accept(path):
+    return path.endswith(".pdf")
+
+
+def _accept_dir(path):
+    return os.path.basename(path) != "policies"
+
+
+def _write(path, data=b"%PDF-1.4 x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_polling_watcher_reports_added_modified_and_removed(tmp_path):
+    _write(str(tmp_path / "a.pdf"))
+    _write(str(tmp_path / "b.pdf"))
+    watcher = PollingWatcher([str(tmp_path)], _accept, _accept_dir, interval=0)
+    assert watcher.poll(0) == set()
+
+    _write(str(tmp_path / "a.pdf"), b"%PDF-1.4 changed")
+    os.remove(tmp_path / "b.pdf")
+    _write(str(tmp_path / "sub" / "c.pdf"))
+    _write(str(tmp_path / "policies" / "p.pdf"))
+    _write(str(tmp_path / "notes.txt"))
+    assert watcher.poll(0) == {str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf"), str(tmp_path / "sub" / "c.pdf")}
+    assert watcher.poll(0) == set()
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="inotify is Linux-only")
+def test_inotify_watcher_follows_new_directories(tmp_path):
+    watcher = InotifyWatcher([str(tmp_path)], _accept, _accept_dir)
+    try:
+        _write(str(tmp_path / "a.pdf"))
+        _write(str(tmp_path / "policies" / "p.pdf"))
+        os.makedirs(tmp_path / "new")
+        _write(str(tmp_path / "new" / "b.pdf"))
+        seen = set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len(seen) < 2:
+            seen |= watcher.poll(0.2)
+        assert seen == {str(tmp_path / "a.pdf"), str(tmp_path / "new" / "b.pdf")}
+
+        os.remove(tmp_path / "new" / "b.pdf")
+        seen = set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not seen:
+            seen |= watcher.poll(0.2)
+        assert seen == {str(tmp_path / "new" / "b.pdf")}
+    finally:
+        watcher.close()
+
+
+def test_debouncer_waits_for_quiet_and_stable_files(tmp_path):
+    path = str(tmp_path / "a.pdf")
+    _write(path)
+    d = Debouncer(quiet_sec=10)
+    d.touch([path], now=100)
+    assert d.ready(now=105) == []
+    assert d.time_to_next(now=105) == 5
+
+    _write(path, b"%PDF-1.4 still copying")  # size moved since the event: hold it again
+    assert d.ready(now=111) == []
+    assert d.ready(now=122) == [path]
+    assert len(d) == 0
+
+
+class FakeWatcher:
+    kind = "fake"
+    roots = ["/lib"]
+
+    def __init__(self):
+        self.events = []
+
+    def poll(self, timeout):
+        return self.events.pop(0) if self.events else set()
+
+    def close(self):
+        pass
+
+
+def test_daemon_starts_with_a_full_pass_then_ingests_settled_changes(tmp_path):
+    a, gone = str(tmp_path / "a.pdf"), str(tmp_path / "gone.pdf")
+    _write(a)
+    watcher = FakeWatcher()
+    calls, refreshed = [], []
+    daemon = IngestDaemon(
+        watcher,
+        lambda changed, removed, full: calls.append((changed, removed, full)) or {"rows_inserted": len(changed)},
+        on_ingested=refreshed.append,
+        debounce_sec=0,
+        log=lambda msg: None,
+    )
+    daemon.step()
+    assert calls == [([], [], True)]
+
+    watcher.events = [{a, gone}, {RESCAN}]
+    daemon.step()
+    assert calls[-1] == ([a], [gone], False)
+    assert daemon.step() is not None and calls[-1] == ([], [], True)
+    assert daemon.step() is None
+    assert refreshed[1] == {"rows_inserted": 1}
+    assert daemon.stats()["full_passes"] == 2
+
+
+def test_ingest_filters_match_the_full_walk(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "CORE_LIBRARY_DIR", str(tmp_path / "lib"))
+    monkeypatch.setattr(ingest, "SYSTEM_PDFS_DIR", str(tmp_path / "system"))
+    doc = str(tmp_path / "lib" / "vendors" / "acme.pdf")
+    assert ingest.source_id_for(doc) == os.path.join("vendors", "acme.pdf")
+    assert ingest.is_ingestable(doc)
+    assert not ingest.is_ingestable(str(tmp_path / "lib" / "policies" / "x.pdf"))
+    assert not ingest.is_ingestable(str(tmp_path / "lib" / "notes.txt"))
+    assert ingest.is_ingestable(doc, only_files=["acme.pdf"])
+    assert ingest.is_ingestable(doc, only_files=[os.path.join("vendors", "acme.pdf")])
+    assert not ingest.is_ingestable(doc, only_files=["other.pdf"])
+
+
+def test_corpus_stamp_bump_invalidates_engine_caches(tmp_path, monkeypatch):
+    stamp = CorpusStamp(str(tmp_path / "stamp.json"), check_interval_sec=0)
+    assert stamp.version() == ""
+    monkeypatch.setattr(engine, "corpus_stamp", stamp)
+    monkeypatch.setattr(engine, "_seen_corpus_stamp", {"version": None})
+    invalidated = []
+    monkeypatch.setattr(engine, "invalidate_caches", lambda: invalidated.append(1))
+
+    before = engine.answer_cache_version()
+    assert engine.answer_cache_version() == before and invalidated == []
+    writer = CorpusStamp(str(tmp_path / "stamp.json"))
+    assert writer.bump({"rows_inserted": 3}) == stamp.version()
+    assert engine.answer_cache_version() != before
+    assert invalidated == [1]
+    assert writer.read()["rows_inserted"] == 3
@@ -0,0 +1,161 @@
+import asyncio, sqlite3
+from types import SimpleNamespace
+
+from meai_core import engine
+from meai_core.lexical_index import LexicalIndex, fuse, query_terms, tokenize
+
+PROSE = "Bolt preload depends on the thread friction and the property class of the fastener. "
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.columns = None
+        self.window = None
+
+    def select(self, columns):
+        self.columns = columns.split(",")
+        return self
+
+    def order(self, col):
+        self.rows = sorted(self.rows, key=lambda r: r[col])
+        return self
+
+    def eq(self, col, val):
+        self.rows = [r for r in self.rows if r[col] == val]
+        return self
+
+    def in_(self, col, vals):
+        self.rows = [r for r in self.rows if r[col] in vals]
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def execute(self):
+        rows = self.rows[slice(*self.window)] if self.window else self.rows
+        return SimpleNamespace(data=[{c: r.get(c) for c in self.columns} for r in rows])
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return FakeQuery(list(self.rows))
+
+
+def _row(ci, content, quality=0.9, sf="spec.pdf"):
+    return {"source_file": sf, "chunk_index": ci, "content": content, "page_start": 1, "page_end": 2, "quality": quality}
+
+
+def test_identifiers_stay_whole_and_are_split_into_parts():
+    assert tokenize("Use ISO 898-1 class 8.8 in 6061-T6.") == [
+        "use", "iso", "898-1", "898", "1", "class", "8.8", "8", "8", "in", "6061-t6", "6061", "t6",
+    ]
+    assert query_terms("What is the ISO 898-1 spec?") == ["iso", "898-1", "898", "1", "spec"]
+
+
+def test_exact_identifier_ranks_first_and_quality_filters(tmp_path):
+    rows = [
+        _row(0, PROSE + "Grade requirements follow ISO 898-1 for property class 10.9."),
+        _row(1, PROSE + "Nuts are specified in ISO 898-2."),
+        _row(2, "ISO 898-1 " * 20, quality=0.1),
+    ] + [_row(i, PROSE + f"Washer {i} is zinc plated.") for i in range(3, 10)]
+    index = LexicalIndex(path=str(tmp_path / "lex.sqlite3"))
+    assert not index.available()
+    assert index.build(FakeSupabase(rows)) == 10
+    hits = index.search("ISO 898-1 property class", k=3, min_quality=0.5)
+    assert [h["chunk_index"] for h in hits[:2]] == [0, 1]
+    assert all(h["chunk_index"] != 2 for h in hits)
+    assert hits[0]["page_end"] == 2 and hits[0]["bm25"] > hits[1]["bm25"]
+    assert index.search("the of and", k=3) == []
+
+
+def test_update_syncs_by_key_and_readers_follow_a_rebuild(tmp_path):
+    rows = [_row(i, PROSE + f"part HX-{100 + i}") for i in range(5)]
+    sb = FakeSupabase(rows)
+    path = str(tmp_path / "lex.sqlite3")
+    writer, reader = LexicalIndex(path=path), LexicalIndex(path=path)
+    writer.build(sb)
+    assert reader.search("HX-102", k=1)[0]["chunk_index"] == 2
+
+    rows.pop(2)
+    rows.append(_row(9, PROSE + "part HX-900"))
+    assert writer.update(sb) == 1
+    assert writer.count == 5
+    assert all(r["chunk_index"] != 2 for r in writer.search("HX-102", k=5))
+    assert writer.search("HX-900", k=1)[0]["chunk_index"] == 9
+
+    rows[0] = _row(0, PROSE + "part HX-777")
+    writer.rebuild(sb)
+    reader._last_check = 0.0
+    assert reader.search("HX-777", k=1)[0]["chunk_index"] == 0
+
+
+def test_search_filters_by_source_file_and_collection(tmp_path):
+    rows = [_row(i, PROSE + f"Torque for M{8 + i} bolts.", sf=f"doc{i % 3}.pdf") for i in range(9)]
+    for r in rows:
+        r["collection"] = "system" if r["source_file"] == "doc0.pdf" else "core"
+    index = LexicalIndex(path=str(tmp_path / "lex.sqlite3"))
+    index.build(FakeSupabase(rows))
+
+    hits = index.search("torque bolts", k=5, collection="system")
+    assert len(hits) == 3 and all(h["source_file"] == "doc0.pdf" and h["collection"] == "system" for h in hits)
+    hits = index.search("torque bolts", k=9, source_files=["doc1.pdf", "doc2.pdf"])
+    assert len(hits) == 6 and "doc0.pdf" not in {h["source_file"] for h in hits}
+    assert index.search("torque bolts", k=5, source_files=["doc1.pdf"], collection="system") == []
+    assert index.search("torque bolts", k=5, source_files=[]) == []
+
+
+def test_other_schema_is_unavailable_and_left_intact(tmp_path):
+    path = str(tmp_path / "lex.sqlite3")
+    LexicalIndex(path=path).build(FakeSupabase([_row(0, PROSE)]))
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA user_version = 1")
+    db.close()
+    index = LexicalIndex(path=path)
+    assert not index.available()
+    assert index.search("bolt preload") == []
+    # a reader running other code must not wipe the file the ingester built
+    db = sqlite3.connect(path)
+    assert db.execute("SELECT count(*) FROM chunks").fetchone()[0] == 1
+    db.close()
+    assert index.update(FakeSupabase([_row(0, PROSE)])) == 1
+    assert index.available() and index.search("bolt preload")
+
+
+def test_rrf_fuses_both_rankings():
+    vector = [{"source_file": "a", "chunk_index": i, "similarity": 0.9 - i / 10} for i in range(3)]
+    lexical = [{"source_file": "a", "chunk_index": 2, "bm25": 7.0}, {"source_file": "b", "chunk_index": 0, "bm25": 5.0}]
+    out = fuse(vector, lexical, k=4, rrf_k=60)
+    assert [(r["source_file"], r["chunk_index"]) for r in out[:2]] == [("a", 2), ("a", 0)]
+    assert out[0]["vector_rank"] == 3 and out[0]["lexical_rank"] == 1 and out[0]["bm25"] == 7.0
+    assert out[0]["similarity"] == 0.7
+    lexical_only = next(r for r in out if r["source_file"] == "b")
+    assert lexical_only["vector_rank"] is None and lexical_only["lexical_rank"] == 2
+
+    vector_only = fuse(vector, lexical, k=1, lexical_weight=0.0)
+    assert vector_only[0]["chunk_index"] == 0
+
+
+def test_retrieve_chunks_is_hybrid_only_with_query_text(tmp_path, monkeypatch):
+    index = LexicalIndex(path=str(tmp_path / "lex.sqlite3"))
+    index.build(FakeSupabase([_row(0, PROSE + "ISO 898-1"), _row(1, PROSE)]))
+    monkeypatch.setattr(engine, "lexical_index", index)
+    monkeypatch.setattr(engine, "HYBRID_RETRIEVAL", True)
+    monkeypatch.setattr(engine, "_check_corpus_stamp", lambda: "")
+    vector_rows = [_row(1, PROSE), _row(5, PROSE, sf="other.pdf")]
+    monkeypatch.setattr(engine, "_vector_chunks", lambda q_emb, k, flt=None: vector_rows[:k])
+
+    async def avector(q_emb, k, flt=None):
+        return vector_rows[:k]
+
+    monkeypatch.setattr(engine, "_avector_chunks", avector)
+
+    assert engine.retrieve_chunks([0.1], k=2) == vector_rows
+    rows = engine.retrieve_chunks([0.1], k=2, query_text="ISO 898-1 preload")
+    assert {(r["source_file"], r["chunk_index"]) for r in rows} == {("spec.pdf", 0), ("spec.pdf", 1)}
+    rows = asyncio.run(engine.aretrieve_chunks([0.1], k=2, query_text="ISO 898-1 preload"))
+    assert {(r["source_file"], r["chunk_index"]) for r in rows} == {("spec.pdf", 0), ("spec.pdf", 1)}
@@ -0,0 +1,62 @@
+import threading
+
+import meai_core.engine as engine
+from meai_core.license_catalog import LicenseCatalog
+
+
+DOCS = [
+    {"source_url": "a.pdf", "title": "Bolts", "license_key": "cc-by"},
+    {"source_url": "b.pdf", "title": "Gears"},
+]
+LICENSES = [{"license_key": "cc-by", "verbatim_allowed": True, "verbatim_char_limit": 200}]
+
+
+def _catalog(loads, fail=False):
+    def load_documents():
+        loads.append("documents")
+        if fail:
+            raise RuntimeError("supabase down")
+        return DOCS
+
+    return LicenseCatalog(
+        load_documents=load_documents,
+        load_licenses=lambda: LICENSES,
+        render_lines=engine.render_license_lines,
+        doc_source_col="source_url",
+        license_key_of=engine._doc_license_key,
+        enabled=True,
+        ttl_sec=300,
+    )
+
+
+def _wait_for_load():
+    for t in threading.enumerate():
+        if t.name == "meai-license-catalog":
+            t.join(5)
+
+
+def test_catalog_matches_query_rendering():
+    loads = []
+    catalog = _catalog(loads)
+    files = ["a.pdf", "b.pdf", "missing.pdf"]
+    expected = engine.render_license_block(files, {d["source_url"]: d for d in DOCS}, LICENSES)
+
+    # a cold catalog never loads on the request path; the caller falls back meanwhile
+    assert catalog.lines_for(files) is None
+    _wait_for_load()
+    assert "\n".join([engine.LICENSE_BLOCK_HEADER] + catalog.lines_for(files)) == expected
+    catalog.lines_for(["a.pdf"])
+    assert loads == ["documents"]
+    assert catalog.stats()["documents"] == 2
+    assert (catalog.stats()["hits"], catalog.stats()["fallbacks"]) == (2, 1)
+
+
+def test_catalog_falls_back_when_load_fails():
+    loads = []
+    catalog = _catalog(loads, fail=True)
+    assert catalog.lines_for(["a.pdf"]) is None
+    _wait_for_load()
+    # backs off instead of retrying on every request
+    assert catalog.lines_for(["a.pdf"]) is None
+    assert loads == ["documents"]
+    assert catalog.stats()["fallbacks"] == 2
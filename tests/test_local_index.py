@@ -0,0 +1,272 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from meai_core.local_index import LocalVectorIndex, sample_queries
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.columns = None
+        self.window = None
+
+    def select(self, columns):
+        self.columns = columns.split(",")
+        return self
+
+    def order(self, col):
+        self.rows = sorted(self.rows, key=lambda r: r[col])
+        return self
+
+    def eq(self, col, val):
+        self.rows = [r for r in self.rows if r[col] == val]
+        return self
+
+    def in_(self, col, vals):
+        self.rows = [r for r in self.rows if r[col] in vals]
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def execute(self):
+        rows = self.rows[slice(*self.window)] if self.window else self.rows
+        return SimpleNamespace(data=[{c: r.get(c) for c in self.columns} for r in rows])
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return FakeQuery(list(self.rows))
+
+
+def _row(sf, ci, vec, quality=None):
+    return {"source_file": sf, "chunk_index": ci, "content": f"{sf}#{ci}", "embedding": str(vec), "quality": quality}
+
+
+def test_build_search_and_incremental_update(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(20, 8)).astype(np.float32)
+    rows = [_row("a.pdf", i, vecs[i].tolist()) for i in range(20)]
+    sb = FakeSupabase(rows)
+
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    assert index.build(sb) == 20
+
+    hits = index.search(vecs[7].tolist(), k=3)
+    assert hits[0]["chunk_index"] == 7
+    assert abs(hits[0]["similarity"] - 1.0) < 1e-5
+    assert len(hits) == 3
+    assert hits[0]["similarity"] >= hits[1]["similarity"] >= hits[2]["similarity"]
+
+    new_vec = rng.normal(size=8).astype(np.float32)
+    sb.rows = rows + [_row("b.pdf", 0, new_vec.tolist())]
+    assert index.update(sb) == 1
+    assert index.update(sb) == 0
+
+    other_worker = LocalVectorIndex(index_dir=str(tmp_path))
+    assert other_worker.available()
+    assert other_worker.count == 21
+    assert other_worker.search(new_vec.tolist(), k=1)[0]["source_file"] == "b.pdf"
+
+
+def test_float16_matches_exact_ranking(tmp_path):
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(50, 16)).astype(np.float32)
+    sb = FakeSupabase([_row("a.pdf", i, vecs[i].tolist()) for i in range(50)])
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(sb, dtype="float16")
+
+    q = vecs[3] + 0.01 * rng.normal(size=16).astype(np.float32)
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    exact = list(np.argsort(-(normed @ q))[:5])
+    assert [h["chunk_index"] for h in index.search(q.tolist(), k=5)] == exact
+
+    # float32 arrays are searched as-is, without normalizing the caller's copy
+    before = q.copy()
+    index.search(q, k=5)
+    index.exact_search(q, k=5)
+    assert np.array_equal(q, before)
+
+
+def test_empty_index_is_unavailable(tmp_path):
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    assert not index.available()
+    assert index.search([1.0, 0.0], k=3) == []
+
+
+def test_search_skips_low_quality_rows(tmp_path):
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(10, 8)).astype(np.float32)
+    rows = [_row("a.pdf", i, vecs[i].tolist(), quality=0.9) for i in range(10)]
+    rows[4]["quality"] = 0.2
+    rows[5]["quality"] = None  # unscored: scored at build time from its (short) content
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase(rows))
+
+    assert index.search(vecs[4].tolist(), k=1)[0]["chunk_index"] == 4
+    hits = index.search(vecs[4].tolist(), k=20, min_quality=0.5)
+    assert len(hits) == 8
+    assert {h["chunk_index"] for h in hits}.isdisjoint({4, 5})
+    assert all(h["quality"] >= 0.5 for h in hits)
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_filtered_search_returns_k_matching_rows(tmp_path, quantization):
+    vecs = _clustered(200, 16, 6)
+    rows = [_row(f"doc{i % 20}.pdf", i, vecs[i].tolist()) for i in range(200)]
+    for i, r in enumerate(rows):
+        r["collection"] = "system" if i % 20 == 3 else "core"
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase(rows), quantization=quantization)
+
+    # the best overall match is filtered out, yet k matching rows still come back
+    q = vecs[0].tolist()
+    hits = index.search(q, k=5, collection="system")
+    assert len(hits) == 5 and all(h["collection"] == "system" for h in hits)
+    hits = index.search(q, k=4, source_files=["doc7.pdf", "doc9.pdf"])
+    assert len(hits) == 4 and {h["source_file"] for h in hits} <= {"doc7.pdf", "doc9.pdf"}
+    assert index.search(q, k=50, source_files=["doc7.pdf"], collection="system") == []
+    assert index.search(q, k=3, source_files=[]) == []
+
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    in_doc5 = [i for i in range(200) if i % 20 == 5]
+    exact = sorted(in_doc5, key=lambda i: -float(normed[i] @ (vecs[0] / np.linalg.norm(vecs[0]))))
+    assert [h["chunk_index"] for h in index.search(q, k=3, source_files="doc5.pdf")] == exact[:3]
+
+
+def test_update_rebuilds_snapshots_without_collections(tmp_path):
+    vecs = _clustered(10, 8, 7)
+    rows = [dict(_row("a.pdf", i, vecs[i].tolist()), collection="core") for i in range(10)]
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase(rows))
+    header = index._read_header()
+    del header["collections"]
+    index._write_header(header)
+    index.load()
+    assert not index.has_collections()
+
+    assert index.update(FakeSupabase(rows)) == 10
+    assert index.has_collections()
+    assert len(index.search(vecs[0].tolist(), k=3, collection="core")) == 3
+
+
+def _clustered(n, dim, seed):
+    # embeddings cluster by topic; uniform random vectors would make every method look bad
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim)).astype(np.float32)
+    return centers[rng.integers(0, 20, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_old_headers_load_as_full_precision(tmp_path):
+    vecs = _clustered(30, 16, 3)
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase([_row("a.pdf", i, vecs[i].tolist()) for i in range(30)]), quantization="none")
+    header = index._read_header()
+    del header["search_dim"], header["quantization"]
+    index._write_header(header)
+    index.load()
+    assert index.stats()["quantization"] == "none"
+    assert index.search(vecs[5].tolist(), k=1)[0]["chunk_index"] == 5
+
+
+@pytest.mark.parametrize("quantization,dims,min_recall,min_compression", [
+    ("none", 32, 0.95, 1.9),
+    ("int8", 0, 0.95, 3.7),  # plus 4 bytes of per-row scale
+    ("int8", 32, 0.95, 7.0),
+    ("binary", 0, 0.95, 31.9),
+])
+def test_compact_modes_rescore_to_high_recall(tmp_path, quantization, dims, min_recall, min_compression):
+    vecs = _clustered(600, 64, 4)
+    sb = FakeSupabase([_row("a.pdf", i, vecs[i].tolist()) for i in range(600)])
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(sb, quantization=quantization, search_dim=dims)
+
+    stats = index.stats()
+    assert stats["quantization"] == quantization
+    assert stats["compression"] >= min_compression
+
+    queries = sample_queries(index, 50)
+    report = index.measure_recall(queries, k=8)
+    assert report["recall_at_k"] >= min_recall
+
+    # similarities come from the full-precision rows, not the codes
+    hit = index.search(vecs[9].tolist(), k=1)[0]
+    assert hit["chunk_index"] == 9
+    assert abs(hit["similarity"] - 1.0) < 1e-5
+
+    more = [_row("b.pdf", i, vecs[i].tolist()) for i in range(3)]
+    sb.rows = sb.rows + more
+    assert index.update(sb) == len(more)
+    assert index.search(vecs[1].tolist(), k=2)[1]["source_file"] in ("a.pdf", "b.pdf")
+    assert index.stats()["count"] == 603
+
+
+def test_compact_search_respects_quality(tmp_path):
+    vecs = _clustered(40, 32, 5)
+    rows = [_row("a.pdf", i, vecs[i].tolist(), quality=0.9) for i in range(40)]
+    rows[0]["quality"] = 0.1
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase(rows), quantization="int8")
+    hits = index.search(vecs[0].tolist(), k=50, min_quality=0.5)
+    assert len(hits) == 39
+    assert 0 not in {h["chunk_index"] for h in hits}
+
+
+def test_update_rebuilds_from_the_new_column_after_an_embedding_switch(tmp_path):
+    rng = np.random.default_rng(3)
+    rows = [_row("a.pdf", i, rng.normal(size=8).tolist()) for i in range(10)]
+    sb = FakeSupabase(rows)
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(sb, embed_model="old-model")
+    assert index.update(sb, "old-model", "embedding") == 0
+
+    for r in rows:
+        r["embedding_v2"] = str(rng.normal(size=4).tolist())
+    assert index.update(sb, "new-model@4", "embedding_v2") == 10
+    assert index.embed_model() == "new-model@4"
+    assert index.stats()["dim"] == 4
+    assert len(index.search(rng.normal(size=4).tolist(), k=3)) == 3
+
+
+@pytest.mark.parametrize("quantization", ["none", "binary"])
+def test_search_can_return_row_vectors(tmp_path, quantization):
+    vecs = _clustered(40, 16, 8)
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase([_row("a.pdf", i, vecs[i].tolist()) for i in range(40)]), quantization=quantization)
+    assert "embedding" not in index.search(vecs[2].tolist(), k=2)[0]
+    hits = index.search(vecs[2].tolist(), k=3, with_vectors=True)
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    for h in hits:
+        assert np.allclose(h["embedding"], normed[h["chunk_index"]], atol=1e-5)
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_update_drops_rows_left_by_an_interrupted_append(tmp_path, quantization):
+    vecs = _clustered(12, 16, 11)
+    rows = [_row("a.pdf", i, vecs[i].tolist()) for i in range(10)]
+    index = LocalVectorIndex(index_dir=str(tmp_path))
+    index.build(FakeSupabase(rows), quantization=quantization, search_dim=8 if quantization != "none" else 0)
+
+    # a worker died after writing vectors and meta for a row but before the header
+    header = index._read_header()
+    index._write_header = lambda h: (_ for _ in ()).throw(OSError("killed"))
+    with pytest.raises(OSError):
+        index._append([_row("orphan.pdf", 0, vecs[10].tolist())], dict(header))
+    del index._write_header
+    assert index._read_header()["count"] == 10
+
+    assert index.update(FakeSupabase(rows + [_row("b.pdf", 0, vecs[11].tolist())])) == 1
+    reader = LocalVectorIndex(index_dir=str(tmp_path))
+    assert reader.available() and reader.count == 11
+    assert "orphan.pdf" not in {m["source_file"] for m in reader._meta}
+    # vector i still belongs to meta i
+    expected = [("a.pdf", i, vecs[i]) for i in range(10)] + [("b.pdf", 0, vecs[11])]
+    for sf, ci, vec in expected:
+        hit = reader.search(vec.tolist(), k=1)[0]
+        assert (hit["source_file"], hit["chunk_index"]) == (sf, ci)
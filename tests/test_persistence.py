@@ -0,0 +1,61 @@
+from meai_core.persistence import WriteBehindWriter
+
+
+def _writer(calls, fail_sessions=0, **kwargs):
+    state = {"session_failures": fail_sessions}
+
+    def write_sessions(rows):
+        if state["session_failures"]:
+            state["session_failures"] -= 1
+            raise RuntimeError("supabase down")
+        calls.append(("sessions", [r["id"] for r in rows]))
+
+    def write_messages(rows):
+        calls.append(("messages", [r["id"] for r in rows]))
+
+    kwargs.setdefault("flush_interval_sec", 60)
+    return WriteBehindWriter(write_sessions, write_messages, enabled=True, dead_letter_path=None, **kwargs)
+
+
+def test_batches_sessions_before_messages():
+    calls = []
+    writer = _writer(calls, batch_size=100)
+    writer.submit_session({"id": "s1"})
+    writer.submit_message({"id": "m1"})
+    writer.submit_session({"id": "s1"})
+    writer.submit_message({"id": "m2"})
+    assert writer.flush()
+    assert calls == [("sessions", ["s1"]), ("messages", ["m1", "m2"])]
+    assert writer.seen_session({"id": "s1"})
+    assert not writer.seen_session({"id": "s1", "tester_label": "qa"})
+    writer.close()
+
+
+def test_flushes_by_size():
+    calls = []
+    writer = _writer(calls, batch_size=2)
+    for i in range(4):
+        writer.submit_message({"id": f"m{i}"})
+    assert writer.flush()
+    assert calls == [("messages", ["m0", "m1"]), ("messages", ["m2", "m3"])]
+    writer.close()
+
+
+def test_retries_then_dead_letters_and_forgets_session(monkeypatch):
+    monkeypatch.setattr("meai_core.persistence.time.sleep", lambda s: None)
+    calls = []
+    writer = _writer(calls, fail_sessions=1, max_retries=1)
+    writer.submit_session({"id": "s1"})
+    writer.submit_message({"id": "m1"})
+    assert writer.flush()
+    assert calls == [("sessions", ["s1"]), ("messages", ["m1"])]
+    assert writer.stats()["retries"] == 1
+
+    failing = _writer([], fail_sessions=5, max_retries=1)
+    failing.submit_session({"id": "s2"})
+    failing.submit_message({"id": "m2"})
+    assert failing.flush()
+    assert failing.stats()["dead_lettered"] == 2
+    assert not failing.seen_session({"id": "s2"})
+    writer.close()
+    failing.close()
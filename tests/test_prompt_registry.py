@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from meai_core.prompt_registry import PromptRegistry, PromptTemplate
+
+
+def _write(path, text, mtime_ns=None):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_registry_reloads_only_on_change(tmp_path):
+    _write(tmp_path / "planner.txt", "plan v1\n", mtime_ns=1_000_000_000)
+    facts = tmp_path / "facts.txt"
+    _write(facts, "facts", mtime_ns=1_000_000_000)
+    reg = PromptRegistry(str(tmp_path), extra_files={"pinned_facts": str(facts)}, check_interval_sec=0)
+    reg.load()
+
+    assert reg.get("planner") == "plan v1"
+    assert reg.get("pinned_facts") == "facts"
+    v1 = reg.version()
+
+    # touched but identical content keeps the version
+    os.utime(tmp_path / "planner.txt", ns=(2_000_000_000, 2_000_000_000))
+    assert reg.version() == v1
+    assert reg.stats()["reloads"] == 0
+
+    _write(tmp_path / "planner.txt", "plan v2", mtime_ns=3_000_000_000)
+    assert reg.get("planner") == "plan v2"
+    assert reg.version() != v1
+    assert reg.stats()["reloads"] == 1
+
+    with pytest.raises(FileNotFoundError):
+        reg.get("mode_9")
+
+
+def test_registry_check_interval_defers_reload(tmp_path):
+    _write(tmp_path / "mode_1.txt", "one", mtime_ns=1_000_000_000)
+    reg = PromptRegistry(str(tmp_path), check_interval_sec=3600)
+    assert reg.get("mode_1") == "one"
+    _write(tmp_path / "mode_1.txt", "two", mtime_ns=2_000_000_000)
+    assert reg.get("mode_1") == "one"
+    reg.load()
+    assert reg.get("mode_1") == "two"
+
+
+def test_prompt_template_matches_format():
+    template = "{license_block}\n\nQ: {question}\n- cite as [source_file:chunk_index]"
+    t = PromptTemplate(template)
+    assert t.prefix == ""
+    assert t.fields == ["license_block", "question"]
+    values = {"license_block": "LICENSE", "question": "what about {braces}?"}
+    assert t.render(**values) == template.format(**values)
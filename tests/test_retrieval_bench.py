@@ -0,0 +1,61 @@
+import copy
+import os
+
+import pytest
+
+import ingest_01_text_to_supabase as ingest
+from benchmarks.retrieval_bench import (
+    DEFAULT_GOLDEN_PATH, compare, judgements, load_golden, rank_metrics, record_synthetic, run_benchmark,
+)
+from meai_core import engine
+from meai_core.chunking import iter_pdf_pages, stream_chunks
+
+
+def test_rank_metrics():
+    relevant = {"a.pdf:0": 2, "a.pdf:1": 1}
+    m = rank_metrics(["x.pdf:0", "a.pdf:1", "a.pdf:0"], relevant, [1, 3])
+    assert m["recall@1"] == 0.0 and m["recall@3"] == 1.0
+    assert m["rr"] == 0.5
+    ideal = 3 + 1 / 1.5849625007211563
+    assert m["ndcg@3"] == pytest.approx((1 / 1.5849625007211563 + 3 / 2) / ideal)
+    assert rank_metrics(["a.pdf:0", "a.pdf:1"], relevant, [2])["ndcg@2"] == pytest.approx(1.0)
+    assert rank_metrics([], relevant, [5]) == {"recall@5": 0.0, "ndcg@5": 0.0, "rr": 0.0}
+
+
+def test_golden_set_points_at_real_system_doc_chunks():
+    golden = load_golden(DEFAULT_GOLDEN_PATH)
+    assert golden["version"] >= 1 and len(golden["sha256"]) == 64
+    counts = {}
+    for name in os.listdir(ingest.SYSTEM_PDFS_DIR):
+        pages = iter_pdf_pages(os.path.join(ingest.SYSTEM_PDFS_DIR, name))
+        counts[name] = sum(1 for _ in stream_chunks(pages, chunk_chars=ingest.CHUNK_CHARS, overlap=ingest.OVERLAP))
+    for q in golden["queries"]:
+        assert judgements(q), q["id"]
+        for r in q["relevant"]:
+            assert r["chunk_index"] < counts[r["source_file"]], q["id"]
+        assert set(q.get("source_files") or []) <= set(counts)
+
+
+def test_synthetic_run_is_offline_and_restores_the_engine(tmp_path):
+    snapshot = str(tmp_path / "snapshot")
+    golden = record_synthetic(snapshot, chunks=300, queries=20, seed=11)
+    before = (engine.local_index, engine.embed_cache, engine.sb, engine.RETRIEVAL_BACKEND)
+    result = run_benchmark(engine, snapshot, golden, [1, 5], depth=10)
+    assert (engine.local_index, engine.embed_cache, engine.sb, engine.RETRIEVAL_BACKEND) == before
+
+    assert result["snapshot"]["chunks"] == {"vector": 300, "lexical": 300}
+    assert result["metrics"]["recall@5"] >= result["metrics"]["recall@1"] > 0
+    assert set(result["by_kind"]) == {"identifier", "topical"}
+    assert result["latency_ms"]["retrieve_chunks"]["p99"] >= result["latency_ms"]["retrieve_chunks"]["p50"] > 0
+    assert len(result["queries"]) == 20
+
+    ok, _ = compare(result, result, max_drop=0.01, latency_tolerance=0.25)
+    assert ok
+    better = copy.deepcopy(result)
+    better["metrics"]["mrr"] += 0.05
+    ok, lines = compare(result, better, max_drop=0.01, latency_tolerance=0.25)
+    assert not ok and any("REGRESSION: mrr" in line for line in lines)
+
+    golden["queries"].append({"id": "new", "query": "never recorded", "relevant": [{"source_file": "x", "chunk_index": 0}]})
+    with pytest.raises(RuntimeError, match="new"):
+        run_benchmark(engine, snapshot, golden, [1], depth=5)
@@ -0,0 +1,110 @@
+import random
+import time
+
+from meai_core.rule_validator import (
+    RuleValidator, check_answer, longest_verbatim_run, parse_verbatim_limits, with_citations_section,
+)
+
+LICENSE_BLOCK = "\n".join([
+    "LICENSE CONSTRAINTS (must follow):",
+    "- open.pdf | title: Open",
+    "  license_key: cc-by",
+    "  verbatim_allowed: True",
+    "  verbatim_char_limit: 200",
+    "- closed.pdf | title: Closed",
+    "  license_key: proprietary",
+    "  verbatim_allowed: False",
+    "- missing.pdf: no document record found. Treat as strict: summarize only, cite if used.",
+])
+
+SOURCE = (
+    "Bolted joints should be preloaded to roughly seventy five percent of the proof load so that the clamp "
+    "force exceeds the external separating load with margin, and the joint stiffness ratio keeps the bolt "
+    "alternating stress below the endurance limit."
+)
+
+
+def test_parse_verbatim_limits():
+    assert parse_verbatim_limits(LICENSE_BLOCK) == {"open.pdf": 200, "closed.pdf": 0, "missing.pdf": 0}
+
+
+def test_clean_cited_answer_passes():
+    verdict = check_answer("Preload to 75% [open.pdf:2].\n\nCitations: [open.pdf:2]", ["[open.pdf:2]"], False)
+    assert verdict == {"ok": True, "issues": [], "conclusive": True}
+
+
+def test_rule_violations():
+    verdict = check_answer("Use Acme [VENDOR_TABLE] and [other.pdf:9], ratio [1:2].", ["[open.pdf:2]"], False)
+    assert not verdict["ok"] and verdict["conclusive"]
+    assert len(verdict["issues"]) == 3
+    assert "[other.pdf:9]" in verdict["issues"][0]
+
+
+def test_uncited_answer_with_context_is_inconclusive():
+    verdict = check_answer("Use 75% of proof load.\n\nCitations: None", ["[open.pdf:2]"], False)
+    assert verdict["ok"] and not verdict["conclusive"]
+
+
+def test_longest_verbatim_run_counts_shared_word_runs():
+    words = SOURCE.split()
+    quote = " ".join(words[3:20])
+    assert longest_verbatim_run(f"As noted:  {quote}\nso plan for it.", SOURCE) == len(quote)
+    # shorter than the shingle, or only loosely similar: no run
+    assert longest_verbatim_run("preloaded to roughly", SOURCE) == 0
+    assert longest_verbatim_run(" ".join(reversed(words)), SOURCE) == 0
+
+    # linear in the input size, so a long answer against a large context stays cheap
+    big_source = " ".join(f"w{i}" for i in range(60000))
+    big_answer = " ".join(f"w{i}" for i in range(30000, 34000))
+    start = time.perf_counter()
+    assert longest_verbatim_run(big_answer, big_source) == len(big_answer)
+    assert time.perf_counter() - start < 1
+
+
+def test_verbatim_limits():
+    rows = [{"source_file": "open.pdf", "chunk_index": 1, "content": SOURCE}]
+    quoted = f"{SOURCE} [open.pdf:1]\n\nCitations: [open.pdf:1]"
+    verdict = check_answer(quoted, ["[open.pdf:1]"], False, LICENSE_BLOCK, rows)
+    assert not verdict["ok"] and verdict["conclusive"]
+    assert "open.pdf" in verdict["issues"][0] and "at most 200" in verdict["issues"][0]
+
+    # the same source quoted within its limit is fine
+    quoted = f"{SOURCE[:180]} [open.pdf:1]\n\nCitations: [open.pdf:1]"
+    assert check_answer(quoted, ["[open.pdf:1]"], False, LICENSE_BLOCK, rows)["ok"]
+
+    # no limit of its own: another source's limit does not apply, the LLM decides
+    rows = [{"source_file": "closed.pdf", "chunk_index": 1, "content": SOURCE}]
+    quoted = f"{SOURCE} [closed.pdf:1]\n\nCitations: [closed.pdf:1]"
+    verdict = check_answer(quoted, ["[closed.pdf:1]"], False, LICENSE_BLOCK, rows)
+    assert verdict["ok"] and not verdict["conclusive"]
+
+
+def test_missing_citations_section_is_appended():
+    assert with_citations_section("Preload [open.pdf:2], buy from [VENDOR_TABLE].") == (
+        "Preload [open.pdf:2], buy from [VENDOR_TABLE].\n\nCitations: [open.pdf:2], [VENDOR_TABLE]"
+    )
+    assert with_citations_section("No sources.\n") == "No sources.\n\nCitations: None"
+    cited = "Ok [a.pdf:1]\n\nCitations: [a.pdf:1]"
+    assert with_citations_section(cited) == cited
+
+    verdict = RuleValidator(enabled=True, audit_rate=0.0).check("Ok [a.pdf:1]", ["[a.pdf:1]"], False)
+    assert verdict["ok"] and verdict["validator"] == "rules"
+    assert verdict["answer"] == cited
+
+
+def test_audit_sampling_and_reconcile():
+    validator = RuleValidator(enabled=True, audit_rate=1.0)
+    verdict = validator.check("Ok [a.pdf:1]\n\nCitations: [a.pdf:1]", ["[a.pdf:1]"], False)
+    assert verdict["validator"] == "audit"
+    merged = validator.reconcile(verdict, {"ok": False, "issues": ["invented number"]})
+    assert merged["ok"] is False and merged["issues"] == ["invented number"]
+    assert validator.stats()["audit_disagreements"] == 1
+
+    assert RuleValidator(enabled=False).check("anything", [], False)["validator"] == "llm"
+
+    def sampled(seed):
+        validator = RuleValidator(enabled=True, audit_rate=0.5, rng=random.Random(seed))
+        return [validator.check("Ok [a.pdf:1]\n\nCitations: [a.pdf:1]", ["[a.pdf:1]"], False)["validator"] for _ in range(20)]
+
+    assert sampled(3) == sampled(3)
+    assert set(sampled(3)) == {"audit", "rules"}
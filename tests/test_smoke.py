@@ -1,3 +1,5 @@
+import json
+
 from fastapi.testclient import TestClient
 
 import meai_web.server as server
@@ -12,6 +14,16 @@ def test_health():
     assert "uptime_seconds" in data
 
 
+def test_stats_only_served_when_debugging(monkeypatch):
+    monkeypatch.setattr(server, "cache_stats", lambda: {"embeddings": {"hits": 1}})
+    client = TestClient(server.app)
+    monkeypatch.delenv("DEBUG_RAG", raising=False)
+    assert client.get("/api/stats").status_code == 404
+    monkeypatch.setenv("DEBUG_RAG", "1")
+    res = client.get("/api/stats")
+    assert res.status_code == 200 and res.json() == {"caches": {"embeddings": {"hits": 1}}}
+
+
 def test_ask_normal(monkeypatch):
     def fake_rag_answer(mode, message, session_id):
         return "ok", [], {}
@@ -80,3 +92,50 @@ def test_hardwarehub_schedule(monkeypatch):
     assert res.status_code == 200
     data = res.json()
     assert "calendar.app.google/b9H7oKXC58tDX4ge9" in data["answer"]
+
+
+def test_ask_stream(monkeypatch):
+    def fake_rag_answer_stream(mode, message, session_id):
+        yield "token", "hel"
+        yield "token", "lo"
+        yield "citations", [{"tag": "[a.pdf:1]"}]
+        yield "debug", {"fixed": False}
+
+    monkeypatch.setattr(server, "rag_answer_stream", fake_rag_answer_stream)
+    client = TestClient(server.app)
+    res = client.post(
+        "/api/ask/stream",
+        json={"mode": "mode_1", "message": "hello", "session_id": "s4"},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in res.text.strip().split("\n\n")]
+    assert events == [
+        "event: token",
+        "event: token",
+        "event: citations",
+        "event: debug",
+        "event: done",
+    ]
+    assert 'data: "hel"' in res.text
+
+
+def test_ask_batch_streams_json_lines(monkeypatch):
+    async def fake_batch(items, concurrency=8):
+        for i, item in reversed(list(enumerate(items))):
+            yield {"index": i, "id": item.get("id", i), "answer": item["message"].upper(), "elapsed_ms": 5}
+
+    monkeypatch.setattr(server, "rag_answer_batch", fake_batch)
+    client = TestClient(server.app)
+    res = client.post(
+        "/api/ask/batch",
+        json={"items": [{"mode": "mode_1", "message": "a", "id": "x"}, {"mode": "mode_2", "message": "b"}], "concurrency": 2},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert [line.get("answer") for line in lines[:2]] == ["B", "A"]
+    assert lines[1]["id"] == "x"
+    assert lines[-1]["summary"]["count"] == 2
+
+    assert client.post("/api/ask/batch", json={"items": []}).status_code == 422
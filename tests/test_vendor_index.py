@@ -0,0 +1,65 @@
+import threading
+
+from meai_core.vendor_index import VendorIndex
+
+VENDORS = [
+    {"id": 1, "name": "Acme Sheet", "category": "Sheet metal", "capabilities": "laser cutting, bending", "industries": "industrial"},
+    {"id": 2, "name": "Precision CNC", "category": "Machine shop", "capabilities": "cnc machining, 5-axis milling", "industries": "medical, aerospace"},
+    {"id": 3, "name": "Proto Labs", "category": "Prototyping", "capabilities": "injection molding, cnc machining", "notes": "fast quotes", "industries": "consumer, medical"},
+    {"id": 4, "name": "Board House", "category": "PCB", "capabilities": "pcb assembly", "industries": "electronics"},
+]
+
+
+def _index(rows):
+    index = VendorIndex(load_vendors=lambda: rows, enabled=True, ttl_sec=600)
+    assert index.refresh()
+    return index
+
+
+def test_cold_index_loads_in_the_background():
+    gate = threading.Event()
+
+    def load_vendors():
+        gate.wait(5)
+        return VENDORS
+
+    index = VendorIndex(load_vendors=load_vendors, enabled=True, ttl_sec=600)
+    # the caller falls back to the ilike query instead of waiting on the load
+    assert index.search(capability="cnc") is None
+    assert index.search(capability="cnc") is None
+    gate.set()
+    for t in threading.enumerate():
+        if t.name == "meai-vendor-index":
+            t.join(5)
+    assert index.search(capability="cnc")[0]["name"] in ("Precision CNC", "Proto Labs")
+    assert index.stats()["loads"] == 1 and index.stats()["fallbacks"] == 2
+
+
+def test_ranks_by_capability_and_filters_industries():
+    index = _index(VENDORS)
+    names = [v["name"] for v in index.search(capability="5-axis cnc machining")]
+    assert names[:2] == ["Precision CNC", "Proto Labs"]
+    assert "Board House" not in names
+
+    names = [v["name"] for v in index.search(industries=["medical"], capability="injection molding")]
+    assert names == ["Proto Labs"]
+
+    assert [v["name"] for v in index.search(industries=["electronics"])] == ["Board House"]
+
+
+def test_fuzzy_terms_and_incremental_refresh():
+    rows = [dict(v) for v in VENDORS]
+    index = _index(rows)
+    assert index.search(capability="machinist")[0]["name"] in ("Precision CNC", "Proto Labs")
+
+    rows[3] = dict(rows[3], capabilities="pcb assembly, cable harnesses")
+    del rows[0]
+    assert index.refresh()
+    assert index.stats()["reindexed"] == len(VENDORS) + 2
+    assert [v["name"] for v in index.search(capability="harness")] == ["Board House"]
+    assert index.search(capability="laser cutting") == []
+
+
+def test_disabled_index_returns_none():
+    index = VendorIndex(load_vendors=lambda: VENDORS, enabled=False)
+    assert index.search(capability="cnc") is None